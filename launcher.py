@@ -4,6 +4,7 @@ import sys
 
 # Import all tool classes
 from photo_video_tools.tools import *
+from photo_video_tools import sharding
 
 # Tool registry: list of tool classes
 TOOLS = [
@@ -14,6 +15,9 @@ TOOLS = [
     CopyGeotagFromXmpToJpegFilesTool,
     MergeSrtWithMp4Tool,
     AddGeotagToDjiDroneVideoTool,
+    ExtractRawPreviewsTool,
+    VideoContactSheetsTool,
+    MetadataPipelineTool,
 ]
 
 
@@ -27,16 +31,25 @@ def print_menu() -> None:
         print(f"  {i}. {tool_class.name}")
         print(f"     {tool_class.description}")
         print()
+    print("  b. Batch mode")
+    print("     Run a tool over many folders concurrently")
+    print()
+    print("  s. Sharded run")
+    print("     Split a large folder into parts to run on several machines")
+    print()
     print("  q. Quit")
     print()
 
 
-def get_user_choice() -> int | None:
+def get_user_choice(allow_batch: bool = True) -> int | str | None:
     """Get tool selection from user."""
+    options = f"1-{len(TOOLS)}, b, s, q" if allow_batch else f"1-{len(TOOLS)}, q"
     while True:
-        choice = input(f"Select a tool (1-{len(TOOLS)}, q): ").strip().lower()
+        choice = input(f"Select a tool ({options}): ").strip().lower()
         if choice == "q":
             return None
+        if choice in ("b", "s") and allow_batch:
+            return choice
         try:
             num = int(choice)
         except ValueError:
@@ -57,6 +70,41 @@ def run_tool(tool_index: int) -> int:
     return tool_class.run()
 
 
+def run_batch() -> int:
+    """Select a tool and run it over many folders."""
+    batch_tools = [tool_class.name for tool_class in TOOLS if tool_class.supports_batch()]
+    print(f"\nBatch mode is available for: {', '.join(batch_tools)}")
+
+    choice = get_user_choice(allow_batch=False)
+    if choice is None:
+        print("Exiting...")
+        return 0
+
+    tool_class = TOOLS[choice]
+    print(f"\nLaunching batch: {tool_class.name}")
+
+    return tool_class.run_batch()
+
+
+def run_sharded() -> int:
+    """Select a tool and plan a run split into parts."""
+    sharded_tools = [tool_class.name for tool_class in TOOLS if tool_class.supports_batch()]
+    print(f"\nSharded runs are available for: {', '.join(sharded_tools)}")
+
+    choice = get_user_choice(allow_batch=False)
+    if choice is None:
+        print("Exiting...")
+        return 0
+
+    tool_class = TOOLS[choice]
+    if not tool_class.supports_batch():
+        print(f"{tool_class.name} can't be split into parts.")
+        return 1
+    print(f"\nPlanning sharded run: {tool_class.name}")
+
+    return sharding.run_interactive(tool_class)
+
+
 def main() -> int:
     """Main entry point."""
     try:
@@ -66,8 +114,13 @@ def main() -> int:
         if choice is None:
             print("Exiting...")
             return 0
-        
-        exit_code = run_tool(choice)
+
+        if choice == "b":
+            exit_code = run_batch()
+        elif choice == "s":
+            exit_code = run_sharded()
+        else:
+            exit_code = run_tool(choice)
         
         if exit_code != 0:
             print(f"\nTool exited with code {exit_code}")
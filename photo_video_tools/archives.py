@@ -0,0 +1,237 @@
+"""Read camera-card archives (ZIP, TAR) in place instead of extracting them first.
+
+Members that are stored uncompressed (all members of a TAR, and the usual "stored" ZIP
+members: JPEG, raw and video data doesn't compress) are plain byte ranges of the archive
+file. Their headers are read with bounded seeks into that range and they are copied out
+with `fastcopy.copy_range`, so only the files that land somewhere are written.
+Compressed ZIP members are decompressed while reading; seeking backwards in them
+restarts the decompression, which is slow but still correct.
+
+Members offer the parts of the `Path` interface the format readers and the sort tool use
+(`name`, `stem`, `suffix`, `stat()`, `open()`).
+"""
+
+import io
+import struct
+import tarfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, NamedTuple
+
+from photo_video_tools.fastcopy import CopyResult, copy_range, copy_stream
+
+# Compressed TARs have no random access, so they are not supported
+ARCHIVE_EXTENSIONS = (".zip", ".tar")
+# For `shared.select_file_gui`
+ARCHIVE_FILETYPES = [("ZIP or TAR archives", "*.zip *.tar")]
+
+# Seconds between 1601-01-01 (NTFS timestamps) and 1970-01-01
+_NTFS_EPOCH_OFFSET = 11_644_473_600
+
+
+class MemberStat(NamedTuple):
+    st_size: int
+    st_mtime_ns: int
+
+
+@dataclass(frozen=True)
+class ArchiveMember:
+    """A regular file inside an archive."""
+
+    archive: "Archive" = field(repr=False)
+    # Path inside the archive, with POSIX separators
+    path: str
+    size: int
+    mtime_ns: int
+    compressed: bool = False
+
+    @property
+    def name(self) -> str:
+        return PurePosixPath(self.path).name
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self.path).stem
+
+    @property
+    def suffix(self) -> str:
+        return PurePosixPath(self.path).suffix
+
+    def stat(self) -> MemberStat:
+        return MemberStat(self.size, self.mtime_ns)
+
+    def open(self, mode: str = "rb") -> BinaryIO:
+        if mode != "rb":
+            raise ValueError(f"Archive members can only be opened for reading, not '{mode}'")
+        return self.archive.open_member(self)
+
+    def __str__(self) -> str:
+        return f"{self.archive.path.name}:{self.path}"
+
+
+class _RangeFile(io.RawIOBase):
+    """Read-only view of `length` bytes at `offset` of a file."""
+
+    def __init__(self, path: Path, offset: int, length: int):
+        super().__init__()
+        self._file = open(path, "rb", buffering=0)
+        self._offset = offset
+        self._length = length
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._length - self._position)
+        if size <= 0:
+            return 0
+        self._file.seek(self._offset + self._position)
+        with memoryview(buffer) as view:
+            read = self._file.readinto(view[:size]) or 0
+        self._position += read
+        return read
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._length}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def _zip_mtime_ns(info: zipfile.ZipInfo) -> int:
+    """
+    Modification time of a ZIP member.
+
+    The DOS time in the header is local time with 2 s resolution; the extended timestamp
+    (Info-ZIP) or NTFS extra fields hold the exact UTC time, if the archiver wrote them.
+    """
+    extra = info.extra
+    position = 0
+    while position + 4 <= len(extra):
+        tag, size = struct.unpack_from("<HH", extra, position)
+        data = extra[position + 4:position + 4 + size]
+        if tag == 0x5455 and len(data) >= 5 and data[0] & 1:
+            return struct.unpack_from("<I", data, 1)[0] * 1_000_000_000
+        if tag == 0x000A and len(data) >= 12:
+            # Reserved, then attributes; attribute 1 holds mtime, atime, ctime in 100 ns units
+            attribute, attribute_size = struct.unpack_from("<HH", data, 4)
+            if attribute == 1 and attribute_size >= 8:
+                (mtime,) = struct.unpack_from("<Q", data, 8)
+                return mtime * 100 - _NTFS_EPOCH_OFFSET * 1_000_000_000
+        position += 4 + size
+    return int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
+
+
+def _is_hidden(path: str) -> bool:
+    """Dot files and the resource forks macOS adds to archives ('__MACOSX/', '._IMG_0001.JPG')."""
+    return path.startswith("__MACOSX/") or PurePosixPath(path).name.startswith(".")
+
+
+class Archive:
+    """A ZIP or uncompressed TAR file and the regular files in it."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.members: list[ArchiveMember] = []
+        self._zip: zipfile.ZipFile | None = None
+        # Offsets of the data of uncompressed members in the archive file
+        self._data_offsets: dict[str, int] = {}
+        self._header_offsets: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if zipfile.is_zipfile(path):
+            try:
+                self._zip = zipfile.ZipFile(path)
+            except zipfile.BadZipFile as e:
+                raise ValueError(f"{path.name} is not a readable ZIP archive: {e}") from e
+            for info in self._zip.infolist():
+                if info.is_dir() or _is_hidden(info.filename):
+                    continue
+                compressed = info.compress_type != zipfile.ZIP_STORED or bool(info.flag_bits & 0x1)
+                self.members.append(ArchiveMember(self, info.filename, info.file_size, _zip_mtime_ns(info), compressed))
+                # The data follows the local header, whose length is only known after reading it
+                self._header_offsets[info.filename] = info.header_offset
+            return
+
+        try:
+            # Reads one header per member and seeks over the data
+            with tarfile.open(path, "r:") as tar:
+                for info in tar:
+                    if not info.isfile() or info.issparse() or _is_hidden(info.name):
+                        continue
+                    self.members.append(ArchiveMember(self, info.name, info.size, round(info.mtime * 1_000_000_000)))
+                    self._data_offsets[info.name] = info.offset_data
+        except tarfile.ReadError as e:
+            raise ValueError(f"{path.name} is not a ZIP or uncompressed TAR archive") from e
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def data_offset(self, member: ArchiveMember) -> int | None:
+        """Offset of the member's data in the archive file, None for compressed members."""
+        if member.compressed:
+            return None
+        with self._lock:
+            offset = self._data_offsets.get(member.path)
+        if offset is not None:
+            return offset
+
+        header_offset = self._header_offsets[member.path]
+        with open(self.path, "rb") as f:
+            f.seek(header_offset)
+            local_header = f.read(30)
+        if len(local_header) < 30 or local_header[:4] != b"PK\x03\x04":
+            raise OSError(f"Bad local header of {member.path} in {self.path.name}")
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        offset = header_offset + 30 + name_length + extra_length
+        with self._lock:
+            self._data_offsets[member.path] = offset
+        return offset
+
+    def open_member(self, member: ArchiveMember) -> BinaryIO:
+        offset = self.data_offset(member)
+        if offset is not None:
+            # Own file handle per open member, so several threads can read at once
+            return io.BufferedReader(_RangeFile(self.path, offset, member.size))
+        if self._zip is None:
+            raise OSError(f"{self.path.name} is closed")
+        return self._zip.open(member.path)
+
+
+def is_archive(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() in ARCHIVE_EXTENSIONS
+
+
+def extract_member(member: ArchiveMember, dst: Path, hash_algorithm: str | None = None) -> CopyResult:
+    """
+    Write one member to `dst` with the member's modification time.
+
+    Uncompressed members are copied kernel-side as a byte range of the archive where
+    possible; with a checksum or for compressed members the data is read through Python.
+    """
+    offset = member.archive.data_offset(member)
+    if offset is not None and hash_algorithm is None:
+        return copy_range(member.archive.path, dst, offset, member.size, member.mtime_ns)
+    with member.open() as f:
+        return copy_stream(f, dst, hash_algorithm, member.mtime_ns)
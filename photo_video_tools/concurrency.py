@@ -0,0 +1,183 @@
+"""Adaptive concurrency for per-file processing loops.
+
+The best number of parallel file operations depends on the storage: a local NVMe drive
+keeps scaling up to many concurrent exiftool writes while a USB card reader or network
+share degrades beyond two. The controller starts low and adjusts the number of tasks in
+flight AIMD-style: add one while throughput keeps up, halve when it drops. Latency is the
+second signal: when the time per operation grows while throughput stays flat, the extra
+tasks only wait in the storage's queue, so the last increase is taken back.
+
+Used on the host and inside the containers, so it only depends on the standard library.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Environment variables with the user's limits; forwarded into the containers
+MIN_WORKERS_ENV = "PHOTO_VIDEO_TOOLS_MIN_WORKERS"
+MAX_WORKERS_ENV = "PHOTO_VIDEO_TOOLS_MAX_WORKERS"
+DEFAULT_MAX_WORKERS = 8
+
+# A window is evaluated once this much time has passed and enough tasks finished in it
+MIN_WINDOW_SECONDS = 0.5
+# Relative drop of both byte and task throughput that counts as congestion
+DECREASE_THRESHOLD = 0.15
+# Relative growth of the mean time per task that counts as queueing, if throughput didn't
+# grow by more than FLAT_THRESHOLD at the same time
+LATENCY_INCREASE_THRESHOLD = 0.3
+FLAT_THRESHOLD = 0.05
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, "")))
+    except ValueError:
+        return default
+
+
+def file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of tasks in flight, with throughput and latency statistics."""
+
+    def __init__(self, min_limit: int = 1, max_limit: int = DEFAULT_MAX_WORKERS, initial: int | None = None):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial if initial is not None else 2, self.min_limit), self.max_limit)
+
+        self.total_bytes = 0
+        self.total_tasks = 0
+        self.total_latency = 0.0
+        self.total_timed_tasks = 0
+        self.started = time.monotonic()
+        self.peak_limit = self.limit
+        self._limit_seconds = 0.0
+        self._limit_since = self.started
+
+        self._window_start = self.started
+        self._window_bytes = 0
+        self._window_tasks = 0
+        self._window_latency = 0.0
+        self._window_timed_tasks = 0
+        self._previous_rates: tuple[float, float] | None = None
+        self._previous_latency: float | None = None
+
+    @classmethod
+    def from_environment(cls) -> "AdaptiveConcurrency":
+        """Create a controller within the limits set via environment variables."""
+        min_limit = _env_int(MIN_WORKERS_ENV, 1)
+        max_limit = _env_int(MAX_WORKERS_ENV, max(min_limit, min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)))
+        return cls(min_limit, max_limit)
+
+    def task_finished(self, nbytes: int, latency: float | None = None) -> None:
+        """
+        Record a finished task and adjust the limit at the end of a measurement window.
+
+        `latency` is the time the task took in seconds, if it was measured.
+        """
+        now = time.monotonic()
+        self.total_bytes += nbytes
+        self.total_tasks += 1
+        self._window_bytes += nbytes
+        self._window_tasks += 1
+        if latency is not None:
+            self.total_latency += latency
+            self.total_timed_tasks += 1
+            self._window_latency += latency
+            self._window_timed_tasks += 1
+
+        elapsed = now - self._window_start
+        if elapsed < MIN_WINDOW_SECONDS or self._window_tasks < max(2, self.limit):
+            return
+
+        rates = (self._window_bytes / elapsed, self._window_tasks / elapsed)
+        latency = self._window_latency / self._window_timed_tasks if self._window_timed_tasks else None
+        if self._previous_rates is not None and all(
+            current < previous * (1 - DECREASE_THRESHOLD)
+            for current, previous in zip(rates, self._previous_rates)
+        ):
+            # Both MB/s and files/s collapsed: the storage is saturated
+            self._set_limit(max(self.min_limit, self.limit // 2), now)
+        elif (
+            self._previous_rates is not None
+            and latency is not None
+            and self._previous_latency is not None
+            and latency > self._previous_latency * (1 + LATENCY_INCREASE_THRESHOLD)
+            and all(
+                current <= previous * (1 + FLAT_THRESHOLD)
+                for current, previous in zip(rates, self._previous_rates)
+            )
+        ):
+            # Each operation takes longer but no more get done: the extra tasks only queue
+            self._set_limit(max(self.min_limit, self.limit - 1), now)
+        else:
+            self._set_limit(min(self.max_limit, self.limit + 1), now)
+
+        self._previous_rates = rates
+        self._previous_latency = latency
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_tasks = 0
+        self._window_latency = 0.0
+        self._window_timed_tasks = 0
+
+    def _set_limit(self, limit: int, now: float) -> None:
+        self._limit_seconds += self.limit * (now - self._limit_since)
+        self._limit_since = now
+        self.limit = limit
+        self.peak_limit = max(self.peak_limit, limit)
+
+    def summary(self) -> str:
+        now = time.monotonic()
+        elapsed = max(now - self.started, 1e-9)
+        average_limit = (self._limit_seconds + self.limit * (now - self._limit_since)) / elapsed
+        latency = (
+            f", {self.total_latency / self.total_timed_tasks * 1000:.0f} ms per file" if self.total_timed_tasks else ""
+        )
+        return (
+            f"Concurrency: {self.limit} at the end, {average_limit:.1f} on average, {self.peak_limit} at most "
+            f"(limits {self.min_limit}-{self.max_limit}); "
+            f"throughput: {self.total_bytes / elapsed / 1e6:.1f} MB/s, {self.total_tasks / elapsed:.1f} files/s{latency}"
+        )
+
+    def map_unordered(
+        self,
+        func: Callable[[T], R],
+        items: Iterable[T],
+        size: Callable[[T], int] = file_size,
+    ) -> Iterator[tuple[T, R | None, Exception | None]]:
+        """
+        Run `func` over items with an adaptive number of worker threads.
+
+        The largest items are started first to shorten the total run time. Yields
+        (item, result, exception) in completion order on the calling thread, so callers
+        can print and update progress bars as in a sequential loop.
+        """
+        pending = sorted(((size(item), item) for item in items), key=lambda entry: entry[0], reverse=True)
+        pending.reverse()  # pop() from the end takes the largest item first
+        in_flight: dict[Future, tuple[T, int, float]] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_limit) as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.limit:
+                    nbytes, item = pending.pop()
+                    in_flight[executor.submit(func, item)] = (item, nbytes, time.monotonic())
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                finished = time.monotonic()
+                for future in done:
+                    item, nbytes, submitted = in_flight.pop(future)
+                    self.task_finished(nbytes, finished - submitted)
+                    error = future.exception()
+                    yield item, (future.result() if error is None else None), error
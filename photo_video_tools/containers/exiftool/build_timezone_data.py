@@ -0,0 +1,74 @@
+"""Convert the timezone-boundary-builder GeoJSON into the compact file read by photo_video_tools.geo.timezones.
+
+Runs once while building the image. Rings are simplified by dropping points closer than
+TOLERANCE_DEGREES to the previously kept point and stored as little-endian float32 pairs:
+
+    b"TZB1", zone count (u32)
+    per zone:    name length (u16), UTF-8 name, polygon count (u32)
+    per polygon: ring count (u32), first ring is the outer boundary
+    per ring:    point count (u32), point count * (lon, lat) float32
+"""
+
+import json
+import struct
+import sys
+import zipfile
+from array import array
+
+MAGIC = b"TZB1"
+# About 50 m; far below the accuracy of the boundaries themselves
+TOLERANCE_DEGREES = 0.0005
+
+
+def simplify_ring(ring: list[list[float]]) -> array:
+    points = array("f")
+    last = None
+    for lon, lat in (point[:2] for point in ring):
+        if last is not None and abs(lon - last[0]) < TOLERANCE_DEGREES and abs(lat - last[1]) < TOLERANCE_DEGREES:
+            continue
+        points.extend((lon, lat))
+        last = (lon, lat)
+    # Keep the ring closed
+    final = array("f", ring[-1][:2])
+    if points[-2:] != final:
+        points.extend(final)
+    if len(points) < 8:
+        # Tiny islands: keep them unsimplified rather than degenerate
+        points = array("f", (value for point in ring for value in point[:2]))
+    return points
+
+
+def main(source: str, destination: str) -> None:
+    with zipfile.ZipFile(source) as archive:
+        member = next(name for name in archive.namelist() if name.endswith((".json", ".geojson")))
+        with archive.open(member) as f:
+            collection = json.load(f)
+
+    zones: dict[str, list[list[list[list[float]]]]] = {}
+    for feature in collection["features"]:
+        geometry = feature["geometry"]
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        zones.setdefault(feature["properties"]["tzid"], []).extend(polygons)
+
+    if sys.byteorder != "little":
+        raise SystemExit("Building the time zone data needs a little-endian machine")
+
+    total_in = total_out = 0
+    with open(destination, "wb") as out:
+        out.write(MAGIC + struct.pack("<I", len(zones)))
+        for name, polygons in sorted(zones.items()):
+            encoded = name.encode()
+            out.write(struct.pack("<H", len(encoded)) + encoded + struct.pack("<I", len(polygons)))
+            for polygon in polygons:
+                out.write(struct.pack("<I", len(polygon)))
+                for ring in polygon:
+                    points = simplify_ring(ring)
+                    total_in += len(ring)
+                    total_out += len(points) // 2
+                    out.write(struct.pack("<I", len(points) // 2))
+                    points.tofile(out)
+    print(f"{len(zones)} zones, {total_in} points simplified to {total_out}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
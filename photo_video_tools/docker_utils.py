@@ -1,9 +1,26 @@
-"""Utility functions for Docker container management."""
+"""Utility functions for Docker container management.
 
+Base images are built with BuildKit, whose cache mounts keep apt and npm downloads between
+builds, and are labelled with a hash of their sources. Built images can be saved to a folder
+as `docker save` tarballs named after that hash, and loaded from there on hosts without
+network access (or just to skip the build):
+
+Usage:
+    python -m photo_video_tools.docker_utils export <folder>
+    python -m photo_video_tools.docker_utils import <folder>
+With PHOTO_VIDEO_TOOLS_IMAGE_CACHE set to such a folder, the tools load matching images from
+it instead of building them, and save the images they build into it.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import os
 from pathlib import Path
 import subprocess
 import shlex
-from typing import Iterable
+import sys
+import time
+from typing import Callable, Iterable
 
 
 # Container registry: maps container name to its config
@@ -11,7 +28,7 @@ CONTAINERS = {
     "exiftool": {
         "image": "base-exiftool",
         "directory": "exiftool",
-        "extra_hash_files": [],
+        "extra_hash_files": ["build_timezone_data.py", "xmp2exif.args"],
     },
     "exiftool-nodejs": {
         "image": "base-exiftool-nodejs",
@@ -21,6 +38,8 @@ CONTAINERS = {
             "DJI_SRT_Parser/package-lock.json",
             "DJI_SRT_Parser/index.js",
         ],
+        # Base images its Dockerfile copies from (the time zone data of the exiftool image)
+        "requires": ["exiftool"],
     },
     "ffmpeg": {
         "image": "base-ffmpeg",
@@ -30,6 +49,10 @@ CONTAINERS = {
 }
 
 CONTAINERS_DIR = Path(__file__).parent / "containers"
+# Folder of saved base images, see the module docstring
+IMAGE_CACHE_ENV = "PHOTO_VIDEO_TOOLS_IMAGE_CACHE"
+# Longest output line of a batch job; the asyncio default of 64 KiB is exceeded by e.g. exiftool -json
+OUTPUT_LINE_LIMIT = 16 * 1024 * 1024
 
 
 def ensure_docker_available() -> None:
@@ -54,57 +77,124 @@ def _compute_hash(paths: Iterable[Path]) -> str:
     return sha.hexdigest()
 
 
-def ensure_base_image(image_tag: str, dockerfile_dir: Path, extra_hash_files: Iterable[Path] | None = None) -> None:
-    """
-    Ensure a base image exists and is up to date based on a source hash.
-
-    Hash includes the Dockerfile and any provided extra files (e.g., parser sources).
-    """
-    dockerfile = dockerfile_dir / "Dockerfile"
-    files = [dockerfile]
+def source_hash(dockerfile_dir: Path, extra_hash_files: Iterable[Path] | None = None) -> str:
+    """Hash of the Dockerfile and any provided extra files (e.g., parser sources) of a base image."""
+    files = [dockerfile_dir / "Dockerfile"]
     if extra_hash_files:
         files.extend(extra_hash_files)
+    return _compute_hash(files)
 
-    wanted_hash = _compute_hash(files)
 
+def _image_source_hash(image_tag: str) -> str:
+    """The `source_hash` label of an image, or an empty string if there is no such image."""
     inspect = subprocess.run([
         "docker", "image", "inspect", image_tag, "--format",
         "{{ index .Config.Labels \"source_hash\"}}"
     ], capture_output=True, text=True)
-    existing_hash = inspect.stdout.strip() if inspect.returncode == 0 else ""
-    if existing_hash == wanted_hash:
+    return inspect.stdout.strip() if inspect.returncode == 0 else ""
+
+
+def image_tarball(cache_dir: Path, image_tag: str, wanted_hash: str) -> Path:
+    """Where the image built from sources with this hash is saved in an image cache folder."""
+    return cache_dir / f"{image_tag}.{wanted_hash}.tar"
+
+
+def save_image(image_tag: str, wanted_hash: str, cache_dir: Path) -> Path:
+    """
+    Save an image into the cache folder with `docker save`; older tarballs of the image are removed.
+
+    The tarball is written under a temporary name and renamed when complete, so an
+    interrupted save never leaves a tarball that looks usable.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tarball = image_tarball(cache_dir, image_tag, wanted_hash)
+    partial = tarball.with_name(f".{tarball.name}.partial")
+    try:
+        save = subprocess.run(["docker", "save", "-o", str(partial), image_tag], capture_output=True, text=True)
+        if save.returncode != 0:
+            raise RuntimeError(f"Failed to save Docker image '{image_tag}': {save.stderr.strip()}")
+        os.replace(partial, tarball)
+    finally:
+        partial.unlink(missing_ok=True)
+
+    for stale in cache_dir.glob(f"{image_tag}.*.tar"):
+        if stale != tarball:
+            stale.unlink()
+    print(f"Saved Docker image '{image_tag}' to {tarball}.")
+    return tarball
+
+
+def load_image(image_tag: str, wanted_hash: str, cache_dir: Path) -> bool:
+    """
+    Load the image built from sources with this hash from the cache folder, if it is there.
+
+    Returns whether the image is now up to date.
+    """
+    tarball = image_tarball(cache_dir, image_tag, wanted_hash)
+    if not tarball.is_file():
+        return False
+
+    print(f"Loading Docker image '{image_tag}' from {tarball}...")
+    load = subprocess.run(["docker", "load", "-i", str(tarball)], capture_output=True, text=True)
+    if load.returncode != 0:
+        print(f"Failed to load Docker image '{image_tag}': {load.stderr.strip()}")
+        return False
+    if _image_source_hash(image_tag) != wanted_hash:
+        print(f"Docker image loaded from {tarball} doesn't match its name (expected source_hash={wanted_hash}).")
+        return False
+    print(f"Loaded Docker image '{image_tag}'.")
+    return True
+
+
+def ensure_base_image(
+    image_tag: str, dockerfile_dir: Path, extra_hash_files: Iterable[Path] | None = None,
+    cache_dir: Path | None = None, before_build: Callable[[], None] | None = None,
+) -> None:
+    """
+    Ensure a base image exists and is up to date based on a source hash.
+
+    Hash includes the Dockerfile and any provided extra files (e.g., parser sources).
+    With a `cache_dir`, a saved image with the wanted hash is loaded instead of building
+    one, and an image that is built or already up to date is saved there if it isn't yet.
+    `before_build` runs only if the image has to be built, e.g. to prepare images it copies from.
+    """
+    wanted_hash = source_hash(dockerfile_dir, extra_hash_files)
+
+    if _image_source_hash(image_tag) == wanted_hash:
         print(f"Docker image '{image_tag}' is up to date (source_hash={wanted_hash}). Skipping build.")
+        if cache_dir is not None and not image_tarball(cache_dir, image_tag, wanted_hash).is_file():
+            save_image(image_tag, wanted_hash, cache_dir)
         return
 
+    if cache_dir is not None and load_image(image_tag, wanted_hash, cache_dir):
+        return
+
+    if before_build is not None:
+        before_build()
+
+    # BuildKit is needed for the cache mounts of the Dockerfiles; its output is shown as the build runs
     print(f"Building Docker image '{image_tag}' (source_hash={wanted_hash})...")
     build = subprocess.run([
         "docker", "build",
         "--label", f"source_hash={wanted_hash}",
         "-t", image_tag,
         str(dockerfile_dir),
-    ], capture_output=True, text=True)
-    if build.returncode == 0:
-        print(f"Successfully built Docker image '{image_tag}'.")
-    else:
+    ], env={**os.environ, "DOCKER_BUILDKIT": "1"})
+    if build.returncode != 0:
         print(f"Failed to build Docker image '{image_tag}'.")
-        print("Build output:")
-        print(build.stdout)
-        print("Build errors:")
-        print(build.stderr)
         raise RuntimeError(f"Failed to build Docker image '{image_tag}'.")
+    print(f"Successfully built Docker image '{image_tag}'.")
 
+    if cache_dir is not None:
+        save_image(image_tag, wanted_hash, cache_dir)
 
-def run_container(container_name: str, docker_options: list[str], command_and_args: list[str]) -> int:
-    """
-    Preflight and run a container by name.
 
-    Args:
-        container_name: Name identifying the container
-        docker_options: List of docker run options (e.g., ["-v", "...", "--rm"])
-        command_and_args: List of command and arguments to run inside the container (e.g., ["python", "script.py"])
+def _container_sources(container_name: str) -> tuple[str, Path, list[Path] | None]:
+    """
+    Image tag, Dockerfile folder and extra hash files of a container by name.
 
-    Returns:
-        Exit code from the container process
+    The sources of the base images it requires are part of its extra hash files, so it is
+    rebuilt when they change.
     """
     if container_name not in CONTAINERS:
         raise ValueError(f"Unknown container: {container_name}. Valid containers: {list(CONTAINERS.keys())}")
@@ -113,14 +203,187 @@ def run_container(container_name: str, docker_options: list[str], command_and_ar
     dockerfile_dir = CONTAINERS_DIR / config["directory"]
 
     # Build extra hash files as Path objects
-    extra_files = [dockerfile_dir  / p for p in config["extra_hash_files"]] if config["extra_hash_files"] else None
+    extra_files = [dockerfile_dir  / p for p in config["extra_hash_files"]]
+    for required in config.get("requires", []):
+        _, required_dir, required_extra_files = _container_sources(required)
+        extra_files += [required_dir / "Dockerfile", *(required_extra_files or [])]
+    return config["image"], dockerfile_dir, extra_files or None
+
+
+def _prepare_required_images(container_name: str, cache_dir: Path | None) -> Callable[[], None]:
+    """A `before_build` that ensures the base images a container's Dockerfile copies from."""
+    def prepare() -> None:
+        for required in CONTAINERS[container_name].get("requires", []):
+            image, dockerfile_dir, extra_files = _container_sources(required)
+            ensure_base_image(image, dockerfile_dir, extra_files, cache_dir, _prepare_required_images(required, cache_dir))
+    return prepare
+
+
+def image_cache_from_environment() -> Path | None:
+    """The image cache folder set via IMAGE_CACHE_ENV, if any."""
+    path = os.environ.get(IMAGE_CACHE_ENV)
+    return Path(path) if path else None
+
+
+def prepare_container(container_name: str) -> str:
+    """
+    Preflight a container by name: ensure Docker is available and the base image is up to date.
+
+    Returns:
+        The image tag to pass to `docker run`
+    """
+    image, dockerfile_dir, extra_files = _container_sources(container_name)
 
     # Ensure Docker is available and the base image is up to date
     ensure_docker_available()
-    ensure_base_image(config["image"], dockerfile_dir, extra_files)
+    cache_dir = image_cache_from_environment()
+    ensure_base_image(image, dockerfile_dir, extra_files, cache_dir, _prepare_required_images(container_name, cache_dir))
+    return image
+
+
+def export_images(cache_dir: Path) -> int:
+    """Build the base images that aren't up to date and save all of them into the cache folder."""
+    ensure_docker_available()
+    failed = 0
+    for container_name in CONTAINERS:
+        image, dockerfile_dir, extra_files = _container_sources(container_name)
+        try:
+            ensure_base_image(image, dockerfile_dir, extra_files, cache_dir, _prepare_required_images(container_name, cache_dir))
+        except RuntimeError as e:
+            print(e)
+            failed += 1
+    return 1 if failed else 0
+
+
+def import_images(cache_dir: Path) -> int:
+    """Load the saved base images that match the current sources; nothing is built."""
+    ensure_docker_available()
+    missing = []
+    for container_name in CONTAINERS:
+        image, dockerfile_dir, extra_files = _container_sources(container_name)
+        wanted_hash = source_hash(dockerfile_dir, extra_files)
+        if _image_source_hash(image) == wanted_hash:
+            print(f"Docker image '{image}' is up to date (source_hash={wanted_hash}).")
+        elif not load_image(image, wanted_hash, cache_dir):
+            missing.append(image)
+
+    if missing:
+        print(f"No matching saved image for: {', '.join(missing)} (they are built when first needed).")
+        return 1
+    return 0
+
+
+def run_container(container_name: str, docker_options: list[str], command_and_args: list[str]) -> int:
+    """
+    Preflight and run a container by name.
+
+    Args:
+        container_name: Name identifying the container
+        docker_options: List of docker run options (e.g., ["-v", "...", "--rm"])
+        command_and_args: List of command and arguments to run inside the container (e.g., ["python", "script.py"])
+
+    Returns:
+        Exit code from the container process
+    """
+    image = prepare_container(container_name)
 
     # Build docker run command: docker run [OPTIONS] IMAGE [COMMAND [ARG...]]
-    cmd = ["docker", "run"] + docker_options + [config["image"]] + command_and_args
+    cmd = ["docker", "run"] + docker_options + [image] + command_and_args
     print(f"Running: {' '.join(cmd)}")
     result = subprocess.run(cmd)
     return result.returncode
+
+
+@dataclass
+class BatchJob:
+    """A single command of a batch run, e.g. one `docker run` per selected directory."""
+
+    label: str
+    command: list[str]
+    log_path: Path | None = None
+    cwd: Path | None = None
+    # Environment of the process; inherited if None
+    env: dict[str, str] | None = None
+    return_code: int | None = None
+    duration: float = 0.0
+
+
+async def run_command_async(job: BatchJob) -> int:
+    """
+    Run a batch job as an asyncio subprocess.
+
+    Every output line is echoed with a `[label]` prefix (if the job has a label) so concurrent
+    jobs stay readable, and written unprefixed to the job's own log file if one is set.
+    A process that is still running when the job fails or is cancelled is killed and waited
+    for, so no `docker run` is left behind.
+    """
+    start = time.monotonic()
+    log = open(job.log_path, "w", encoding="utf-8") if job.log_path is not None else None
+    process = None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *job.command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            stdin=asyncio.subprocess.DEVNULL,
+            cwd=job.cwd,
+            env=job.env,
+            limit=OUTPUT_LINE_LIMIT,
+        )
+        assert process.stdout is not None
+        async for raw_line in process.stdout:
+            # Progress bars redraw with carriage returns; keep only the final state of the line
+            line = raw_line.decode("utf-8", errors="replace").rstrip().rsplit("\r", 1)[-1]
+            if not line:
+                continue
+            print(f"[{job.label}] {line}" if job.label else line)
+            if log is not None:
+                log.write(line + "\n")
+        job.return_code = await process.wait()
+    except Exception as e:
+        print(f"[{job.label}] Failed to run job: {e}")
+        if log is not None:
+            log.write(f"Failed to run job: {e}\n")
+        job.return_code = -1
+    finally:
+        if process is not None and process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        if log is not None:
+            log.close()
+        job.duration = time.monotonic() - start
+    return job.return_code
+
+
+async def run_jobs_concurrently(jobs: list[BatchJob], max_concurrency: int) -> list[int]:
+    """
+    Run batch jobs with at most `max_concurrency` of them in flight at any time.
+
+    Returns:
+        Exit codes in the order of `jobs`
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_limited(job: BatchJob) -> int:
+        async with semaphore:
+            print(f"[{job.label}] Started: {shlex.join(job.command)}")
+            return_code = await run_command_async(job)
+            print(f"[{job.label}] Finished with exit code {return_code}")
+            return return_code
+
+    return list(await asyncio.gather(*(run_limited(job) for job in jobs)))
+
+
+if __name__ == "__main__":
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ("", [])
+    if command in ("export", "import") and len(args) == 1:
+        try:
+            raise SystemExit((export_images if command == "export" else import_images)(Path(args[0])))
+        except RuntimeError as e:
+            print(e)
+            raise SystemExit(1)
+    print(__doc__[__doc__.index("Usage:"):].rstrip())
+    raise SystemExit(1)
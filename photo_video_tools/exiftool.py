@@ -0,0 +1,184 @@
+"""Batched exiftool invocations for the container scripts.
+
+Starting exiftool costs more than processing a typical photo, so metadata of a whole
+folder is read with one `-json` run, and many writes are sent to one long-running
+`-stay_open` process instead of starting exiftool per file.
+XMP sidecars are written the same way, so tools can leave large raw files untouched.
+Files (or their copies from an earlier run) that already have the tags a tool would write
+are found with the same kind of bulk read, so reruns only write the files that differ.
+
+Used inside the containers, so it only depends on the standard library.
+"""
+
+import json
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+
+def read_tags(files: list[Path], tags: list[str], numeric: bool = False) -> dict[str, dict]:
+    """
+    Read some tags of many files with a single exiftool run, keyed by file path.
+
+    Uses `-fast2`, so only the metadata at the start of each file is parsed.
+    Files that could not be read are missing from the result.
+    """
+    command = ["exiftool", "-json", "-fast2", *(["-n"] if numeric else []), *(f"-{tag}" for tag in tags), "-@", "-"]
+    process = subprocess.run(
+        command, input="\n".join(str(file) for file in files),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    # exiftool exits with 1 if a single file can't be read but still reports the others
+    try:
+        return {entry["SourceFile"]: entry for entry in json.loads(process.stdout or "[]")}
+    except json.JSONDecodeError:
+        return {}
+
+
+@dataclass
+class WritePlan:
+    """The files of a run that writes copies into an output folder, by what is left to do."""
+
+    # Files whose copy in the output folder already has the target values
+    done: list[Path] = field(default_factory=list)
+    # Files that have the target values themselves, so a link will do for the copy
+    unchanged: list[Path] = field(default_factory=list)
+    # Files that need writing
+    changed: list[Path] = field(default_factory=list)
+
+
+def plan_writes(
+    files: list[Path], tags: list[str], is_target: Callable[[Path, dict], bool],
+    output_dir: Path | None = None, numeric: bool = False,
+) -> WritePlan:
+    """
+    Find the files a run doesn't need to write, with one `read_tags` run.
+
+    `is_target` decides from the tags read (an empty dict for files that couldn't be read)
+    whether a file is in the target state; it gets the input file also for its copy.
+    Copies that already exist in `output_dir` are read along, so a rerun on a folder that
+    is mostly done only writes the rest. All lists keep the order of `files`.
+    """
+    copies = {file: output_dir / file.name for file in files} if output_dir is not None else {}
+    existing = [copy for copy in copies.values() if copy.exists()]
+    entries = read_tags([*files, *existing], tags, numeric)
+
+    plan = WritePlan()
+    for file in files:
+        copy = copies.get(file)
+        if copy is not None and str(copy) in entries and is_target(file, entries[str(copy)]):
+            plan.done.append(file)
+        elif is_target(file, entries.get(str(file), {})):
+            plan.unchanged.append(file)
+        else:
+            plan.changed.append(file)
+    return plan
+
+
+class ExiftoolSession:
+    """
+    One `exiftool -stay_open` process executing many commands.
+
+    Each command is a list of arguments as on the command line; its output (including
+    errors) is returned once exiftool reports that it is ready for the next one.
+    """
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ["exiftool", "-stay_open", "True", "-@", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+    def execute(self, args: list[str]) -> str:
+        # One argument per line; file names with newlines can't be passed this way
+        self.process.stdin.write("\n".join(args) + "\n-execute\n")
+        self.process.stdin.flush()
+        output = []
+        for line in self.process.stdout:
+            if line.rstrip() == "{ready}":
+                break
+            output.append(line)
+        else:
+            raise RuntimeError(f"exiftool exited unexpectedly (exit code {self.process.wait()})")
+        return "".join(output)
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.stdin.write("-stay_open\nFalse\n")
+            self.process.stdin.flush()
+            self.process.wait()
+
+    def __enter__(self) -> "ExiftoolSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def sidecar_path(file: Path) -> Path:
+    """The XMP sidecar `<stem>.xmp` next to a file; an existing one with an upper-case extension is kept."""
+    upper = file.with_suffix(".XMP")
+    if upper.exists() and not file.with_suffix(".xmp").exists():
+        return upper
+    return file.with_suffix(".xmp")
+
+
+def _modification_time(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def existing_copies(files: list[Path], output_dir: Path) -> set[Path]:
+    """The files whose copy is already in `output_dir`, taken before a `-o` write (see `copy_written`)."""
+    return {file for file in files if (output_dir / file.name).exists()}
+
+
+def copy_written(file: Path, output_dir: Path, existed: set[Path]) -> bool:
+    """
+    Whether a `-o` write into `output_dir` created the copy of a file.
+
+    `-o` never overwrites, so a copy that existed before the write (an earlier run's) wasn't
+    written by it, even though it is there now.
+    """
+    return file not in existed and (output_dir / file.name).exists()
+
+
+def write_sidecars(session: ExiftoolSession, files: list[Path], tag_args: list[str]) -> tuple[list[Path], list[Path], str]:
+    """
+    Write tags into the XMP sidecars of many files with one command per batch; the files themselves are never written.
+
+    `tag_args` are evaluated with each file as the source, e.g. '-XMP-exif:DateTimeOriginal<DateTimeOriginal'.
+    Missing sidecars are created; existing ones are updated in place and keep their other tags.
+    Returns the files whose sidecar was written, the ones whose sidecar wasn't, and exiftool's output.
+    """
+    before = {file: _modification_time(sidecar_path(file)) for file in files}
+    output = ""
+
+    new = [file for file in files if before[file] is None]
+    if new:
+        # `-o` with a name format creates the sidecars and never overwrites one
+        output += session.execute(["-m", "-tagsfromfile", "@", *tag_args, "-o", "%d%f.xmp", *(str(file) for file in new)])
+
+    # `-srcfile` edits the sidecar instead of the file, with the file's tags as the source
+    existing: dict[str, list[Path]] = {}
+    for file in files:
+        if before[file] is not None:
+            existing.setdefault(sidecar_path(file).suffix, []).append(file)
+    for suffix, group in existing.items():
+        output += session.execute([
+            "-m", "-overwrite_original", "-tagsfromfile", "@", *tag_args,
+            "-srcfile", f"%d%f{suffix}", *(str(file) for file in group),
+        ])
+
+    written = [file for file in files if _modification_time(sidecar_path(file)) not in (None, before[file])]
+    written_set = set(written)
+    failed = [file for file in files if file not in written_set]
+    return written, failed, output
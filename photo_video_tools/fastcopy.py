@@ -0,0 +1,378 @@
+"""High-throughput file copies with optional checksums computed during the copy.
+
+Without a checksum the data is copied kernel-side (`copy_file_range`, then `sendfile`)
+where the platform supports it. With a checksum the data has to pass through user space
+anyway, so it is read once into a large page-aligned buffer, hashed and written.
+Copies are written to a temporary name in the destination folder and renamed when
+complete, so other readers never see partial files.
+
+Used on the host and inside the containers, so it only depends on the standard library
+(`xxhash` is used if installed).
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+BUFFER_SIZE = 8 * 1024 * 1024
+# Upper bound per kernel copy call, keeps single calls interruptible
+KERNEL_CHUNK_SIZE = 1024 * 1024 * 1024
+PARTIAL_SUFFIX = ".partial"
+# Bytes read from the start and the end of a file for `sample_hash`
+SAMPLE_BLOCK_SIZE = 1024 * 1024
+CHECKSUM_FILE_PREFIX = "checksums."
+
+
+@dataclass
+class CopyResult:
+    bytes_copied: int
+    method: str
+    digest: str | None = None
+
+
+def default_hash_algorithm() -> str:
+    """The fastest available algorithm: xxh3_128 if `xxhash` is installed, else BLAKE2b."""
+    return "xxh3_128" if xxhash is not None else "blake2b"
+
+
+def new_hasher(algorithm: str):
+    if algorithm.startswith("xxh"):
+        if xxhash is None:
+            raise ValueError(f"Hash algorithm '{algorithm}' needs the xxhash package")
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
+
+
+def _advise_sequential(fd: int, size: int) -> None:
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def _copy_kernel(src_fd: int, dst_fd: int, size: int) -> str | None:
+    """Copy without passing the data through user space; returns the method used or None if unsupported."""
+    for method in ("copy_file_range", "sendfile"):
+        if not hasattr(os, method):
+            continue
+        copied = 0
+        try:
+            while copied < size:
+                if method == "copy_file_range":
+                    sent = os.copy_file_range(src_fd, dst_fd, min(KERNEL_CHUNK_SIZE, size - copied))
+                else:
+                    sent = os.sendfile(dst_fd, src_fd, None, min(KERNEL_CHUNK_SIZE, size - copied))
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            if copied:
+                raise
+            # Unsupported for this pair of file systems: try the next method
+            continue
+        if copied == 0 and size:
+            # Some file systems report 0 bytes for copies they don't support (e.g. across devices)
+            continue
+        if copied == size:
+            return method
+        raise OSError(f"Source changed size during copy ({copied} of {size} bytes)")
+    return None
+
+
+def _copy_buffered(src_fd: int, dst_fd: int, hasher) -> int:
+    copied = 0
+    # Anonymous mappings are page-aligned, which suits direct and network file systems
+    with mmap.mmap(-1, BUFFER_SIZE) as buffer:
+        view = memoryview(buffer)
+        try:
+            while True:
+                read = os.readv(src_fd, [view]) if hasattr(os, "readv") else _read_into(src_fd, view)
+                if read == 0:
+                    break
+                with view[:read] as chunk:
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    written = 0
+                    while written < read:
+                        written += os.write(dst_fd, chunk[written:])
+                copied += read
+        finally:
+            view.release()
+    return copied
+
+
+def _read_into(fd: int, view: memoryview) -> int:
+    data = os.read(fd, len(view))
+    view[:len(data)] = data
+    return len(data)
+
+
+def copy_file(src: Path, dst: Path, hash_algorithm: str | None = None, preserve_metadata: bool = True) -> CopyResult:
+    """
+    Copy `src` to `dst` via a temporary file that is renamed into place when complete.
+
+    Args:
+        src: Source file
+        dst: Destination file (replaced if it exists)
+        hash_algorithm: If set, compute this checksum of the data while copying
+        preserve_metadata: Copy timestamps and permission bits like `shutil.copy2`
+
+    Returns:
+        Bytes copied, the copy method used and the hex digest (if requested)
+    """
+    dst = Path(dst)
+    temp = dst.with_name(f".{dst.name}.{os.getpid()}-{threading.get_ident()}{PARTIAL_SUFFIX}")
+    hasher = new_hasher(hash_algorithm) if hash_algorithm else None
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(src_fd).st_size
+        _advise_sequential(src_fd, size)
+        dst_fd = os.open(temp, flags, 0o644)
+        try:
+            method = _copy_kernel(src_fd, dst_fd, size) if hasher is None else None
+            if method is None:
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+                copied = _copy_buffered(src_fd, dst_fd, hasher)
+                method = "buffered"
+            else:
+                copied = size
+        finally:
+            os.close(dst_fd)
+        if preserve_metadata:
+            shutil.copystat(src, temp)
+        os.replace(temp, dst)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+    finally:
+        os.close(src_fd)
+
+    return CopyResult(copied, method, hasher.hexdigest() if hasher is not None else None)
+
+
+def copy_range(src: Path, dst: Path, offset: int, length: int, mtime_ns: int | None = None) -> CopyResult:
+    """
+    Copy `length` bytes starting at `offset` of `src` into a new file `dst`.
+
+    Used to extract embedded streams (e.g. preview JPEGs, archive members) without reading
+    the rest of the source. Goes through a temporary file like `copy_file`; `dst` gets the
+    source's timestamps, or `mtime_ns` as its access and modification time if given.
+    """
+    dst = Path(dst)
+    temp = dst.with_name(f".{dst.name}.{os.getpid()}-{threading.get_ident()}{PARTIAL_SUFFIX}")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if offset + length > os.fstat(src_fd).st_size:
+            raise OSError(f"Range {offset}+{length} is beyond the end of {src}")
+        dst_fd = os.open(temp, flags, 0o644)
+        try:
+            method = "buffered"
+            copied = 0
+            if hasattr(os, "copy_file_range"):
+                try:
+                    while copied < length:
+                        sent = os.copy_file_range(src_fd, dst_fd, length - copied, offset + copied)
+                        if sent == 0:
+                            break
+                        copied += sent
+                    method = "copy_file_range"
+                except OSError:
+                    if copied:
+                        raise
+            os.lseek(src_fd, offset + copied, os.SEEK_SET)
+            while copied < length:
+                data = os.read(src_fd, min(BUFFER_SIZE, length - copied))
+                if not data:
+                    raise OSError(f"Unexpected end of {src}")
+                os.write(dst_fd, data)
+                copied += len(data)
+        finally:
+            os.close(dst_fd)
+        if mtime_ns is None:
+            stat = os.stat(src)
+            os.utime(temp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        else:
+            os.utime(temp, ns=(mtime_ns, mtime_ns))
+        os.replace(temp, dst)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+    finally:
+        os.close(src_fd)
+
+    return CopyResult(copied, method)
+
+
+def copy_stream(src: BinaryIO, dst: Path, hash_algorithm: str | None = None, mtime_ns: int | None = None) -> CopyResult:
+    """
+    Copy everything readable from `src` into `dst`, e.g. a decompressed archive member.
+
+    Goes through a temporary file like `copy_file`; `dst` gets `mtime_ns` as its access and
+    modification time if given.
+    """
+    dst = Path(dst)
+    temp = dst.with_name(f".{dst.name}.{os.getpid()}-{threading.get_ident()}{PARTIAL_SUFFIX}")
+    hasher = new_hasher(hash_algorithm) if hash_algorithm else None
+    copied = 0
+    try:
+        with open(temp, "wb") as f:
+            for chunk in iter(lambda: src.read(BUFFER_SIZE), b""):
+                if hasher is not None:
+                    hasher.update(chunk)
+                f.write(chunk)
+                copied += len(chunk)
+        if mtime_ns is not None:
+            os.utime(temp, ns=(mtime_ns, mtime_ns))
+        os.replace(temp, dst)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+    return CopyResult(copied, "stream", hasher.hexdigest() if hasher is not None else None)
+
+
+def link_file(src: Path, dst: Path) -> CopyResult:
+    """
+    Make `dst` a hard link to `src`, e.g. to put an unchanged file into an output folder.
+
+    Nothing is copied; where links aren't possible (another file system, no link support)
+    the file is copied with `copy_file`. An existing `dst` is replaced, unless it already
+    is the same file.
+    """
+    dst = Path(dst)
+    try:
+        if os.path.samefile(src, dst):
+            return CopyResult(0, "link")
+    except OSError:
+        pass
+
+    temp = dst.with_name(f".{dst.name}.{os.getpid()}-{threading.get_ident()}{PARTIAL_SUFFIX}")
+    try:
+        os.link(src, temp)
+    except OSError:
+        return copy_file(src, dst)
+    try:
+        os.replace(temp, dst)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+    return CopyResult(0, "link")
+
+
+def hash_file(path: Path, algorithm: str) -> str:
+    """Checksum of a file's content, e.g. to verify a copy against its recorded digest."""
+    hasher = new_hasher(algorithm)
+    if not isinstance(path, (str, os.PathLike)):
+        # No file descriptor of its own, e.g. a member of an archive
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(BUFFER_SIZE), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        _advise_sequential(fd, 0)
+        with mmap.mmap(-1, BUFFER_SIZE) as buffer:
+            view = memoryview(buffer)
+            try:
+                while True:
+                    read = os.readv(fd, [view]) if hasattr(os, "readv") else _read_into(fd, view)
+                    if read == 0:
+                        break
+                    with view[:read] as chunk:
+                        hasher.update(chunk)
+            finally:
+                view.release()
+    finally:
+        os.close(fd)
+    return hasher.hexdigest()
+
+
+def sample_hash(path: Path, algorithm: str, block_size: int = SAMPLE_BLOCK_SIZE) -> str:
+    """
+    Checksum of a file's size and its first and last `block_size` bytes.
+
+    Much cheaper than `hash_file` for large videos; catches different files of the same
+    size (they differ in headers or trailing metadata) but not changes in the middle.
+    """
+    hasher = new_hasher(algorithm)
+    with path.open("rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        hasher.update(size.to_bytes(8, "little"))
+        hasher.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(block_size, size - block_size))
+            hasher.update(f.read(block_size))
+    return hasher.hexdigest()
+
+
+class ChecksumManifest:
+    """
+    Checksums of copied files, stored as '<digest>  <relative path>' lines.
+
+    The file is named after the algorithm (e.g. 'checksums.blake2b' in the output root);
+    BLAKE2b manifests can also be checked with `b2sum -c`.
+    """
+
+    def __init__(self, root: Path, algorithm: str):
+        self.root = root
+        self.algorithm = algorithm
+        self.path = root / f"{CHECKSUM_FILE_PREFIX}{algorithm}"
+        self._lock = threading.Lock()
+
+    def record(self, file: Path, digest: str) -> None:
+        line = f"{digest}  {file.relative_to(self.root).as_posix()}\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def read(self) -> dict[str, str]:
+        """Relative path -> digest; later entries win."""
+        entries: dict[str, str] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                digest, sep, name = line.rstrip("\n").partition("  ")
+                if sep:
+                    entries[name] = digest
+        return entries
+
+    def verify(self) -> list[str]:
+        """Re-hash every recorded file; returns the relative paths that are missing or differ."""
+        failures = []
+        for name, digest in self.read().items():
+            try:
+                if hash_file(self.root / name, self.algorithm) != digest:
+                    failures.append(name)
+            except OSError:
+                failures.append(name)
+        return failures
@@ -0,0 +1 @@
+"""Offline geographic lookups (time zones, place names) for geotagged photos."""
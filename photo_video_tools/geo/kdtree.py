@@ -0,0 +1,156 @@
+"""k-d tree over 3D points with nearest-neighbour queries for whole batches at once.
+
+Positions on the globe are mapped to unit vectors, so the straight-line (chord) distance
+between them is monotonic in the great-circle distance and the tree can use plain
+Euclidean splits. Queries are not answered one by one: all queries first descend to their
+leaf together, then the remaining (query, node) pairs that could still hold a closer point
+are processed level by level with array operations.
+
+Requires NumPy.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 16
+# Queries per array operation; bounds the temporary (queries x leaf size x 3) arrays
+QUERY_CHUNK_SIZE = 1 << 16
+
+
+def to_unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+class KDTree:
+    """Static k-d tree; nodes are stored in flat arrays, leaves as padded blocks of points."""
+
+    def __init__(self, points: np.ndarray):
+        points = np.asarray(points, dtype=np.float64)
+        self.points = points
+        split_dim: list[int] = []
+        split_value: list[float] = []
+        children: list[tuple[int, int]] = []
+        leaf_of_node: list[int] = []
+        leaves: list[np.ndarray] = []
+
+        # Iterative build: (node id, indices of its points)
+        split_dim.append(-1)
+        split_value.append(0.0)
+        children.append((-1, -1))
+        leaf_of_node.append(-1)
+        stack = [(0, np.arange(len(points)))]
+        while stack:
+            node, indices = stack.pop()
+            if len(indices) <= LEAF_SIZE:
+                leaf_of_node[node] = len(leaves)
+                leaves.append(indices)
+                continue
+            subset = points[indices]
+            dim = int(np.argmax(subset.max(axis=0) - subset.min(axis=0)))
+            order = np.argsort(subset[:, dim], kind="stable")
+            middle = len(indices) // 2
+            split_dim[node] = dim
+            split_value[node] = float(subset[order[middle], dim])
+            left, right = len(split_dim), len(split_dim) + 1
+            for _ in range(2):
+                split_dim.append(-1)
+                split_value.append(0.0)
+                children.append((-1, -1))
+                leaf_of_node.append(-1)
+            children[node] = (left, right)
+            stack.append((left, indices[order[:middle]]))
+            stack.append((right, indices[order[middle:]]))
+
+        self.split_dim = np.array(split_dim, dtype=np.int64)
+        self.split_value = np.array(split_value)
+        self.children = np.array(children, dtype=np.int64)
+        self.leaf_of_node = np.array(leaf_of_node, dtype=np.int64)
+
+        # Leaves padded to the same size; padding points lie far outside the unit sphere
+        self.leaf_indices = np.full((len(leaves), LEAF_SIZE), -1, dtype=np.int64)
+        self.leaf_points = np.full((len(leaves), LEAF_SIZE, 3), 1e3)
+        for i, indices in enumerate(leaves):
+            self.leaf_indices[i, :len(indices)] = indices
+            self.leaf_points[i, :len(indices)] = points[indices]
+
+    def _search_leaves(self, queries: np.ndarray, query_ids: np.ndarray, nodes: np.ndarray):
+        """Closest point (squared distance, index) within the leaf of each (query, node) pair."""
+        leaves = self.leaf_of_node[nodes]
+        diff = self.leaf_points[leaves] - queries[query_ids][:, None, :]
+        distances = np.einsum("ijk,ijk->ij", diff, diff)
+        best = np.argmin(distances, axis=1)
+        rows = np.arange(len(leaves))
+        return distances[rows, best], self.leaf_indices[leaves, best]
+
+    def _query_chunk(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        count = len(queries)
+        all_ids = np.arange(count)
+
+        # 1. Descend to the leaf containing each query for a first candidate
+        nodes = np.zeros(count, dtype=np.int64)
+        while True:
+            internal = self.split_dim[nodes] >= 0
+            if not internal.any():
+                break
+            ids = all_ids[internal]
+            current = nodes[ids]
+            go_right = queries[ids, self.split_dim[current]] >= self.split_value[current]
+            nodes[ids] = self.children[current, go_right.astype(np.int64)]
+        best_distance, best_index = self._search_leaves(queries, all_ids, nodes)
+        home_leaf = nodes
+
+        # 2. Visit every other node whose region may hold a closer point, all queries at once.
+        # `bounds` is a lower bound of the squared distance from the query to the node's region.
+        query_ids = all_ids
+        nodes = np.zeros(count, dtype=np.int64)
+        bounds = np.zeros(count)
+        while len(query_ids):
+            keep = bounds < best_distance[query_ids]
+            query_ids, nodes, bounds = query_ids[keep], nodes[keep], bounds[keep]
+
+            is_leaf = self.split_dim[nodes] < 0
+            leaf_pairs = is_leaf & (nodes != home_leaf[query_ids])
+            if leaf_pairs.any():
+                distances, indices = self._search_leaves(queries, query_ids[leaf_pairs], nodes[leaf_pairs])
+                ids = query_ids[leaf_pairs]
+                # Several leaves of one query may be searched in the same round; keep the closest
+                order = np.lexsort((distances, ids))
+                ids, distances, indices = ids[order], distances[order], indices[order]
+                first = np.ones(len(ids), dtype=bool)
+                first[1:] = ids[1:] != ids[:-1]
+                ids, distances, indices = ids[first], distances[first], indices[first]
+                closer = distances < best_distance[ids]
+                best_distance[ids[closer]] = distances[closer]
+                best_index[ids[closer]] = indices[closer]
+
+            internal = ~is_leaf
+            query_ids, nodes, bounds = query_ids[internal], nodes[internal], bounds[internal]
+            dims = self.split_dim[nodes]
+            offset = queries[query_ids, dims] - self.split_value[nodes]
+            near = self.children[nodes, (offset >= 0).astype(np.int64)]
+            far = self.children[nodes, (offset < 0).astype(np.int64)]
+            # The far side only matters if the splitting plane is closer than the best point so far
+            far_bounds = np.maximum(bounds, offset * offset)
+            reach_far = far_bounds < best_distance[query_ids]
+            query_ids = np.concatenate((query_ids, query_ids[reach_far]))
+            nodes = np.concatenate((near, far[reach_far]))
+            bounds = np.concatenate((bounds, far_bounds[reach_far]))
+
+        return best_index, np.sqrt(best_distance)
+
+    def query(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Index of the nearest point and the Euclidean distance to it for each query point."""
+        queries = np.asarray(queries, dtype=np.float64)
+        indices = np.empty(len(queries), dtype=np.int64)
+        distances = np.empty(len(queries))
+        for start in range(0, len(queries), QUERY_CHUNK_SIZE):
+            chunk = slice(start, start + QUERY_CHUNK_SIZE)
+            indices[chunk], distances[chunk] = self._query_chunk(queries[chunk])
+        return indices, distances
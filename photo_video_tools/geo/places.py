@@ -0,0 +1,112 @@
+"""Offline reverse geocoding: the nearest populated place for GPS positions.
+
+Places come from the GeoNames `cities15000` table (all places with more than 15,000
+inhabitants, CC BY 4.0) and the GeoNames country list. Both are downloaded once into
+`photo_video_tools/geo/data/` on the host; after that everything runs offline, and the
+containers read the same files through the mounted package.
+
+Requires NumPy.
+"""
+
+import io
+import urllib.request
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from photo_video_tools.geo.kdtree import KDTree, chord_to_km, to_unit_vectors
+
+DATA_DIR = Path(__file__).parent / "data"
+PLACES_FILE_NAME = "cities15000.zip"
+COUNTRIES_FILE_NAME = "countryInfo.txt"
+DOWNLOAD_URL = "https://download.geonames.org/export/dump/"
+
+# Column positions in the GeoNames tables
+_NAME, _LATITUDE, _LONGITUDE, _COUNTRY_CODE = 1, 4, 5, 8
+_COUNTRY_ISO, _COUNTRY_NAME = 0, 4
+
+
+@dataclass
+class Place:
+    name: str
+    country_code: str
+    country: str
+    distance_km: float
+
+
+def ensure_places_data(data_dir: Path = DATA_DIR) -> Path:
+    """Download the GeoNames tables into `data_dir` unless they are already there."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for name in (PLACES_FILE_NAME, COUNTRIES_FILE_NAME):
+        path = data_dir / name
+        if path.exists():
+            continue
+        print(f"Downloading {DOWNLOAD_URL}{name}...")
+        temp = path.with_name(f".{name}.partial")
+        with urllib.request.urlopen(DOWNLOAD_URL + name, timeout=60) as response, open(temp, "wb") as f:
+            while chunk := response.read(1024 * 1024):
+                f.write(chunk)
+        temp.replace(path)
+    return data_dir
+
+
+class PlaceIndex:
+    """Nearest-place lookups for many positions at once."""
+
+    def __init__(self, names: list[str], country_codes: list[str], countries: dict[str, str],
+                 latitudes: np.ndarray, longitudes: np.ndarray):
+        self.names = names
+        self.country_codes = country_codes
+        self.countries = countries
+        self.tree = KDTree(to_unit_vectors(latitudes, longitudes))
+
+    @classmethod
+    def load(cls, data_dir: Path = DATA_DIR) -> "PlaceIndex":
+        names: list[str] = []
+        country_codes: list[str] = []
+        latitudes: list[float] = []
+        longitudes: list[float] = []
+        with zipfile.ZipFile(data_dir / PLACES_FILE_NAME) as archive:
+            member = next(name for name in archive.namelist() if name.endswith(".txt"))
+            with io.TextIOWrapper(archive.open(member), encoding="utf-8") as f:
+                for line in f:
+                    columns = line.rstrip("\n").split("\t")
+                    if len(columns) <= _COUNTRY_CODE:
+                        continue
+                    try:
+                        latitudes.append(float(columns[_LATITUDE]))
+                        longitudes.append(float(columns[_LONGITUDE]))
+                    except ValueError:
+                        continue
+                    names.append(columns[_NAME])
+                    country_codes.append(columns[_COUNTRY_CODE])
+
+        countries: dict[str, str] = {}
+        with open(data_dir / COUNTRIES_FILE_NAME, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#"):
+                    continue
+                columns = line.rstrip("\n").split("\t")
+                if len(columns) > _COUNTRY_NAME:
+                    countries[columns[_COUNTRY_ISO]] = columns[_COUNTRY_NAME]
+
+        return cls(names, country_codes, countries, np.array(latitudes), np.array(longitudes))
+
+    def nearest(self, latitudes: np.ndarray, longitudes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Index of the nearest place and its distance in km for each position."""
+        indices, chords = self.tree.query(to_unit_vectors(latitudes, longitudes))
+        return indices, chord_to_km(chords)
+
+    def lookup(self, positions: list[tuple[float, float]]) -> list[Place]:
+        """Nearest place for each (latitude, longitude) position."""
+        if not positions:
+            return []
+        coordinates = np.array(positions, dtype=np.float64)
+        indices, distances = self.nearest(coordinates[:, 0], coordinates[:, 1])
+        places = []
+        for index, distance in zip(indices.tolist(), distances.tolist()):
+            code = self.country_codes[index]
+            places.append(Place(self.names[index], code, self.countries.get(code, code), distance))
+        return places
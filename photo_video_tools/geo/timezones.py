@@ -0,0 +1,150 @@
+"""Offline lookup of the time zone and UTC offset at a GPS position.
+
+The zone boundaries come from a compact file built from timezone-boundary-builder when
+the exiftool image is built (see `containers/exiftool/build_timezone_data.py`). Polygons
+are indexed in a 1° grid by their bounding boxes; a point-in-polygon test then only
+looks at the polygon edges in the point's 0.1° latitude band. Outside all zones (at sea)
+the nautical zone of the longitude is used. Offsets are computed with `zoneinfo`, so they
+are correct for daylight saving time at the photo's capture time.
+
+Used inside the containers, so it only depends on the standard library.
+"""
+
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+MAGIC = b"TZB1"
+DEFAULT_DATA_PATH = Path("/timezone_data/timezones.bin")
+GRID_DEGREES = 1
+BAND_DEGREES = 0.1
+
+
+@dataclass
+class _Polygon:
+    zone: str
+    # Rings as flat (lon, lat, lon, lat, ...) arrays; the first is the outer boundary
+    rings: list[array]
+    bbox: tuple[float, float, float, float]
+    # Latitude band -> flat (x1, y1, x2, y2, ...) edges crossing it; built on first use
+    bands: dict[int, array] | None = field(default=None)
+
+    def _build_bands(self) -> dict[int, array]:
+        bands: dict[int, array] = {}
+        for ring in self.rings:
+            for i in range(0, len(ring) - 2, 2):
+                x1, y1, x2, y2 = ring[i], ring[i + 1], ring[i + 2], ring[i + 3]
+                if y1 == y2:
+                    continue
+                low, high = (y1, y2) if y1 < y2 else (y2, y1)
+                for band in range(int(low // BAND_DEGREES), int(high // BAND_DEGREES) + 1):
+                    bands.setdefault(band, array("d")).extend((x1, y1, x2, y2))
+        return bands
+
+    def contains(self, lon: float, lat: float) -> bool:
+        """Even-odd ray casting, so holes are handled by their rings like any other edge."""
+        west, south, east, north = self.bbox
+        if not (west <= lon <= east and south <= lat <= north):
+            return False
+        if self.bands is None:
+            self.bands = self._build_bands()
+        edges = self.bands.get(int(lat // BAND_DEGREES))
+        if edges is None:
+            return False
+        inside = False
+        for i in range(0, len(edges), 4):
+            x1, y1, x2, y2 = edges[i], edges[i + 1], edges[i + 2], edges[i + 3]
+            if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+
+class TimezoneIndex:
+    """Finds the IANA time zone at a position."""
+
+    def __init__(self, polygons: list[_Polygon]):
+        self.polygons = polygons
+        # Photos are taken in clusters; positions rounded to ~10 m resolve once
+        self._cache: dict[tuple[float, float], str] = {}
+        self.grid: dict[tuple[int, int], list[int]] = {}
+        for index, polygon in enumerate(polygons):
+            west, south, east, north = polygon.bbox
+            for x in range(int(west // GRID_DEGREES), int(east // GRID_DEGREES) + 1):
+                for y in range(int(south // GRID_DEGREES), int(north // GRID_DEGREES) + 1):
+                    self.grid.setdefault((x, y), []).append(index)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_DATA_PATH) -> "TimezoneIndex":
+        data = Path(path).read_bytes()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a time zone data file")
+        (zone_count,) = struct.unpack_from("<I", data, 4)
+        offset = 8
+        polygons = []
+        for _ in range(zone_count):
+            (name_length,) = struct.unpack_from("<H", data, offset)
+            zone = data[offset + 2:offset + 2 + name_length].decode()
+            offset += 2 + name_length
+            (polygon_count,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            for _ in range(polygon_count):
+                (ring_count,) = struct.unpack_from("<I", data, offset)
+                offset += 4
+                rings = []
+                for _ in range(ring_count):
+                    (point_count,) = struct.unpack_from("<I", data, offset)
+                    offset += 4
+                    points = array("f")
+                    points.frombytes(data[offset:offset + point_count * 8])
+                    if sys.byteorder != "little":
+                        points.byteswap()
+                    offset += point_count * 8
+                    rings.append(array("d", points))
+                if not rings or len(rings[0]) < 6:
+                    continue
+                outer = rings[0]
+                bbox = (min(outer[0::2]), min(outer[1::2]), max(outer[0::2]), max(outer[1::2]))
+                polygons.append(_Polygon(zone, rings, bbox))
+        return cls(polygons)
+
+    def zone_at(self, latitude: float, longitude: float) -> str:
+        """IANA zone name at a position; the nautical 'Etc/GMT±N' zone at sea."""
+        key = (round(latitude, 4), round(longitude, 4))
+        zone = self._cache.get(key)
+        if zone is None:
+            zone = self._cache[key] = self._lookup(latitude, longitude)
+        return zone
+
+    def _lookup(self, latitude: float, longitude: float) -> str:
+        cell = (int(longitude // GRID_DEGREES), int(latitude // GRID_DEGREES))
+        for index in self.grid.get(cell, ()):
+            polygon = self.polygons[index]
+            if polygon.contains(longitude, latitude):
+                return polygon.zone
+        return nautical_zone(longitude)
+
+
+def nautical_zone(longitude: float) -> str:
+    hours = round(longitude / 15)
+    if hours == 0:
+        return "Etc/GMT"
+    # The POSIX-style Etc zones have inverted signs: UTC+2 is 'Etc/GMT-2'
+    return f"Etc/GMT{-hours:+d}"
+
+
+def format_offset(offset: timedelta) -> str:
+    """Format a UTC offset the way EXIF OffsetTime tags expect it, e.g. '+05:30'."""
+    minutes = int(offset.total_seconds() // 60)
+    sign = "+" if minutes >= 0 else "-"
+    hours, minutes = divmod(abs(minutes), 60)
+    return f"{sign}{hours:02d}:{minutes:02d}"
+
+
+def utc_offset(zone: str, local_time: datetime) -> str:
+    """UTC offset of a zone at a local wall-clock time, e.g. '+02:00' for Europe/Berlin in summer."""
+    offset = local_time.replace(tzinfo=ZoneInfo(zone)).utcoffset()
+    return format_offset(offset if offset is not None else timedelta(0))
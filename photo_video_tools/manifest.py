@@ -0,0 +1,129 @@
+"""Manifests of the inputs of a tool run and journals of their outcomes.
+
+A manifest is a JSON lines file: a header with the tool, its arguments and the folder the
+inputs are relative to, then one line per input unit (a file, or a pair such as SRT + MP4)
+with its size in bytes:
+
+    {"format": 1, "tool": "AddTimezoneInfoTool", "params": ["+02:00"], "root": "/mnt/nas/2019"}
+    {"inputs": ["IMG_0001.JPG"], "size": 6291456}
+
+When a manifest is passed to a tool (see MANIFEST_ENV), it processes exactly these inputs
+instead of listing the folder. If a journal is passed too (JOURNAL_ENV), the outcome of
+every input is appended to it as one line. Each process writes its own journal, so several
+processes or machines can work on parts of one manifest without any locking.
+
+Used on the host and inside the containers, so it only depends on the standard library.
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+FORMAT_VERSION = 1
+
+# Set by the host for a tool process; paths as seen by that process
+MANIFEST_ENV = "PHOTO_VIDEO_TOOLS_MANIFEST"
+JOURNAL_ENV = "PHOTO_VIDEO_TOOLS_JOURNAL"
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+@dataclass
+class Manifest:
+    tool: str
+    params: list[str]
+    root: str
+    # Input units as paths relative to `root` (POSIX separators) and their total size
+    units: list[list[str]] = field(default_factory=list)
+    sizes: list[int] = field(default_factory=list)
+
+    def add(self, inputs: list[str], size: int) -> None:
+        self.units.append(inputs)
+        self.sizes.append(size)
+
+    def subset(self, indices) -> "Manifest":
+        """A manifest with the same header and only the given units."""
+        part = Manifest(self.tool, self.params, self.root)
+        for i in indices:
+            part.add(self.units[i], self.sizes[i])
+        return part
+
+    def write(self, path: Path) -> None:
+        temp = path.with_name(f".{path.name}.partial")
+        with open(temp, "w", encoding="utf-8") as f:
+            header = {"format": FORMAT_VERSION, "tool": self.tool, "params": self.params, "root": self.root}
+            f.write(json.dumps(header) + "\n")
+            for inputs, size in zip(self.units, self.sizes):
+                f.write(json.dumps({"inputs": inputs, "size": size}, ensure_ascii=False) + "\n")
+        os.replace(temp, path)
+
+    @classmethod
+    def read(cls, path: Path) -> "Manifest":
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("format") != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a manifest")
+            manifest = cls(header["tool"], header["params"], header["root"])
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    manifest.add(entry["inputs"], entry["size"])
+        return manifest
+
+
+def load_units(work_dir: Path) -> list[list[Path]] | None:
+    """The input units of the manifest passed to this process, resolved against `work_dir`; None without one."""
+    path = os.environ.get(MANIFEST_ENV)
+    if not path:
+        return None
+    return [[work_dir / name for name in inputs] for inputs in Manifest.read(Path(path)).units]
+
+
+class Journal:
+    """Appends the outcome of each input as a JSON line; does nothing if no journal was passed."""
+
+    def __init__(self, path: Path | None, work_dir: Path):
+        self.work_dir = work_dir
+        self._file = open(path, "a", encoding="utf-8", buffering=1) if path is not None else None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, work_dir: Path) -> "Journal":
+        path = os.environ.get(JOURNAL_ENV)
+        return cls(Path(path) if path else None, work_dir)
+
+    def record(self, file: Path, status: str, detail: str = "") -> None:
+        if self._file is None:
+            return
+        try:
+            name = file.relative_to(self.work_dir).as_posix()
+        except ValueError:
+            name = file.name
+        line = json.dumps({"input": name, "status": status, "detail": detail}, ensure_ascii=False) + "\n"
+        # Whole lines only, so a journal cut off by a crash loses at most its last entry
+        with self._lock:
+            self._file.write(line)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_journal(path: Path) -> dict[str, tuple[str, str]]:
+    """Input -> (status, detail); later lines win, an incomplete last line is ignored."""
+    outcomes: dict[str, tuple[str, str]] = {}
+    if not path.exists():
+        return outcomes
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            outcomes[entry["input"]] = (entry["status"], entry.get("detail", ""))
+    return outcomes
@@ -0,0 +1 @@
+"""Native readers and writers for photo and video container formats."""
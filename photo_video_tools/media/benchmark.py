@@ -0,0 +1,65 @@
+"""Measure the throughput of each format's capture time reader on a folder of sample files.
+
+Usage: python -m photo_video_tools.media.benchmark <folder> [--compare-exifread]
+"""
+
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from photo_video_tools.media import formats
+
+
+def benchmark_folder(folder: Path, compare_exifread: bool = False) -> int:
+    groups: dict[str, list[tuple[Path, formats.MediaFormat]]] = defaultdict(list)
+    for file in sorted(folder.iterdir()):
+        if not file.is_file():
+            continue
+        media_format = formats.detect_format(file)
+        if media_format is not None:
+            groups[media_format.name].append((file, media_format))
+
+    if not groups:
+        print(f"No supported files found in {folder}")
+        return 1
+
+    print(f"{'Format':<10} {'Files':>6} {'Found':>6} {'Files/s':>10} {'ms/file':>8}", end="")
+    print(f" {'exifread/s':>11} {'Speedup':>8}" if compare_exifread else "")
+    for name, files in sorted(groups.items()):
+        # Warm-up pass so both readers see the same (cached) file state
+        for file, media_format in files:
+            media_format.read_capture_time(file)
+        start = time.perf_counter()
+        found = sum(1 for file, media_format in files if media_format.read_capture_time(file) is not None)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        line = f"{name:<10} {len(files):>6} {found:>6} {len(files) / elapsed:>10.0f} {1000 * elapsed / len(files):>8.3f}"
+        if compare_exifread:
+            baseline = _time_exifread([file for file, _ in files])
+            if baseline is not None:
+                line += f" {len(files) / baseline:>11.0f} {baseline / elapsed:>7.1f}x"
+        print(line)
+    return 0
+
+
+def _time_exifread(files: list[Path]) -> float | None:
+    try:
+        import exifread
+    except ImportError:
+        return None
+    start = time.perf_counter()
+    for file in files:
+        with open(file, "rb") as f:
+            try:
+                exifread.process_file(f, details=False)
+            except Exception:
+                pass
+    return max(time.perf_counter() - start, 1e-9)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) != 1:
+        print(__doc__.strip().splitlines()[-1])
+        raise SystemExit(1)
+    raise SystemExit(benchmark_folder(Path(args[0]), "--compare-exifread" in sys.argv))
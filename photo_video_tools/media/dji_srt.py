@@ -0,0 +1,223 @@
+"""Streaming parser for DJI drone SRT telemetry files.
+
+DJI drones write one subtitle cue per video frame with the telemetry of that frame, e.g.
+
+    1
+    00:00:00,000 --> 00:00:00,033
+    <font size="28">FrameCnt: 1, DiffTime: 33ms
+    2024-05-12 14:33:10.123
+    [iso: 100] [shutter: 1/500.0] [fnum: 2.8] [latitude: 47.123456] [longitude: 8.123456] [rel_alt: 1.200 abs_alt: 450.300] </font>
+
+Older models use `GPS(lon,lat,alt)` and `[longtitude: ...]`. Cues are read one at a time,
+so memory does not grow with the length of the flight.
+
+`compact_srt` rewrites such a file with fewer cues for use as a subtitle track, in the
+same single pass.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+_TIMING = re.compile(
+    r"(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})"
+)
+_FIELD = re.compile(r"([A-Za-z_]+)\s*:\s*([-+]?\d+(?:\.\d+)?(?:/[-+]?\d+(?:\.\d+)?)?)")
+_GPS = re.compile(r"GPS\s*\(\s*([-+\d.]+)\s*,\s*([-+\d.]+)\s*,\s*([-+\d.]+)")
+_TIMESTAMP = re.compile(r"(\d{4})[-.](\d{2})[-.](\d{2})\s+(\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,6}))?")
+_TAG = re.compile(r"<[^>]*>")
+
+# Fields that change with every frame and carry nothing for a viewer; dropped by `compact_srt`
+DEFAULT_DROP_FIELDS = ("FrameCnt", "DiffTime")
+
+# Normalized field names for the spellings found in different firmware versions
+FIELD_ALIASES = {
+    "lat": "latitude",
+    "longtitude": "longitude",
+    "lon": "longitude",
+    "altitude": "abs_alt",
+    "barometer": "rel_alt",
+}
+
+
+@dataclass
+class Cue:
+    index: int
+    start_ms: int
+    end_ms: int
+    text: str
+    fields: dict[str, float] = field(default_factory=dict)
+    timestamp: datetime | None = None
+
+
+def _timing_ms(groups: tuple[str, ...]) -> int:
+    hours, minutes, seconds, fraction = groups
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, "0"))
+
+
+def _number(value: str) -> float:
+    if "/" in value:
+        numerator, denominator = value.split("/", 1)
+        return float(numerator) / float(denominator)
+    return float(value)
+
+
+def parse_fields(text: str) -> tuple[dict[str, float], datetime | None]:
+    """Extract the numeric telemetry fields and the wall-clock timestamp from a cue's text."""
+    plain = _TAG.sub(" ", text)
+    fields: dict[str, float] = {}
+    timestamp = None
+
+    match = _TIMESTAMP.search(plain)
+    if match is not None:
+        year, month, day, hour, minute, second, fraction = match.groups()
+        try:
+            timestamp = datetime(
+                int(year), int(month), int(day), int(hour), int(minute), int(second),
+                int((fraction or "0").ljust(6, "0")),
+            )
+        except ValueError:
+            timestamp = None
+        plain = plain[:match.start()] + " " + plain[match.end():]
+
+    gps = _GPS.search(plain)
+    if gps is not None:
+        fields["longitude"], fields["latitude"], fields["abs_alt"] = (float(v) for v in gps.groups())
+
+    for name, value in _FIELD.findall(plain):
+        key = name.lower()
+        key = FIELD_ALIASES.get(key, key)
+        try:
+            fields.setdefault(key, _number(value))
+        except (ValueError, ZeroDivisionError):
+            continue
+    return fields, timestamp
+
+
+def iter_cue_blocks(lines: Iterable[str]) -> Iterator[tuple[int, int, int, list[str]]]:
+    """Yield (index, start_ms, end_ms, text lines) for each cue without parsing its text."""
+    block: list[str] = []
+    for line in lines:
+        line = line.rstrip("\r\n").lstrip("﻿")
+        if line.strip():
+            block.append(line)
+            continue
+        if block:
+            parsed = _parse_block(block)
+            if parsed is not None:
+                yield parsed
+            block = []
+    if block:
+        parsed = _parse_block(block)
+        if parsed is not None:
+            yield parsed
+
+
+def _parse_block(block: list[str]) -> tuple[int, int, int, list[str]] | None:
+    for i, line in enumerate(block[:2]):
+        match = _TIMING.search(line)
+        if match is None:
+            continue
+        try:
+            index = int(block[0].strip()) if i == 1 else 0
+        except ValueError:
+            index = 0
+        groups = match.groups()
+        return index, _timing_ms(groups[:4]), _timing_ms(groups[4:]), block[i + 1:]
+    return None
+
+
+def iter_cues(f: TextIO) -> Iterator[Cue]:
+    """Yield the cues of an SRT file with their telemetry fields."""
+    for index, start_ms, end_ms, text_lines in iter_cue_blocks(f):
+        text = "\n".join(text_lines)
+        fields, timestamp = parse_fields(text)
+        yield Cue(index, start_ms, end_ms, text, fields, timestamp)
+
+
+@dataclass
+class CompactionStats:
+    cues_in: int = 0
+    cues_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Size of the original file per byte of the compacted one."""
+        return self.bytes_in / self.bytes_out if self.bytes_out else 0.0
+
+
+def strip_fields(text: str, names: Iterable[str]) -> str:
+    """Plain text of a cue without formatting tags and without the named fields (e.g. 'FrameCnt: 1,')."""
+    plain = _TAG.sub("", text)
+    for name in names:
+        # A field in its own brackets goes with them; one of several in brackets ('[rel_alt: 1.2 abs_alt: 4.3]') alone
+        value = rf"{re.escape(name)}\s*:\s*[^\s,\]]*"
+        plain = re.sub(rf"\[\s*{value}\s*\]|{value},?", "", plain, flags=re.IGNORECASE)
+    lines = (" ".join(line.split()).replace("[ ", "[").replace(" ]", "]") for line in plain.splitlines())
+    return "\n".join(line for line in lines if line and line != "[]")
+
+
+def _format_timing(ms: int) -> str:
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def compact_cues(
+    blocks: Iterable[tuple[int, int, int, list[str]]], interval_ms: int, drop_fields: Iterable[str] = DEFAULT_DROP_FIELDS,
+) -> Iterator[tuple[int, int, str]]:
+    """
+    (start ms, end ms, text) of the cues to keep, holding only one cue at a time.
+
+    At most one cue per `interval_ms` is kept and shown until the next kept one, so the
+    timeline stays covered; a kept cue whose text equals the previous one extends it instead.
+    """
+    drop_fields = tuple(drop_fields)
+    pending: list | None = None
+    next_start = 0
+    for _, start, end, lines in blocks:
+        if end <= start:
+            continue
+        if pending is not None and start < next_start:
+            # Dropped by the downsampling; the shown cue covers its time
+            pending[1] = max(pending[1], end)
+            continue
+        next_start = start + interval_ms
+
+        text = strip_fields("\n".join(lines), drop_fields)
+        if pending is not None and text == pending[2]:
+            pending[1] = max(pending[1], end)
+            continue
+        if pending is not None:
+            yield pending[0], min(pending[1], start), pending[2]
+        pending = [start, end, text]
+    if pending is not None:
+        yield pending[0], pending[1], pending[2]
+
+
+def compact_srt(src: Path, dst: Path, rate_hz: float, drop_fields: Iterable[str] = DEFAULT_DROP_FIELDS) -> CompactionStats:
+    """
+    Write a compacted copy of a DJI telemetry SRT with at most `rate_hz` cues per second.
+
+    See `compact_cues`. Reads and writes one cue at a time, so memory stays constant for
+    flights of any length.
+    """
+    stats = CompactionStats(bytes_in=os.path.getsize(src))
+
+    def counted(blocks):
+        for block in blocks:
+            stats.cues_in += 1
+            yield block
+
+    with open(src, encoding="utf-8", errors="replace") as f, open(dst, "w", encoding="utf-8") as out:
+        for start, end, text in compact_cues(counted(iter_cue_blocks(f)), round(1000 / rate_hz), drop_fields):
+            stats.cues_out += 1
+            out.write(f"{stats.cues_out}\n{_format_timing(start)} --> {_format_timing(end)}\n{text}\n\n")
+    stats.bytes_out = os.path.getsize(dst)
+    return stats
@@ -0,0 +1,271 @@
+"""Registry of supported media formats and their capture time and position readers.
+
+Each format is identified by its extensions and a magic-bytes check on the file header,
+and comes with a fast reader that goes straight to the structure holding the capture time
+(TIFF IFDs, the JPEG APP1 segment, CR3 `CMT2` box, HEIC `Exif` item, MP4 `moov`).
+Host tools and container scripts share this registry so they agree on supported formats.
+Readers open files with `path.open("rb")`, so they also read members of archives in place
+(see `photo_video_tools.archives`).
+"""
+
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+from photo_video_tools.media import isobmff, tiff
+
+KIND_IMAGE = "image"
+KIND_RAW = "raw"
+KIND_VIDEO = "video"
+
+HEADER_SIZE = 16
+
+# UUID box of Canon CR3 files holding the CMT1..CMT4 TIFF streams
+CANON_CR3_UUID = bytes.fromhex("85c0b687820f11e08111f4ce462b6a48")
+HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"mif1", b"msf1"}
+
+
+@dataclass(frozen=True)
+class MediaFormat:
+    name: str
+    kind: str
+    extensions: tuple[str, ...]
+    matches_header: Callable[[bytes], bool]
+    read_capture_time: Callable[[Path], datetime | None]
+    # GPS position as (latitude, longitude); None if the format has no position reader
+    read_position: Callable[[Path], tuple[float, float] | None] | None = None
+
+
+_FORMATS: list[MediaFormat] = []
+
+
+def register(media_format: MediaFormat) -> MediaFormat:
+    """Add a format to the registry; formats are tried in registration order."""
+    _FORMATS.append(media_format)
+    return media_format
+
+
+def all_formats() -> list[MediaFormat]:
+    return list(_FORMATS)
+
+
+def supported_extensions(*kinds: str) -> set[str]:
+    """Lower-case extensions (with dot) of all registered formats, optionally limited to some kinds."""
+    return {
+        ext for media_format in _FORMATS
+        if not kinds or media_format.kind in kinds
+        for ext in media_format.extensions
+    }
+
+
+def read_header(path: Path) -> bytes:
+    with path.open("rb") as f:
+        return f.read(HEADER_SIZE)
+
+
+def detect_format(path: Path, header: bytes | None = None) -> MediaFormat | None:
+    """
+    Find the format of a file.
+
+    The extension selects the candidates and the header confirms them; files with a
+    missing or wrong extension are identified by their header alone.
+    """
+    if header is None:
+        try:
+            header = read_header(path)
+        except OSError:
+            return None
+    suffix = path.suffix.lower()
+    by_extension = [media_format for media_format in _FORMATS if suffix in media_format.extensions]
+    for media_format in by_extension:
+        if media_format.matches_header(header):
+            return media_format
+    for media_format in _FORMATS:
+        if media_format.matches_header(header):
+            return media_format
+    return None
+
+
+def read_capture_time(path: Path) -> datetime | None:
+    """Read the capture time of a file with the fast reader of its format."""
+    media_format = detect_format(path)
+    if media_format is None:
+        return None
+    # A corrupt file must not abort a run over a whole folder
+    try:
+        return media_format.read_capture_time(path)
+    except isobmff.READ_ERRORS:
+        return None
+
+
+def read_position(path: Path) -> tuple[float, float] | None:
+    """Read the GPS position of a file with the fast reader of its format."""
+    media_format = detect_format(path)
+    if media_format is None or media_format.read_position is None:
+        return None
+    try:
+        return media_format.read_position(path)
+    except isobmff.READ_ERRORS:
+        return None
+
+
+# --- Header checks ---
+
+def _is_tiff(header: bytes) -> bool:
+    return header[:4] in (b"II*\0", b"MM\0*")
+
+
+def _is_orf(header: bytes) -> bool:
+    return header[:4] in (b"IIRO", b"IIRS", b"MMOR")
+
+
+def _is_rw2(header: bytes) -> bool:
+    return header[:4] == b"IIU\0"
+
+
+def _is_jpeg(header: bytes) -> bool:
+    return header[:3] == b"\xff\xd8\xff"
+
+
+def _ftyp_brand(header: bytes) -> bytes | None:
+    return header[8:12] if header[4:8] == b"ftyp" else None
+
+
+def _is_cr3(header: bytes) -> bool:
+    return _ftyp_brand(header) == b"crx "
+
+
+def _is_heif(header: bytes) -> bool:
+    return _ftyp_brand(header) in HEIF_BRANDS
+
+
+def _is_video(header: bytes) -> bool:
+    brand = _ftyp_brand(header)
+    if brand is not None:
+        return brand not in HEIF_BRANDS and brand != b"crx "
+    # Old QuickTime files may start with other top-level atoms
+    return header[4:8] in (b"moov", b"mdat", b"wide", b"free", b"skip")
+
+
+# --- Capture time readers ---
+
+def _read_tiff_capture_time(path: Path) -> datetime | None:
+    with path.open("rb") as f:
+        return tiff.read_datetime_original(f)
+
+
+def _read_jpeg_capture_time(path: Path) -> datetime | None:
+    with path.open("rb") as f:
+        base = tiff.find_jpeg_exif(f)
+        return tiff.read_datetime_original(f, base) if base is not None else None
+
+
+def _read_cr3_capture_time(path: Path) -> datetime | None:
+    """CR3 keeps its EXIF IFD as a standalone TIFF stream in moov/uuid/CMT2."""
+    try:
+        with path.open("rb") as f:
+            moov = isobmff.find_box(f, b"moov", 0, isobmff.file_size(f))
+            if moov is None:
+                return None
+            for box in isobmff.iter_boxes(f, moov.payload_offset, moov.end):
+                if box.type != b"uuid" or isobmff.read_payload(f, box, 16) != CANON_CR3_UUID:
+                    continue
+                children_start = box.payload_offset + 16
+                for name in (b"CMT2", b"CMT1"):
+                    cmt = isobmff.find_box(f, name, children_start, box.end)
+                    if cmt is not None:
+                        value = tiff.read_datetime_original(f, cmt.payload_offset)
+                        if value is not None:
+                            return value
+    except isobmff.READ_ERRORS:
+        pass
+    return None
+
+
+def _heif_exif_base(f: BinaryIO) -> int | None:
+    """HEIC stores EXIF as an item; its location comes from the `iinf` and `iloc` boxes."""
+    meta = isobmff.find_box(f, b"meta", 0, isobmff.file_size(f))
+    if meta is None:
+        return None
+    item_id = isobmff.find_item_id(f, meta, b"Exif")
+    if item_id is None:
+        return None
+    extents = isobmff.item_extents(f, meta, item_id)
+    if not extents:
+        return None
+    offset = extents[0][0]
+    f.seek(offset)
+    # Item payload: 32-bit offset to the TIFF header, then (usually) "Exif\0\0"
+    (tiff_header_offset,) = struct.unpack(">I", f.read(4))
+    return offset + 4 + tiff_header_offset
+
+
+def _read_heif_capture_time(path: Path) -> datetime | None:
+    try:
+        with path.open("rb") as f:
+            base = _heif_exif_base(f)
+            return tiff.read_datetime_original(f, base) if base is not None else None
+    except isobmff.READ_ERRORS:
+        pass
+    return None
+
+
+# --- Position readers ---
+
+def _read_tiff_position(path: Path) -> tuple[float, float] | None:
+    with path.open("rb") as f:
+        return tiff.read_gps_position(f)
+
+
+def _read_jpeg_position(path: Path) -> tuple[float, float] | None:
+    with path.open("rb") as f:
+        base = tiff.find_jpeg_exif(f)
+        return tiff.read_gps_position(f, base) if base is not None else None
+
+
+def _read_heif_position(path: Path) -> tuple[float, float] | None:
+    try:
+        with path.open("rb") as f:
+            base = _heif_exif_base(f)
+            return tiff.read_gps_position(f, base) if base is not None else None
+    except isobmff.READ_ERRORS:
+        pass
+    return None
+
+
+def _read_cr3_position(path: Path) -> tuple[float, float] | None:
+    """CR3 keeps the GPS IFD as a standalone TIFF stream in moov/uuid/CMT4."""
+    try:
+        with path.open("rb") as f:
+            moov = isobmff.find_box(f, b"moov", 0, isobmff.file_size(f))
+            if moov is None:
+                return None
+            for box in isobmff.iter_boxes(f, moov.payload_offset, moov.end):
+                if box.type != b"uuid" or isobmff.read_payload(f, box, 16) != CANON_CR3_UUID:
+                    continue
+                cmt = isobmff.find_box(f, b"CMT4", box.payload_offset + 16, box.end)
+                if cmt is not None:
+                    return tiff.read_gps_position(f, cmt.payload_offset, gps_ifd_first=True)
+    except isobmff.READ_ERRORS:
+        pass
+    return None
+
+
+JPEG = register(MediaFormat(
+    "JPEG", KIND_IMAGE, (".jpg", ".jpeg"), _is_jpeg, _read_jpeg_capture_time, _read_jpeg_position
+))
+HEIF = register(MediaFormat(
+    "HEIF", KIND_IMAGE, (".heic", ".heif", ".hif"), _is_heif, _read_heif_capture_time, _read_heif_position
+))
+DNG = register(MediaFormat("DNG", KIND_RAW, (".dng",), _is_tiff, _read_tiff_capture_time, _read_tiff_position))
+ARW = register(MediaFormat("ARW", KIND_RAW, (".arw",), _is_tiff, _read_tiff_capture_time, _read_tiff_position))
+NEF = register(MediaFormat("NEF", KIND_RAW, (".nef",), _is_tiff, _read_tiff_capture_time, _read_tiff_position))
+ORF = register(MediaFormat("ORF", KIND_RAW, (".orf",), _is_orf, _read_tiff_capture_time, _read_tiff_position))
+RW2 = register(MediaFormat("RW2", KIND_RAW, (".rw2",), _is_rw2, _read_tiff_capture_time, _read_tiff_position))
+CR3 = register(MediaFormat("CR3", KIND_RAW, (".cr3",), _is_cr3, _read_cr3_capture_time, _read_cr3_position))
+VIDEO = register(MediaFormat(
+    "MP4/MOV", KIND_VIDEO, tuple(sorted(isobmff.VIDEO_EXTENSIONS)), _is_video, isobmff.read_creation_time,
+    isobmff.read_location,
+))
@@ -0,0 +1,434 @@
+"""Minimal ISO base media file format (MP4/MOV) box reader.
+
+Boxes are located by reading their 8 or 16 byte headers and seeking over the payload,
+so the media data (`mdat`) of a clip is never read and the cost of finding metadata
+does not depend on the file size.
+"""
+
+import re
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+# QuickTime and ISO-BMFF timestamps count seconds since 1904-01-01 00:00:00 UTC
+MAC_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".3gp"}
+
+# What reading a truncated or corrupt file can raise: short reads leave too few bytes to
+# unpack or index, and garbage field values overflow dates or fail conversions
+READ_ERRORS = (OSError, struct.error, IndexError, OverflowError, ValueError)
+
+_QUICKTIME_DATE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?)?\s*(Z|[+-]\d{2}:?\d{2})?"
+)
+# ISO 6709 position as written by phones and cameras, e.g. "+47.1234+008.1234+450.000/"
+_ISO6709 = re.compile(r"([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)")
+
+
+@dataclass
+class Box:
+    """Location of a box inside a file."""
+
+    type: bytes
+    offset: int
+    size: int
+    header_size: int
+
+    @property
+    def payload_offset(self) -> int:
+        return self.offset + self.header_size
+
+    @property
+    def payload_size(self) -> int:
+        return self.size - self.header_size
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+
+def iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Box]:
+    """Yield the boxes between `start` and `end` without reading their payloads."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            header_size = 16
+        elif size == 0:
+            # Box extends to the end of the enclosing range (e.g. a trailing mdat)
+            size = end - offset
+        if size < header_size or offset + size > end:
+            return
+        yield Box(box_type, offset, size, header_size)
+        offset += size
+
+
+def find_box(f: BinaryIO, box_type: bytes, start: int, end: int) -> Box | None:
+    """Return the first direct child box of the given type in a range."""
+    for box in iter_boxes(f, start, end):
+        if box.type == box_type:
+            return box
+    return None
+
+
+def find_path(f: BinaryIO, path: list[bytes], start: int, end: int) -> Box | None:
+    """Follow a path of box types, e.g. [b"moov", b"udta"], starting in a range."""
+    box = None
+    for box_type in path:
+        box = find_box(f, box_type, start, end)
+        if box is None:
+            return None
+        start = meta_children_offset(f, box) if box.type == b"meta" else box.payload_offset
+        end = box.end
+    return box
+
+
+def file_size(f: BinaryIO) -> int:
+    f.seek(0, 2)
+    return f.tell()
+
+
+def read_payload(f: BinaryIO, box: Box, limit: int | None = None) -> bytes:
+    f.seek(box.payload_offset)
+    size = box.payload_size if limit is None else min(limit, box.payload_size)
+    return f.read(size)
+
+
+def meta_children_offset(f: BinaryIO, box: Box) -> int:
+    """
+    Offset of the first child of a `meta` box.
+
+    ISO-BMFF defines `meta` as a full box (4 bytes version/flags before the children),
+    while QuickTime writes it as a plain container; tell them apart by peeking for `hdlr`.
+    """
+    f.seek(box.payload_offset + 4)
+    if f.read(4) == b"hdlr":
+        return box.payload_offset
+    return box.payload_offset + 4
+
+
+def mac_time_to_datetime(seconds: int) -> datetime | None:
+    """Convert seconds since the 1904 epoch into an aware UTC datetime, None if unset."""
+    if seconds <= 0:
+        return None
+    try:
+        return MAC_EPOCH + timedelta(seconds=seconds)
+    except OverflowError:
+        # Garbage beyond year 9999
+        return None
+
+
+def datetime_to_mac_time(value: datetime) -> int:
+    """Convert an aware datetime into seconds since the 1904 epoch."""
+    return int((value - MAC_EPOCH).total_seconds())
+
+
+def read_full_box_times(f: BinaryIO, box: Box) -> tuple[int, int] | None:
+    """Read creation and modification time of an `mvhd`, `tkhd` or `mdhd` box (version 0 or 1)."""
+    data = read_payload(f, box, 20)
+    if len(data) < 12:
+        return None
+    if data[0] == 1:
+        if len(data) < 20:
+            return None
+        return struct.unpack(">QQ", data[4:20])
+    return struct.unpack(">II", data[4:12])
+
+
+def parse_quicktime_date(value: str) -> datetime | None:
+    """
+    Parse a QuickTime date string such as '2024-05-12T14:33:10+0200'.
+
+    Returns the wall-clock time as written (naive), matching how EXIF DateTimeOriginal
+    stores the local capture time.
+    """
+    match = _QUICKTIME_DATE.search(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second = (int(g) if g else 0 for g in match.groups()[:6])
+    try:
+        return datetime(year, month, day, hour, minute, second)
+    except ValueError:
+        return None
+
+
+def _read_user_data_text(f: BinaryIO, udta: Box, item_type: bytes) -> str | None:
+    """Read a QuickTime text user data item such as `©day` or `©xyz`."""
+    item = find_box(f, item_type, udta.payload_offset, udta.end)
+    if item is None:
+        return None
+    data = read_payload(f, item, 256)
+    # QuickTime text items: 16-bit text length, 16-bit language code, text
+    if len(data) >= 4:
+        (length,) = struct.unpack(">H", data[:2])
+        if 0 < length <= len(data) - 4:
+            return data[4:4 + length].decode("utf-8", errors="replace")
+    return data.decode("utf-8", errors="replace")
+
+
+def user_data_text_location(f: BinaryIO, udta: Box, item_type: bytes) -> tuple[int, int] | None:
+    """File offset and length of the text of a QuickTime text user data item, e.g. to patch it in place."""
+    item = find_box(f, item_type, udta.payload_offset, udta.end)
+    if item is None:
+        return None
+    data = read_payload(f, item, 4)
+    if len(data) < 4:
+        return None
+    (length,) = struct.unpack(">H", data[:2])
+    if not 0 < length <= item.payload_size - 4:
+        return None
+    return item.payload_offset + 4, length
+
+
+def _read_user_data_date(f: BinaryIO, udta: Box) -> datetime | None:
+    """Read the QuickTime `©day` user data item."""
+    value = _read_user_data_text(f, udta, b"\xa9day")
+    return parse_quicktime_date(value) if value is not None else None
+
+
+def parse_iso6709(value: str) -> tuple[float, float] | None:
+    match = _ISO6709.match(value.strip())
+    if match is None:
+        return None
+    latitude, longitude = float(match.group(1)), float(match.group(2))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def _data_value_location(f: BinaryIO, item: Box) -> tuple[int, int] | None:
+    """File offset and length of the value of the `data` atom inside a metadata item list entry."""
+    data = find_box(f, b"data", item.payload_offset, item.end)
+    if data is None or data.payload_size <= 8:
+        return None
+    # 4 bytes type indicator, 4 bytes locale, then the value
+    return data.payload_offset + 8, data.payload_size - 8
+
+
+def read_metadata_items(f: BinaryIO, meta: Box) -> dict[str, bytes]:
+    """
+    Read a `meta` box's items as a name->value mapping.
+
+    Supports QuickTime metadata (names from the `keys` box, e.g. 'com.apple.quicktime.creationdate')
+    and iTunes-style item lists (names are the four character item types, e.g. '©day').
+    Values are cut off after 504 bytes.
+    """
+    items: dict[str, bytes] = {}
+    for name, (offset, length) in metadata_value_locations(f, meta).items():
+        f.seek(offset)
+        items[name] = f.read(min(length, 504))
+    return items
+
+
+def metadata_value_locations(f: BinaryIO, meta: Box) -> dict[str, tuple[int, int]]:
+    """Like `read_metadata_items`, but the file offset and length of each value, e.g. to patch it in place."""
+    start = meta_children_offset(f, meta)
+    keys: list[str] = []
+    keys_box = find_box(f, b"keys", start, meta.end)
+    if keys_box is not None:
+        data = read_payload(f, keys_box, 64 * 1024)
+        (count,) = struct.unpack(">I", data[4:8])
+        pos = 8
+        for _ in range(count):
+            if pos + 8 > len(data):
+                break
+            (key_size,) = struct.unpack(">I", data[pos:pos + 4])
+            if key_size < 8:
+                break
+            keys.append(data[pos + 8:pos + key_size].decode("utf-8", errors="replace"))
+            pos += key_size
+
+    items: dict[str, tuple[int, int]] = {}
+    ilst = find_box(f, b"ilst", start, meta.end)
+    if ilst is None:
+        return items
+    for item in iter_boxes(f, ilst.payload_offset, ilst.end):
+        value = _data_value_location(f, item)
+        if value is None:
+            continue
+        if keys:
+            # Keyed item lists use the 1-based key index as the item type
+            index = struct.unpack(">I", item.type)[0]
+            if 1 <= index <= len(keys):
+                items[keys[index - 1]] = value
+        else:
+            items[item.type.decode("latin-1")] = value
+    return items
+
+
+def find_item_id(f: BinaryIO, meta: Box, item_type: bytes) -> int | None:
+    """Return the ID of the first HEIF item of a type (e.g. b"Exif") from the `iinf` box of a `meta` box."""
+    start = meta_children_offset(f, meta)
+    iinf = find_box(f, b"iinf", start, meta.end)
+    if iinf is None:
+        return None
+    f.seek(iinf.payload_offset)
+    header = f.read(4)
+    if len(header) < 4:
+        return None
+    version = header[0]
+    entries_start = iinf.payload_offset + (6 if version == 0 else 8)
+    for infe in iter_boxes(f, entries_start, iinf.end):
+        if infe.type != b"infe":
+            continue
+        data = read_payload(f, infe, 16)
+        if len(data) < 14 or data[0] < 2:
+            continue
+        if data[0] == 2:
+            (item_id,) = struct.unpack(">H", data[4:6])
+            found_type = data[8:12]
+        else:
+            (item_id,) = struct.unpack(">I", data[4:8])
+            found_type = data[10:14]
+        if found_type == item_type:
+            return item_id
+    return None
+
+
+def item_extents(f: BinaryIO, meta: Box, item_id: int) -> list[tuple[int, int]]:
+    """Return the (file offset, length) extents of a HEIF item from the `iloc` box of a `meta` box."""
+    start = meta_children_offset(f, meta)
+    iloc = find_box(f, b"iloc", start, meta.end)
+    if iloc is None:
+        return []
+    data = read_payload(f, iloc, 1024 * 1024)
+    if len(data) < 8:
+        return []
+    version = data[0]
+    offset_size, length_size = data[4] >> 4, data[4] & 0x0F
+    base_offset_size, index_size = data[5] >> 4, (data[5] & 0x0F if version in (1, 2) else 0)
+    pos = 6
+
+    def read_uint(size: int) -> int:
+        nonlocal pos
+        value = int.from_bytes(data[pos:pos + size], "big") if size else 0
+        pos += size
+        return value
+
+    item_count = read_uint(2 if version < 2 else 4)
+    for _ in range(item_count):
+        current_id = read_uint(2 if version < 2 else 4)
+        construction_method = read_uint(2) & 0x0F if version in (1, 2) else 0
+        read_uint(2)  # data reference index
+        base_offset = read_uint(base_offset_size)
+        extent_count = read_uint(2)
+        extents = []
+        for _ in range(extent_count):
+            read_uint(index_size)
+            extent_offset = read_uint(offset_size)
+            extent_length = read_uint(length_size)
+            extents.append((base_offset + extent_offset, extent_length))
+        if current_id == item_id:
+            # Only file-offset construction is supported (what cameras and phones write)
+            return extents if construction_method == 0 else []
+    return []
+
+
+def read_major_brand(f: BinaryIO) -> bytes | None:
+    f.seek(0)
+    header = f.read(12)
+    if len(header) < 12 or header[4:8] != b"ftyp":
+        return None
+    return header[8:12]
+
+
+def read_location(path: Path) -> tuple[float, float] | None:
+    """Read the recording position of an MP4/MOV file from Keys `location.ISO6709` or `©xyz`."""
+    try:
+        with path.open("rb") as f:
+            moov = find_box(f, b"moov", 0, file_size(f))
+            if moov is None:
+                return None
+            for box in iter_boxes(f, moov.payload_offset, moov.end):
+                value = None
+                if box.type == b"meta":
+                    raw = read_metadata_items(f, box).get("com.apple.quicktime.location.ISO6709")
+                    value = raw.decode("utf-8", errors="replace") if raw is not None else None
+                elif box.type == b"udta":
+                    value = _read_user_data_text(f, box, b"\xa9xyz")
+                position = parse_iso6709(value) if value else None
+                if position is not None:
+                    return position
+    except READ_ERRORS:
+        pass
+    return None
+
+
+def read_creation_time(path: Path) -> datetime | None:
+    """
+    Read the capture time of an MP4/MOV file from its box tree.
+
+    Prefers the local wall-clock time from QuickTime metadata (Keys `creationdate`, `©day`).
+    Falls back to the `mvhd`/`tkhd` creation time, which is stored as UTC and converted
+    to the local time of this machine.
+    Only a few KB are read regardless of the file size.
+    """
+    try:
+        with path.open("rb") as f:
+            moov = find_box(f, b"moov", 0, file_size(f))
+            if moov is None:
+                return None
+
+            for box in iter_boxes(f, moov.payload_offset, moov.end):
+                if box.type == b"meta":
+                    value = read_metadata_items(f, box).get("com.apple.quicktime.creationdate")
+                    if value is not None:
+                        date = parse_quicktime_date(value.decode("utf-8", errors="replace"))
+                        if date is not None:
+                            return date
+                elif box.type == b"udta":
+                    date = _read_user_data_date(f, box)
+                    if date is None:
+                        meta = find_box(f, b"meta", box.payload_offset, box.end)
+                        if meta is not None:
+                            value = read_metadata_items(f, meta).get("\xa9day")
+                            if value is not None:
+                                date = parse_quicktime_date(value.decode("utf-8", errors="replace"))
+                    if date is not None:
+                        return date
+
+            candidates = [find_box(f, b"mvhd", moov.payload_offset, moov.end)]
+            for trak in iter_boxes(f, moov.payload_offset, moov.end):
+                if trak.type == b"trak":
+                    candidates.append(find_box(f, b"tkhd", trak.payload_offset, trak.end))
+            for box in candidates:
+                if box is None:
+                    continue
+                times = read_full_box_times(f, box)
+                created = mac_time_to_datetime(times[0]) if times is not None else None
+                if created is not None:
+                    return created.astimezone().replace(tzinfo=None)
+    except READ_ERRORS:
+        pass
+    return None
+
+
+def read_duration(path: Path) -> float | None:
+    """Read the duration of an MP4/MOV file in seconds from its `mvhd` box."""
+    try:
+        with path.open("rb") as f:
+            mvhd = find_path(f, [b"moov", b"mvhd"], 0, file_size(f))
+            if mvhd is None:
+                return None
+            data = read_payload(f, mvhd, 32)
+            if data[:1] == b"\x01":
+                timescale, duration = struct.unpack(">IQ", data[20:32])
+            else:
+                timescale, duration = struct.unpack(">II", data[12:20])
+    except READ_ERRORS:
+        return None
+    if timescale == 0 or duration in (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+        return None
+    return duration / timescale
@@ -0,0 +1,136 @@
+"""In-place edits of MP4/MOV files: box builders and rewriting the `moov` box.
+
+The media data of a clip is never moved. New samples are appended as a new `mdat` at the
+end of the file and the rebuilt `moov` either replaces the old one where it is (if it fits
+into the old box plus a directly following `free` box) or is appended too, with the old
+one turned into `free`. Chunk offsets of the existing tracks stay valid either way, so the
+bytes written depend on the size of the metadata, not on the size of the clip.
+
+Fragmented files and files without a single top-level `moov` are not supported; callers
+fall back to a full remux for those.
+"""
+
+import os
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from photo_video_tools.media.isobmff import Box, file_size, find_box, iter_boxes, read_payload
+
+# Larger boxes would need a 64-bit header
+MAX_BOX_SIZE = 0xFFFFFFFF
+
+
+class UnsupportedLayout(Exception):
+    """The file's box layout can't be edited in place."""
+
+
+def box(box_type: bytes, *payload: bytes) -> bytes:
+    data = b"".join(payload)
+    if len(data) + 8 > MAX_BOX_SIZE:
+        raise UnsupportedLayout(f"'{box_type.decode('latin-1')}' box too large")
+    return struct.pack(">I4s", len(data) + 8, box_type) + data
+
+
+def full_box(box_type: bytes, version: int, flags: int, *payload: bytes) -> bytes:
+    return box(box_type, struct.pack(">I", (version << 24) | flags), *payload)
+
+
+def free_box(size: int) -> bytes:
+    return struct.pack(">I4s", size, b"free") + bytes(size - 8)
+
+
+@dataclass
+class Layout:
+    """Top-level boxes of a file that can be edited in place."""
+
+    boxes: list[Box]
+    moov: Box
+    size: int
+
+    @property
+    def moov_is_last(self) -> bool:
+        return self.moov.end == self.size
+
+    def space_after_moov(self) -> int:
+        """Bytes available for a rewritten `moov` without moving it (the box plus a following `free`)."""
+        index = self.boxes.index(self.moov)
+        space = self.moov.size
+        if index + 1 < len(self.boxes) and self.boxes[index + 1].type in (b"free", b"skip"):
+            space += self.boxes[index + 1].size
+        return space
+
+
+def read_layout(f: BinaryIO) -> Layout:
+    size = file_size(f)
+    boxes = list(iter_boxes(f, 0, size))
+    if not boxes or boxes[-1].end != size:
+        raise UnsupportedLayout("Trailing data after the last box")
+    moovs = [b for b in boxes if b.type == b"moov"]
+    if len(moovs) != 1:
+        raise UnsupportedLayout(f"{len(moovs)} 'moov' boxes")
+    if any(b.type == b"moof" for b in boxes) or find_box(f, b"mvex", moovs[0].payload_offset, moovs[0].end):
+        raise UnsupportedLayout("Fragmented file")
+    if moovs[0].header_size != 8:
+        raise UnsupportedLayout("'moov' with a 64-bit size")
+    return Layout(boxes, moovs[0], size)
+
+
+def read_moov(f: BinaryIO, layout: Layout) -> bytes:
+    return read_payload(f, layout.moov)
+
+
+def append_offset(layout: Layout) -> int:
+    """File offset where appended boxes start; a trailing `moov` is overwritten."""
+    return layout.moov.offset if layout.moov_is_last else layout.size
+
+
+def _fix_open_ended_box(f: BinaryIO, layout: Layout) -> None:
+    """A last box with size 0 extends to the end of the file; give it its real size before appending."""
+    last = layout.boxes[-1]
+    f.seek(last.offset)
+    if last is layout.moov or struct.unpack(">I", f.read(4))[0] != 0:
+        return
+    if last.size > MAX_BOX_SIZE:
+        raise UnsupportedLayout(f"Open-ended '{last.type.decode('latin-1')}' box larger than 4 GB")
+    f.seek(last.offset)
+    f.write(struct.pack(">I", last.size))
+
+
+def write(f: BinaryIO, layout: Layout, moov_payload: bytes, appended: bytes = b"") -> int:
+    """
+    Write a rebuilt `moov` and optional boxes to append (e.g. a new `mdat`).
+
+    `appended` lands at `append_offset(layout)`, so chunk offsets into it can be computed
+    before calling this. Returns the number of bytes written.
+    """
+    moov = box(b"moov", moov_payload)
+    start = append_offset(layout)
+    written = 0
+
+    if appended:
+        _fix_open_ended_box(f, layout)
+    in_place = not layout.moov_is_last and (
+        len(moov) == layout.space_after_moov() or len(moov) + 8 <= layout.space_after_moov()
+    )
+    if in_place:
+        # Keeps a "fast start" layout (moov before mdat) intact
+        remaining = layout.space_after_moov() - len(moov)
+        f.seek(layout.moov.offset)
+        f.write(moov + (free_box(remaining) if remaining else b""))
+        written += layout.space_after_moov()
+        tail = appended
+    else:
+        if not layout.moov_is_last:
+            f.seek(layout.moov.offset + 4)
+            f.write(b"free")
+            written += 4
+        tail = appended + moov
+
+    f.seek(start)
+    f.write(tail)
+    f.truncate(start + len(tail))
+    written += len(tail)
+    f.flush()
+    os.fsync(f.fileno())
+    return written
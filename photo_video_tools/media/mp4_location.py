@@ -0,0 +1,184 @@
+"""Write the recording position of an MP4/MOV file in place.
+
+The position is stored the way QuickTime and exiftool read it: as an ISO 6709 string in the
+`udta/©xyz` user data item and in the Keys item `com.apple.quicktime.location.ISO6709`
+of `moov/meta`. Both live in `moov`, so only `moov` is rebuilt and written with
+`mp4_edit.write`: `free` boxes inside `moov` absorb the growth so it keeps its size, and
+otherwise the rebuilt `moov` goes into the old one plus a directly following `free` box or
+is appended at the end of the file. The media data never moves, so the chunk offsets in
+`stco`/`co64` stay valid and the bytes written depend only on the size of the metadata.
+"""
+
+import struct
+from pathlib import Path
+from typing import BinaryIO
+
+from photo_video_tools.media import mp4_edit
+from photo_video_tools.media.isobmff import Box, iter_boxes, meta_children_offset
+from photo_video_tools.media.mp4_edit import UnsupportedLayout, box, full_box
+
+LOCATION_KEY = "com.apple.quicktime.location.ISO6709"
+USER_DATA_LOCATION = b"\xa9xyz"
+# ISO 639-2/T 'und' packed into 15 bits, as QuickTime writes it for text items without a language
+_LANGUAGE_UNDETERMINED = 0x55C4
+# Well-known type of UTF-8 values in `data` atoms
+_DATA_TYPE_UTF8 = 1
+
+
+def format_iso6709(latitude: float, longitude: float, altitude: float | None = None) -> str:
+    """Format a position like '+46.558630+007.835430+2971.600/'."""
+    value = f"{latitude:+010.6f}{longitude:+011.6f}"
+    if altitude is not None:
+        value += f"{altitude:+.3f}"
+    return value + "/"
+
+
+def _user_data_item(value: str) -> bytes:
+    text = value.encode("utf-8")
+    return box(USER_DATA_LOCATION, struct.pack(">HH", len(text), _LANGUAGE_UNDETERMINED), text)
+
+
+def _metadata_item(index: int, value: str) -> bytes:
+    data = box(b"data", struct.pack(">II", _DATA_TYPE_UTF8, 0), value.encode("utf-8"))
+    return box(struct.pack(">I", index), data)
+
+
+def _read_children(f: BinaryIO, start: int, end: int, parent: str) -> tuple[list[tuple[Box, bytes]], bytes]:
+    """
+    The child boxes of a range with their complete bytes, and the bytes after the last one.
+
+    Only a few zero bytes may follow the last child, like the 32-bit terminator some
+    writers put at the end of `udta`.
+    """
+    children = []
+    for child in iter_boxes(f, start, end):
+        f.seek(child.offset)
+        children.append((child, f.read(child.size)))
+    rest_offset = children[-1][0].end if children else start
+    f.seek(rest_offset)
+    rest = f.read(end - rest_offset)
+    if len(rest) >= 8 or rest.strip(b"\x00"):
+        raise UnsupportedLayout(f"Unreadable boxes inside '{parent}'")
+    return children, rest
+
+
+def _build_udta(f: BinaryIO, udta: Box | None, value: str) -> bytes:
+    """`udta` with its `©xyz` item replaced or added; the other items are kept as they are."""
+    parts = []
+    terminator = b""
+    if udta is not None:
+        children, terminator = _read_children(f, udta.payload_offset, udta.end, "udta")
+        parts = [data for child, data in children if child.type != USER_DATA_LOCATION]
+    return box(b"udta", *parts, _user_data_item(value), terminator)
+
+
+def _build_keys_meta(f: BinaryIO, meta: Box | None, value: str) -> bytes | None:
+    """
+    `meta` with the Keys location item replaced or added.
+
+    Returns None for `meta` boxes that hold no QuickTime Keys metadata (e.g. iTunes-style
+    item lists), which are left alone.
+    """
+    if meta is None:
+        handler = full_box(b"hdlr", 0, 0, bytes(4), b"mdta", bytes(12), b"\x00")
+        keys = full_box(b"keys", 0, 0, struct.pack(">I", 1), box(b"mdta", LOCATION_KEY.encode("utf-8")))
+        return full_box(b"meta", 0, 0, handler, keys, box(b"ilst", _metadata_item(1, value)))
+
+    start = meta_children_offset(f, meta)
+    children, rest = _read_children(f, start, meta.end, "meta")
+    keys_box = next((data[child.header_size:] for child, data in children if child.type == b"keys"), None)
+    if keys_box is None or len(keys_box) < 8:
+        return None
+
+    # Key entries: 32-bit size, 4-byte namespace, name
+    (count,) = struct.unpack(">I", keys_box[4:8])
+    entries = []
+    pos = 8
+    for _ in range(count):
+        if pos + 8 > len(keys_box):
+            raise UnsupportedLayout("Truncated 'keys' box")
+        (size,) = struct.unpack(">I", keys_box[pos:pos + 4])
+        if size < 8 or pos + size > len(keys_box):
+            raise UnsupportedLayout("Bad entry in 'keys' box")
+        entries.append(keys_box[pos:pos + size])
+        pos += size
+
+    names = [entry[8:].decode("utf-8", errors="replace") for entry in entries]
+    if LOCATION_KEY in names:
+        index = names.index(LOCATION_KEY) + 1
+    else:
+        entries.append(box(b"mdta", LOCATION_KEY.encode("utf-8")))
+        index = len(entries)
+    keys = full_box(b"keys", 0, 0, struct.pack(">I", len(entries)), *entries)
+
+    items = []
+    ilst = next((child for child, _ in children if child.type == b"ilst"), None)
+    if ilst is not None:
+        ilst_items, _ = _read_children(f, ilst.payload_offset, ilst.end, "ilst")
+        items = [data for item, data in ilst_items if struct.unpack(">I", item.type)[0] != index]
+    items.append(_metadata_item(index, value))
+
+    f.seek(meta.payload_offset)
+    version_and_flags = f.read(start - meta.payload_offset)
+    parts = []
+    for child, data in children:
+        if child.type == b"keys":
+            parts.append(keys)
+        elif child.type == b"ilst":
+            parts.append(box(b"ilst", *items))
+        else:
+            parts.append(data)
+    if ilst is None:
+        parts.append(box(b"ilst", *items))
+    return box(b"meta", version_and_flags, *parts, rest)
+
+
+def _absorb_growth(parts: list[tuple[bytes, bytes]], old_size: int) -> list[tuple[bytes, bytes]]:
+    """Shrink or drop a `free` box inside `moov` so that `moov` keeps its size, if one is large enough."""
+    growth = sum(len(data) for _, data in parts) - old_size
+    if growth <= 0:
+        return parts
+    for i, (box_type, data) in enumerate(parts):
+        # A shrunk `free` box needs at least its 8-byte header
+        if box_type in (b"free", b"skip") and (len(data) == growth or len(data) - growth >= 8):
+            remaining = len(data) - growth
+            return parts[:i] + [(box_type, mp4_edit.free_box(remaining) if remaining else b"")] + parts[i + 1:]
+    return parts
+
+
+def write_location(path: Path, latitude: float, longitude: float, altitude: float | None = None) -> int:
+    """
+    Set the recording position of an MP4/MOV file in place.
+
+    Returns the number of bytes written. Raises UnsupportedLayout for files that can't be
+    edited this way (nothing is written then).
+    """
+    value = format_iso6709(latitude, longitude, altitude)
+    with open(path, "r+b") as f:
+        layout = mp4_edit.read_layout(f)
+        moov = layout.moov
+        children, rest = _read_children(f, moov.payload_offset, moov.end, "moov")
+        if rest:
+            raise UnsupportedLayout("Unreadable boxes inside 'moov'")
+
+        udta = next((child for child, _ in children if child.type == b"udta"), None)
+        meta = next((child for child, _ in children if child.type == b"meta"), None)
+        new_udta = _build_udta(f, udta, value)
+        new_meta = _build_keys_meta(f, meta, value)
+
+        # Children in their order, with the rebuilt ones in place of the old ones
+        parts: list[tuple[bytes, bytes]] = []
+        for child, data in children:
+            if child is udta:
+                parts.append((child.type, new_udta))
+            elif child is meta and new_meta is not None:
+                parts.append((child.type, new_meta))
+            else:
+                parts.append((child.type, data))
+        if meta is None:
+            parts.append((b"meta", new_meta))
+        if udta is None:
+            parts.append((b"udta", new_udta))
+
+        parts = _absorb_growth(parts, moov.payload_size)
+        return mp4_edit.write(f, layout, b"".join(data for _, data in parts))
@@ -0,0 +1,194 @@
+"""Shift the recording times of MP4/MOV files in place.
+
+The creation and modification times of the `mvhd`, `tkhd` and `mdhd` boxes are fixed-size
+integer fields, and the QuickTime date strings (Keys `com.apple.quicktime.creationdate`,
+`©day`) keep their length when shifted. A shift therefore overwrites a few dozen bytes
+inside `moov`; the media data is never read or written and the time per file does not
+depend on its size. All fields are located and their new values computed before the first
+byte is written, and the written bytes are read back afterwards.
+"""
+
+import os
+import re
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO
+
+from photo_video_tools.media.isobmff import (
+    Box,
+    file_size,
+    find_box,
+    find_path,
+    iter_boxes,
+    metadata_value_locations,
+    read_payload,
+    user_data_text_location,
+)
+from photo_video_tools.media.mp4_edit import UnsupportedLayout
+
+CREATION_DATE_KEY = "com.apple.quicktime.creationdate"
+USER_DATA_DATE = b"\xa9day"
+
+# A complete date and time; the fraction and the offset are kept as written
+_DATE_TIME = re.compile(
+    r"(\d{4}-\d{2}-\d{2})([T ])(\d{2}:\d{2}:\d{2})(\.\d+)?(Z|([+-])(\d{2})(:?)(\d{2}))?"
+)
+
+
+@dataclass
+class Patch:
+    """New bytes for a field of the file."""
+
+    label: str
+    offset: int
+    old: bytes
+    new: bytes
+
+
+def shift_date_string(value: str, shift: timedelta, shift_offset: bool) -> str | None:
+    """
+    Shift a QuickTime date string such as '2024-05-12T14:33:10+0200' by `shift`.
+
+    The wall-clock time is shifted; with `shift_offset` the UTC offset is shifted along
+    (the camera's clock was set to the wrong time zone), like the EXIF OffsetTime tags of photos.
+    Returns None if the value has no complete date and time or would change its length.
+    """
+    match = _DATE_TIME.search(value)
+    if match is None:
+        return None
+    date, separator, time_of_day, fraction, offset, sign, hours, colon, minutes = match.groups()
+    try:
+        shifted = datetime.strptime(f"{date} {time_of_day}", "%Y-%m-%d %H:%M:%S") + shift
+    except (ValueError, OverflowError):
+        return None
+    if shifted.year < 1000 or shifted.year > 9999:
+        return None
+
+    offset = offset or ""
+    if shift_offset and sign is not None:
+        total_minutes = (1 if sign == "+" else -1) * (int(hours) * 60 + int(minutes)) + int(shift.total_seconds()) // 60
+        if abs(total_minutes) >= 24 * 60:
+            return None
+        new_hours, new_minutes = divmod(abs(total_minutes), 60)
+        offset = f"{'-' if total_minutes < 0 else '+'}{new_hours:02d}{colon}{new_minutes:02d}"
+
+    text = f"{shifted:%Y-%m-%d}{separator}{shifted:%H:%M:%S}{fraction or ''}{offset}"
+    result = value[:match.start()] + text + value[match.end():]
+    return result if len(result.encode("utf-8")) == len(value.encode("utf-8")) else None
+
+
+def _full_box_time_patches(f: BinaryIO, box: Box, label: str, seconds: int) -> list[Patch]:
+    """Creation and modification time of an `mvhd`, `tkhd` or `mdhd` box (version 0 or 1)."""
+    data = read_payload(f, box, 20)
+    if len(data) < 12:
+        raise UnsupportedLayout(f"'{label}' box too short")
+    if data[0] == 1:
+        if len(data) < 20:
+            raise UnsupportedLayout(f"'{label}' box too short")
+        size, fmt, limit = 8, ">Q", 0xFFFFFFFFFFFFFFFF
+    else:
+        size, fmt, limit = 4, ">I", 0xFFFFFFFF
+
+    patches = []
+    for index, name in enumerate(("creation", "modification")):
+        start = 4 + index * size
+        old = data[start:start + size]
+        (value,) = struct.unpack(fmt, old)
+        # Zero means not set; leave it that way
+        if value == 0:
+            continue
+        if not 0 < value + seconds <= limit:
+            raise UnsupportedLayout(f"{label} {name} time out of range after shifting")
+        patches.append(Patch(f"{label} {name} time", box.payload_offset + start, old, struct.pack(fmt, value + seconds)))
+    return patches
+
+
+def _string_patch(f: BinaryIO, label: str, location: tuple[int, int], shift: timedelta, shift_offset: bool) -> Patch | None:
+    offset, length = location
+    f.seek(offset)
+    old = f.read(length)
+    try:
+        value = old.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    new = shift_date_string(value, shift, shift_offset)
+    if new is None or new == value:
+        return None
+    return Patch(label, offset, old, new.encode("utf-8"))
+
+
+def _metadata_patches(f: BinaryIO, meta: Box, label: str, shift: timedelta, shift_offset: bool) -> list[Patch]:
+    patches = []
+    locations = metadata_value_locations(f, meta)
+    for name in (CREATION_DATE_KEY, USER_DATA_DATE.decode("latin-1")):
+        if name in locations:
+            patch = _string_patch(f, f"{label} {name}", locations[name], shift, shift_offset)
+            if patch is not None:
+                patches.append(patch)
+    return patches
+
+
+def plan_shift(f: BinaryIO, shift: timedelta, shift_offset: bool) -> list[Patch]:
+    """Locate all recording times of a file and compute their shifted values without writing anything."""
+    if shift % timedelta(seconds=1):
+        raise ValueError("Shifts must be whole seconds")
+    seconds = int(shift.total_seconds())
+
+    moov = find_box(f, b"moov", 0, file_size(f))
+    if moov is None:
+        raise UnsupportedLayout("no 'moov' box")
+
+    patches: list[Patch] = []
+    mvhd = find_box(f, b"mvhd", moov.payload_offset, moov.end)
+    if mvhd is not None:
+        patches += _full_box_time_patches(f, mvhd, "mvhd", seconds)
+
+    track = 0
+    for child in iter_boxes(f, moov.payload_offset, moov.end):
+        if child.type == b"trak":
+            track += 1
+            tkhd = find_box(f, b"tkhd", child.payload_offset, child.end)
+            if tkhd is not None:
+                patches += _full_box_time_patches(f, tkhd, f"track {track} tkhd", seconds)
+            mdhd = find_path(f, [b"mdia", b"mdhd"], child.payload_offset, child.end)
+            if mdhd is not None:
+                patches += _full_box_time_patches(f, mdhd, f"track {track} mdhd", seconds)
+        elif child.type == b"meta":
+            patches += _metadata_patches(f, child, "Keys", shift, shift_offset)
+        elif child.type == b"udta":
+            location = user_data_text_location(f, child, USER_DATA_DATE)
+            if location is not None:
+                patch = _string_patch(f, "udta ©day", location, shift, shift_offset)
+                if patch is not None:
+                    patches.append(patch)
+            meta = find_box(f, b"meta", child.payload_offset, child.end)
+            if meta is not None:
+                patches += _metadata_patches(f, meta, "udta", shift, shift_offset)
+    return patches
+
+
+def shift_times(path: Path, shift: timedelta, shift_offset: bool = False) -> list[Patch]:
+    """
+    Shift the recording times of an MP4/MOV file in place and verify them by reading them back.
+
+    Returns the patched fields. Raises UnsupportedLayout if the file has no recording times
+    that can be shifted this way, OSError if the read-back doesn't match.
+    """
+    with open(path, "r+b") as f:
+        patches = plan_shift(f, shift, shift_offset)
+        if not patches:
+            raise UnsupportedLayout("no recording times found")
+        for patch in patches:
+            f.seek(patch.offset)
+            f.write(patch.new)
+        f.flush()
+        os.fsync(f.fileno())
+
+    with open(path, "rb") as f:
+        for patch in patches:
+            f.seek(patch.offset)
+            if f.read(len(patch.new)) != patch.new:
+                raise OSError(f"{patch.label} reads back differently after writing")
+    return patches
@@ -0,0 +1,214 @@
+"""Add SRT subtitles to MP4 files as a 3GPP timed text (`tx3g`) track without a remux.
+
+The cues become one chunk of `tx3g` samples in a new `mdat` appended to the file, and a
+text `trak` describing them is added to the rebuilt `moov` (see `mp4_edit`). This is the
+track layout ffmpeg writes for `-c:s mov_text`: handler `sbtl`, a null media header and
+empty samples filling the gaps between cues, so players treat both the same.
+"""
+
+import re
+import struct
+from pathlib import Path
+
+from photo_video_tools.media import mp4_edit
+from photo_video_tools.media.dji_srt import iter_cue_blocks
+from photo_video_tools.media.isobmff import Box, find_box, find_path, iter_boxes, read_payload
+from photo_video_tools.media.mp4_edit import UnsupportedLayout, box, full_box
+
+TIMESCALE = 1000
+# Packed ISO 639-2 code "und"
+LANGUAGE_UNDEFINED = 0x55C4
+MAX_SAMPLE_TEXT = 0xFFFF
+
+_TAG = re.compile(r"<[^>]*>|\{\\[^}]*\}")
+
+# Defaults of ffmpeg's mov_text encoder: centered at the bottom, white 18 pt serif text
+_TX3G_DEFAULTS = bytes.fromhex(
+    "00000000"  # display flags
+    "01ff"  # horizontal / vertical justification
+    "00000000"  # background color
+    "0000000000000000"  # default text box
+    "000000000001" "00" "12" "ffffffff"  # style record: chars, font ID, face, size, color
+) + box(b"ftab", struct.pack(">HHB", 1, 1, 5) + b"Serif")
+
+_IDENTITY_MATRIX = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+
+def read_srt(path: Path) -> list[tuple[int, int, str]]:
+    """(start ms, end ms, plain text) of each cue, sorted by start; formatting tags are dropped."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        cues = [
+            (start, end, "\n".join(line.strip() for line in _TAG.sub("", "\n".join(lines)).splitlines()).strip())
+            for _, start, end, lines in iter_cue_blocks(f)
+        ]
+    return sorted((cue for cue in cues if cue[1] > cue[0]), key=lambda cue: cue[0])
+
+
+def build_samples(cues: list[tuple[int, int, str]]) -> list[tuple[int, bytes]]:
+    """
+    (duration ms, sample) pairs covering the timeline from 0 to the end of the last cue.
+
+    Overlapping cues are cut at the start of the next one, since a text track shows one
+    sample at a time.
+    """
+    samples: list[tuple[int, bytes]] = []
+    position = 0
+    for i, (start, end, text) in enumerate(cues):
+        if i + 1 < len(cues):
+            end = min(end, cues[i + 1][0])
+        start = max(start, position)
+        if end <= start:
+            continue
+        if start > position:
+            samples.append((start - position, b"\x00\x00"))
+        encoded = text.encode("utf-8")[:MAX_SAMPLE_TEXT]
+        samples.append((end - start, struct.pack(">H", len(encoded)) + encoded))
+        position = end
+    return samples
+
+
+def _time_to_sample(durations: list[int]) -> bytes:
+    runs: list[list[int]] = []
+    for duration in durations:
+        if runs and runs[-1][1] == duration:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, duration])
+    return full_box(b"stts", 0, 0, struct.pack(">I", len(runs)), b"".join(struct.pack(">II", *run) for run in runs))
+
+
+def _read_mvhd(data: bytes) -> tuple[int, int, int, int, int]:
+    """(version, creation time, modification time, timescale, duration) of an `mvhd` payload."""
+    if data[0] == 1:
+        return (1, *struct.unpack(">QQIQ", data[4:32]))
+    return (0, *struct.unpack(">IIII", data[4:20]))
+
+
+def _video_size(f, moov: Box) -> bytes:
+    """Width and height (16.16 fixed point) from the `tkhd` of the first video track."""
+    for trak in iter_boxes(f, moov.payload_offset, moov.end):
+        if trak.type != b"trak":
+            continue
+        hdlr = find_path(f, [b"mdia", b"hdlr"], trak.payload_offset, trak.end)
+        tkhd = find_box(f, b"tkhd", trak.payload_offset, trak.end)
+        if hdlr is not None and tkhd is not None and read_payload(f, hdlr, 12)[8:12] == b"vide":
+            return read_payload(f, tkhd)[-8:]
+    return bytes(8)
+
+
+def _max_track_id(f, moov: Box) -> int:
+    track_id = 0
+    for trak in iter_boxes(f, moov.payload_offset, moov.end):
+        tkhd = find_box(f, b"tkhd", trak.payload_offset, trak.end) if trak.type == b"trak" else None
+        if tkhd is not None:
+            data = read_payload(f, tkhd, 32)
+            track_id = max(track_id, struct.unpack(">I", data[20:24] if data[0] == 1 else data[12:16])[0])
+    return track_id
+
+
+def build_text_trak(
+    samples: list[tuple[int, bytes]],
+    chunk_offset: int,
+    track_id: int,
+    movie_timescale: int,
+    times: tuple[int, int],
+    size: bytes,
+) -> bytes:
+    duration = sum(duration for duration, _ in samples)
+    movie_duration = duration * movie_timescale // TIMESCALE
+    creation, modification = times
+    long_times = max(creation, modification, movie_duration, duration) > 0xFFFFFFFF
+    version, time_format = (1, ">QQIIQ") if long_times else (0, ">IIIII")
+
+    tkhd = full_box(
+        b"tkhd", version, 0x3,  # enabled, in movie
+        struct.pack(time_format, creation, modification, track_id, 0, movie_duration),
+        bytes(8),  # reserved
+        struct.pack(">hhhH", 0, 0, 0, 0),  # layer, alternate group, volume, reserved
+        _IDENTITY_MATRIX,
+        size,
+    )
+    mdhd = full_box(
+        b"mdhd", version, 0,
+        struct.pack(">QQIQ" if long_times else ">IIII", creation, modification, TIMESCALE, duration),
+        struct.pack(">HH", LANGUAGE_UNDEFINED, 0),
+    )
+    hdlr = full_box(b"hdlr", 0, 0, struct.pack(">I4s12x", 0, b"sbtl"), b"SubtitleHandler\x00")
+    dinf = box(b"dinf", full_box(b"dref", 0, 0, struct.pack(">I", 1), full_box(b"url ", 0, 1)))
+
+    tx3g = box(b"tx3g", bytes(6), struct.pack(">H", 1), _TX3G_DEFAULTS)
+    if chunk_offset > 0xFFFFFFFF:
+        chunk_offsets = full_box(b"co64", 0, 0, struct.pack(">IQ", 1, chunk_offset))
+    else:
+        chunk_offsets = full_box(b"stco", 0, 0, struct.pack(">II", 1, chunk_offset))
+    stbl = box(
+        b"stbl",
+        full_box(b"stsd", 0, 0, struct.pack(">I", 1), tx3g),
+        _time_to_sample([duration for duration, _ in samples]),
+        full_box(b"stsc", 0, 0, struct.pack(">IIII", 1, 1, len(samples), 1)),
+        full_box(b"stsz", 0, 0, struct.pack(">II", 0, len(samples)), b"".join(struct.pack(">I", len(sample)) for _, sample in samples)),
+        chunk_offsets,
+    )
+    minf = box(b"minf", full_box(b"nmhd", 0, 0), dinf, stbl)
+    return box(b"trak", tkhd, box(b"mdia", mdhd, hdlr, minf))
+
+
+def add_subtitle_track(video: Path, srt: Path) -> int:
+    """
+    Add the cues of an SRT file to an MP4 file as a new subtitle track, in place.
+
+    Returns the number of bytes written. Raises UnsupportedLayout for files that can't be
+    edited this way (nothing is written then) and ValueError for SRT files without cues.
+    """
+    samples = build_samples(read_srt(srt))
+    if not samples:
+        raise ValueError(f"No subtitles found in {srt.name}")
+
+    with open(video, "r+b") as f:
+        layout = mp4_edit.read_layout(f)
+        moov = layout.moov
+        mvhd = find_box(f, b"mvhd", moov.payload_offset, moov.end)
+        if mvhd is None:
+            raise UnsupportedLayout("No 'mvhd' box")
+        mvhd_data = bytearray(read_payload(f, mvhd))
+        version, creation, modification, movie_timescale, movie_duration = _read_mvhd(mvhd_data)
+        if movie_timescale == 0:
+            raise UnsupportedLayout("Movie timescale is 0")
+
+        # One chunk with all samples, in a new mdat at the end of the file
+        media = b"".join(sample for _, sample in samples)
+        mdat = box(b"mdat", media)
+        chunk_offset = mp4_edit.append_offset(layout) + 8
+
+        track_id = max(struct.unpack(">I", mvhd_data[-4:])[0], _max_track_id(f, moov) + 1)
+        if track_id >= 0xFFFFFFFF:
+            raise UnsupportedLayout("No free track ID")
+        trak = build_text_trak(
+            samples, chunk_offset, track_id, movie_timescale, (creation, modification), _video_size(f, moov),
+        )
+
+        # Next track ID, and the movie duration if the subtitles run past the end
+        mvhd_data[-4:] = struct.pack(">I", track_id + 1)
+        text_duration = sum(duration for duration, _ in samples) * movie_timescale // TIMESCALE
+        if text_duration > movie_duration:
+            if version == 1:
+                mvhd_data[24:32] = struct.pack(">Q", text_duration)
+            elif text_duration <= 0xFFFFFFFF:
+                mvhd_data[16:20] = struct.pack(">I", text_duration)
+
+        # Rebuilt moov: original children with the patched mvhd and the new trak after the last one
+        children = list(iter_boxes(f, moov.payload_offset, moov.end))
+        if sum(child.size for child in children) != moov.payload_size:
+            raise UnsupportedLayout("Unreadable boxes inside 'moov'")
+        last_trak = max((i for i, child in enumerate(children) if child.type == b"trak"), default=0)
+        parts = []
+        for i, child in enumerate(children):
+            f.seek(child.offset)
+            if child.offset == mvhd.offset:
+                parts.append(f.read(child.header_size) + bytes(mvhd_data))
+            else:
+                parts.append(f.read(child.size))
+            if i == last_trak:
+                parts.append(trak)
+
+        return mp4_edit.write(f, layout, b"".join(parts), mdat)
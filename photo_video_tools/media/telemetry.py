@@ -0,0 +1,189 @@
+"""Columnar cache of DJI SRT telemetry in NumPy arrays.
+
+Each SRT is parsed once into one array per field and saved as an uncompressed `.npz`.
+The cache records the size, mtime and BLAKE2b hash of the SRT it came from; it is reused
+while size and mtime match, or while the hash matches (e.g. after the SRT was copied).
+Cached arrays are memory-mapped straight out of the `.npz`, so lookups like the first fix,
+the median position or the bounding box are array operations instead of text parsing.
+
+Requires NumPy.
+"""
+
+import hashlib
+import os
+import struct
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from photo_video_tools.media import dji_srt
+
+CACHE_SUFFIX = ".telemetry.npz"
+CACHE_VERSION = 1
+
+# Columns stored per frame; missing values are NaN
+FLOAT_COLUMNS = ("latitude", "longitude", "abs_alt", "rel_alt", "iso", "shutter", "fnum", "ev", "focal_len")
+FRAME_COLUMNS = FLOAT_COLUMNS + ("start_ms", "timestamp_us")
+
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+
+
+def _hash_file(path: Path) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def parse_srt(srt_path: Path) -> dict[str, np.ndarray]:
+    """Parse an SRT into columns; arrays grow in chunks so the text is never held in memory."""
+    capacity = 4096
+    count = 0
+    columns = {name: np.full(capacity, np.nan) for name in FLOAT_COLUMNS}
+    start_ms = np.zeros(capacity, dtype=np.int64)
+    # Wall-clock time of the frame as microseconds since 1970-01-01 (naive, as written by the drone)
+    timestamp_us = np.zeros(capacity, dtype=np.int64)
+
+    with open(srt_path, encoding="utf-8", errors="replace") as f:
+        for cue in dji_srt.iter_cues(f):
+            if count == capacity:
+                capacity *= 2
+                for name in FLOAT_COLUMNS:
+                    grown = np.full(capacity, np.nan)
+                    grown[:count] = columns[name][:count]
+                    columns[name] = grown
+                start_ms = np.resize(start_ms, capacity)
+                timestamp_us = np.resize(timestamp_us, capacity)
+            for name in FLOAT_COLUMNS:
+                value = cue.fields.get(name)
+                if value is not None:
+                    columns[name][count] = value
+            start_ms[count] = cue.start_ms
+            timestamp_us[count] = (
+                int((cue.timestamp - _NAIVE_EPOCH).total_seconds() * 1_000_000) if cue.timestamp is not None else 0
+            )
+            count += 1
+
+    arrays = {name: columns[name][:count].copy() for name in FLOAT_COLUMNS}
+    arrays["start_ms"] = start_ms[:count].copy()
+    arrays["timestamp_us"] = timestamp_us[:count].copy()
+    return arrays
+
+
+def _mmap_npz(path: Path) -> dict[str, np.ndarray]:
+    """
+    Memory-map the members of an uncompressed `.npz`.
+
+    `np.load` ignores `mmap_mode` for archives, so locate each stored `.npy` member
+    in the ZIP and map its data directly.
+    """
+    arrays: dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED or not info.filename.endswith(".npy"):
+                raise ValueError(f"Cannot memory-map {info.filename} in {path}")
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject:
+                raise ValueError(f"Cannot memory-map {info.filename} in {path}")
+            if len(shape) == 0 or 0 in shape:
+                # Scalars and empty arrays can't be mapped; they are tiny anyway
+                count = int(np.prod(shape))
+                arrays[name] = np.frombuffer(f.read(dtype.itemsize * count), dtype=dtype, count=count).reshape(shape)
+                continue
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return arrays
+
+
+class Telemetry:
+    """Per-frame telemetry of one flight as NumPy arrays."""
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.arrays = arrays
+
+    def __len__(self) -> int:
+        return len(self.arrays["start_ms"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def valid_fix_mask(self) -> np.ndarray:
+        latitude, longitude = self.arrays["latitude"], self.arrays["longitude"]
+        # Drones report 0/0 until they have a GPS lock
+        return np.isfinite(latitude) & np.isfinite(longitude) & ((latitude != 0) | (longitude != 0))
+
+    def first_fix(self) -> tuple[float, float, float] | None:
+        """Latitude, longitude and absolute altitude of the first frame with a GPS fix."""
+        indices = np.flatnonzero(self.valid_fix_mask())
+        if len(indices) == 0:
+            return None
+        i = indices[0]
+        altitude = float(self.arrays["abs_alt"][i])
+        return float(self.arrays["latitude"][i]), float(self.arrays["longitude"][i]), altitude if np.isfinite(altitude) else 0.0
+
+    def median_position(self) -> tuple[float, float] | None:
+        mask = self.valid_fix_mask()
+        if not mask.any():
+            return None
+        return float(np.median(self.arrays["latitude"][mask])), float(np.median(self.arrays["longitude"][mask]))
+
+    def bounding_box(self) -> tuple[float, float, float, float] | None:
+        """(min latitude, min longitude, max latitude, max longitude) of all fixes."""
+        mask = self.valid_fix_mask()
+        if not mask.any():
+            return None
+        latitude, longitude = self.arrays["latitude"][mask], self.arrays["longitude"][mask]
+        return float(latitude.min()), float(longitude.min()), float(latitude.max()), float(longitude.max())
+
+    def track(self) -> dict[str, np.ndarray]:
+        """Columns of all frames with a GPS fix, e.g. for exporting the flight path."""
+        mask = self.valid_fix_mask()
+        return {name: np.asarray(self.arrays[name])[mask] for name in FRAME_COLUMNS}
+
+
+def cache_path(srt_path: Path, cache_dir: Path) -> Path:
+    return cache_dir / f"{srt_path.stem}{CACHE_SUFFIX}"
+
+
+def load_telemetry(srt_path: Path, cache_dir: Path) -> Telemetry:
+    """Return the telemetry of an SRT, parsing it only if no valid cache exists in `cache_dir`."""
+    stat = srt_path.stat()
+    path = cache_path(srt_path, cache_dir)
+
+    if path.exists():
+        try:
+            arrays = _mmap_npz(path)
+            valid = int(arrays["cache_version"]) == CACHE_VERSION and int(arrays["source_size"]) == stat.st_size
+            if valid and int(arrays["source_mtime_ns"]) != stat.st_mtime_ns:
+                valid = bytes(arrays["source_hash"]).decode() == _hash_file(srt_path)
+            if valid:
+                return Telemetry(arrays)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            pass
+
+    arrays = parse_srt(srt_path)
+    metadata = {
+        "cache_version": np.array(CACHE_VERSION),
+        "source_size": np.array(stat.st_size, dtype=np.int64),
+        "source_mtime_ns": np.array(stat.st_mtime_ns, dtype=np.int64),
+        "source_hash": np.frombuffer(_hash_file(srt_path).encode(), dtype=np.uint8),
+    }
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.{os.getpid()}.partial.npz")
+    np.savez(temp, **arrays, **metadata)
+    os.replace(temp, path)
+    return Telemetry(_mmap_npz(path))
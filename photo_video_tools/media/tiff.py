@@ -0,0 +1,285 @@
+"""Minimal TIFF/EXIF IFD reader.
+
+Used for TIFF-based raw formats (DNG, ARW, NEF, ORF, RW2) and for the TIFF streams
+embedded in JPEG APP1 segments, CR3 `CMT` boxes and HEIC `Exif` items. Only the
+requested IFD entries are read; image data is never touched.
+"""
+
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO
+
+# Tags
+TAG_RW2_JPEG_FROM_RAW = 0x002E
+TAG_NEW_SUBFILE_TYPE = 0x00FE
+TAG_COMPRESSION = 0x0103
+TAG_STRIP_OFFSETS = 0x0111
+TAG_STRIP_BYTE_COUNTS = 0x0117
+TAG_DATETIME = 0x0132
+TAG_SUBIFDS = 0x014A
+TAG_JPEG_OFFSET = 0x0201
+TAG_JPEG_LENGTH = 0x0202
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+
+# Field type -> size in bytes of one value
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+TYPE_FORMATS = {1: "B", 3: "H", 4: "I", 6: "b", 8: "h", 9: "i", 13: "I"}
+
+# Olympus ORF and Panasonic RW2 replace the TIFF magic number 42
+TIFF_MAGIC_NUMBERS = {42, 0x4F52, 0x5352, 0x55}
+# Largest value read from a file; longer ones only occur in corrupt IFDs
+MAX_VALUE_SIZE = 1024 * 1024
+
+# Tags of the GPS IFD
+GPS_LATITUDE_REF = 0x0001
+GPS_LATITUDE = 0x0002
+GPS_LONGITUDE_REF = 0x0003
+GPS_LONGITUDE = 0x0004
+
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# Compression values of JPEG-compressed image data; DNG also uses 7 for lossless raw data
+COMPRESSION_OLD_JPEG = 6
+COMPRESSION_JPEG = 7
+
+
+@dataclass
+class IfdEntry:
+    tag: int
+    type: int
+    count: int
+    # Raw 4 byte value field: the value itself if it fits, otherwise an offset
+    value_field: bytes
+
+
+class TiffReader:
+    """Reads IFDs of a TIFF stream starting at `base` in a file."""
+
+    def __init__(self, f: BinaryIO, base: int = 0):
+        self.f = f
+        self.base = base
+        f.seek(base)
+        header = f.read(8)
+        if len(header) < 8 or header[:2] not in (b"II", b"MM"):
+            raise ValueError("Not a TIFF stream")
+        self.endian = "<" if header[:2] == b"II" else ">"
+        magic, self.first_ifd = struct.unpack(self.endian + "HI", header[2:8])
+        if magic not in TIFF_MAGIC_NUMBERS:
+            raise ValueError("Not a TIFF stream")
+
+    def read_ifd(self, offset: int) -> tuple[dict[int, IfdEntry], int]:
+        """Read the IFD at `offset` (relative to base); returns its entries and the next IFD offset."""
+        self.f.seek(self.base + offset)
+        raw_count = self.f.read(2)
+        if len(raw_count) < 2:
+            return {}, 0
+        (count,) = struct.unpack(self.endian + "H", raw_count)
+        data = self.f.read(count * 12 + 4)
+        entries: dict[int, IfdEntry] = {}
+        for i in range(min(count, len(data) // 12)):
+            tag, field_type, value_count = struct.unpack(self.endian + "HHI", data[i * 12:i * 12 + 8])
+            entries[tag] = IfdEntry(tag, field_type, value_count, data[i * 12 + 8:i * 12 + 12])
+        next_ifd = 0
+        if len(data) >= count * 12 + 4:
+            (next_ifd,) = struct.unpack(self.endian + "I", data[count * 12:count * 12 + 4])
+        return entries, next_ifd
+
+    def value_bytes(self, entry: IfdEntry) -> bytes:
+        size = TYPE_SIZES.get(entry.type, 1) * entry.count
+        if size <= 4:
+            return entry.value_field[:size]
+        if size > MAX_VALUE_SIZE:
+            raise ValueError(f"Value of tag {entry.tag:#06x} too large ({size} bytes)")
+        (offset,) = struct.unpack(self.endian + "I", entry.value_field)
+        self.f.seek(self.base + offset)
+        return self.f.read(size)
+
+    def ints(self, entry: IfdEntry) -> list[int]:
+        fmt = TYPE_FORMATS.get(entry.type)
+        if fmt is None:
+            return []
+        data = self.value_bytes(entry)
+        count = len(data) // struct.calcsize(fmt)
+        return list(struct.unpack(f"{self.endian}{count}{fmt}", data[:count * struct.calcsize(fmt)]))
+
+    def rationals(self, entry: IfdEntry) -> list[float]:
+        if entry.type not in (5, 10):
+            return []
+        data = self.value_bytes(entry)
+        count = len(data) // 8
+        fmt = "I" if entry.type == 5 else "i"
+        values = struct.unpack(f"{self.endian}{count * 2}{fmt}", data[:count * 8])
+        return [
+            numerator / denominator if denominator else 0.0
+            for numerator, denominator in zip(values[0::2], values[1::2])
+        ]
+
+    def string(self, entry: IfdEntry) -> str:
+        return self.value_bytes(entry).split(b"\0", 1)[0].decode("ascii", errors="replace").strip()
+
+    def iter_ifds(self, offset: int | None = None, limit: int = 16):
+        """Yield the entries of an IFD chain (IFD0, IFD1, ...)."""
+        offset = self.first_ifd if offset is None else offset
+        seen = set()
+        while offset and offset not in seen and len(seen) < limit:
+            seen.add(offset)
+            entries, offset = self.read_ifd(offset)
+            yield entries
+
+
+def parse_exif_datetime(value: str) -> datetime | None:
+    try:
+        return datetime.strptime(value.strip(), EXIF_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def read_datetime_original(f: BinaryIO, base: int = 0) -> datetime | None:
+    """
+    Read DateTimeOriginal from a TIFF stream.
+
+    Looks in IFD0 (where CR3 `CMT2` streams keep the EXIF tags) and in the EXIF sub-IFD,
+    falling back to the IFD0 DateTime.
+    """
+    try:
+        reader = TiffReader(f, base)
+        ifd0, _ = reader.read_ifd(reader.first_ifd)
+        entry = ifd0.get(TAG_DATETIME_ORIGINAL)
+        if entry is None and TAG_EXIF_IFD in ifd0:
+            exif_offsets = reader.ints(ifd0[TAG_EXIF_IFD])
+            if exif_offsets:
+                exif_ifd, _ = reader.read_ifd(exif_offsets[0])
+                entry = exif_ifd.get(TAG_DATETIME_ORIGINAL)
+        if entry is None:
+            entry = ifd0.get(TAG_DATETIME)
+        if entry is None:
+            return None
+        return parse_exif_datetime(reader.string(entry))
+    except (ValueError, struct.error):
+        return None
+
+
+def _gps_coordinate(reader: TiffReader, gps: dict[int, IfdEntry], value_tag: int, ref_tag: int) -> float | None:
+    if value_tag not in gps:
+        return None
+    parts = reader.rationals(gps[value_tag])
+    if not parts:
+        return None
+    degrees, minutes, seconds = (parts + [0.0, 0.0])[:3]
+    value = degrees + minutes / 60 + seconds / 3600
+    ref = reader.string(gps[ref_tag]).upper() if ref_tag in gps else ""
+    return -value if ref in ("S", "W") else value
+
+
+def read_gps_position(f: BinaryIO, base: int = 0, gps_ifd_first: bool = False) -> tuple[float, float] | None:
+    """
+    Read the GPS latitude and longitude (in signed degrees) from a TIFF stream.
+
+    The GPS IFD is found via IFD0, or is IFD0 itself if `gps_ifd_first` is set
+    (as in the CR3 `CMT4` stream).
+    """
+    try:
+        reader = TiffReader(f, base)
+        ifd0, _ = reader.read_ifd(reader.first_ifd)
+        if gps_ifd_first:
+            gps = ifd0
+        else:
+            if TAG_GPS_IFD not in ifd0:
+                return None
+            gps_offsets = reader.ints(ifd0[TAG_GPS_IFD])
+            if not gps_offsets:
+                return None
+            gps, _ = reader.read_ifd(gps_offsets[0])
+        latitude = _gps_coordinate(reader, gps, GPS_LATITUDE, GPS_LATITUDE_REF)
+        longitude = _gps_coordinate(reader, gps, GPS_LONGITUDE, GPS_LONGITUDE_REF)
+    except (ValueError, struct.error):
+        return None
+    if latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+        return None
+    return latitude, longitude
+
+
+def find_jpeg_exif(f: BinaryIO, limit: int = 256 * 1024) -> int | None:
+    """Return the offset of the TIFF stream in a JPEG's APP1 Exif segment."""
+    f.seek(0)
+    if f.read(2) != b"\xff\xd8":
+        return None
+    offset = 2
+    while offset < limit:
+        f.seek(offset)
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        segment_type = marker[1]
+        if segment_type in (0xD9, 0xDA):
+            # End of image or start of scan: metadata segments come before this
+            return None
+        (length,) = struct.unpack(">H", marker[2:4])
+        if segment_type == 0xE1 and f.read(6) == b"Exif\0\0":
+            return offset + 10
+        offset += 2 + length
+    return None
+
+
+def _jpeg_candidates(reader: TiffReader, entries: dict[int, IfdEntry]) -> list[tuple[int, int]]:
+    """(offset, length) pairs relative to base of the JPEG streams referenced by one IFD."""
+    candidates = []
+    if TAG_JPEG_OFFSET in entries and TAG_JPEG_LENGTH in entries:
+        offsets, lengths = reader.ints(entries[TAG_JPEG_OFFSET]), reader.ints(entries[TAG_JPEG_LENGTH])
+        if offsets and lengths:
+            candidates.append((offsets[0], lengths[0]))
+
+    compression = reader.ints(entries[TAG_COMPRESSION]) if TAG_COMPRESSION in entries else []
+    subfile_type = reader.ints(entries[TAG_NEW_SUBFILE_TYPE]) if TAG_NEW_SUBFILE_TYPE in entries else [0]
+    # Only reduced-resolution images: a full-resolution JPEG strip in a raw is the (lossless) raw data
+    if (
+        compression and compression[0] in (COMPRESSION_OLD_JPEG, COMPRESSION_JPEG)
+        and subfile_type and subfile_type[0] & 1
+        and TAG_STRIP_OFFSETS in entries and TAG_STRIP_BYTE_COUNTS in entries
+    ):
+        offsets, lengths = reader.ints(entries[TAG_STRIP_OFFSETS]), reader.ints(entries[TAG_STRIP_BYTE_COUNTS])
+        if len(offsets) == 1 and len(lengths) == 1:
+            candidates.append((offsets[0], lengths[0]))
+
+    # Panasonic RW2 stores the whole preview JPEG as the value of a tag in IFD0
+    entry = entries.get(TAG_RW2_JPEG_FROM_RAW)
+    if entry is not None and entry.count > 4:
+        (offset,) = struct.unpack(reader.endian + "I", entry.value_field)
+        candidates.append((offset, entry.count))
+    return candidates
+
+
+def find_largest_jpeg(f: BinaryIO, base: int = 0) -> tuple[int, int] | None:
+    """
+    Locate the largest embedded JPEG preview of a TIFF-based raw.
+
+    Searches the IFD chain and the SubIFDs (one level deep, where DNG and NEF keep
+    their full-size previews). Returns the absolute offset and length of the JPEG,
+    or None if there is none.
+    """
+    try:
+        reader = TiffReader(f, base)
+        ifds = list(reader.iter_ifds())
+        for entries in list(ifds):
+            if TAG_SUBIFDS in entries:
+                for offset in reader.ints(entries[TAG_SUBIFDS])[:8]:
+                    ifds.append(reader.read_ifd(offset)[0])
+
+        candidates = []
+        for entries in ifds:
+            candidates.extend(_jpeg_candidates(reader, entries))
+    except (ValueError, struct.error):
+        return None
+
+    best = None
+    for offset, length in candidates:
+        if best is not None and length <= best[1]:
+            continue
+        # Check the SOI marker, so stale or bogus offsets are never copied
+        f.seek(base + offset)
+        if length > 2 and f.read(2) == b"\xff\xd8":
+            best = (base + offset, length)
+    return best
@@ -0,0 +1,133 @@
+"""GPS track simplification and GPX export.
+
+A 30-minute flight recorded at 60 fps has over 100k positions, most of them on nearly
+straight lines. Douglas-Peucker keeps only the points that deviate more than a tolerance
+from the simplified path; distances are computed with NumPy for a whole segment at once.
+
+Requires NumPy.
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from photo_video_tools.geo.timezones import TimezoneIndex
+
+EARTH_RADIUS_M = 6371008.8
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+
+
+def project_to_meters(latitude: np.ndarray, longitude: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Equirectangular projection around the track's mean latitude; accurate enough for a single flight."""
+    reference = np.radians(np.mean(latitude))
+    x = np.radians(longitude - longitude[0]) * np.cos(reference) * EARTH_RADIUS_M
+    y = np.radians(latitude - latitude[0]) * EARTH_RADIUS_M
+    return x, y
+
+
+def simplify(x: np.ndarray, y: np.ndarray, tolerance: float, z: np.ndarray | None = None) -> np.ndarray:
+    """
+    Douglas-Peucker simplification.
+
+    Returns the sorted indices of the points to keep (always including the first and last).
+    `z` (e.g. altitude in meters) is included in the distance if given.
+    """
+    count = len(x)
+    if count <= 2:
+        return np.arange(count)
+    points = np.column_stack([x, y] if z is None else [x, y, np.nan_to_num(z)])
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[start + 1:end]
+        a, b = points[start], points[end]
+        direction = b - a
+        length_sq = float(direction @ direction)
+        if length_sq == 0.0:
+            distances = np.linalg.norm(segment - a, axis=1)
+        else:
+            # Distance of every inner point to the segment from a to b; clamping to the
+            # ends keeps points beyond them, e.g. where the drone turned around
+            t = np.clip((segment - a) @ direction / length_sq, 0.0, 1.0)
+            distances = np.linalg.norm(segment - (a + np.outer(t, direction)), axis=1)
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def simplify_track(track: dict[str, np.ndarray], tolerance_m: float) -> np.ndarray:
+    """Indices of the points of a telemetry track to keep with a tolerance in meters."""
+    latitude, longitude = track["latitude"], track["longitude"]
+    if len(latitude) == 0:
+        return np.arange(0)
+    x, y = project_to_meters(latitude, longitude)
+    altitude = track.get("abs_alt")
+    if altitude is None or not np.isfinite(altitude).any():
+        return simplify(x, y, tolerance_m)
+    return simplify(x, y, tolerance_m, altitude - np.nanmin(altitude))
+
+
+def start_utc_offset(track: dict[str, np.ndarray], zones: TimezoneIndex) -> timedelta:
+    """
+    UTC offset where and when a track starts.
+
+    Drones record local wall-clock time without a zone; the zone is looked up at the first position.
+    """
+    if len(track["latitude"]) == 0:
+        return timedelta(0)
+    latitude, longitude = float(track["latitude"][0]), float(track["longitude"][0])
+    zone = zones.zone_at(latitude, longitude)
+    start = datetime.now()
+    if "timestamp_us" in track:
+        start = _NAIVE_EPOCH + timedelta(microseconds=int(track["timestamp_us"][0]))
+    return start.replace(tzinfo=ZoneInfo(zone)).utcoffset() or timedelta(0)
+
+
+def write_gpx(
+    path: Path, track: dict[str, np.ndarray], indices: np.ndarray, name: str, utc_offset: timedelta | None = None,
+) -> None:
+    """
+    Write the selected points of a track as a GPX 1.1 file.
+
+    `utc_offset` is that of the track's local times, which are then written in UTC. Without
+    it the local times are written without a zone designator.
+    """
+    latitude, longitude = track["latitude"][indices], track["longitude"][indices]
+    altitude = track["abs_alt"][indices] if "abs_alt" in track else np.full(len(indices), np.nan)
+    timestamps = track["timestamp_us"][indices] if "timestamp_us" in track else np.zeros(len(indices), dtype=np.int64)
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<gpx version="1.1" creator="photo_video_tools" xmlns="http://www.topografix.com/GPX/1/1">',
+        f"  <trk><name>{escape(name)}</name><trkseg>",
+    ]
+    for lat, lon, ele, timestamp in zip(latitude, longitude, altitude, timestamps):
+        point = f'    <trkpt lat="{lat:.7f}" lon="{lon:.7f}">'
+        if np.isfinite(ele):
+            point += f"<ele>{ele:.2f}</ele>"
+        if timestamp:
+            when = _NAIVE_EPOCH + timedelta(microseconds=int(timestamp))
+            if utc_offset is None:
+                point += f"<time>{when.isoformat(timespec='milliseconds')}</time>"
+            else:
+                # GPX times are UTC
+                point += f"<time>{(when - utc_offset).isoformat(timespec='milliseconds')}Z</time>"
+        lines.append(point + "</trkpt>")
+    lines.append("  </trkseg></trk>")
+    lines.append("</gpx>")
+
+    temp = path.with_name(f".{path.name}.partial")
+    temp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    temp.replace(path)
@@ -0,0 +1,196 @@
+"""Compile an ordered list of metadata edits into as few exiftool writes per file as possible.
+
+Running "shift time", then "add timezone", then "copy geotags" as separate tools reads and
+writes every photo three times. The steps are folded into the arguments of as few exiftool
+commands as possible instead, with the same result as applying them one after another:
+
+    shift=<sign><hours>:<minutes>     shift the date tags, and the offset tags along if it is
+                                      a time zone change (a multiple of 15 minutes)
+    timezone=<sign><hours>:<minutes>  set the offset tags
+    geotag                            copy the tags of the XMP sidecar `<name>.xmp` like the
+                                      geotag tool: location tags, plus the EXIF tags that
+                                      xmp2exif.args maps from XMP (including dates and offsets)
+
+Shifts add up; a timezone step sets the offsets to its value plus the time zone changes
+after it, so it makes the shifts before it irrelevant for the offsets. All shift and
+timezone steps between two geotag steps become one write. A geotag step is a write of its
+own with the geotag tool's arguments: the dates and offsets it copies depend on what each
+sidecar holds, so they can't be folded with the steps around it.
+
+The tag arguments of the standalone tools are defined here too, so the tools and the
+pipeline apply the same edits (e.g. the same rule for when offsets move with a shift).
+
+Used on the host and inside the containers, so it only depends on the standard library.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+
+SHIFT = "shift"
+TIMEZONE = "timezone"
+GEOTAG = "geotag"
+OPERATIONS = (SHIFT, TIMEZONE, GEOTAG)
+
+DATE_TAGS = ["DateTimeOriginal", "CreateDate", "ModifyDate", "SonyDateTime"]
+OFFSET_TAGS = ["OffsetTime", "OffsetTimeOriginal", "OffsetTimeDigitized"]
+# Maps XMP to EXIF tags when copying a sidecar; vendored into the exiftool image
+XMP2EXIF_ARGS_FILE = "/exiftool_args_file/xmp2exif.args"
+
+
+@dataclass
+class Step:
+    operation: str
+    # Shift or offset of `shift` and `timezone` steps
+    amount: timedelta = timedelta(0)
+
+    def __str__(self) -> str:
+        if self.operation == GEOTAG:
+            return GEOTAG
+        return f"{self.operation}={format_amount(self.amount)}"
+
+
+@dataclass
+class Write:
+    """One exiftool write of the compiled steps."""
+
+    # Arguments applied to every file
+    arguments: list[str]
+    # Whether this write copies each file's XMP sidecar with `geotag_arguments` instead
+    geotag: bool = False
+
+    def describe(self) -> str:
+        if self.geotag:
+            return f"exiftool {' '.join(geotag_arguments('<name>.xmp'))}"
+        return f"exiftool {' '.join(self.arguments)}" if self.arguments else "copy unchanged"
+
+
+@dataclass
+class CompiledSteps:
+    # The writes applied one after another to each file
+    writes: list[Write]
+
+    @property
+    def geotag(self) -> bool:
+        return any(write.geotag for write in self.writes)
+
+    def describe(self) -> list[str]:
+        return [write.describe() for write in self.writes]
+
+
+def parse_amount(value: str) -> timedelta:
+    """Parse '<sign><hours>:<minutes>' (e.g. '-9:00', '+5:30') into a timedelta."""
+    value = value.strip()
+    sign = -1 if value.startswith("-") else 1
+    hours, separator, minutes = value.lstrip("+-").partition(":")
+    if not separator or not hours.isdigit() or not minutes.isdigit() or not 0 <= int(minutes) < 60:
+        raise ValueError(f"Invalid amount '{value}', expected <sign><hours>:<minutes>")
+    return sign * timedelta(hours=int(hours), minutes=int(minutes))
+
+
+def format_amount(amount: timedelta) -> str:
+    """Format a whole number of minutes as '+02:00' or '-09:30'."""
+    sign = "-" if amount < timedelta(0) else "+"
+    hours, minutes = divmod(int(abs(amount).total_seconds()) // 60, 60)
+    return f"{sign}{hours:02d}:{minutes:02d}"
+
+
+def parse_steps(args: list[str]) -> list[Step]:
+    """Parse script arguments such as ['shift=-9:00', 'timezone=+02:00', 'geotag']."""
+    steps = []
+    for arg in args:
+        operation, separator, value = arg.partition("=")
+        if operation not in OPERATIONS or (operation == GEOTAG) == bool(separator):
+            raise ValueError(f"Invalid step '{arg}'")
+        steps.append(Step(operation, parse_amount(value)) if separator else Step(operation))
+    if not steps:
+        raise ValueError("No steps given")
+    return steps
+
+
+def format_shift(shift: timedelta) -> str:
+    """Format a shift as exiftool takes it, e.g. '-9:00' or '+0:03:27'."""
+    sign = "-" if shift < timedelta(0) else "+"
+    total = int(abs(shift).total_seconds())
+    hours, rest = divmod(total, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{sign}{hours}:{minutes:02d}:{seconds:02d}" if seconds else f"{sign}{hours}:{minutes:02d}"
+
+
+def shifts_offset(shift: timedelta) -> bool:
+    """Whether a shift is a time zone change (whole quarter hours), so the offsets move along."""
+    # Clock drift (seconds, odd minutes) is not a time zone change, so the offsets stay as they are
+    return shift.total_seconds() % (15 * 60) == 0
+
+
+def shift_arguments(shift: timedelta) -> list[str]:
+    """exiftool arguments of the shift tool: the date tags, and the offset tags if the shift is a time zone change."""
+    value = format_shift(shift)
+    operator, amount = value[0], value[1:]
+    arguments = [f"-{tag}{operator}={amount}" for tag in DATE_TAGS]
+    if shifts_offset(shift):
+        # Existing offsets move along, missing ones stay missing
+        arguments += [f"-{tag}+={value}" for tag in OFFSET_TAGS]
+    return arguments
+
+
+def timezone_arguments(offset: str) -> list[str]:
+    """exiftool arguments of the timezone tool setting the offset tags, e.g. to '+2:00'."""
+    return [f"-{tag}={offset}" for tag in OFFSET_TAGS]
+
+
+def geotag_arguments(sidecar: str) -> list[str]:
+    """exiftool arguments of the geotag tool copying from an XMP sidecar (a path or a name format like '%d%f.xmp')."""
+    return [
+        "-tagsfromfile", sidecar,
+        "-location:all",  # copy only location-related tags from XMP
+        "-@", XMP2EXIF_ARGS_FILE,
+        "--Orientation",  # after args file: ignore orientation from XMP
+    ]
+
+
+def _fold(steps: list[Step]) -> list[str]:
+    """The arguments of one exiftool write applying shift and timezone steps."""
+    total_shift = timedelta(0)
+    # The value set by the last timezone step, if any, and what the shifts since move the offsets by
+    offset: timedelta | None = None
+    offset_shift = timedelta(0)
+    for step in steps:
+        if step.operation == SHIFT:
+            total_shift += step.amount
+            if shifts_offset(step.amount):
+                offset_shift += step.amount
+        elif step.operation == TIMEZONE:
+            offset, offset_shift = step.amount, timedelta(0)
+
+    arguments = []
+    if total_shift:
+        # exiftool shifts with the sign as operator: '-DateTimeOriginal-=9:00'
+        shift = format_amount(total_shift)
+        arguments += [f"-{tag}{shift[0]}={shift[1:]}" for tag in DATE_TAGS]
+
+    if offset is not None:
+        arguments += [f"-{tag}={format_amount(offset + offset_shift)}" for tag in OFFSET_TAGS]
+    elif offset_shift:
+        # Like the shift tool: existing offsets move along, missing ones stay missing
+        arguments += [f"-{tag}+={format_amount(offset_shift)}" for tag in OFFSET_TAGS]
+    return arguments
+
+
+def compile_steps(steps: list[Step]) -> CompiledSteps:
+    """Fold the steps into the exiftool writes applied to each file, see the module docstring."""
+    writes: list[Write] = []
+    pending: list[Step] = []
+    for step in steps:
+        if step.operation != GEOTAG:
+            pending.append(step)
+            continue
+        if arguments := _fold(pending):
+            writes.append(Write(arguments))
+        pending = []
+        # Copying the same sidecar twice in a row gives the same tags as copying it once
+        if not writes or not writes[-1].geotag:
+            writes.append(Write([], geotag=True))
+    if arguments := _fold(pending):
+        writes.append(Write(arguments))
+    # Without any edits the files are still copied into the output folder
+    return CompiledSteps(writes or [Write([])])
@@ -0,0 +1,251 @@
+"""Split one tool run across several processes or machines.
+
+    plan     list the inputs of a folder once and write them to a manifest
+    shard    split the manifest into N parts of about the same size in bytes
+    execute  run the tool over one part (on any machine that mounts the same folder)
+    merge    combine the journals of all parts into one result and a manifest of what is left
+
+Every part writes its own journal next to its manifest, so the parts need no coordination.
+Executing a part again only processes the inputs its journal doesn't list as done, and the
+"remaining" manifest written by `merge` can be sharded and executed like the original one.
+
+`local` shards a plan and executes the parts as separate local processes, e.g. to test a
+sharded run or to use more cores for a host tool.
+
+Usage:
+    python -m photo_video_tools.sharding shard <plan.jsonl> <parts>
+    python -m photo_video_tools.sharding execute <part.jsonl> [<folder as mounted on this machine>]
+    python -m photo_video_tools.sharding merge <plan.jsonl>
+    python -m photo_video_tools.sharding local <plan.jsonl> <parts>
+Plans are written from the launcher (option "s").
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from photo_video_tools.docker_utils import prepare_container, run_command_async, run_jobs_concurrently, BatchJob
+from photo_video_tools.manifest import STATUS_OK, STATUS_SKIPPED, Manifest, read_journal
+from photo_video_tools.shared import ToolBase, ask_concurrency, select_directory_gui
+
+REPO_ROOT = Path(__file__).parent.parent
+# Plan, parts, journals and logs of a sharded run, inside the folder it processes
+RUN_DIR_NAME = ".sharded_run"
+DEFAULT_PARTS = 4
+# Outcomes that don't need another attempt
+DONE_STATUSES = {STATUS_OK, STATUS_SKIPPED}
+
+
+def tool_by_name(name: str) -> type[ToolBase]:
+    from photo_video_tools import tools
+
+    tool_class = getattr(tools, name, None)
+    if tool_class is None or not issubclass(tool_class, ToolBase):
+        raise ValueError(f"Unknown tool: {name}")
+    return tool_class
+
+
+def part_paths(plan_path: Path) -> list[Path]:
+    pattern = re.compile(rf"{re.escape(plan_path.stem)}\.part-\d+-of-\d+\.jsonl")
+    return sorted(path for path in plan_path.parent.iterdir() if pattern.fullmatch(path.name))
+
+
+def journal_path(part_path: Path) -> Path:
+    return part_path.with_name(f"{part_path.stem}.journal.jsonl")
+
+
+def plan(tool_class: type[ToolBase], work_dir: Path, script_args: list[str], plan_path: Path) -> Manifest:
+    """List the inputs of `work_dir` the way the tool would and write them to a manifest."""
+    return tool_class.write_manifest(work_dir, script_args, plan_path)
+
+
+def shard(plan_path: Path, parts: int) -> list[Path]:
+    """
+    Split a plan into `parts` manifests with about the same number of bytes each.
+
+    Largest inputs first, each into the currently smallest part; within a part the inputs
+    keep the plan's order.
+    """
+    manifest = Manifest.read(plan_path)
+    parts = max(1, min(parts, len(manifest.units)))
+    for old in part_paths(plan_path):
+        if journal_path(old).exists():
+            raise ValueError(
+                f"{old.name} was already executed; merge the plan and shard its remaining inputs instead"
+            )
+        old.unlink()
+
+    heap = [(0, i) for i in range(parts)]
+    assigned: list[list[int]] = [[] for _ in range(parts)]
+    for index in sorted(range(len(manifest.units)), key=lambda i: -manifest.sizes[i]):
+        total, part = heapq.heappop(heap)
+        assigned[part].append(index)
+        heapq.heappush(heap, (total + manifest.sizes[index], part))
+
+    paths = []
+    for part, indices in enumerate(assigned, start=1):
+        path = plan_path.with_name(f"{plan_path.stem}.part-{part:02d}-of-{parts:02d}.jsonl")
+        manifest.subset(sorted(indices)).write(path)
+        size = sum(manifest.sizes[i] for i in indices)
+        print(f"{path.name}: {len(indices)} inputs, {size / 1e9:.2f} GB")
+        paths.append(path)
+    return paths
+
+
+def execute(part_path: Path, work_dir: Path | None = None) -> int:
+    """Run the tool over the inputs of one part that its journal doesn't list as done."""
+    manifest = Manifest.read(part_path)
+    tool_class = tool_by_name(manifest.tool)
+    work_dir = work_dir if work_dir is not None else Path(manifest.root)
+    journal = journal_path(part_path)
+
+    done = {name for name, (status, _) in read_journal(journal).items() if status in DONE_STATUSES}
+    pending = [i for i, unit in enumerate(manifest.units) if not any(name in done for name in unit)]
+    if not pending:
+        print(f"{part_path.name}: all {len(manifest.units)} inputs are done")
+        return 0
+    print(f"{part_path.name}: {len(pending)} of {len(manifest.units)} inputs to process")
+
+    pending_path = part_path.with_name(f"{part_path.stem}.pending.jsonl")
+    manifest.subset(pending).write(pending_path)
+    try:
+        image = prepare_container(tool_class.container_name) if tool_class.container_name is not None else None
+        job = tool_class.shard_job(work_dir, manifest.params, image, pending_path, journal)
+        # Output goes straight to this process; `execute_locally` prefixes it with the part
+        job.label = ""
+        job.log_path = part_path.with_suffix(".log")
+        return asyncio.run(run_command_async(job))
+    finally:
+        pending_path.unlink(missing_ok=True)
+
+
+def merge(plan_path: Path) -> int:
+    """
+    Combine the journals of all parts of a plan.
+
+    Writes '<plan>.results.jsonl' (the plan's inputs with their outcome) and, if inputs failed
+    or were not processed yet, '<plan>.remaining.jsonl' to shard and execute again.
+    """
+    manifest = Manifest.read(plan_path)
+    outcomes: dict[str, tuple[str, str]] = {}
+    for part in part_paths(plan_path):
+        outcomes.update(read_journal(journal_path(part)))
+
+    counts: dict[str, int] = {}
+    remaining = []
+    results_path = plan_path.with_name(f"{plan_path.stem}.results.jsonl")
+    with open(results_path, "w", encoding="utf-8") as results:
+        for i, unit in enumerate(manifest.units):
+            # Tools record an outcome under any file of a unit, e.g. the MP4 of an SRT + MP4 pair
+            status, detail = next((outcomes[name] for name in unit if name in outcomes), ("not run", ""))
+            counts[status] = counts.get(status, 0) + 1
+            if status not in DONE_STATUSES:
+                remaining.append(i)
+            results.write(json.dumps({"inputs": unit, "status": status, "detail": detail}, ensure_ascii=False) + "\n")
+
+    for status, count in sorted(counts.items()):
+        print(f"{status}: {count}")
+    print(f"Results written to: {results_path}")
+
+    remaining_path = plan_path.with_name(f"{plan_path.stem}.remaining.jsonl")
+    remaining_path.unlink(missing_ok=True)
+    if remaining:
+        manifest.subset(remaining).write(remaining_path)
+        print(f"{len(remaining)} inputs left, written to: {remaining_path}")
+        return 1
+    return 0
+
+
+def execute_locally(plan_path: Path, paths: list[Path], max_concurrency: int | None = None) -> int:
+    """Execute parts of a plan as separate processes on this machine, then merge."""
+    jobs = [
+        BatchJob(
+            label=path.stem.rsplit(".", 1)[-1],
+            command=[sys.executable, "-m", "photo_video_tools.sharding", "execute", str(path)],
+            # The part's own log is written by `execute`
+            cwd=REPO_ROOT,
+        )
+        for path in paths
+    ]
+    asyncio.run(run_jobs_concurrently(jobs, max_concurrency or len(jobs)))
+    return merge(plan_path)
+
+
+def run_local(plan_path: Path, parts: int, max_concurrency: int | None = None) -> int:
+    """Shard a plan and execute all parts as separate processes on this machine, then merge."""
+    return execute_locally(plan_path, shard(plan_path, parts), max_concurrency)
+
+
+def run_interactive(tool_class: type[ToolBase]) -> int:
+    """Plan a sharded run of a tool from the launcher and optionally execute all parts locally."""
+    tool_class.announce()
+
+    work_dir = select_directory_gui(tool_class.directory_prompt)
+    if work_dir is None:
+        print("No directory selected. Abort.")
+        return 1
+
+    script_args = tool_class.ask_script_args()
+    if script_args is None:
+        return 1
+
+    run_dir = work_dir / RUN_DIR_NAME
+    run_dir.mkdir(exist_ok=True)
+    plan_path = run_dir / "plan.jsonl"
+    print("Listing inputs...")
+    manifest = plan(tool_class, work_dir, script_args, plan_path)
+    if not manifest.units:
+        print("No inputs found. Abort.")
+        return 0
+    print(f"Planned {len(manifest.units)} inputs, {sum(manifest.sizes) / 1e9:.2f} GB: {plan_path}")
+
+    while True:
+        answer = input(f"Number of parts [{DEFAULT_PARTS}]: ").strip() or str(DEFAULT_PARTS)
+        if answer.isdigit() and int(answer) >= 1:
+            break
+        print("Please enter a positive whole number.")
+    try:
+        paths = shard(plan_path, int(answer))
+    except ValueError as e:
+        print(e)
+        return 1
+
+    print()
+    print("Run each part on a machine that mounts this folder:")
+    for path in paths:
+        print(f"  python -m photo_video_tools.sharding execute \"{path}\" [<folder as mounted there>]")
+    print("Then combine the results:")
+    print(f"  python -m photo_video_tools.sharding merge \"{plan_path}\"")
+    print()
+
+    if input("Run all parts on this machine now? (y/N): ").strip().lower() not in ["yes", "y"]:
+        return 0
+    max_concurrency = ask_concurrency(default=min(len(paths), os.cpu_count() or 1))
+    return execute_locally(plan_path, paths, max_concurrency)
+
+
+if __name__ == "__main__":
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ("", [])
+    if command == "shard" and len(args) == 2:
+        try:
+            shard(Path(args[0]), int(args[1]))
+        except ValueError as e:
+            print(e)
+            raise SystemExit(1)
+        raise SystemExit(0)
+    if command == "execute" and len(args) in (1, 2):
+        raise SystemExit(execute(Path(args[0]), Path(args[1]) if len(args) == 2 else None))
+    if command == "merge" and len(args) == 1:
+        raise SystemExit(merge(Path(args[0])))
+    if command == "local" and len(args) == 2:
+        try:
+            raise SystemExit(run_local(Path(args[0]), int(args[1])))
+        except ValueError as e:
+            print(e)
+            raise SystemExit(1)
+    print(__doc__[__doc__.index("Usage:"):].rstrip())
+    raise SystemExit(1)
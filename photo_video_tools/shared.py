@@ -1,13 +1,40 @@
 """Shared base class and utilities for photo and video tools."""
 
+import asyncio
+import glob
+import os
+import tempfile
 from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog
 
-from photo_video_tools.docker_utils import run_container
+from photo_video_tools.concurrency import MAX_WORKERS_ENV, MIN_WORKERS_ENV
+from photo_video_tools.docker_utils import BatchJob, prepare_container, run_container, run_jobs_concurrently
+from photo_video_tools.manifest import JOURNAL_ENV, MANIFEST_ENV, Manifest
+
+BATCH_LOG_NAME = "batch_job.log"
+
+# The package is mounted into containers so their scripts can use the shared media modules
+PACKAGE_DIR = Path(__file__).parent
+CONTAINER_PACKAGE_ROOT = "/pkg"
+# Folder holding the manifest of the inputs (and the journal of a sharded run) inside the container
+CONTAINER_MANIFEST_DIR = "/manifest"
+MANIFEST_NAME = "inputs.jsonl"
+
 
 class ToolBase:
     name = ""
+    description = ""
+
+    # Container tools set these; tools running on the host leave them unset
+    directory_prompt = "Select folder containing image files"
+    container_name: str | None = None
+    container_dir: Path | None = None
+
+    # Files the tool processes, by lower-case extension; used to list its inputs on the host
+    input_extensions: tuple[str, ...] = ()
+    # Extensions of the file each input is paired with, in order of preference (e.g. the MP4 of an SRT)
+    paired_extensions: tuple[str, ...] = ()
 
     @classmethod
     def announce(cls):
@@ -17,20 +44,50 @@ class ToolBase:
         print()
 
     @classmethod
-    def run_default(cls, file_selection_prompt: str, container_dir: Path, container_name: str) -> int:
-        cls.announce()
+    def run(cls) -> int:
+        return cls.run_default()
 
-        work_dir = select_directory_gui(file_selection_prompt)
-        if work_dir is None:
-            print("No directory selected. Abort.")
-            return 1
+    @classmethod
+    def ask_script_args(cls) -> list[str] | None:
+        """Prompt for the arguments passed to the container script. Returns None to abort."""
+        return []
+
+    @classmethod
+    def container_invocation(
+        cls,
+        work_dir: Path,
+        script_args: list[str],
+        interactive: bool = True,
+        manifest_path: Path | None = None,
+    ) -> tuple[list[str], list[str]]:
+        """
+        Build the docker run options and the command executed inside the container for one directory.
 
+        With a manifest, the container script processes the inputs listed in it instead of
+        listing `/work` itself; every stat through a Docker Desktop bind mount is slow.
+        """
         docker_options = [
-            "-it", "--rm",
-            f"-v", f"{work_dir}:/work",
-            f"-v", f"{container_dir}:/app:ro",
+            "--rm",
+            "-v", f"{work_dir}:/work",
+            "-v", f"{cls.container_dir}:/app:ro",
+            "-v", f"{PACKAGE_DIR}:{CONTAINER_PACKAGE_ROOT}/photo_video_tools:ro",
+            "-e", f"PYTHONPATH={CONTAINER_PACKAGE_ROOT}",
             "-w", "/work",
         ]
+        # Forward the user's concurrency limits if set
+        for env_name in (MIN_WORKERS_ENV, MAX_WORKERS_ENV):
+            if env_name in os.environ:
+                docker_options += ["-e", env_name]
+        if interactive:
+            docker_options.insert(0, "-it")
+        else:
+            # Without a TTY Python would block-buffer its output, which hides progress in batch logs
+            docker_options += ["-e", "PYTHONUNBUFFERED=1"]
+        if manifest_path is not None:
+            docker_options += [
+                "-v", f"{manifest_path.parent}:{CONTAINER_MANIFEST_DIR}",
+                "-e", f"{MANIFEST_ENV}={CONTAINER_MANIFEST_DIR}/{manifest_path.name}",
+            ]
 
         command_and_args = [
             "sh", "-c",
@@ -39,12 +96,225 @@ class ToolBase:
                 ". /venv/bin/activate && "
                 "pip install --upgrade pip && "
                 "pip install --no-cache-dir -r /app/requirements.txt && "
-                f"python /app/container_script.py"
+                " ".join(["python", "/app/container_script.py", *script_args])
             ),
         ]
+        return docker_options, command_and_args
+
+    @classmethod
+    def run_default(cls) -> int:
+        cls.announce()
+
+        work_dir = select_directory_gui(cls.directory_prompt)
+        if work_dir is None:
+            print("No directory selected. Abort.")
+            return 1
+
+        script_args = cls.ask_script_args()
+        if script_args is None:
+            return 1
+
+        with tempfile.TemporaryDirectory(prefix="photo_video_tools-") as manifest_dir:
+            manifest_path = Path(manifest_dir) / MANIFEST_NAME
+            if not cls.write_manifest(work_dir, script_args, manifest_path).units:
+                print(f"No input files found in {work_dir}. Abort.")
+                return 0
+
+            docker_options, command_and_args = cls.container_invocation(
+                work_dir, script_args, manifest_path=manifest_path
+            )
+
+            print(f"Running container '{cls.container_name}'...")
+            return run_container(cls.container_name, docker_options, command_and_args)
+
+    @classmethod
+    def supports_batch(cls) -> bool:
+        return cls.container_name is not None
+
+    @classmethod
+    def scan_inputs(cls, work_dir: Path) -> list[list[Path]]:
+        """
+        The input units the tool would process in `work_dir`: single files, or pairs of a
+        file and its partner with the same name and one of the `paired_extensions`, in any case.
+        """
+        with os.scandir(work_dir) as entries:
+            files = {entry.name: Path(entry.path) for entry in entries if entry.is_file()}
+        # Partners are matched regardless of case, e.g. IMG_0001.xmp with IMG_0001.JPG
+        by_lower_name = {name.lower(): path for name, path in files.items()}
+        units = []
+        for name in sorted(files):
+            path = files[name]
+            if path.suffix.lower() not in cls.input_extensions:
+                continue
+            if not cls.paired_extensions:
+                units.append([path])
+                continue
+            partner = next(
+                (by_lower_name[f"{path.stem}{ext}".lower()] for ext in cls.paired_extensions
+                 if f"{path.stem}{ext}".lower() in by_lower_name),
+                None,
+            )
+            if partner is not None:
+                units.append([path, partner])
+        return units
+
+    @classmethod
+    def write_manifest(cls, work_dir: Path, script_args: list[str], path: Path) -> Manifest:
+        """List the inputs of `work_dir` natively on the host and write them with their sizes to a manifest."""
+        manifest = Manifest(cls.__name__, script_args, str(work_dir))
+        for unit in cls.scan_inputs(work_dir):
+            size = 0
+            for file in unit:
+                try:
+                    size += file.stat().st_size
+                except OSError:
+                    pass
+            manifest.add([file.relative_to(work_dir).as_posix() for file in unit], size)
+        manifest.write(path)
+        return manifest
+
+    @classmethod
+    def shard_job(cls, work_dir: Path, script_args: list[str], image: str | None, manifest_path: Path, journal_path: Path) -> BatchJob:
+        """Like `batch_job`, but processing only the inputs listed in a manifest and journaling their outcomes."""
+        if cls.container_name is None:
+            job = cls.batch_job(work_dir, script_args, image, manifest_path)
+            job.env = {**os.environ, MANIFEST_ENV: str(manifest_path), JOURNAL_ENV: str(journal_path)}
+            return job
 
-        print(f"Running container '{container_name}'...")
-        return run_container(container_name, docker_options, command_and_args)
+        docker_options, command_and_args = cls.container_invocation(
+            work_dir, script_args, interactive=False, manifest_path=manifest_path
+        )
+        # The journal is written next to the manifest
+        docker_options += ["-e", f"{JOURNAL_ENV}={CONTAINER_MANIFEST_DIR}/{journal_path.name}"]
+        return BatchJob(
+            label=manifest_path.stem,
+            command=["docker", "run"] + docker_options + [image] + command_and_args,
+        )
+
+    @classmethod
+    def batch_job(cls, work_dir: Path, script_args: list[str], image: str | None, manifest_path: Path | None = None) -> BatchJob:
+        """Describe the non-interactive command processing one directory (or the inputs of a manifest) of a batch run."""
+        docker_options, command_and_args = cls.container_invocation(
+            work_dir, script_args, interactive=False, manifest_path=manifest_path
+        )
+        return BatchJob(
+            label=work_dir.name,
+            command=["docker", "run"] + docker_options + [image] + command_and_args,
+            log_path=work_dir / BATCH_LOG_NAME,
+        )
+
+    @classmethod
+    def run_batch(cls) -> int:
+        """Run the tool over many directories at once with a limited number of concurrent jobs."""
+        cls.announce()
+
+        if not cls.supports_batch():
+            print("This tool does not support batch mode.")
+            return 1
+
+        work_dirs = ask_directories(cls.directory_prompt)
+        if not work_dirs:
+            print("No directories selected. Abort.")
+            return 1
+        print(f"Selected {len(work_dirs)} directories.")
+
+        script_args = cls.ask_script_args()
+        if script_args is None:
+            return 1
+
+        max_concurrency = ask_concurrency(default=min(4, os.cpu_count() or 1))
+
+        # Build and check the base image once instead of racing for it in every job
+        image = prepare_container(cls.container_name) if cls.container_name is not None else None
+
+        with tempfile.TemporaryDirectory(prefix="photo_video_tools-") as manifest_dir:
+            # The folders are listed here, one manifest each, before any job starts
+            jobs = []
+            for i, work_dir in enumerate(work_dirs):
+                manifest_path = Path(manifest_dir) / str(i) / MANIFEST_NAME
+                manifest_path.parent.mkdir()
+                cls.write_manifest(work_dir, script_args, manifest_path)
+                jobs.append(cls.batch_job(work_dir, script_args, image, manifest_path))
+            labels = [job.label for job in jobs]
+            for job, work_dir in zip(jobs, work_dirs):
+                if labels.count(job.label) > 1:
+                    job.label = str(work_dir)
+
+            print(f"Running {len(jobs)} jobs with up to {max_concurrency} in parallel...")
+            asyncio.run(run_jobs_concurrently(jobs, max_concurrency))
+
+        print_batch_summary(jobs)
+        return 0 if all(job.return_code == 0 for job in jobs) else 1
+
+
+def ask_directories(title: str) -> list[Path]:
+    """Ask for a list of directories as paths/glob patterns, or pick them one by one with the folder picker."""
+
+    user_input = input(
+        "Enter directories or glob patterns separated by ';' (e.g. D:/Trip/2024-*), "
+        "or leave empty to pick folders one by one: "
+    ).strip()
+    if user_input:
+        return parse_directories_input(user_input)
+
+    directories: list[Path] = []
+    while True:
+        selected = select_directory_gui(f"{title} ({len(directories)} selected, cancel to finish)")
+        if selected is None:
+            return directories
+        if selected not in directories:
+            directories.append(selected)
+
+
+def parse_directories_input(input_str: str) -> list[Path]:
+    """Expand a ';'-separated list of directory paths and glob patterns into existing directories."""
+
+    directories: list[Path] = []
+    for pattern in (part.strip().strip('"') for part in input_str.split(';')):
+        if not pattern:
+            continue
+        matches = sorted(glob.glob(os.path.expanduser(pattern))) or [pattern]
+        for match in matches:
+            path = Path(match)
+            if not path.is_dir():
+                print(f"Ignoring '{match}' (not a directory)")
+                continue
+            if path not in directories:
+                directories.append(path)
+    return directories
+
+
+def ask_concurrency(default: int) -> int:
+    """Prompt for the maximum number of concurrent jobs."""
+
+    while True:
+        user_input = input(f"Maximum number of concurrent jobs [{default}]: ").strip()
+        if not user_input:
+            return default
+        try:
+            value = int(user_input)
+        except ValueError:
+            value = 0
+        if value >= 1:
+            return value
+        print("Please enter a positive whole number.")
+
+
+def print_batch_summary(jobs: list[BatchJob]) -> None:
+    """Print an aggregated pass/fail table of a finished batch run."""
+
+    width = max(len("Directory"), *(len(job.label) for job in jobs))
+    print()
+    print(f"{'Directory':<{width}}  Result  Exit  Duration  Log")
+    print("-" * (width + 40))
+    for job in jobs:
+        result = "PASS" if job.return_code == 0 else "FAIL"
+        log = job.log_path if job.log_path is not None else "-"
+        print(f"{job.label:<{width}}  {result:<6}  {job.return_code:>4}  {job.duration:>7.1f}s  {log}")
+    passed = sum(1 for job in jobs if job.return_code == 0)
+    print("-" * (width + 40))
+    print(f"Passed: {passed}")
+    print(f"Failed: {len(jobs) - passed}")
 
 def select_directory_gui(title: str) -> Path | None:
     """Prompt the user for a directory using a Tk folder picker."""
@@ -59,6 +329,19 @@ def select_directory_gui(title: str) -> Path | None:
         return None
     return Path(selected)
 
+def select_file_gui(title: str, filetypes: list[tuple[str, str]]) -> Path | None:
+    """Prompt the user for a file using a Tk file picker; `filetypes` as (label, '*.ext *.ext')."""
+
+    print(title + "...")
+    root = tk.Tk()
+    root.withdraw()
+    root.attributes("-topmost", True)
+    selected = filedialog.askopenfilename(title=title, filetypes=filetypes, parent=root)
+    root.destroy()
+    if not selected:
+        return None
+    return Path(selected)
+
 def parse_timezone_input(input_str: str) -> str | None:
     try:
         if input_str.count(':') != 1:
@@ -7,6 +7,9 @@ from .cpy_geotag_from_xmp_to_jpeg_files.tool import CopyGeotagFromXmpToJpegFiles
 from .merge_srt_with_mp4.tool import MergeSrtWithMp4Tool
 from .add_geotag_to_dji_drone_video.tool import AddGeotagToDjiDroneVideoTool
 from .add_timezone_info.tool import AddTimezoneInfoTool
+from .extract_raw_previews.tool import ExtractRawPreviewsTool
+from .video_contact_sheets.tool import VideoContactSheetsTool
+from .metadata_pipeline.tool import MetadataPipelineTool
 
 __all__ = [
     "SortImagesIntoFoldersTool",
@@ -16,4 +19,7 @@ __all__ = [
     "MergeSrtWithMp4Tool",
     "AddGeotagToDjiDroneVideoTool",
     "AddTimezoneInfoTool",
+    "ExtractRawPreviewsTool",
+    "VideoContactSheetsTool",
+    "MetadataPipelineTool",
 ]
@@ -1,12 +1,26 @@
-"""Add geotag from DJI drone SRT sidecar files to MP4 video files."""
+"""Add geotag from DJI drone SRT sidecar files to MP4 video files.
+
+The position is written into the metadata of a copy of each video, or of the video itself
+with "--in-place", so the video data is neither read nor rewritten; videos with a box
+layout that can't be edited this way go through exiftool.
+"""
 
 import json
-import shutil
+import os
 import subprocess
+import sys
 from pathlib import Path
 
 from alive_progress import alive_bar
 
+from photo_video_tools.fastcopy import PARTIAL_SUFFIX, copy_file
+from photo_video_tools.manifest import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, Journal, load_units
+from photo_video_tools.media.mp4_edit import UnsupportedLayout
+from photo_video_tools.media.mp4_location import write_location
+from photo_video_tools.media.telemetry import load_telemetry
+from photo_video_tools.geo.timezones import DEFAULT_DATA_PATH, TimezoneIndex
+from photo_video_tools.media.track import simplify_track, start_utc_offset, write_gpx
+
 WORK_DIR = Path("/work")
 TEMP_DIR = Path("/tmp/processing")
 OUTPUT_DIR = WORK_DIR / "videos_with_geotags"
@@ -49,22 +63,175 @@ def parse_first_geotag(srt_path: Path) -> tuple[float, float, float] | None:
         return None
 
 
-if __name__ == "__main__":
+def read_first_geotag(srt_path: Path) -> tuple[float, float, float] | None:
+    """
+    Get the first GPS fix from the SRT's telemetry cache (parsing the SRT once if needed).
+
+    The cache is stored next to the output, so later runs and other lookups skip the text parsing.
+    """
+    try:
+        geotag = load_telemetry(srt_path, OUTPUT_DIR).first_fix()
+        if geotag is not None:
+            return geotag
+    except Exception as e:
+        print(f"Telemetry parse error for {srt_path.name}: {e}")
+
+    # Fall back to DJI_SRT_Parser for layouts the telemetry parser doesn't recognize
+    return parse_first_geotag(srt_path)
+
+
+def read_written_position(mp4_file: Path) -> tuple[float, float, float | None]:
+    """Position of a video as exiftool reads it (from the QuickTime GPSCoordinates tags)."""
+    # No -fast: the rewritten metadata may come after the media data
+    process = subprocess.run(
+        ["exiftool", "-json", "-n", "-GPSLatitude", "-GPSLongitude", "-GPSAltitude", str(mp4_file)],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        entry = json.loads(process.stdout)[0]
+        return float(entry["GPSLatitude"]), float(entry["GPSLongitude"]), entry.get("GPSAltitude")
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise RuntimeError(f"Position not readable after writing ({process.stdout.strip()})")
+
+
+def write_verified_geotag(mp4_file: Path, geotag: tuple[float, float, float]) -> int:
+    """
+    Write the position into the metadata of a video, then read it back with exiftool.
+
+    Only the rebuilt `moov` box is written. Returns the number of bytes written.
+    """
+    latitude, longitude, altitude = geotag
+    written = write_location(mp4_file, latitude, longitude, altitude)
 
-    # Collect SRT files
-    srt_files = [
-        file for file in WORK_DIR.iterdir() if file.is_file() and file.suffix.lower() == ".srt"
+    read_latitude, read_longitude, read_altitude = read_written_position(mp4_file)
+    if (
+        abs(read_latitude - latitude) > 1e-5
+        or abs(read_longitude - longitude) > 1e-5
+        or (read_altitude is not None and abs(float(read_altitude) - altitude) > 0.01)
+    ):
+        raise RuntimeError(
+            f"exiftool reads back {read_latitude}, {read_longitude}, {read_altitude}"
+        )
+    return written
+
+
+def write_geotag_to_copy(mp4_file: Path, geotag: tuple[float, float, float], final_output: Path) -> int:
+    """
+    Copy the video into the output folder and write the position into the copy's metadata.
+
+    The copy is done kernel-side (a reflink on file systems that support it) and only moved
+    into the output folder once the position reads back. Returns the number of bytes written.
+    """
+    partial = final_output.with_name(f".{final_output.name}{PARTIAL_SUFFIX}")
+    try:
+        copy_file(mp4_file, partial)
+        written = write_verified_geotag(partial, geotag)
+        os.replace(partial, final_output)
+        return written
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def write_geotag_with_exiftool(mp4_file: Path, geotag: tuple[float, float, float], final_output: Path) -> bool:
+    latitude, longitude, altitude = geotag
+    temp_input = TEMP_DIR / f"in_{mp4_file.name}"
+    temp_output = TEMP_DIR / f"out_{mp4_file.name}"
+
+    try:
+        copy_file(mp4_file, temp_input)
+    except Exception as e:
+        print(f"✗ Failed to copy {mp4_file.name} into container: {e}")
+        return False
+
+    # Construct the ExifTool command
+    command = [
+        "exiftool",
+        '-m', # ignore maker notes offset warning
+        f"-GPSLatitude={latitude}",
+        f"-GPSLongitude={longitude}",
+        f"-GPSAltitude={altitude}",
+        "-o", str(temp_output),
+        str(temp_input),
     ]
 
-    # Find matching MP4 files
+    # Execute exiftool and stream output so the progress bar stays clean
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    )
+    if process.stdout is not None:
+        for line in process.stdout:
+            line = line.rstrip()
+            if line:
+                print(line)
+    return_code = process.wait()
+
+    success = False
+    if return_code != 0:
+        print(f"✗ Failed to process {mp4_file.name} (exiftool exit code {return_code})")
+    else:
+        try:
+            # Lands under a temporary name first, so the host never sees a partial video
+            copy_file(temp_output, final_output)
+            success = True
+        except Exception as e:
+            print(f"✗ Failed to copy {mp4_file.name} back to host: {e}")
+
+    # Cleanup temp files
+    temp_input.unlink(missing_ok=True)
+    temp_output.unlink(missing_ok=True)
+    return success
+
+
+def export_track(srt_path: Path, gpx_path: Path, tolerance_m: float, zones: TimezoneIndex | None) -> tuple[int, int]:
+    """
+    Write the simplified flight track of an SRT as GPX; returns the number of points before and after.
+
+    The times are converted to UTC with the time zone data, or kept local without it.
+    """
+    track = load_telemetry(srt_path, OUTPUT_DIR).track()
+    indices = simplify_track(track, tolerance_m)
+    utc_offset = start_utc_offset(track, zones) if zones is not None else None
+    write_gpx(gpx_path, track, indices, gpx_path.stem, utc_offset)
+    return len(track["latitude"]), len(indices)
+
+
+if __name__ == "__main__":
+
+    # Optional: "--gpx-track <tolerance in meters>"; "--in-place" writes into the videos themselves
+    args = sys.argv[1:]
+    in_place = "--in-place" in args
+    if in_place:
+        args.remove("--in-place")
+    track_tolerance = None
+    if len(args) == 2 and args[0] == "--gpx-track":
+        track_tolerance = float(args[1])
+    elif args:
+        print("Usage: container_script.py [--gpx-track <tolerance in meters>] [--in-place]")
+        raise SystemExit(1)
+
+    units = load_units(WORK_DIR)
     pairs: list[tuple[Path, Path]] = []
-    for srt_file in srt_files:
-        stem = srt_file.stem
-        for ext in [".mp4", ".MP4"]:
-            mp4_candidate = WORK_DIR / f"{stem}{ext}"
-            if mp4_candidate.exists():
-                pairs.append((srt_file, mp4_candidate))
-                break
+    if units is not None:
+        # Pairs listed in the manifest passed in
+        pairs = [(unit[0], unit[1]) for unit in units]
+    else:
+        # Collect SRT files
+        srt_files = [
+            file for file in WORK_DIR.iterdir() if file.is_file() and file.suffix.lower() == ".srt"
+        ]
+
+        # Find matching MP4 files
+        for srt_file in srt_files:
+            stem = srt_file.stem
+            for ext in [".mp4", ".MP4"]:
+                mp4_candidate = WORK_DIR / f"{stem}{ext}"
+                if mp4_candidate.exists():
+                    pairs.append((srt_file, mp4_candidate))
+                    break
     
     if not pairs:
         print("No matching SRT + MP4 pairs found. Abort.")
@@ -79,6 +246,14 @@ if __name__ == "__main__":
     # Process each pair
     processed = 0
     failed = 0
+    journal = Journal.from_environment(WORK_DIR)
+
+    zones = None
+    if track_tolerance is not None:
+        if DEFAULT_DATA_PATH.exists():
+            zones = TimezoneIndex.load()
+        else:
+            print(f"No time zone data at {DEFAULT_DATA_PATH}: GPX times are written as local times without a zone.")
     
     with alive_bar(
         len(pairs),
@@ -92,83 +267,63 @@ if __name__ == "__main__":
             
             # Parse geotag from SRT            
             bar.text(f"Parsing Geotag from {srt_file.name}")
-            geotag = parse_first_geotag(srt_file)
+            geotag = read_first_geotag(srt_file)
             if geotag is None:
                 print(f"✗ Skipped {mp4_file.name} (no geotag found in {srt_file.name})")
+                journal.record(mp4_file, STATUS_SKIPPED, "no geotag found")
                 failed += 1
                 bar()
                 continue
             
             latitude, longitude, altitude = geotag
-            
-            # Copy file into container for fast processing
-            bar.text(f"Copying {mp4_file.name} into container")
+            final_output = mp4_file if in_place else OUTPUT_DIR / mp4_file.name
 
-            temp_input = TEMP_DIR / f"in_{mp4_file.name}"
-            temp_output = TEMP_DIR / f"out_{mp4_file.name}"
-            
+            # Write the position into the video or a copy of it, rewriting only its metadata
+            bar.text(f"Writing geotag to {mp4_file.name}")
+            success = False
+            error = ""
             try:
-                shutil.copy2(mp4_file, temp_input)
+                if in_place:
+                    written = write_verified_geotag(mp4_file, geotag)
+                else:
+                    written = write_geotag_to_copy(mp4_file, geotag, final_output)
+                print(f"✓ Processed {mp4_file.name} → GPS: {latitude:.6f}, {longitude:.6f}, Alt: {altitude:.1f} m ({written / 1024:.0f} KB written)")
+                success = True
+            except (UnsupportedLayout, RuntimeError) as e:
+                # Fallback: exiftool rewrites the whole file, on the container's filesystem (turned out to be faster);
+                # in place, the rewritten file replaces the original
+                print(f"  {mp4_file.name}: {e}, writing with exiftool")
+                bar.text(f"Processing {mp4_file.name} with exiftool")
+                success = write_geotag_with_exiftool(mp4_file, geotag, final_output)
+                if success:
+                    print(f"✓ Processed {mp4_file.name} → GPS: {latitude:.6f}, {longitude:.6f}, Alt: {altitude:.1f} m")
             except Exception as e:
-                print(f"✗ Failed to copy {mp4_file.name} into container: {e}")
-                failed += 1
-                bar()
-                continue
-                    
-            # Process on container's filesystem (turned out to be faster)
-            bar.text(f"Processing {mp4_file.name}")
-
-			# Construct the ExifTool command
-            command = [
-                "exiftool",
-                '-m', # ignore maker notes offset warning
-                f"-GPSLatitude={latitude}",
-                f"-GPSLongitude={longitude}",
-                f"-GPSAltitude={altitude}",
-                "-o", temp_output,
-                temp_input,
-            ]
-
-            # Execute exiftool and stream output so the progress bar stays clean
-            process = subprocess.Popen(
-				command,
-				stdout=subprocess.PIPE,
-				stderr=subprocess.STDOUT,
-				text=True,
-				bufsize=1,
-			)
-            if process.stdout is not None:
-                for line in process.stdout:
-                    line = line.rstrip()
-                    if line:
-                        print(line)
-            return_code = process.wait()
-
-            if return_code != 0:
-                print(f"✗ Failed to process {mp4_file.name} (exiftool exit code {return_code})")
-                failed += 1
+                print(f"✗ Failed to process {mp4_file.name}: {e}")
+                error = str(e)
+
+            if success:
+                journal.record(mp4_file, STATUS_OK)
+                processed += 1
             else:
-                # Copy result back to mount
-                bar.text(f"Copying back {mp4_file.name} to host")
-                final_output = OUTPUT_DIR / mp4_file.name
+                journal.record(mp4_file, STATUS_FAILED, error)
+                failed += 1
+
+            if track_tolerance is not None and success:
+                bar.text(f"Exporting flight track of {mp4_file.name}")
+                gpx_path = (OUTPUT_DIR / mp4_file.name).with_suffix(".gpx")
                 try:
-                    shutil.copy2(temp_output, final_output)
-                    print(f"✓ Processed {mp4_file.name} → GPS: {latitude:.6f}, {longitude:.6f}, Alt: {altitude:.1f} m")
-                    processed += 1
+                    total, kept = export_track(srt_file, gpx_path, track_tolerance, zones)
+                    print(f"  Track: {kept} of {total} points → {gpx_path.name}")
                 except Exception as e:
-                    print(f"✗ Failed to copy {mp4_file.name} back to host: {e}")
-                    failed += 1                
-            
-            # Cleanup temp files
-            temp_input.unlink(missing_ok=True)
-            temp_output.unlink(missing_ok=True)
+                    print(f"  Failed to export track of {mp4_file.name}: {e}")
 
             bar()
     
+    journal.close()
     print(f"Processed: {processed}")
     print(f"Failed: {failed}")
     
-    print(f"Output written to: {OUTPUT_DIR}")
+    print(f"Output written to: {WORK_DIR if in_place else OUTPUT_DIR}")
 
     if failed != 0:
         print("Completed with failures!")
@@ -5,6 +5,7 @@ from photo_video_tools.shared import ToolBase
 
 TOOL_PATH = Path(__file__).parent
 CONTAINER_DIR = TOOL_PATH / "container"
+DEFAULT_TRACK_TOLERANCE_M = 1.0
 
 
 class AddGeotagToDjiDroneVideoTool(ToolBase):
@@ -12,11 +13,38 @@ class AddGeotagToDjiDroneVideoTool(ToolBase):
 
     name = "Add Geotag to DJI Drone Video"
     description = "Extract GPS data from SRT and embed into MP4 files"
-    
+
+    directory_prompt = "Select folder containing MP4 + SRT file pairs"
+    container_name = "exiftool-nodejs"
+    container_dir = CONTAINER_DIR
+    input_extensions = (".srt",)
+    paired_extensions = (".mp4",)
+
     @classmethod
-    def run(cls) -> int:
-        return cls.run_default(
-            "Select folder containing MP4 + SRT file pairs",
-            CONTAINER_DIR,
-            "exiftool-nodejs"
-        )
\ No newline at end of file
+    def ask_script_args(cls) -> list[str] | None:
+        # Only the metadata is rewritten, so there is no need for a copy of each clip
+        in_place = input(
+            "Write the geotags into the videos themselves instead of copies? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        output_args = ["--in-place"] if in_place else []
+
+        answer = input("Also export the full flight track as a GPX file next to each video? (y/N): ").strip().lower()
+        if answer not in ("y", "yes"):
+            return output_args
+
+        # Points closer than this to the simplified path are dropped
+        tolerance = None
+        while tolerance is None:
+            user_input = input(f"Track simplification tolerance in meters (Enter for {DEFAULT_TRACK_TOLERANCE_M}): ").strip()
+            if not user_input:
+                tolerance = DEFAULT_TRACK_TOLERANCE_M
+                break
+            try:
+                tolerance = float(user_input)
+            except ValueError:
+                tolerance = None
+            if tolerance is None or tolerance < 0:
+                print("Invalid tolerance. Please enter a non-negative number.")
+                tolerance = None
+
+        return ["--gpx-track", str(tolerance), *output_args]
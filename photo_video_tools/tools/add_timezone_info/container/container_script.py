@@ -1,44 +1,241 @@
-"""Add timezone information to image files using ExifTool."""
+"""Add timezone information to image files using ExifTool.
+
+Images are only written if needed: images whose copy from an earlier run already has the
+offset are left alone, and images that have it themselves are hard-linked into the output
+folder.
+"""
 
 import sys
 import subprocess
+from datetime import datetime
 from pathlib import Path
 from alive_progress import alive_bar
 
+from photo_video_tools.concurrency import AdaptiveConcurrency, file_size
+from photo_video_tools.exiftool import (
+	ExiftoolSession,
+	copy_written,
+	existing_copies,
+	plan_writes,
+	read_tags,
+	sidecar_path,
+	write_sidecars,
+)
+from photo_video_tools.fastcopy import link_file
+from photo_video_tools.geo.timezones import TimezoneIndex, utc_offset
+from photo_video_tools.manifest import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, Journal, load_units
+from photo_video_tools.media import formats
+from photo_video_tools.pipeline import OFFSET_TAGS, parse_amount, timezone_arguments
+
 WORK_DIR = Path("/work")
 OUTPUT_DIR = WORK_DIR / "photos_with_added_timezone_info"
-SUPPORTED_EXTENSIONS = {'.dng', '.arw', '.jpg', '.jpeg'}
+SUPPORTED_EXTENSIONS = formats.supported_extensions(formats.KIND_IMAGE, formats.KIND_RAW)
+# Files per exiftool run when reading GPS positions or writing a group of files with the same offset
+CHUNK_SIZE = 500
+# The offset tags are read along, to find the images that already have their offset
+POSITION_TAGS = ["GPSLatitude", "GPSLongitude", "DateTimeOriginal", "CreateDate", *OFFSET_TAGS]
 
 
-if __name__ == "__main__":
-	# Parse timezone info from command-line argument in format <hours>:<minutes>
-	if len(sys.argv) != 2:
-		print("Usage: python container_script.py <sign><hours>:<minutes>")
-		print("Example: python container_script.py -9:30")
-		raise SystemExit(1)
-	timezone_info = sys.argv[1]
+def has_offset(entry: dict, timezone_info: str) -> bool:
+	"""Whether all offset tags of an image (as read by `read_tags`) already hold the offset, e.g. '+2:00' and '+02:00'."""
+	try:
+		offset = parse_amount(timezone_info)
+		return all(parse_amount(str(entry[tag])) == offset for tag in OFFSET_TAGS)
+	except (KeyError, ValueError):
+		return False
+
 
-	# Get all ARW and JPEG files in the directory
-	image_files = [
-		file for file in WORK_DIR.iterdir()
-		if file.is_file() and file.suffix.lower() in SUPPORTED_EXTENSIONS
+def record_unchanged(done: list[tuple[Path, str]], unchanged: list[tuple[Path, str]], journal: Journal) -> tuple[int, int]:
+	"""
+	Record the images that need no writing, each with its offset.
+
+	Images in `done` already have a copy with the offset in the output folder; images in
+	`unchanged` have the offset themselves and are hard-linked into it.
+	"""
+	skipped = 0
+	failed = 0
+	for image_file, offset in done:
+		print(f"✓ Skipped {image_file.name} (copy already has offset {offset})")
+		journal.record(image_file, STATUS_SKIPPED, f"copy already has offset {offset}")
+		skipped += 1
+
+	for image_file, offset in unchanged:
+		try:
+			link_file(image_file, OUTPUT_DIR / image_file.name)
+		except OSError as e:
+			print(f"✗ Failed to link {image_file.name}: {e}")
+			journal.record(image_file, STATUS_FAILED, str(e))
+			failed += 1
+			continue
+		print(f"✓ Skipped {image_file.name} (offset already {offset})")
+		journal.record(image_file, STATUS_SKIPPED, f"offset already {offset}")
+		skipped += 1
+	return skipped, failed
+
+
+def process_image(image_file: Path, timezone_info: str) -> tuple[int, str]:
+	"""Write the timezone tags into a copy of one image; returns exiftool's exit code and output."""
+	output_path = OUTPUT_DIR / image_file.name
+	command = [
+		"exiftool",
+		'-m', # ignore maker notes offset warning
+		*timezone_arguments(timezone_info),
+		"-o", str(output_path),  # Write corrected copy to output directory
+		str(image_file),
 	]
 
-	if not image_files:
-		print(f"No supported image files found. Abort.")
-		raise SystemExit(0)
-	
-	print(f"Found {len(image_files)} image files to process.")
+	# Capture the output so lines of concurrent runs don't interleave
+	process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+	return process.returncode, process.stdout
 
-	# Ensure output directory exists
-	OUTPUT_DIR.mkdir(exist_ok=True)
 
-	# Process each image file
-	print(f"Processing {len(image_files)} files with timezone offset: {timezone_info} hours")
+def process_group(image_files: list[Path], timezone_info: str) -> tuple[int, str]:
+	"""Write the same timezone tags into copies of many images with a single exiftool run."""
+	command = [
+		"exiftool",
+		'-m', # ignore maker notes offset warning
+		*timezone_arguments(timezone_info),
+		"-o", f"{OUTPUT_DIR}/",  # Trailing slash: keep the file names
+		"-@", "-",  # File names are read from stdin
+	]
+	process = subprocess.run(
+		command, input="\n".join(str(file) for file in image_files),
+		stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+	)
+	return process.returncode, process.stdout
+
+
+def sidecar_arguments(timezone_info: str) -> list[str]:
+	"""exiftool arguments writing the capture times with their offset into XMP, where the offset is part of the date."""
+	sign, hours, minutes = timezone_info[0], *timezone_info[1:].split(":")
+	offset = f"{sign}{int(hours):02d}:{minutes}"
+	return [
+		f"-XMP-exif:DateTimeOriginal<${{DateTimeOriginal}}{offset}",
+		f"-XMP-photoshop:DateCreated<${{DateTimeOriginal}}{offset}",
+		f"-XMP-xmp:CreateDate<${{CreateDate}}{offset}",
+	]
+
 
+def run_sidecars(groups: dict[str, list[Path]], journal: Journal) -> tuple[int, int]:
+	"""Write each group's offset into the XMP sidecars of its images in batches, leaving the images untouched."""
 	processed = 0
 	failed = 0
-	
+	batches = [
+		(offset, files[i:i + CHUNK_SIZE])
+		for offset, files in sorted(groups.items())
+		for i in range(0, len(files), CHUNK_SIZE)
+	]
+
+	with ExiftoolSession() as session, alive_bar(
+		sum(len(files) for _, files in batches),
+		title="Writing XMP sidecars",
+		bar="smooth",
+		spinner="waves",
+		dual_line=True,
+		enrich_print=True,
+	) as bar:
+		for offset, files in batches:
+			bar.text(f"{len(files)} files with offset {offset}")
+			written, not_written, output = write_sidecars(session, files, sidecar_arguments(offset))
+			for line in output.splitlines():
+				line = line.rstrip()
+				if line:
+					print(line)
+
+			for image_file in written:
+				print(f"✓ Processed {sidecar_path(image_file).name} ({offset})")
+				journal.record(image_file, STATUS_OK, offset)
+				processed += 1
+				bar()
+			for image_file in not_written:
+				print(f"✗ Failed to write {sidecar_path(image_file).name}")
+				journal.record(image_file, STATUS_FAILED, "sidecar not written")
+				failed += 1
+				bar()
+
+	return processed, failed
+
+
+def resolve_offsets(
+	image_files: list[Path], fallback: str | None, controller: AdaptiveConcurrency, skip_unchanged: bool
+) -> tuple[dict[str, list[Path]], list[Path], list[tuple[Path, str]], list[tuple[Path, str]]]:
+	"""
+	Determine the UTC offset of each image from its GPS position and capture time.
+
+	Returns the images grouped by offset and the images without a usable position (these
+	get the fallback offset if one is given). With `skip_unchanged`, the copies of earlier
+	runs are read along and two more lists are returned instead of being grouped: the
+	images whose copy already has its offset, and the ones that have it themselves.
+	"""
+	index = TimezoneIndex.load()
+	groups: dict[str, list[Path]] = {}
+	zones: dict[tuple[str, str], int] = {}
+	unresolved: list[Path] = []
+	done: list[tuple[Path, str]] = []
+	unchanged: list[tuple[Path, str]] = []
+
+	def read_chunk(chunk: list[Path]) -> dict[str, dict]:
+		copies = [OUTPUT_DIR / image_file.name for image_file in chunk] if skip_unchanged else []
+		return read_tags([*chunk, *(copy for copy in copies if copy.exists())], POSITION_TAGS, numeric=True)
+
+	def add(image_file: Path, offset: str, entry: dict, copy_entry: dict) -> None:
+		if skip_unchanged and has_offset(copy_entry, offset):
+			done.append((image_file, offset))
+		elif skip_unchanged and has_offset(entry, offset):
+			unchanged.append((image_file, offset))
+		else:
+			groups.setdefault(offset, []).append(image_file)
+
+	chunks = [image_files[i:i + CHUNK_SIZE] for i in range(0, len(image_files), CHUNK_SIZE)]
+	for chunk, positions, error in controller.map_unordered(
+		read_chunk, chunks,
+		size=lambda chunk: sum(file_size(file) for file in chunk),
+	):
+		for image_file in chunk:
+			entry = (positions or {}).get(str(image_file), {})
+			copy_entry = (positions or {}).get(str(OUTPUT_DIR / image_file.name), {})
+			latitude, longitude = entry.get("GPSLatitude"), entry.get("GPSLongitude")
+			taken = entry.get("DateTimeOriginal") or entry.get("CreateDate")
+			try:
+				local_time = datetime.strptime(str(taken)[:19], "%Y:%m:%d %H:%M:%S")
+			except ValueError:
+				local_time = None
+
+			if not isinstance(latitude, (int, float)) or not isinstance(longitude, (int, float)) or local_time is None:
+				if fallback is None:
+					unresolved.append(image_file)
+				else:
+					add(image_file, fallback, entry, copy_entry)
+				continue
+
+			zone = index.zone_at(latitude, longitude)
+			offset = utc_offset(zone, local_time)
+			zones[(zone, offset)] = zones.get((zone, offset), 0) + 1
+			add(image_file, offset, entry, copy_entry)
+
+	for (zone, offset), count in sorted(zones.items()):
+		print(f"  {zone} ({offset}): {count} files")
+	return groups, unresolved, done, unchanged
+
+
+def run_fixed_offset(image_files: list[Path], timezone_info: str, journal: Journal) -> tuple[int, int, int]:
+	"""Add the same offset to every image that doesn't have it yet, one exiftool process per file."""
+	# One bulk read of the offset tags of the images and of the copies of earlier runs
+	plan = plan_writes(image_files, OFFSET_TAGS, lambda image_file, entry: has_offset(entry, timezone_info), OUTPUT_DIR)
+	skipped, failed = record_unchanged(
+		[(image_file, timezone_info) for image_file in plan.done],
+		[(image_file, timezone_info) for image_file in plan.unchanged],
+		journal,
+	)
+	if skipped:
+		print(f"Skipped {skipped} files that already have the offset {timezone_info}.")
+	image_files = plan.changed
+
+	print(f"Processing {len(image_files)} files with timezone offset: {timezone_info} hours")
+
+	processed = 0
+	controller = AdaptiveConcurrency.from_environment()
+
 	with alive_bar(
 		len(image_files),
 		title="Adding Timezone Information",
@@ -47,48 +244,157 @@ if __name__ == "__main__":
 		dual_line=True,
 		enrich_print=True,
 	) as bar:
-		for image_file in image_files:
+		# Run several exiftool processes at once; the controller adapts their number to the storage
+		for image_file, result, error in controller.map_unordered(
+			lambda image_file: process_image(image_file, timezone_info), image_files
+		):
 			bar.text(f"{image_file.name}")
-			# Construct the ExifTool command
-			output_path = OUTPUT_DIR / image_file.name
-			command = [
-				"exiftool",
-				'-m', # ignore maker notes offset warning
-				f'-OffsetTime={timezone_info}',
-				f'-OffsetTimeOriginal={timezone_info}',
-				f'-OffsetTimeDigitized={timezone_info}',
-				"-o", str(output_path),  # Write corrected copy to output directory
-				str(image_file),
-			]
-
-			# Execute exiftool and stream output so the progress bar stays clean
-			process = subprocess.Popen(
-				command,
-				stdout=subprocess.PIPE,
-				stderr=subprocess.STDOUT,
-				text=True,
-				bufsize=1,
-			)
-			if process.stdout is not None:
-				for line in process.stdout:
-					line = line.rstrip()
-					if line:
-						print(line)
-			return_code = process.wait()
+			if error is not None:
+				print(f"✗ Failed to process {image_file.name}: {error}")
+				journal.record(image_file, STATUS_FAILED, str(error))
+				failed += 1
+				bar()
+				continue
+
+			return_code, output = result
+			for line in output.splitlines():
+				line = line.rstrip()
+				if line:
+					print(line)
 
 			if return_code != 0:
 				print(f"✗ Failed to process {image_file.name} (exiftool exit code {return_code})")
+				journal.record(image_file, STATUS_FAILED, f"exiftool exit code {return_code}")
 				failed += 1
 			else:
 				print(f"✓ Processed {image_file.name}")
+				journal.record(image_file, STATUS_OK)
 				processed += 1
 
 			bar()
 
+	print(controller.summary())
+	return processed, skipped, failed
+
+
+def run_from_gps(image_files: list[Path], fallback: str | None, journal: Journal, sidecars: bool) -> tuple[int, int, int]:
+	"""Add the offset of each image's GPS position, one exiftool process per group of equal offsets."""
+	controller = AdaptiveConcurrency.from_environment()
+
+	print("Resolving time zones from GPS positions...")
+	# Sidecars are small, so they are always written; copies of images that already have their offset are linked
+	groups, unresolved, done, unchanged = resolve_offsets(image_files, fallback, controller, skip_unchanged=not sidecars)
+
+	failed = 0
+	for image_file in unresolved:
+		print(f"✗ Skipped {image_file.name} (no GPS position or capture time)")
+		journal.record(image_file, STATUS_SKIPPED, "no GPS position or capture time")
+		failed += 1
+
+	if sidecars:
+		processed, sidecars_failed = run_sidecars(groups, journal)
+		return processed, 0, failed + sidecars_failed
+
+	skipped, link_failed = record_unchanged(done, unchanged, journal)
+	failed += link_failed
+	if skipped:
+		print(f"Skipped {skipped} files that already have the offset of their position.")
+
+	processed = 0
+	batches = [
+		(offset, files[i:i + CHUNK_SIZE])
+		for offset, files in sorted(groups.items())
+		for i in range(0, len(files), CHUNK_SIZE)
+	]
+	existed = existing_copies([file for _, files in batches for file in files], OUTPUT_DIR)
+
+	with alive_bar(
+		sum(len(files) for _, files in batches),
+		title="Adding Timezone Information",
+		bar="smooth",
+		spinner="waves",
+		dual_line=True,
+		enrich_print=True,
+	) as bar:
+		for (offset, files), result, error in controller.map_unordered(
+			lambda batch: process_group(batch[1], batch[0]), batches,
+			size=lambda batch: sum(file_size(file) for file in batch[1]),
+		):
+			bar.text(f"{len(files)} files with offset {offset}")
+			if error is None:
+				return_code, output = result
+				for line in output.splitlines():
+					line = line.rstrip()
+					if line:
+						print(line)
+
+			# A batch can partly succeed; the copies it created tell which files made it
+			for image_file in files:
+				if error is None and copy_written(image_file, OUTPUT_DIR, existed):
+					print(f"✓ Processed {image_file.name} ({offset})")
+					journal.record(image_file, STATUS_OK, offset)
+					processed += 1
+				else:
+					print(f"✗ Failed to process {image_file.name}" + (f": {error}" if error is not None else ""))
+					journal.record(image_file, STATUS_FAILED, str(error or ""))
+					failed += 1
+				bar()
+
+	print(controller.summary())
+	return processed, skipped, failed
+
+
+if __name__ == "__main__":
+	# Either a fixed offset in format <hours>:<minutes>, or "--from-gps [<fallback offset>]";
+	# "--sidecars" writes XMP sidecars next to the images instead of corrected copies
+	args = sys.argv[1:]
+	sidecars = "--sidecars" in args
+	if sidecars:
+		args.remove("--sidecars")
+	from_gps = len(args) in (1, 2) and args[0] == "--from-gps"
+	if not from_gps and len(args) != 1:
+		print("Usage: python container_script.py <sign><hours>:<minutes> [--sidecars]")
+		print("       python container_script.py --from-gps [<fallback offset>] [--sidecars]")
+		print("Example: python container_script.py -9:30")
+		raise SystemExit(1)
+	timezone_info = args[1] if from_gps and len(args) == 2 else (None if from_gps else args[0])
+
+	# Get all image and RAW files in the directory, or the ones listed in the manifest passed in
+	units = load_units(WORK_DIR)
+	if units is not None:
+		image_files = [unit[0] for unit in units]
+	else:
+		image_files = [
+			file for file in WORK_DIR.iterdir()
+			if file.is_file() and file.suffix.lower() in SUPPORTED_EXTENSIONS
+		]
+
+	if not image_files:
+		print(f"No supported image files found. Abort.")
+		raise SystemExit(0)
+	
+	print(f"Found {len(image_files)} image files to process.")
+
+	# Ensure output directory exists
+	if not sidecars:
+		OUTPUT_DIR.mkdir(exist_ok=True)
+
+	journal = Journal.from_environment(WORK_DIR)
+	skipped = 0
+	if from_gps:
+		processed, skipped, failed = run_from_gps(image_files, timezone_info, journal, sidecars)
+	elif sidecars:
+		processed, failed = run_sidecars({timezone_info: image_files}, journal)
+	else:
+		processed, skipped, failed = run_fixed_offset(image_files, timezone_info, journal)
+	journal.close()
+
 	print(f"Processed: {processed}")
+	if skipped:
+		print(f"Skipped: {skipped} (offset already set)")
 	print(f"Failed: {failed}")
 	
-	print(f"Output written to: {OUTPUT_DIR}")
+	print(f"Output written to: {WORK_DIR if sidecars else OUTPUT_DIR}")
 
 	if failed != 0:
 		print("Completed with failures!")
@@ -1,8 +1,8 @@
 """Host launcher for the Docker container executing the script of the add_timezone_info tool."""
 
 from pathlib import Path
-from photo_video_tools.docker_utils import run_container
-from photo_video_tools.shared import select_directory_gui, parse_timezone_input, ToolBase
+from photo_video_tools.media import formats
+from photo_video_tools.shared import parse_timezone_input, ToolBase
 
 TOOL_PATH = Path(__file__).parent
 CONTAINER_DIR = TOOL_PATH / "container"
@@ -13,15 +13,35 @@ class AddTimezoneInfoTool(ToolBase):
     
     name = "Add Timezone Information"
     description = "Add timezone information to photos' tags"
-    
-    @classmethod
-    def run(cls) -> int:
-        cls.announce()
 
-        work_dir = select_directory_gui("Select folder containing image files")
-        if work_dir is None:
-            print("No directory selected. Abort.")
-            return 1
+    directory_prompt = "Select folder containing image files"
+    container_name = "exiftool"
+    container_dir = CONTAINER_DIR
+    input_extensions = tuple(sorted(formats.supported_extensions(formats.KIND_IMAGE, formats.KIND_RAW)))
+
+    @classmethod
+    def ask_script_args(cls) -> list[str] | None:
+        # Sidecars are a few KB each, so large raw files are neither read in full nor rewritten
+        sidecars = input(
+            "Write XMP sidecars next to the photos instead of corrected copies? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        sidecar_args = ["--sidecars"] if sidecars else []
+
+        from_gps = input(
+            "Determine each photo's offset from its GPS position and capture time? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        if from_gps:
+            # Photos without GPS get this offset, or are skipped if none is given
+            while True:
+                user_input = input(
+                    "Offset for photos without GPS position (e.g., -9:00, 5:30; Enter to skip them): "
+                ).strip()
+                if not user_input:
+                    return ["--from-gps", *sidecar_args]
+                fallback = parse_timezone_input(user_input)
+                if fallback is not None:
+                    return ["--from-gps", fallback, *sidecar_args]
+                print("Invalid timezone offset format. Please try again.")
 
         # Get timezone info from user
         timezone_info = None
@@ -31,24 +51,4 @@ class AddTimezoneInfoTool(ToolBase):
             if timezone_info is None:
                 print("Invalid timezone offset format. Please try again.")
 
-        docker_options = [
-            "-it", "--rm",
-            "-v", f"{work_dir}:/work",
-            "-v", f"{CONTAINER_DIR}:/app:ro",
-            "-w", "/work",
-        ]
-
-        # command to run inside container
-        command_and_args = [
-            "sh", "-c",
-            (
-                "python -m venv /venv && "
-                ". /venv/bin/activate && "
-                "pip install --upgrade pip && "
-                "pip install --no-cache-dir -r /app/requirements.txt && "
-                f"python /app/container_script.py {timezone_info}"
-            ),
-        ]
-
-        print(f"Running container...")
-        return run_container("exiftool", docker_options, command_and_args)
+        return [timezone_info, *sidecar_args]
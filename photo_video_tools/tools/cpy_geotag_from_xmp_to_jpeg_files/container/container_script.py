@@ -1,30 +1,209 @@
-"""Add geotag from XMP sidecar files to JPEG image files."""
+"""Add geotag from XMP sidecar files to JPEG image files.
+
+JPEGs are only written if needed: JPEGs whose copy from an earlier run already has the
+sidecar's position (and place) are left alone, and JPEGs that have it themselves are
+hard-linked into the output folder.
+"""
 
 import subprocess
+import sys
 from pathlib import Path
 from alive_progress import alive_bar
 
+from photo_video_tools.concurrency import AdaptiveConcurrency, file_size
+from photo_video_tools.exiftool import ExiftoolSession, WritePlan, plan_writes, read_tags
+from photo_video_tools.fastcopy import link_file
+from photo_video_tools.geo.places import Place, PlaceIndex
+from photo_video_tools.manifest import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, Journal, load_units
+from photo_video_tools.media import formats
+from photo_video_tools.pipeline import geotag_arguments
+
 WORK_DIR = Path("/work")
 OUTPUT_DIR = WORK_DIR / "photos_with_copied_geotags"
-ARGS_FILE = "/exiftool_args_file/xmp2exif.args"
+# Sidecars per exiftool command in sidecar mode
+CHUNK_SIZE = 500
+# Tags of the JPEGs compared with the sidecars to find the ones already geotagged
+PLAN_TAGS = ["GPSLatitude", "GPSLongitude", "XMP-photoshop:City", "XMP-photoshop:Country", "XMP-iptcCore:CountryCode"]
+# Largest difference in degrees (about 1 m) still taken as the same position; EXIF stores rationals
+POSITION_TOLERANCE = 1e-5
 
-if __name__ == "__main__":
 
-    # Collect XMP files
-    xmp_files = [
-        file for file in WORK_DIR.iterdir() if file.is_file() and file.suffix.lower() == ".xmp"
+def read_xmp_positions(xmp_files: list[Path]) -> dict[Path, tuple[float, float]]:
+    """GPS positions of all XMP sidecars from a single exiftool run."""
+    positions = {}
+    for entry in read_tags(xmp_files, ["GPSLatitude", "GPSLongitude"], numeric=True).values():
+        latitude, longitude = entry.get("GPSLatitude"), entry.get("GPSLongitude")
+        if isinstance(latitude, (int, float)) and isinstance(longitude, (int, float)):
+            positions[Path(entry["SourceFile"])] = (latitude, longitude)
+    return positions
+
+
+def xmp_place_arguments(place: Place) -> list[str]:
+    return [
+        f"-XMP-photoshop:City={place.name}",
+        f"-XMP-photoshop:Country={place.country}",
+        f"-XMP-iptcCore:CountryCode={place.country_code}",
+    ]
+
+
+def place_tag_arguments(place: Place) -> list[str]:
+    """exiftool arguments writing the place as XMP and IPTC City/Country tags."""
+    return [
+        *xmp_place_arguments(place),
+        "-IPTC:CodedCharacterSet=UTF8",
+        f"-IPTC:City={place.name}",
+        f"-IPTC:Country-PrimaryLocationName={place.country}",
+        f"-IPTC:Country-PrimaryLocationCode={place.country_code}",
     ]
 
-    # Find matching JPEG files
-    supported_extensions = {".jpg", ".jpeg"}
+
+def has_geotag(entry: dict, position: tuple[float, float] | None, place: Place | None) -> bool:
+    """Whether a JPEG (as read by `read_tags` with PLAN_TAGS) already has the position and place a run would write."""
+    latitude, longitude = entry.get("GPSLatitude"), entry.get("GPSLongitude")
+    if position is None or not isinstance(latitude, (int, float)) or not isinstance(longitude, (int, float)):
+        return False
+    if abs(latitude - position[0]) > POSITION_TOLERANCE or abs(longitude - position[1]) > POSITION_TOLERANCE:
+        return False
+    return place is None or (
+        entry.get("City") == place.name
+        and entry.get("Country") == place.country
+        and entry.get("CountryCode") == place.country_code
+    )
+
+
+def record_unchanged(plan: WritePlan, journal: Journal) -> tuple[int, int]:
+    """Record the JPEGs that need no writing; the ones that are geotagged themselves are hard-linked into the output folder."""
+    skipped = 0
+    failed = 0
+    for jpeg_path in plan.done:
+        print(f"✓ Skipped {jpeg_path.name} (copy already geotagged)")
+        journal.record(jpeg_path, STATUS_SKIPPED, "copy already geotagged")
+        skipped += 1
+
+    for jpeg_path in plan.unchanged:
+        try:
+            link_file(jpeg_path, OUTPUT_DIR / jpeg_path.name)
+        except OSError as e:
+            print(f"✗ Failed to link {jpeg_path.name}: {e}")
+            journal.record(jpeg_path, STATUS_FAILED, str(e))
+            failed += 1
+            continue
+        print(f"✓ Skipped {jpeg_path.name} (already geotagged)")
+        journal.record(jpeg_path, STATUS_SKIPPED, "already geotagged")
+        skipped += 1
+    return skipped, failed
+
+
+def process_pair(pair: tuple[Path, Path], place: Place | None = None) -> tuple[int, str]:
+    """Copy the location tags of an XMP sidecar into a copy of its JPEG; returns exiftool's exit code and output."""
+    xmp_path, jpeg_path = pair
+    output_path = OUTPUT_DIR / jpeg_path.name
+
+    # Construct the ExifTool command
+    command: list[str] = [
+        "exiftool",
+        '-m', # ignore maker notes offset warning
+        *geotag_arguments(str(xmp_path)),
+        *(place_tag_arguments(place) if place is not None else []),
+        "-o", str(output_path),
+        str(jpeg_path),
+    ]
+
+    # Capture the output so lines of concurrent runs don't interleave
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return process.returncode, process.stdout
+
+
+def write_places_to_sidecars(
+    pairs: list[tuple[Path, Path]], places: dict[Path, Place], journal: Journal
+) -> tuple[int, int]:
+    """
+    Add the places to the XMP sidecars themselves, which already hold the GPS position.
+
+    The JPEGs are not written. Sidecars of the same place are updated with one command.
+    """
+    # Places aren't hashable; group by the tags written
+    by_place: dict[tuple[str, str, str], list[Path]] = {}
+    for xmp_path, _ in pairs:
+        if xmp_path in places:
+            place = places[xmp_path]
+            by_place.setdefault((place.name, place.country, place.country_code), []).append(xmp_path)
+    jpeg_of = {xmp_path: jpeg_path for xmp_path, jpeg_path in pairs}
+
+    processed = 0
+    failed = 0
+    with ExiftoolSession() as session, alive_bar(
+        len(pairs),
+        title="Writing places to sidecars",
+        bar="smooth",
+        spinner="waves",
+        dual_line=True,
+        enrich_print=True,
+    ) as bar:
+        for xmp_path, jpeg_path in pairs:
+            if xmp_path not in places:
+                print(f"✗ Skipped {xmp_path.name} (no GPS position)")
+                journal.record(jpeg_path, STATUS_SKIPPED, "no GPS position in sidecar")
+                failed += 1
+                bar()
+
+        for xmp_paths in by_place.values():
+            place = places[xmp_paths[0]]
+            for i in range(0, len(xmp_paths), CHUNK_SIZE):
+                chunk = xmp_paths[i:i + CHUNK_SIZE]
+                bar.text(f"{len(chunk)} sidecars in {place.name}")
+                before = {xmp_path: xmp_path.stat().st_mtime_ns for xmp_path in chunk}
+                output = session.execute([
+                    "-m", "-overwrite_original", *xmp_place_arguments(place), *(str(xmp_path) for xmp_path in chunk),
+                ])
+                for line in output.splitlines():
+                    line = line.rstrip()
+                    if line:
+                        print(line)
+
+                # Rewritten sidecars tell which files of the chunk made it
+                for xmp_path in chunk:
+                    if xmp_path.stat().st_mtime_ns != before[xmp_path]:
+                        print(f"✓ Processed {xmp_path.name} → {place.name}, {place.country}")
+                        journal.record(jpeg_of[xmp_path], STATUS_OK)
+                        processed += 1
+                    else:
+                        print(f"✗ Failed to process {xmp_path.name}")
+                        journal.record(jpeg_of[xmp_path], STATUS_FAILED)
+                        failed += 1
+                    bar()
+    return processed, failed
+
+
+if __name__ == "__main__":
+    # Optional: "--location-tags" to also write the nearest place as City/Country tags,
+    # with "--sidecars" into the XMP sidecars only
+    location_tags = "--location-tags" in sys.argv[1:]
+    sidecars = "--sidecars" in sys.argv[1:]
+    if sys.argv[1:] not in ([], ["--location-tags"], ["--location-tags", "--sidecars"]):
+        print("Usage: python container_script.py [--location-tags [--sidecars]]")
+        raise SystemExit(1)
+
+    units = load_units(WORK_DIR)
     pairs: list[tuple[Path, Path]] = []
-    for xmp_file in xmp_files:
-        stem = xmp_file.stem
-        for ext in supported_extensions:
-            jpeg_candidate = WORK_DIR / f"{stem}{ext}"
-            if jpeg_candidate.exists():
-                pairs.append((xmp_file, jpeg_candidate))
-                break
+    if units is not None:
+        # Pairs listed in the manifest passed in
+        pairs = [(unit[0], unit[1]) for unit in units]
+    else:
+        # Collect XMP files
+        xmp_files = [
+            file for file in WORK_DIR.iterdir() if file.is_file() and file.suffix.lower() == ".xmp"
+        ]
+
+        # Find matching JPEG files
+        supported_extensions = formats.JPEG.extensions
+        for xmp_file in xmp_files:
+            stem = xmp_file.stem
+            for ext in supported_extensions:
+                jpeg_candidate = WORK_DIR / f"{stem}{ext}"
+                if jpeg_candidate.exists():
+                    pairs.append((xmp_file, jpeg_candidate))
+                    break
 
     if not pairs:
         print(f"No matching XMP + JPEG pairs found in. Abort.")
@@ -33,11 +212,48 @@ if __name__ == "__main__":
     print(f"Found {len(pairs)} XMP + JPEG pairs to process.")
 
     # Ensure output directory exists
-    OUTPUT_DIR.mkdir(exist_ok=True)
+    if not sidecars:
+        OUTPUT_DIR.mkdir(exist_ok=True)
+
+    # Resolve the places of all sidecars with one batch query
+    places: dict[Path, Place] = {}
+    positions: dict[Path, tuple[float, float]] = {}
+    if location_tags or not sidecars:
+        positions = read_xmp_positions([xmp_path for xmp_path, _ in pairs])
+    if location_tags:
+        print("Looking up places...")
+        located = [xmp_path for xmp_path, _ in pairs if xmp_path in positions]
+        places = dict(zip(located, PlaceIndex.load().lookup([positions[xmp_path] for xmp_path in located])))
+        print(f"Found places for {len(places)} of {len(pairs)} sidecars.")
+
+    if sidecars:
+        journal = Journal.from_environment(WORK_DIR)
+        processed, failed = write_places_to_sidecars(pairs, places, journal)
+        journal.close()
+        print(f"Processed: {processed}")
+        print(f"Failed: {failed}")
+        print(f"Output written to: {WORK_DIR}")
+        if failed != 0:
+            print("Completed with failures.")
+            raise SystemExit(1)
+        raise SystemExit(0)
+
+    # One bulk read of the JPEGs and the copies of earlier runs finds the ones already geotagged
+    journal = Journal.from_environment(WORK_DIR)
+    xmp_of = {jpeg_path: xmp_path for xmp_path, jpeg_path in pairs}
+    plan = plan_writes(
+        list(xmp_of), PLAN_TAGS,
+        lambda jpeg_path, entry: has_geotag(entry, positions.get(xmp_of[jpeg_path]), places.get(xmp_of[jpeg_path])),
+        OUTPUT_DIR, numeric=True,
+    )
+    skipped, failed = record_unchanged(plan, journal)
+    if skipped:
+        print(f"Skipped {skipped} JPEGs that already have the geotag of their sidecar.")
+    pairs = [(xmp_of[jpeg_path], jpeg_path) for jpeg_path in plan.changed]
 
     # Process each pair
     processed = 0
-    failed = 0
+    controller = AdaptiveConcurrency.from_environment()
     
     with alive_bar(
         len(pairs),
@@ -47,47 +263,41 @@ if __name__ == "__main__":
         dual_line=True,
         enrich_print=True,
     ) as bar:
-        for xmp_path, jpeg_path in pairs:
+        # Run several exiftool processes at once; the controller adapts their number to the storage
+        for (xmp_path, jpeg_path), result, error in controller.map_unordered(
+            lambda pair: process_pair(pair, places.get(pair[0])), pairs, size=lambda pair: file_size(pair[1])
+        ):
             bar.text(jpeg_path.name)
-            output_path = OUTPUT_DIR / jpeg_path.name
-
-			# Construct the ExifTool command
-            command: list[str] = [
-                "exiftool",
-                '-m', # ignore maker notes offset warning
-                "-tagsfromfile", str(xmp_path),
-                "-location:all",          # copy only location-related tags from XMP
-                "-@", ARGS_FILE,
-                "--Orientation",          # after args file: ignore orientation from XMP
-                "-o", str(output_path),
-                str(jpeg_path),
-            ]
-
-            # Execute exiftool and stream output so the progress bar stays clean
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-            )
-            if process.stdout is not None:
-                for line in process.stdout:
-                    line = line.rstrip()
-                    if line:
-                        print(line)
-            return_code = process.wait()
+            if error is not None:
+                print(f"✗ Failed to process {jpeg_path.name}: {error}")
+                journal.record(jpeg_path, STATUS_FAILED, str(error))
+                failed += 1
+                bar()
+                continue
+
+            return_code, output = result
+            for line in output.splitlines():
+                line = line.rstrip()
+                if line:
+                    print(line)
 
             if return_code != 0:
                 print(f"✗ Failed to process {jpeg_path.name} (exiftool exit code {return_code})")
+                journal.record(jpeg_path, STATUS_FAILED, f"exiftool exit code {return_code}")
                 failed += 1
             else:
-                print(f"✓ Processed {jpeg_path.name}")
+                place = places.get(xmp_path)
+                print(f"✓ Processed {jpeg_path.name}" + (f" → {place.name}, {place.country}" if place is not None else ""))
+                journal.record(jpeg_path, STATUS_OK)
                 processed += 1
 
             bar()
 
+    journal.close()
+    print(controller.summary())
     print(f"Processed: {processed}")
+    if skipped:
+        print(f"Skipped: {skipped} (already geotagged)")
     print(f"Failed: {failed}")
 
     print(f"Output written to: {OUTPUT_DIR}")
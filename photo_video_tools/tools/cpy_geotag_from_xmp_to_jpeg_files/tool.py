@@ -1,6 +1,8 @@
 """Host launcher for the Docker container executing the script of the cpy_geotag_from_xmp_to_jpeg_files tool."""
 
 from pathlib import Path
+from photo_video_tools.geo.places import ensure_places_data
+from photo_video_tools.media import formats
 from photo_video_tools.shared import ToolBase
 
 TOOL_PATH = Path(__file__).parent
@@ -12,11 +14,28 @@ class CopyGeotagFromXmpToJpegFilesTool(ToolBase):
     
     name = "Copy Geotags from XMP to JPEG Files"
     description = "Copy GPS data from XMP sidecars to JPEG files"
-    
+
+    directory_prompt = "Select folder containing XMP + JPG file pairs"
+    container_name = "exiftool"
+    container_dir = CONTAINER_DIR
+    input_extensions = (".xmp",)
+    paired_extensions = formats.JPEG.extensions
+
     @classmethod
-    def run(cls) -> int:
-        return cls.run_default(
-            "Select folder containing XMP + JPG file pairs",
-            CONTAINER_DIR,
-            "exiftool"
-        )
+    def ask_script_args(cls) -> list[str] | None:
+        location_tags = input(
+            "Also write City and Country tags of the nearest place? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        if not location_tags:
+            return []
+        # The container reads the places table through the mounted package
+        try:
+            ensure_places_data()
+        except OSError as e:
+            print(f"Could not download the places table: {e}")
+            return None
+        # The sidecars already hold the GPS position; only the place needs writing then
+        sidecars = input(
+            "Write the places into the XMP sidecars only, leaving the JPEGs untouched? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        return ["--location-tags", "--sidecars"] if sidecars else ["--location-tags"]
@@ -0,0 +1 @@
+"""Extract raw previews tool."""
@@ -0,0 +1,100 @@
+"""Extract the embedded JPEG previews of raw files for fast culling."""
+
+from pathlib import Path
+
+from alive_progress import alive_bar
+
+from photo_video_tools.concurrency import AdaptiveConcurrency
+from photo_video_tools.fastcopy import copy_range
+from photo_video_tools.media import formats, tiff
+from photo_video_tools.shared import select_directory_gui, ToolBase
+
+OUTPUT_SUBDIR = "previews"
+# TIFF-based raws; their previews are referenced from the IFDs
+PREVIEW_FORMATS = (formats.DNG, formats.ARW, formats.NEF, formats.ORF, formats.RW2)
+SUPPORTED_EXTS = tuple(sorted(ext for media_format in PREVIEW_FORMATS for ext in media_format.extensions))
+
+
+def extract_preview(raw_file: Path, output_dir: Path) -> int | None:
+    """
+    Copy the largest embedded JPEG of a raw file to `output_dir` without decoding anything.
+
+    Returns the size of the preview in bytes, or None if the file has no embedded JPEG.
+    """
+    with open(raw_file, "rb") as f:
+        location = tiff.find_largest_jpeg(f)
+    if location is None:
+        return None
+    offset, length = location
+    copy_range(raw_file, output_dir / f"{raw_file.stem}.jpg", offset, length)
+    return length
+
+
+class ExtractRawPreviewsTool(ToolBase):
+    """Extract the embedded JPEG previews of raw files for fast culling."""
+
+    name = "Extract RAW Previews"
+    description = "Copy the embedded full-size JPEG previews of ARW, DNG, NEF, ORF and RW2 files to a subfolder"
+
+    directory_prompt = "Select folder containing RAW files"
+
+    @classmethod
+    def run(cls) -> int:
+        cls.announce()
+
+        work_dir = select_directory_gui(cls.directory_prompt)
+        if work_dir is None:
+            print("No directory selected. Abort.")
+            return 1
+
+        raw_files = [
+            file for file in work_dir.iterdir()
+            if file.is_file() and file.name.lower().endswith(SUPPORTED_EXTS)
+        ]
+
+        if not raw_files:
+            print(f"No supported RAW files found in {work_dir}")
+            return 0
+
+        output_dir = work_dir / OUTPUT_SUBDIR
+        output_dir.mkdir(exist_ok=True)
+
+        processed = 0
+        failed = 0
+        # Extraction only reads a few IFDs and copies the preview bytes, so throughput is bound by the storage
+        controller = AdaptiveConcurrency.from_environment()
+
+        with alive_bar(
+            len(raw_files),
+            title="Extracting previews",
+            bar="smooth",
+            spinner="waves",
+            dual_line=True,
+            enrich_print=True,
+        ) as bar:
+            for raw_file, length, error in controller.map_unordered(
+                lambda raw_file: extract_preview(raw_file, output_dir), raw_files
+            ):
+                bar.text(raw_file.name)
+                if error is not None:
+                    print(f"✗ Failed {raw_file.name}: {error}")
+                    failed += 1
+                elif length is None:
+                    print(f"✗ Failed {raw_file.name} (no embedded JPEG preview found)")
+                    failed += 1
+                else:
+                    print(f"✓ Processed {raw_file.name} ({length / 1024 / 1024:.1f} MB preview)")
+                    processed += 1
+                bar()
+
+        print(controller.summary())
+        print(f"Processed: {processed}")
+        print(f"Failed: {failed}")
+
+        print(f"Output written to: {output_dir}")
+
+        if failed != 0:
+            print("Completed with failures!")
+            return 1
+
+        return 0
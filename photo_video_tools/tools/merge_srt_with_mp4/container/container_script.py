@@ -1,33 +1,174 @@
-"""Add subtitle tracks from SRT files into MP4 video files."""
+"""Add subtitle tracks from SRT files into MP4 video files.
 
-import shutil
+The subtitles are appended to a copy of each video as a new track, or to the video itself
+with "--in-place", so only the metadata is written; videos with a box layout that can't be
+edited this way are remuxed with ffmpeg.
+DJI telemetry subtitles (one cue per frame) can be compacted first.
+"""
+
+import os
 import subprocess
+import sys
 from pathlib import Path
 
 from alive_progress import alive_bar
 
+from photo_video_tools.fastcopy import PARTIAL_SUFFIX, copy_file
+from photo_video_tools.manifest import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, Journal, load_units
+from photo_video_tools.media.dji_srt import DEFAULT_DROP_FIELDS, compact_srt
+from photo_video_tools.media.mp4_edit import UnsupportedLayout
+from photo_video_tools.media.subtitles import add_subtitle_track
+
 
 WORK_DIR = Path("/work")
 TEMP_DIR = Path("/tmp/processing")
 OUTPUT_DIR = WORK_DIR / "videos_with_merged_subtitles"
 
 
-if __name__ == "__main__":
+def read_subtitle_codecs(mp4_file: Path) -> list[str] | None:
+    """Codecs of the subtitle tracks of a video as ffprobe reads them; None if it can't be read."""
+    # Reading the streams only parses the metadata
+    probe = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "s",
+            "-show_entries", "stream=codec_name", "-of", "csv=p=0", str(mp4_file),
+        ],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    if probe.returncode != 0:
+        return None
+    return [line.strip() for line in probe.stdout.splitlines() if line.strip()]
+
+
+def add_verified_track(srt_file: Path, mp4_file: Path) -> int:
+    """
+    Append the subtitle track to a video, then read it back with ffprobe.
+
+    Only the new samples and the rebuilt metadata are written. Returns the number of bytes written.
+    """
+    written = add_subtitle_track(mp4_file, srt_file)
+    codecs = read_subtitle_codecs(mp4_file)
+    if codecs is None or "mov_text" not in codecs:
+        raise RuntimeError(f"Subtitle track not readable after writing ({codecs})")
+    return written
+
+
+def add_track_to_copy(srt_file: Path, mp4_file: Path, final_output: Path) -> int:
+    """
+    Copy the video into the output folder and append the subtitle track to the copy.
+
+    The copy is done kernel-side (a reflink on file systems that support it) and only moved
+    into the output folder once the track reads back. Returns the number of bytes written.
+    """
+    partial = final_output.with_name(f".{final_output.name}{PARTIAL_SUFFIX}")
+    try:
+        copy_file(mp4_file, partial)
+        written = add_verified_track(srt_file, partial)
+        os.replace(partial, final_output)
+        return written
+    finally:
+        partial.unlink(missing_ok=True)
+
 
-    # Collect SRT files
-    srt_files = [
-        file for file in WORK_DIR.iterdir() if file.is_file() and file.suffix.lower() == ".srt"
+def remux_with_ffmpeg(srt_file: Path, mp4_file: Path, final_output: Path) -> bool:
+    temp_input = TEMP_DIR / f"in_{mp4_file.name}"
+    temp_output = TEMP_DIR / f"out_{mp4_file.name}"
+
+    try:
+        copy_file(mp4_file, temp_input)
+    except Exception as e:
+        print(f"✗ Failed to copy {mp4_file.name} into container: {e}")
+        return False
+
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "warning",
+        "-y",
+        "-i", str(temp_input),
+        "-i", str(srt_file),
+        "-map_metadata", "0",
+        "-c", "copy",
+        "-c:s", "mov_text",
+        str(temp_output),
     ]
 
-    # Find matching MP4 files
+    # Execute ffmpeg and stream output so the progress bar stays clean
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    )
+    if process.stdout is not None:
+        for line in process.stdout:
+            line = line.rstrip()
+            if line:
+                print(line)
+    return_code = process.wait()
+
+    success = False
+    if return_code != 0:
+        print(f"✗ Failed to process {mp4_file.name} (ffmpeg exit code {return_code})")
+    else:
+        try:
+            # Lands under a temporary name first, so the host never sees a partial video
+            copy_file(temp_output, final_output)
+            success = True
+        except Exception as e:
+            print(f"✗ Failed to copy {mp4_file.name} back to host: {e}")
+
+    # Cleanup temp files
+    temp_input.unlink(missing_ok=True)
+    temp_output.unlink(missing_ok=True)
+    return success
+
+
+def parse_args(args: list[str]) -> tuple[float | None, tuple[str, ...]]:
+    """Optional "--compact <cues per second> [<field>,<field>...]": rate of the compacted subtitles and fields to drop."""
+    if not args:
+        return None, DEFAULT_DROP_FIELDS
+    if args[0] != "--compact" or len(args) not in (2, 3):
+        raise ValueError("Invalid arguments")
+    rate = float(args[1])
+    if rate <= 0:
+        raise ValueError("The rate must be positive")
+    drop_fields = tuple(name for name in args[2].split(",") if name) if len(args) == 3 else DEFAULT_DROP_FIELDS
+    return rate, drop_fields
+
+
+if __name__ == "__main__":
+    # "--in-place" appends the tracks to the videos themselves instead of copies in the output folder
+    args = sys.argv[1:]
+    in_place = "--in-place" in args
+    if in_place:
+        args.remove("--in-place")
+    try:
+        compact_rate, drop_fields = parse_args(args)
+    except ValueError:
+        print("Usage: python container_script.py [--compact <cues per second> [<field>,<field>...]] [--in-place]")
+        raise SystemExit(1)
+
+    units = load_units(WORK_DIR)
     pairs: list[tuple[Path, Path]] = []
-    for srt_file in srt_files:
-        stem = srt_file.stem
-        for ext in [".mp4", ".MP4"]:
-            mp4_candidate = WORK_DIR / f"{stem}{ext}"
-            if mp4_candidate.exists():
-                pairs.append((srt_file, mp4_candidate))
-                break
+    if units is not None:
+        # Pairs listed in the manifest passed in
+        pairs = [(unit[0], unit[1]) for unit in units]
+    else:
+        # Collect SRT files
+        srt_files = [
+            file for file in WORK_DIR.iterdir() if file.is_file() and file.suffix.lower() == ".srt"
+        ]
+
+        # Find matching MP4 files
+        for srt_file in srt_files:
+            stem = srt_file.stem
+            for ext in [".mp4", ".MP4"]:
+                mp4_candidate = WORK_DIR / f"{stem}{ext}"
+                if mp4_candidate.exists():
+                    pairs.append((srt_file, mp4_candidate))
+                    break
     
     if not pairs:
         print("No matching SRT + MP4 pairs found. Abort.")
@@ -41,7 +182,9 @@ if __name__ == "__main__":
     
     # Process each pair
     processed = 0
+    skipped = 0
     failed = 0
+    journal = Journal.from_environment(WORK_DIR)
     
     with alive_bar(
         len(pairs),
@@ -52,77 +195,95 @@ if __name__ == "__main__":
         enrich_print=True,
     ) as bar:
         for srt_file, mp4_file in pairs:
+            final_output = mp4_file if in_place else OUTPUT_DIR / mp4_file.name
 
-            # Copy file into container for fast processing
-            bar.text(f"Copying {mp4_file.name} into container")
+            # The original itself is written, so a rerun must not add a second track
+            if in_place and read_subtitle_codecs(mp4_file):
+                print(f"- Skipped {mp4_file.name} (already has a subtitle track)")
+                journal.record(mp4_file, STATUS_SKIPPED, "already has a subtitle track")
+                skipped += 1
+                bar()
+                continue
 
-            temp_input = TEMP_DIR / f"in_{mp4_file.name}"
-            temp_output = TEMP_DIR / f"out_{mp4_file.name}"
-            
+            # One cue per frame makes a huge text track; keep a few per second
+            compacted = None
+            if compact_rate is not None:
+                bar.text(f"Compacting {srt_file.name}")
+                compacted = TEMP_DIR / srt_file.name
+                try:
+                    stats = compact_srt(srt_file, compacted, compact_rate, drop_fields)
+                    print(
+                        f"  {srt_file.name}: {stats.cues_in} → {stats.cues_out} cues, "
+                        f"{stats.bytes_in / 1024:.0f} → {stats.bytes_out / 1024:.0f} KB ({stats.ratio:.1f}x smaller)"
+                    )
+                    srt_file = compacted
+                except Exception as e:
+                    print(f"✗ Failed to compact {srt_file.name}: {e}")
+                    journal.record(mp4_file, STATUS_FAILED, str(e))
+                    failed += 1
+                    compacted.unlink(missing_ok=True)
+                    bar()
+                    continue
+
+            # Append the subtitle track to the video or a copy of it, rewriting only its metadata
+            bar.text(f"Adding subtitle track to {mp4_file.name}")
             try:
-                shutil.copy2(mp4_file, temp_input)
+                if in_place:
+                    written = add_verified_track(srt_file, mp4_file)
+                else:
+                    written = add_track_to_copy(srt_file, mp4_file, final_output)
+                print(f"✓ Processed {mp4_file.name} ({written / 1024:.0f} KB written)")
+                journal.record(mp4_file, STATUS_OK)
+                processed += 1
+                if compacted is not None:
+                    compacted.unlink(missing_ok=True)
+                bar()
+                continue
+            except UnsupportedLayout as e:
+                # Raised before anything is written
+                print(f"  {mp4_file.name}: {e}, remuxing with ffmpeg")
+            except RuntimeError as e:
+                if in_place:
+                    # The track was appended already, a remux of the original would add a second one
+                    print(f"✗ Failed to process {mp4_file.name}: {e}")
+                    journal.record(mp4_file, STATUS_FAILED, str(e))
+                    failed += 1
+                    if compacted is not None:
+                        compacted.unlink(missing_ok=True)
+                    bar()
+                    continue
+                print(f"  {mp4_file.name}: {e}, remuxing with ffmpeg")
             except Exception as e:
-                print(f"✗ Failed to copy {mp4_file.name} into container: {e}")
+                print(f"✗ Failed to process {mp4_file.name}: {e}")
+                journal.record(mp4_file, STATUS_FAILED, str(e))
                 failed += 1
+                if compacted is not None:
+                    compacted.unlink(missing_ok=True)
                 bar()
                 continue
-                    
-            # Process on container's filesystem (turned out to be faster)
-            bar.text(f"Processing {mp4_file.name}")
-
-            command = [
-                "ffmpeg",
-                "-hide_banner",
-                "-loglevel", "warning",
-                "-y",
-                "-i", str(temp_input),
-                "-i", str(srt_file),
-                "-map_metadata", "0",
-                "-c", "copy",
-                "-c:s", "mov_text",
-                str(temp_output),
-            ]
-
-            # Execute ffmpeg and stream output so the progress bar stays clean
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-            )
-            if process.stdout is not None:
-                for line in process.stdout:
-                    line = line.rstrip()
-                    if line:
-                        print(line)
-            return_code = process.wait()
-
-            if return_code != 0:
-                print(f"✗ Failed to process {mp4_file.name} (ffmpeg exit code {return_code})")
-                failed += 1
+
+            # Fallback: full remux, on the container's filesystem (turned out to be faster);
+            # in place, the remuxed file replaces the original
+            bar.text(f"Copying {mp4_file.name} into container")
+            if remux_with_ffmpeg(srt_file, mp4_file, final_output):
+                print(f"✓ Processed {mp4_file.name} (remuxed)")
+                journal.record(mp4_file, STATUS_OK)
+                processed += 1
             else:
-                # Copy result back to mount
-                bar.text(f"Copying back {mp4_file.name} to host")
-                final_output = OUTPUT_DIR / mp4_file.name
-                try:
-                    shutil.copy2(temp_output, final_output)
-                    print(f"✓ Processed {mp4_file.name}")
-                    processed += 1
-                except Exception as e:
-                    print(f"✗ Failed to copy {mp4_file.name} back to host: {e}")
-                    failed += 1
-            
-            # Cleanup temp files
-            temp_input.unlink(missing_ok=True)
-            temp_output.unlink(missing_ok=True)
+                journal.record(mp4_file, STATUS_FAILED)
+                failed += 1
 
+            if compacted is not None:
+                compacted.unlink(missing_ok=True)
             bar()
 
+    journal.close()
     print(f"Processed: {processed}")
+    if skipped:
+        print(f"Skipped: {skipped}")
     print(f"Failed: {failed}")
     
-    print(f"Output written to: {OUTPUT_DIR}")
+    print(f"Output written to: {WORK_DIR if in_place else OUTPUT_DIR}")
 
     if failed != 0:
         print("Completed with failures!")
@@ -5,6 +5,7 @@ from photo_video_tools.shared import ToolBase
 
 TOOL_PATH = Path(__file__).parent
 CONTAINER_DIR = TOOL_PATH / "container"
+DEFAULT_CUE_RATE_HZ = 1.0
 
 
 class MergeSrtWithMp4Tool(ToolBase):
@@ -12,11 +13,38 @@ class MergeSrtWithMp4Tool(ToolBase):
     
     name = "Merge SRT with MP4"
     description = "Merge SRT subtitle files into MP4 videos as a subtitle track"
-    
+
+    directory_prompt = "Select the folder containing MP4 + SRT file pairs"
+    container_name = "ffmpeg"
+    container_dir = CONTAINER_DIR
+    input_extensions = (".srt",)
+    paired_extensions = (".mp4",)
+
     @classmethod
-    def run(cls) -> int:
-        return cls.run_default(
-            "Select the folder containing MP4 + SRT file pairs", 
-            CONTAINER_DIR, 
-            "ffmpeg"
-        )
+    def ask_script_args(cls) -> list[str] | None:
+        # Only the subtitle samples and the metadata are written, so there is no need for a copy of each clip
+        in_place = input(
+            "Add the subtitle tracks to the videos themselves instead of copies? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        output_args = ["--in-place"] if in_place else []
+
+        answer = input("Compact DJI telemetry subtitles (fewer cues, unused fields dropped) before merging? (y/N): ").strip().lower()
+        if answer not in ("y", "yes"):
+            return output_args
+
+        # Cues closer together than 1/rate are merged into the previous one
+        rate = None
+        while rate is None:
+            user_input = input(f"Subtitle cues per second (Enter for {DEFAULT_CUE_RATE_HZ}): ").strip()
+            if not user_input:
+                rate = DEFAULT_CUE_RATE_HZ
+                break
+            try:
+                rate = float(user_input)
+            except ValueError:
+                rate = None
+            if rate is None or rate <= 0:
+                print("Invalid rate. Please enter a positive number.")
+                rate = None
+
+        return ["--compact", str(rate), *output_args]
@@ -0,0 +1 @@
+"""Metadata pipeline tool."""
@@ -0,0 +1,186 @@
+"""Apply an ordered list of metadata edits to image files with as few exiftool writes per file as possible.
+
+Most step lists compile into a single write. With geotag steps between other steps, the
+writes run one after another: the first writes a copy into a stage folder inside the
+output folder, each next one writes the copy of the previous stage into the next, and the
+last into the output folder itself, so a failed write never leaves a half-edited copy there.
+"""
+
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from alive_progress import alive_bar
+
+from photo_video_tools.exiftool import ExiftoolSession, copy_written, existing_copies, sidecar_path
+from photo_video_tools.fastcopy import copy_file
+from photo_video_tools.manifest import STATUS_FAILED, STATUS_OK, Journal, load_units
+from photo_video_tools.media import formats
+from photo_video_tools.pipeline import Write, compile_steps, geotag_arguments, parse_steps
+
+WORK_DIR = Path("/work")
+OUTPUT_DIR = WORK_DIR / "photos_with_pipeline_edits"
+SUPPORTED_EXTENSIONS = formats.supported_extensions(formats.KIND_IMAGE, formats.KIND_RAW)
+# Files per exiftool command
+CHUNK_SIZE = 500
+
+
+def stage_dir(index: int, count: int) -> Path:
+    """Where write `index` of `count` puts its copies; the last one writes into the output folder."""
+    return OUTPUT_DIR if index == count - 1 else OUTPUT_DIR / f".pipeline-stage-{index + 1}"
+
+
+def batch_commands(
+    sources: dict[Path, Path], write: Write, target_dir: Path,
+) -> tuple[list[tuple[list[Path], list[str]]], list[Path]]:
+    """
+    The exiftool commands of one write, each with the files it writes, and the files it leaves unchanged.
+
+    `sources` maps each file to its copy from the previous write (or to itself for the
+    first). A geotag write copies each file's sidecar, named per file with a `%f` format
+    and grouped by its folder and extension; files without a sidecar are left unchanged.
+    """
+    # Files by the tag arguments of their command
+    groups: dict[tuple[str, ...], list[Path]] = {}
+    unchanged = []
+    for file in sources:
+        if not write.geotag:
+            groups.setdefault(tuple(write.arguments), []).append(file)
+            continue
+        sidecar = sidecar_path(file)
+        if sidecar.exists():
+            groups.setdefault(tuple(geotag_arguments(f"{sidecar.parent}/%f{sidecar.suffix}")), []).append(file)
+        else:
+            unchanged.append(file)
+
+    commands = []
+    for tag_arguments, group in groups.items():
+        for i in range(0, len(group), CHUNK_SIZE):
+            chunk = group[i:i + CHUNK_SIZE]
+            commands.append((chunk, [
+                "-m", # ignore maker notes offset warning
+                *tag_arguments,
+                "-o", f"{target_dir}/",  # Trailing slash: keep the file names
+                *(str(sources[file]) for file in chunk),
+            ]))
+    return commands, unchanged
+
+
+def run_write(
+    session: ExiftoolSession, write: Write, sources: dict[Path, Path], target_dir: Path,
+) -> dict[Path, Path]:
+    """Apply one write to the files; returns the new copy of each file that made it."""
+    commands, unchanged = batch_commands(sources, write, target_dir)
+    results = {}
+    for files, command in commands:
+        existed = existing_copies(files, target_dir)
+        output = session.execute(command)
+        for line in output.splitlines():
+            line = line.rstrip()
+            if line:
+                print(line)
+        # The copies the write created tell which files of the batch made it
+        results.update({file: target_dir / file.name for file in files if copy_written(file, target_dir, existed)})
+
+    for file in unchanged:
+        target = target_dir / file.name
+        try:
+            if target.exists():
+                print(f"{target} already exists")
+            elif sources[file] == file:
+                copy_file(file, target)
+                results[file] = target
+            else:
+                os.replace(sources[file], target)
+                results[file] = target
+        except OSError as e:
+            print(f"Failed to copy {file.name}: {e}")
+    return results
+
+
+if __name__ == "__main__":
+    try:
+        steps = parse_steps(sys.argv[1:])
+    except ValueError as e:
+        print(e)
+        print("Usage: python container_script.py <step> [<step> ...]")
+        print("Steps: shift=<sign><hours>:<minutes>, timezone=<sign><hours>:<minutes>, geotag")
+        print("Example: python container_script.py shift=-9:00 timezone=+02:00 geotag")
+        raise SystemExit(1)
+    compiled = compile_steps(steps)
+
+    # Get all image and RAW files in the directory, or the ones listed in the manifest passed in
+    units = load_units(WORK_DIR)
+    if units is not None:
+        image_files = [unit[0] for unit in units]
+    else:
+        image_files = sorted(
+            file for file in WORK_DIR.iterdir()
+            if file.is_file() and file.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
+
+    if not image_files:
+        print("No supported image files found. Abort.")
+        raise SystemExit(0)
+
+    print(f"Found {len(image_files)} image files to process.")
+    print(f"Steps: {', '.join(str(step) for step in steps)}")
+    for line in compiled.describe():
+        print(f"  {line}")
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    writes = compiled.writes
+    stages = [stage_dir(i, len(writes)) for i in range(len(writes) - 1)]
+    for stage in stages:
+        # Left over from an interrupted run
+        shutil.rmtree(stage, ignore_errors=True)
+        stage.mkdir()
+
+    processed = 0
+    failed = 0
+    journal = Journal.from_environment(WORK_DIR)
+
+    with ExiftoolSession() as session, alive_bar(
+        len(image_files),
+        title="Applying pipeline",
+        bar="smooth",
+        spinner="waves",
+        dual_line=True,
+        enrich_print=True,
+    ) as bar:
+        sources = {file: file for file in image_files}
+        for index, write in enumerate(writes):
+            bar.text(f"Write {index + 1} of {len(writes)}: {write.describe()}")
+            results = run_write(session, write, sources, stage_dir(index, len(writes)))
+            for image_file, source in sources.items():
+                if source != image_file:
+                    # The previous stage's copy is no longer needed
+                    source.unlink(missing_ok=True)
+                if image_file not in results:
+                    print(f"✗ Failed to process {image_file.name}")
+                    journal.record(image_file, STATUS_FAILED)
+                    failed += 1
+                    bar()
+            sources = results
+
+        for image_file in sources:
+            print(f"✓ Processed {image_file.name}")
+            journal.record(image_file, STATUS_OK)
+            processed += 1
+            bar()
+
+    for stage in stages:
+        shutil.rmtree(stage, ignore_errors=True)
+
+    journal.close()
+    print(f"Processed: {processed}")
+    print(f"Failed: {failed}")
+
+    print(f"Output written to: {OUTPUT_DIR}")
+
+    if failed != 0:
+        print("Completed with failures!")
+        raise SystemExit(1)
+
+    raise SystemExit(0)
@@ -0,0 +1,63 @@
+"""Host launcher for the Docker container executing the script of the metadata_pipeline tool."""
+
+from pathlib import Path
+from photo_video_tools.media import formats
+from photo_video_tools.pipeline import GEOTAG, SHIFT, TIMEZONE, Step, compile_steps, parse_amount
+from photo_video_tools.shared import parse_timezone_input, ToolBase
+
+TOOL_PATH = Path(__file__).parent
+CONTAINER_DIR = TOOL_PATH / "container"
+
+STEP_CHOICES = {
+    "1": (SHIFT, "Shift time and timezone"),
+    "2": (TIMEZONE, "Add timezone information"),
+    "3": (GEOTAG, "Copy geotags from the XMP sidecar"),
+}
+
+
+class MetadataPipelineTool(ToolBase):
+    """Apply several metadata edits to each photo with a single write."""
+
+    name = "Metadata Pipeline"
+    description = "Shift time, add timezone and copy geotags in one pass, writing each photo once"
+
+    directory_prompt = "Select folder containing image files"
+    container_name = "exiftool"
+    container_dir = CONTAINER_DIR
+    input_extensions = tuple(sorted(formats.supported_extensions(formats.KIND_IMAGE, formats.KIND_RAW)))
+
+    @classmethod
+    def ask_script_args(cls) -> list[str] | None:
+        print("Steps, applied in the order entered:")
+        for key, (_, label) in STEP_CHOICES.items():
+            print(f"  {key}. {label}")
+
+        steps: list[Step] = []
+        while True:
+            choice = input(f"Step {len(steps) + 1} (1-{len(STEP_CHOICES)}; Enter to finish): ").strip()
+            if not choice:
+                break
+            if choice not in STEP_CHOICES:
+                print(f"Invalid choice: {choice}")
+                continue
+
+            operation = STEP_CHOICES[choice][0]
+            if operation == GEOTAG:
+                steps.append(Step(GEOTAG))
+                continue
+            prompt = "time offset (e.g., -9:00, 5:30)" if operation == SHIFT else "offset from UTC (e.g., -9:00, 5:30)"
+            amount = None
+            while amount is None:
+                amount = parse_timezone_input(input(f"  Enter the {prompt}: "))
+                if amount is None:
+                    print("Invalid timezone offset format. Please try again.")
+            steps.append(Step(operation, parse_amount(amount)))
+
+        if not steps:
+            print("No steps entered. Abort.")
+            return None
+
+        print("Each photo is written once with:")
+        for line in compile_steps(steps).describe():
+            print(f"  {line}")
+        return [str(step) for step in steps]
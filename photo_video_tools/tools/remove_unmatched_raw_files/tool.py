@@ -1,10 +1,12 @@
 """Move files without a matching counterpart (by filename stem) to a subfolder."""
 
 import shutil
+from pathlib import Path
 
 from alive_progress import alive_bar
 
-from photo_video_tools.shared import select_directory_gui, ToolBase
+from photo_video_tools.archives import ARCHIVE_FILETYPES, Archive, ArchiveMember, extract_member
+from photo_video_tools.shared import select_directory_gui, select_file_gui, ToolBase
 
 
 def parse_extensions_input(input_str: str) -> set[str] | None:
@@ -27,6 +29,26 @@ def ask_extensions(prompt: str) -> set[str] | None:
         print("Please enter at least one file extension, e.g. 'arw' or 'jpg, jpeg'.")
 
 
+def ask_source(label: str, extensions: set[str]) -> Path | None:
+    """Ask whether the files are in a folder or a ZIP/TAR archive and let the user pick it."""
+
+    from_archive = input(f"Are the {label} files in a folder or a ZIP/TAR archive? (F/a): ").strip().lower() in ["a", "archive"]
+    title = f"Select {'archive' if from_archive else 'folder'} containing {label} files ({', '.join(sorted(extensions))})"
+    return select_file_gui(title, ARCHIVE_FILETYPES) if from_archive else select_directory_gui(title)
+
+
+def list_files(source: Path | Archive, extensions: set[str]) -> list[Path] | list[ArchiveMember]:
+    """Files of a folder, or members of an archive, with one of the extensions."""
+
+    if isinstance(source, Archive):
+        return [member for member in source.members if member.suffix.lower() in extensions]
+    return [file for file in source.iterdir() if file.is_file() and file.suffix.lower() in extensions]
+
+
+def open_source(path: Path) -> Path | Archive:
+    return Archive(path) if path.is_file() else path
+
+
 class RemoveUnmatchedRawFilesTool(ToolBase):
     """Move files without a matching counterpart (by filename stem) to a subfolder."""
 
@@ -56,31 +78,35 @@ class RemoveUnmatchedRawFilesTool(ToolBase):
             )
             return 1
 
-        template_dir = select_directory_gui(
-            f"Select folder containing template files ({', '.join(sorted(template_extensions))})"
-        )
+        template_dir = ask_source("template", template_extensions)
         if template_dir is None:
-            print("No template directory selected. Abort.")
+            print("No template folder or archive selected. Abort.")
             return 1
 
-        target_dir = select_directory_gui(
-            f"Select folder containing files to check ({', '.join(sorted(target_extensions))})"
-        )
+        target_dir = ask_source("target", target_extensions)
         if target_dir is None:
-            print("No target directory selected. Abort.")
+            print("No target folder or archive selected. Abort.")
+            return 1
+
+        # Archives are matched by their member names alone, without reading any data
+        try:
+            template_source = open_source(template_dir)
+            target_source = open_source(target_dir)
+        except (OSError, ValueError) as e:
+            print(f"Could not read archive: {e}")
             return 1
 
         # Collect template file stems
-        template_file_stems = {
-            file.stem for file in template_dir.iterdir()
-            if file.is_file() and file.suffix.lower() in template_extensions
-        }
+        template_file_stems = {file.stem for file in list_files(template_source, template_extensions)}
+        if isinstance(template_source, Archive):
+            template_source.close()
 
         # Collect target files
-        target_files = [
-            file for file in target_dir.iterdir()
-            if file.is_file() and file.suffix.lower() in target_extensions
-        ]
+        target_files = list_files(target_source, target_extensions)
+
+        if isinstance(target_source, Archive):
+            with target_source:
+                return cls.extract_matched(target_source, target_files, template_file_stems, target_extensions)
 
         # Find unmatched target files
         unmatched_files = [
@@ -142,3 +168,75 @@ class RemoveUnmatchedRawFilesTool(ToolBase):
             return 1
 
         return 0
+
+    @classmethod
+    def extract_matched(
+        cls,
+        archive: Archive,
+        target_files: list[ArchiveMember],
+        template_file_stems: set[str],
+        target_extensions: set[str],
+    ) -> int:
+        """
+        Extract the target files of an archive that have a counterpart into a folder next to it.
+
+        Files can't be moved out of an archive, so the archive is left unchanged and the
+        folder gets what would remain after moving the unmatched files away.
+        """
+        matched_files = [member for member in target_files if member.stem in template_file_stems]
+        unmatched = len(target_files) - len(matched_files)
+        print(f"Unmatched files in {archive.path.name}: {unmatched} of {len(target_files)}")
+        if not matched_files:
+            print("No matched files to extract.")
+            return 0
+
+        extensions_label = "_".join(sorted(ext.lstrip('.') for ext in target_extensions))
+        output_dir = archive.path.parent / f"{archive.path.stem}_matched_{extensions_label}_files"
+        confirm = input(
+            f"The archive can't be changed. Extract the {len(matched_files)} matched files to {output_dir}? "
+            "Type YES to confirm: "
+        ).strip()
+        if confirm.lower() not in ['yes', 'y']:
+            print("Operation cancelled.")
+            return 1
+        output_dir.mkdir(exist_ok=True)
+
+        extracted = 0
+        failed = 0
+
+        with alive_bar(
+            len(matched_files),
+            title="Extracting matched files",
+            bar="smooth",
+            spinner="waves",
+            dual_line=True,
+            enrich_print=True,
+        ) as bar:
+            for member in matched_files:
+                bar.text(f"Extracting {member.name}")
+                dest = output_dir / member.name
+                try:
+                    if dest.exists():
+                        raise FileExistsError(f"{dest.name} already exists in {output_dir.name}")
+                    extract_member(member, dest)
+                    extracted += 1
+                except Exception as e:
+                    print(f"✗ Failed to extract {member.path}: {e}")
+                    failed += 1
+                    bar()
+                    continue
+
+                print(f"✓ Extracted {member.path}")
+                bar()
+
+        print(f"Unmatched: {unmatched}")
+        print(f"Extracted: {extracted}")
+        print(f"Failed: {failed}")
+
+        print(f"Output written to: {output_dir}")
+
+        if failed != 0:
+            print("Completed with failures.")
+            return 1
+
+        return 0
@@ -1,47 +1,330 @@
-"""Shift time and timezone of image files using ExifTool."""
+"""Shift time and timezone of image files using ExifTool, and of videos by patching their recording times in place."""
 
+import os
+import re
 import sys
 import subprocess
+from datetime import datetime, timedelta
 from pathlib import Path
 from alive_progress import alive_bar
 
+from photo_video_tools.concurrency import AdaptiveConcurrency
+from photo_video_tools.exiftool import (
+	ExiftoolSession,
+	copy_written,
+	existing_copies,
+	read_tags,
+	sidecar_path,
+	write_sidecars,
+)
+from photo_video_tools.fastcopy import PARTIAL_SUFFIX, copy_file
+from photo_video_tools.manifest import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, Journal, load_units
+from photo_video_tools.media import formats, isobmff, mp4_times
+from photo_video_tools.pipeline import format_amount, format_shift, parse_amount, shift_arguments, shifts_offset
+
 WORK_DIR = Path("/work")
 OUTPUT_DIR = WORK_DIR / "photos_with_corrected_timezone"
-SUPPORTED_EXTENSIONS = {'.dng', '.arw', '.jpg', '.jpeg'}
+SUPPORTED_EXTENSIONS = formats.supported_extensions(formats.KIND_IMAGE, formats.KIND_RAW, formats.KIND_VIDEO)
+# Videos have no DateTimeOriginal; exiftool reports their QuickTime creation time as CreateDate
+CAMERA_TAGS = ["Make", "Model", "SerialNumber", "InternalSerialNumber", "DateTimeOriginal", "CreateDate"]
+# Tags of a file that tell the offset to write into its sidecar
+OFFSET_SOURCE_TAGS = ["DateTimeOriginal", "OffsetTimeOriginal", "OffsetTime"]
+# Offset at the end of an XMP date
+XMP_OFFSET = re.compile(r"[+-]\d{2}:\d{2}$|Z$")
+# Files per exiftool command when writing sidecars
+CHUNK_SIZE = 500
 
 
-if __name__ == "__main__":
-	# Parse timezone offset from command-line argument in format <hours>:<minutes>
-	if len(sys.argv) != 2:
-		print("Usage: python container_script.py <sign><hours>:<minutes>")
-		print("Example: python container_script.py -9:30")
-		raise SystemExit(1)
-	timezone_offset = sys.argv[1]
+def process_image(image_file: Path, shift: timedelta) -> tuple[int, str]:
+	"""Shift the time and timezone tags in a copy of one image; returns exiftool's exit code and output."""
+	output_path = OUTPUT_DIR / image_file.name
+	command = [
+		"exiftool",
+		'-m', # ignore maker notes offset warning
+		*shift_arguments(shift),
+		"-o", str(output_path),  # Write corrected copy to output directory
+		str(image_file),
+	]
+
+	# Capture the output so lines of concurrent runs don't interleave
+	process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+	return process.returncode, process.stdout
+
+
+def is_video(file: Path) -> bool:
+	return file.suffix.lower() in isobmff.VIDEO_EXTENSIONS
+
+
+def shift_video(video_file: Path, shift: timedelta, in_place: bool) -> int:
+	"""
+	Shift the recording times of one video; returns the number of fields changed.
+
+	Only the time fields inside `moov` are overwritten, never the media data. Without
+	`in_place` a copy in the output folder is patched; the copy is done kernel-side
+	(a reflink on file systems that support it).
+	"""
+	if in_place:
+		return len(mp4_times.shift_times(video_file, shift, shifts_offset(shift)))
+
+	output_path = OUTPUT_DIR / video_file.name
+	partial = output_path.with_name(f".{output_path.name}{PARTIAL_SUFFIX}")
+	try:
+		copy_file(video_file, partial)
+		patches = mp4_times.shift_times(partial, shift, shifts_offset(shift))
+		os.replace(partial, output_path)
+		return len(patches)
+	finally:
+		partial.unlink(missing_ok=True)
 
-	# Get all ARW and JPEG files in the directory
-	image_files = [
-		file for file in WORK_DIR.iterdir()
-		if file.is_file() and file.suffix.lower() in SUPPORTED_EXTENSIONS
+
+def parse_shift(value: str) -> timedelta | None:
+	"""Parse '<sign><hours>:<minutes>[:<seconds>]' into a timedelta."""
+	value = value.strip()
+	sign = -1 if value.startswith("-") else 1
+	parts = value.lstrip("+-").split(":")
+	if len(parts) not in (2, 3):
+		return None
+	try:
+		hours, minutes, seconds = (int(part) for part in parts + ["0"] * (3 - len(parts)))
+	except ValueError:
+		return None
+	if not (0 <= minutes < 60 and 0 <= seconds < 60):
+		return None
+	return sign * timedelta(hours=hours, minutes=minutes, seconds=seconds)
+
+
+def sidecar_arguments(shift: timedelta, offset: str | None) -> list[str]:
+	"""exiftool arguments writing the shifted capture times of a file into its XMP sidecar, with `offset` appended if known."""
+	# The dates are taken from the file itself, so writing the sidecars again doesn't shift twice
+	suffix = offset or ""
+	return [
+		"-globalTimeShift", format_shift(shift),
+		f"-XMP-exif:DateTimeOriginal<${{DateTimeOriginal}}{suffix}",
+		f"-XMP-photoshop:DateCreated<${{DateTimeOriginal}}{suffix}",
+		f"-XMP-xmp:CreateDate<${{CreateDate}}{suffix}",
+		f"-XMP-xmp:ModifyDate<${{ModifyDate}}{suffix}",
 	]
 
-	if not image_files:
-		print(f"No supported image files found. Abort.")
-		raise SystemExit(0)
-	
-	print(f"Found {len(image_files)} image files to process.")
 
-	# Ensure output directory exists
-	OUTPUT_DIR.mkdir(exist_ok=True)
+def parse_offset(value) -> timedelta | None:
+	"""The offset of an EXIF offset tag ('+02:00') or at the end of an XMP date ('2024:05:12 14:33:10+02:00')."""
+	match = XMP_OFFSET.search(str(value or "").strip())
+	if match is None:
+		return None
+	if match.group(0) == "Z":
+		return timedelta(0)
+	return parse_amount(match.group(0))
+
+
+def sidecar_offset(entry: dict, sidecar_entry: dict, shift: timedelta) -> str | None:
+	"""
+	The offset to write into a file's sidecar along with the dates shifted by `shift`; None if there is none.
+
+	Like in file mode, the offset moves along with a time zone change and stays for clock drift.
+	It starts from the offset already in the sidecar (e.g. from Add Timezone), else the file's
+	OffsetTimeOriginal. A sidecar date that differs from the file's is an earlier shift of this
+	tool, which is undone first, so writing the sidecars again doesn't shift the offset twice.
+	"""
+	offset = parse_offset(sidecar_entry.get("DateTimeOriginal"))
+	if offset is not None:
+		file_time = parse_exif_time(entry.get("DateTimeOriginal"))
+		sidecar_time = parse_exif_time(sidecar_entry.get("DateTimeOriginal"))
+		if file_time is not None and sidecar_time is not None and shifts_offset(sidecar_time - file_time):
+			offset -= sidecar_time - file_time
+	else:
+		offset = parse_offset(entry.get("OffsetTimeOriginal") or entry.get("OffsetTime"))
+	if offset is None:
+		return None
+	return format_amount(offset + shift if shifts_offset(shift) else offset)
+
+
+def write_shifted_sidecars(
+	session: ExiftoolSession, image_files: list[Path], shift: timedelta, journal: Journal, bar
+) -> tuple[int, int]:
+	"""Write the shifted capture times and offsets into the XMP sidecars of images in batches, leaving the images untouched."""
+	# One bulk read of the files and of their existing sidecars decides the offset of each sidecar
+	entries = read_tags(image_files, OFFSET_SOURCE_TAGS)
+	sidecars = {image_file: sidecar_path(image_file) for image_file in image_files}
+	sidecar_entries = read_tags([sidecar for sidecar in sidecars.values() if sidecar.exists()], ["XMP-exif:DateTimeOriginal"])
+	groups: dict[str | None, list[Path]] = {}
+	for image_file in image_files:
+		offset = sidecar_offset(entries.get(str(image_file), {}), sidecar_entries.get(str(sidecars[image_file]), {}), shift)
+		groups.setdefault(offset, []).append(image_file)
+
+	processed = 0
+	failed = 0
+	for offset, files in groups.items():
+		description = f"{format_shift(shift)}, {offset}" if offset else format_shift(shift)
+		for i in range(0, len(files), CHUNK_SIZE):
+			written, not_written, output = write_sidecars(session, files[i:i + CHUNK_SIZE], sidecar_arguments(shift, offset))
+			for line in output.splitlines():
+				line = line.rstrip()
+				if line:
+					print(line)
+			for image_file in written:
+				print(f"✓ Processed {sidecar_path(image_file).name} ({description})")
+				journal.record(image_file, STATUS_OK, description)
+				processed += 1
+				bar()
+			for image_file in not_written:
+				print(f"✗ Failed to write {sidecar_path(image_file).name}")
+				journal.record(image_file, STATUS_FAILED, "sidecar not written")
+				failed += 1
+				bar()
+	return processed, failed
+
+
+def parse_exif_time(value) -> datetime | None:
+	try:
+		return datetime.strptime(str(value)[:19], "%Y:%m:%d %H:%M:%S")
+	except ValueError:
+		return None
+
+
+def group_by_camera(image_files: list[Path]) -> tuple[dict[str, list[Path]], dict[str, datetime | None]]:
+	"""
+	Group images by camera body (make, model and serial number) read with one bulk exiftool run.
+
+	Also returns the capture time of each image by file name.
+	"""
+	tags = read_tags(image_files, CAMERA_TAGS)
+	groups: dict[str, list[Path]] = {}
+	capture_times: dict[str, datetime | None] = {}
+	for image_file in image_files:
+		entry = tags.get(str(image_file), {})
+		capture_times[image_file.name] = parse_exif_time(entry.get("DateTimeOriginal") or entry.get("CreateDate"))
+		serial = entry.get("SerialNumber") or entry.get("InternalSerialNumber")
+		camera = " ".join(str(entry[tag]) for tag in ("Make", "Model") if entry.get(tag)) or "Unknown camera"
+		if serial:
+			camera += f" (#{serial})"
+		groups.setdefault(camera, []).append(image_file)
+	return dict(sorted(groups.items(), key=lambda item: -len(item[1]))), capture_times
+
+
+def derive_shift(capture_times: dict[str, datetime | None]) -> timedelta | None:
+	"""Ask for a photo of this camera and one of a correctly set camera taken at the same moment."""
+	own = input("    File name of a photo from this camera: ").strip()
+	reference = input("    File name of a photo taken at the same moment with a correctly set camera: ").strip()
+	own_time = capture_times.get(own)
+	reference_time = capture_times.get(reference)
+	if own_time is None or reference_time is None:
+		print("    Capture time of one of the photos not found.")
+		return None
+	return reference_time - own_time
+
+
+def ask_camera_shifts(groups: dict[str, list[Path]], capture_times: dict[str, datetime | None]) -> dict[str, timedelta]:
+	"""Ask for the shift of each camera group; groups without a shift are left unchanged."""
+	print("Cameras found:")
+	for camera, files in groups.items():
+		times = sorted(time for file in files if (time := capture_times.get(file.name)) is not None)
+		period = f", {times[0]:%Y-%m-%d %H:%M} to {times[-1]:%Y-%m-%d %H:%M}" if times else ""
+		print(f"  {camera}: {len(files)} files{period}")
+	print()
+
+	shifts: dict[str, timedelta] = {}
+	for camera in groups:
+		while True:
+			answer = input(
+				f"Shift for {camera} (e.g., -9:00, 0:03:27; 'r' to derive from a reference pair; Enter to leave unchanged): "
+			).strip().lower()
+			if not answer:
+				break
+			shift = derive_shift(capture_times) if answer == "r" else parse_shift(answer)
+			if shift is None:
+				print("Invalid shift. Please try again.")
+				continue
+			if shift:
+				shifts[camera] = shift
+				print(f"    {camera}: shifting by {format_shift(shift)}")
+			break
+	return shifts
+
+
+def run_per_camera(image_files: list[Path], journal: Journal, videos_in_place: bool, sidecars: bool) -> tuple[int, int]:
+	"""Shift each camera's images by its own amount, all in one exiftool session; videos are patched directly."""
+	if not sys.stdin.isatty():
+		print("Per-camera shifts need an interactive run.")
+		raise SystemExit(1)
+
+	print("Reading camera information...")
+	groups, capture_times = group_by_camera(image_files)
+	shifts = ask_camera_shifts(groups, capture_times)
+
+	processed = 0
+	failed = 0
+	files_to_shift = sum(len(groups[camera]) for camera in shifts)
+	with ExiftoolSession() as session, alive_bar(
+		files_to_shift,
+		title="Shifting Time and Timezone",
+		bar="smooth",
+		spinner="waves",
+		dual_line=True,
+		enrich_print=True,
+	) as bar:
+		for camera, shift in shifts.items():
+			files = [file for file in groups[camera] if not is_video(file)]
+			bar.text(f"{camera}: {len(groups[camera])} files")
+			for video_file in (file for file in groups[camera] if is_video(file)):
+				try:
+					fields = shift_video(video_file, shift, videos_in_place)
+					print(f"✓ Processed {video_file.name} ({format_shift(shift)}, {fields} fields)")
+					journal.record(video_file, STATUS_OK, format_shift(shift))
+					processed += 1
+				except Exception as e:
+					print(f"✗ Failed to process {video_file.name}: {e}")
+					journal.record(video_file, STATUS_FAILED, str(e))
+					failed += 1
+				bar()
+			if not files:
+				continue
+			if sidecars:
+				sidecars_processed, sidecars_failed = write_shifted_sidecars(session, files, shift, journal, bar)
+				processed += sidecars_processed
+				failed += sidecars_failed
+				continue
+
+			existed = existing_copies(files, OUTPUT_DIR)
+			output = session.execute([
+				"-m", # ignore maker notes offset warning
+				*shift_arguments(shift),
+				"-o", f"{OUTPUT_DIR}/",  # Trailing slash: keep the file names
+				*(str(file) for file in files),
+			])
+			for line in output.splitlines():
+				line = line.rstrip()
+				if line:
+					print(line)
 
-	# Split timezone_offset into operator and absolute value
-	date_operator = timezone_offset[0]
-	timezone_offset_abs = timezone_offset[1:]
+			# The copies the write created tell which files of the group made it
+			for image_file in files:
+				if copy_written(image_file, OUTPUT_DIR, existed):
+					print(f"✓ Processed {image_file.name} ({format_shift(shift)})")
+					journal.record(image_file, STATUS_OK, format_shift(shift))
+					processed += 1
+				else:
+					print(f"✗ Failed to process {image_file.name}")
+					journal.record(image_file, STATUS_FAILED)
+					failed += 1
+				bar()
 
-	# Process each image file
+	unchanged = len(image_files) - files_to_shift
+	for camera, files in groups.items():
+		if camera not in shifts:
+			for image_file in files:
+				journal.record(image_file, STATUS_SKIPPED, "no shift for this camera")
+	if unchanged:
+		print(f"Left unchanged: {unchanged}")
+	return processed, failed
+
+
+def run_fixed_offset(image_files: list[Path], timezone_offset: str, journal: Journal) -> tuple[int, int]:
+	"""Shift every image by the same offset, one exiftool process per file."""
 	print(f"Processing {len(image_files)} files with timezone offset: {timezone_offset} hours")
 
 	processed = 0
 	failed = 0
+	controller = AdaptiveConcurrency.from_environment()
 	
 	with alive_bar(
 		len(image_files),
@@ -51,52 +334,139 @@ if __name__ == "__main__":
 		dual_line=True,
 		enrich_print=True,
 	) as bar:
-		for image_file in image_files:
+		# Run several exiftool processes at once; the controller adapts their number to the storage
+		for image_file, result, error in controller.map_unordered(
+			lambda image_file: process_image(image_file, parse_shift(timezone_offset)), image_files
+		):
 			bar.text(f"{image_file.name}")
-			# Construct the ExifTool command
-			output_path = OUTPUT_DIR / image_file.name
-			command = [
-				"exiftool",
-				'-m', # ignore maker notes offset warning
-				f'-DateTimeOriginal{date_operator}={timezone_offset_abs}',
-				f'-CreateDate{date_operator}={timezone_offset_abs}',
-				f'-ModifyDate{date_operator}={timezone_offset_abs}',
-				f'-SonyDateTime{date_operator}={timezone_offset_abs}',
-				f'-OffsetTime+={timezone_offset}',
-				f'-OffsetTimeOriginal+={timezone_offset}',
-				f'-OffsetTimeDigitized+={timezone_offset}',
-				"-o", str(output_path),  # Write corrected copy to output directory
-				str(image_file),
-			]
-
-			# Execute exiftool and stream output so the progress bar stays clean
-			process = subprocess.Popen(
-				command,
-				stdout=subprocess.PIPE,
-				stderr=subprocess.STDOUT,
-				text=True,
-				bufsize=1,
-			)
-			if process.stdout is not None:
-				for line in process.stdout:
-					line = line.rstrip()
-					if line:
-						print(line)
-			return_code = process.wait()
+			if error is not None:
+				print(f"✗ Failed to process {image_file.name}: {error}")
+				journal.record(image_file, STATUS_FAILED, str(error))
+				failed += 1
+				bar()
+				continue
+
+			return_code, output = result
+			for line in output.splitlines():
+				line = line.rstrip()
+				if line:
+					print(line)
 
 			if return_code != 0:
 				print(f"✗ Failed to process {image_file.name} (exiftool exit code {return_code})")
+				journal.record(image_file, STATUS_FAILED, f"exiftool exit code {return_code}")
 				failed += 1
 			else:
 				print(f"✓ Processed {image_file.name}")
+				journal.record(image_file, STATUS_OK)
 				processed += 1
 
 			bar()
 
+	print(controller.summary())
+	return processed, failed
+
+
+def run_videos(video_files: list[Path], shift: timedelta, in_place: bool, journal: Journal) -> tuple[int, int]:
+	"""Shift every video by the same amount by patching its recording times."""
+	where = "in place" if in_place else "in copies"
+	print(f"Shifting {len(video_files)} videos {where} by {format_shift(shift)}")
+
+	processed = 0
+	failed = 0
+	controller = AdaptiveConcurrency.from_environment()
+
+	with alive_bar(
+		len(video_files),
+		title="Shifting video recording times",
+		bar="smooth",
+		spinner="waves",
+		dual_line=True,
+		enrich_print=True,
+	) as bar:
+		for video_file, fields, error in controller.map_unordered(
+			lambda video_file: shift_video(video_file, shift, in_place), video_files
+		):
+			bar.text(f"{video_file.name}")
+			if error is not None:
+				print(f"✗ Failed to process {video_file.name}: {error}")
+				journal.record(video_file, STATUS_FAILED, str(error))
+				failed += 1
+			else:
+				print(f"✓ Processed {video_file.name} ({fields} fields)")
+				journal.record(video_file, STATUS_OK)
+				processed += 1
+			bar()
+
+	print(controller.summary())
+	return processed, failed
+
+
+if __name__ == "__main__":
+	# Parse timezone offset from command-line argument in format <hours>:<minutes>, or "--per-camera";
+	# "--videos-in-place" patches the videos themselves instead of copies in the output folder,
+	# "--sidecars" writes XMP sidecars next to the photos instead of corrected copies
+	args = sys.argv[1:]
+	videos_in_place = "--videos-in-place" in args
+	sidecars = "--sidecars" in args
+	args = [arg for arg in args if arg not in ("--videos-in-place", "--sidecars")]
+	if len(args) != 1 or (args[0] != "--per-camera" and parse_shift(args[0]) is None):
+		print("Usage: python container_script.py <sign><hours>:<minutes> [--videos-in-place] [--sidecars]")
+		print("       python container_script.py --per-camera [--videos-in-place] [--sidecars]")
+		print("Example: python container_script.py -9:30")
+		raise SystemExit(1)
+	timezone_offset = args[0]
+
+	# Get all image, RAW and video files in the directory, or the ones listed in the manifest passed in
+	units = load_units(WORK_DIR)
+	if units is not None:
+		image_files = [unit[0] for unit in units]
+	else:
+		image_files = [
+			file for file in WORK_DIR.iterdir()
+			if file.is_file() and file.suffix.lower() in SUPPORTED_EXTENSIONS
+		]
+
+	if not image_files:
+		print(f"No supported image or video files found. Abort.")
+		raise SystemExit(0)
+	
+	print(f"Found {len(image_files)} files to process.")
+
+	# Ensure output directory exists
+	OUTPUT_DIR.mkdir(exist_ok=True)
+
+	journal = Journal.from_environment(WORK_DIR)
+	if timezone_offset == "--per-camera":
+		processed, failed = run_per_camera(image_files, journal, videos_in_place, sidecars)
+	else:
+		processed = failed = 0
+		photos = [file for file in image_files if not is_video(file)]
+		videos = [file for file in image_files if is_video(file)]
+		if photos and sidecars:
+			with ExiftoolSession() as session, alive_bar(
+				len(photos),
+				title="Writing XMP sidecars",
+				bar="smooth",
+				spinner="waves",
+				dual_line=True,
+				enrich_print=True,
+			) as bar:
+				processed, failed = write_shifted_sidecars(session, photos, parse_shift(timezone_offset), journal, bar)
+		elif photos:
+			processed, failed = run_fixed_offset(photos, timezone_offset, journal)
+		if videos:
+			video_processed, video_failed = run_videos(videos, parse_shift(timezone_offset), videos_in_place, journal)
+			processed += video_processed
+			failed += video_failed
+	journal.close()
+
 	print(f"Processed: {processed}")
 	print(f"Failed: {failed}")
 	
 	print(f"Output written to: {OUTPUT_DIR}")
+	if sidecars:
+		print(f"XMP sidecars written to: {WORK_DIR}")
 
 	if failed != 0:
 		print("Completed with failures!")
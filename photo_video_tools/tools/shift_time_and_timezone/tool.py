@@ -1,27 +1,43 @@
 """Host launcher for the Docker container executing the script of the shift_time_and_timezone tool."""
 
 from pathlib import Path
-from photo_video_tools.docker_utils import run_container
-from photo_video_tools.shared import select_directory_gui, parse_timezone_input, ToolBase
+from photo_video_tools.media import formats
+from photo_video_tools.shared import parse_timezone_input, ToolBase
 
 TOOL_PATH = Path(__file__).parent
 CONTAINER_DIR = TOOL_PATH / "container"
 
 
 class ShiftTimeAndTimezoneTool(ToolBase):
-    """Adjust photo timestamps for timezone differences."""
+    """Adjust photo and video timestamps for timezone differences."""
     
     name = "Shift Time and Timezone"
-    description = "Adjust photos' tags for time and timezone such that they are shifted by the same specified amount"
-    
-    @classmethod
-    def run(cls) -> int:
-        cls.announce()
+    description = "Adjust photos' tags and videos' recording times such that they are shifted by the same specified amount"
 
-        work_dir = select_directory_gui("Select folder containing image files")
-        if work_dir is None:
-            print("No directory selected. Abort.")
-            return 1
+    directory_prompt = "Select folder containing image or video files"
+    container_name = "exiftool"
+    container_dir = CONTAINER_DIR
+    input_extensions = tuple(sorted(formats.supported_extensions(formats.KIND_IMAGE, formats.KIND_RAW, formats.KIND_VIDEO)))
+
+    @classmethod
+    def ask_script_args(cls) -> list[str] | None:
+        # Videos are shifted by overwriting a few bytes, so there is no need for a copy of each clip
+        videos_in_place = input(
+            "Shift videos in place instead of writing shifted copies? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        output_args = ["--videos-in-place"] if videos_in_place else []
+        # Sidecars are a few KB each, so large raw files are neither read in full nor rewritten
+        if input(
+            "Write XMP sidecars next to the photos instead of corrected copies? (y/N): "
+        ).strip().lower() in ["yes", "y"]:
+            output_args.append("--sidecars")
+
+        per_camera = input(
+            "Shift each camera (make, model, serial number) by its own amount? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        if per_camera:
+            # The cameras are listed and their shifts asked inside the container
+            return ["--per-camera", *output_args]
 
         # Get timezone offset from user
         timezone_offset = None
@@ -31,24 +47,4 @@ class ShiftTimeAndTimezoneTool(ToolBase):
             if timezone_offset is None:
                 print("Invalid timezone offset format. Please try again.")
 
-        docker_options = [
-            "-it", "--rm",
-            "-v", f"{work_dir}:/work",
-            "-v", f"{CONTAINER_DIR}:/app:ro",
-            "-w", "/work",
-        ]
-
-        # command to run inside container
-        command_and_args = [
-            "sh", "-c",
-            (
-                "python -m venv /venv && "
-                ". /venv/bin/activate && "
-                "pip install --upgrade pip && "
-                "pip install --no-cache-dir -r /app/requirements.txt && "
-                f"python /app/container_script.py {timezone_offset}"
-            ),
-        ]
-
-        print(f"Running container...")
-        return run_container("exiftool", docker_options, command_and_args)
+        return [timezone_offset, *output_args]
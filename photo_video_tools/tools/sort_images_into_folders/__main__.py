@@ -0,0 +1,41 @@
+"""Sort a single directory (or ZIP/TAR archive) without prompts, e.g. as one job of a batch run."""
+
+import sys
+from pathlib import Path
+
+from photo_video_tools.archives import is_archive
+from photo_video_tools.tools.sort_images_into_folders.sync import (
+    CONFLICTS_RENAME,
+    CONFLICTS_REPORT,
+    VERIFY_FULL,
+    VERIFY_NONE,
+    VERIFY_PARTIAL,
+)
+from photo_video_tools.tools.sort_images_into_folders.tool import (
+    LAYOUT_DATE,
+    LAYOUT_LOCATION,
+    SortImagesIntoFoldersTool,
+)
+
+# Allowed values of the optional positional arguments after the directory, first is the default
+CHOICES = [
+    (LAYOUT_DATE, LAYOUT_LOCATION),
+    (VERIFY_NONE, VERIFY_PARTIAL, VERIFY_FULL),
+    (CONFLICTS_RENAME, CONFLICTS_REPORT),
+]
+
+
+if __name__ == "__main__":
+    options = sys.argv[2:]
+    if len(sys.argv) < 2 or len(options) > len(CHOICES) or any(
+        option not in choices for option, choices in zip(options, CHOICES)
+    ):
+        usage = " ".join(f"[{'|'.join(choices)}]" for choices in CHOICES)
+        print(f"Usage: python -m photo_video_tools.tools.sort_images_into_folders <directory or archive> {usage}")
+        raise SystemExit(1)
+
+    layout, verify, conflicts = options + [choices[0] for choices in CHOICES[len(options):]]
+    source = Path(sys.argv[1])
+    if is_archive(source):
+        raise SystemExit(SortImagesIntoFoldersTool.sort_archive(source, False, layout, verify, conflicts))
+    raise SystemExit(SortImagesIntoFoldersTool.sort_directory(source, False, layout, verify, conflicts))
@@ -0,0 +1,145 @@
+"""Incremental copies into the sorted output, similar to rsync's quick check.
+
+The output tree is stat'ed once up front. A file whose copy already exists with the same
+size and modification time is skipped without reading either file; copies keep the
+source's mtime, so this holds for everything a previous run copied. Optionally the content
+of existing files is compared with a partial or full hash before skipping them.
+An existing file with the same name but different content is never overwritten: the new
+copy gets a numbered name or the conflict is only reported. Names are reserved in the index
+when they are chosen, so files with the same name copied at the same time (e.g. from two
+folders of an archive) never pick the same one.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from photo_video_tools.fastcopy import default_hash_algorithm, hash_file, sample_hash
+
+VERIFY_NONE = "none"
+VERIFY_PARTIAL = "partial"
+VERIFY_FULL = "full"
+CONFLICTS_RENAME = "rename"
+CONFLICTS_REPORT = "report"
+
+ACTION_COPY = "copy"
+ACTION_UNCHANGED = "unchanged"
+ACTION_CONFLICT = "conflict"
+
+# Modification times closer than this count as equal; FAT/exFAT store them with 2 s resolution
+MODIFY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass
+class Placement:
+    action: str
+    path: Path
+
+
+class DestinationIndex:
+    """Name, size and mtime of every file in the output folders, from one scan of the tree."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        # File name -> {relative folder: (size, mtime_ns)}
+        self.entries: dict[str, dict[str, tuple[int, int]]] = {}
+        # (relative folder, file name) chosen for copies that are still in progress
+        self.reserved: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def scan(cls, root: Path, depth: int) -> "DestinationIndex":
+        """Index the files exactly `depth` folders below `root` (1 for date folders, 2 for Country/City)."""
+        index = cls(root)
+        stack = [(root, "", 0)]
+        while stack:
+            directory, relative, level = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("."):
+                            continue
+                        if level < depth and entry.is_dir(follow_symlinks=False):
+                            stack.append((Path(entry.path), f"{relative}/{entry.name}".lstrip("/"), level + 1))
+                        elif level == depth and entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            index.entries.setdefault(entry.name, {})[relative] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+        return index
+
+    def get(self, folder: str, name: str) -> tuple[int, int] | None:
+        return self.entries.get(name, {}).get(folder)
+
+    def add(self, folder: str, name: str, stat: os.stat_result) -> None:
+        """Record a completed copy; a reservation of its name is released."""
+        with self._lock:
+            self.entries.setdefault(name, {})[folder] = (stat.st_size, stat.st_mtime_ns)
+            self.reserved.discard((folder, name))
+
+    def release(self, folder: str, name: str) -> None:
+        """Release the name reserved for a copy that failed."""
+        with self._lock:
+            self.reserved.discard((folder, name))
+
+    def find_unchanged(self, name: str, stat: os.stat_result) -> str | None:
+        """A folder already holding a copy of the file with the same size and mtime, if any."""
+        for folder, existing in self.entries.get(name, {}).items():
+            if quick_match(stat, existing):
+                return folder
+        return None
+
+
+def quick_match(stat: os.stat_result, existing: tuple[int, int]) -> bool:
+    size, mtime_ns = existing
+    return stat.st_size == size and abs(stat.st_mtime_ns - mtime_ns) <= MODIFY_WINDOW_NS
+
+
+def same_content(src: Path, stat: os.stat_result, dst: Path, existing: tuple[int, int], verify: str) -> bool:
+    if verify == VERIFY_NONE:
+        return quick_match(stat, existing)
+    if stat.st_size != existing[0]:
+        return False
+    # Same size: the hashes decide, regardless of the modification times
+    algorithm = default_hash_algorithm()
+    if verify == VERIFY_PARTIAL:
+        return sample_hash(src, algorithm) == sample_hash(dst, algorithm)
+    return hash_file(src, algorithm) == hash_file(dst, algorithm)
+
+
+def place(
+    src: Path,
+    folder: str,
+    index: DestinationIndex,
+    verify: str = VERIFY_NONE,
+    conflicts: str = CONFLICTS_RENAME,
+) -> Placement:
+    """
+    Decide where a file goes in `folder` of the output.
+
+    Walks 'name.ext', 'name (1).ext', ... until it finds an existing file with the same
+    content (nothing to do) or a free name (copy there). With CONFLICTS_REPORT, reaching a
+    free name past an existing file with different content reports that file instead.
+    A free name is reserved in the index in the same step as it is found; the caller
+    records the copy with `index.add`, or releases the name with `index.release` if it fails.
+    Names reserved by other copies in progress count as taken by different content.
+    """
+    stat = src.stat()
+    target = index.root / folder / src.name
+    candidate = target
+    number = 0
+    while True:
+        with index._lock:
+            existing = index.get(folder, candidate.name)
+            reserved = (folder, candidate.name) in index.reserved
+            if existing is None and not reserved:
+                if candidate != target and conflicts == CONFLICTS_REPORT:
+                    return Placement(ACTION_CONFLICT, target)
+                index.reserved.add((folder, candidate.name))
+                return Placement(ACTION_COPY, candidate)
+        # Comparing contents may hash both files, so it runs outside the lock
+        if not reserved and same_content(src, stat, candidate, existing, verify):
+            return Placement(ACTION_UNCHANGED, candidate)
+        number += 1
+        candidate = target.with_name(f"{target.stem} ({number}){target.suffix}")
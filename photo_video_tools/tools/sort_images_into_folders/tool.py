@@ -1,28 +1,97 @@
-"""Sort images into YYYY-MM-DD folders based on EXIF DateTimeOriginal."""
+"""Sort images and videos into YYYY-MM-DD folders based on their capture date."""
 
-import shutil
+import os
+import re
+import sys
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime
+from typing import Callable
 import exifread
 from alive_progress import alive_bar
 
-from photo_video_tools.shared import select_directory_gui, ToolBase
+from photo_video_tools.archives import ARCHIVE_FILETYPES, Archive, ArchiveMember, extract_member
+from photo_video_tools.concurrency import AdaptiveConcurrency
+from photo_video_tools.docker_utils import BatchJob
+from photo_video_tools.fastcopy import ChecksumManifest, copy_file, default_hash_algorithm
+from photo_video_tools.geo.places import PlaceIndex, ensure_places_data
+from photo_video_tools.manifest import MANIFEST_ENV, STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, Journal, load_units
+from photo_video_tools.media import formats
+from photo_video_tools.shared import select_directory_gui, select_file_gui, ToolBase, BATCH_LOG_NAME
+from photo_video_tools.tools.sort_images_into_folders.sync import (
+    ACTION_CONFLICT,
+    ACTION_COPY,
+    ACTION_UNCHANGED,
+    CONFLICTS_RENAME,
+    CONFLICTS_REPORT,
+    VERIFY_FULL,
+    VERIFY_NONE,
+    VERIFY_PARTIAL,
+    DestinationIndex,
+    Placement,
+    place,
+)
+from photo_video_tools.tools.sort_images_into_folders.watch import watch_directory
 
+REPO_ROOT = Path(__file__).parents[3]
 OUTPUT_SUBDIR = "sorted_images"
-SUPPORTED_EXTS = (".jpg", ".jpeg", ".dng", ".arw")
+SUPPORTED_EXTS = tuple(sorted(formats.supported_extensions()))
+
+# Folder layouts: capture date (YYYY-MM-DD) or nearest place (Country/City)
+LAYOUT_DATE = "date"
+LAYOUT_LOCATION = "location"
+SKIP_REASONS = {
+    LAYOUT_DATE: "could not read create date",
+    LAYOUT_LOCATION: "could not read GPS position",
+}
+# Folder levels below the output folder: YYYY-MM-DD or Country/City
+LAYOUT_DEPTHS = {LAYOUT_DATE: 1, LAYOUT_LOCATION: 2}
+# Characters not allowed in folder names on Windows
+_UNSAFE_FOLDER_CHARS = re.compile(r'[<>:"/\\|?*]')
+
+
+@dataclass
+class SortOutcome:
+    copied: list[Path] = field(default_factory=list)
+    # Already in the output with the same content
+    unchanged: list[Path] = field(default_factory=list)
+    # A different file with the same name is in the output (only when conflicts are reported)
+    conflicts: list[Path] = field(default_factory=list)
+    # No date or position
+    skipped: list[Path] = field(default_factory=list)
+    failed: int = 0
+
+    @property
+    def handled(self) -> list[Path]:
+        """Files that won't need another attempt."""
+        return self.copied + self.unchanged + self.conflicts + self.skipped
 
 
 class SortImagesIntoFoldersTool(ToolBase):
-    """Sort images into YYYY-MM-DD folders based on EXIF DateTimeOriginal."""
+    """Sort images and videos into YYYY-MM-DD folders based on their capture date."""
     
     name = "Sort Images into Folders"
-    description = "Organize images by date into year/month folders"
+    description = "Organize images and videos by date into year/month folders"
+
+    directory_prompt = "Select folder containing image files"
+    input_extensions = SUPPORTED_EXTS
 
     @staticmethod
     def extract_createdate(file_path: Path) -> datetime | None:
-        """Extract EXIF DateTimeOriginal from an image file."""
+        """Extract the capture date of an image (EXIF DateTimeOriginal) or video (creation time)."""
+        # Fast path: the format's own reader goes straight to the date field
+        media_format = formats.detect_format(file_path)
+        if media_format is not None:
+            try:
+                createdate = media_format.read_capture_time(file_path)
+            except OSError:
+                createdate = None
+            if createdate is not None or media_format.kind == formats.KIND_VIDEO:
+                return createdate
+
+        # Fall back to the general-purpose EXIF parser for unusual image layouts
         try:
-            with open(file_path, "rb") as f:
+            with file_path.open("rb") as f:
                 tags = exifread.process_file(f, details=False)
                 if "EXIF DateTimeOriginal" in tags:
                     date_str = str(tags["EXIF DateTimeOriginal"])
@@ -31,74 +100,362 @@ class SortImagesIntoFoldersTool(ToolBase):
             pass
         return None
     
+    @classmethod
+    def date_folder(cls, file_path: Path) -> str | None:
+        createdate = cls.extract_createdate(file_path)
+        return createdate.strftime("%Y-%m-%d") if createdate is not None else None
+
+    @staticmethod
+    def location_folders(files: list[Path]) -> dict[Path, str]:
+        """
+        Folder names ('Country/City') for all files with a GPS position.
+
+        Positions are read in parallel and then resolved in one batch query against the places index.
+        """
+        positions: dict[Path, tuple[float, float]] = {}
+        controller = AdaptiveConcurrency.from_environment()
+        for file, position, error in controller.map_unordered(formats.read_position, files, size=lambda _: 1):
+            if error is None and position is not None:
+                positions[file] = position
+        if not positions:
+            return {}
+
+        places = PlaceIndex.load().lookup(list(positions.values()))
+        return {
+            file: "/".join(_UNSAFE_FOLDER_CHARS.sub("_", part).strip() or "_" for part in (place.country, place.name))
+            for file, place in zip(positions, places)
+        }
+
+    @classmethod
+    def ask_script_args(cls) -> list[str] | None:
+        layout = input("Sort into date folders or location folders? (D/l): ").strip().lower()
+        layout = LAYOUT_LOCATION if layout in ["l", "location"] else LAYOUT_DATE
+        if layout == LAYOUT_LOCATION:
+            try:
+                ensure_places_data()
+            except OSError as e:
+                print(f"Could not download the places table: {e}")
+                return None
+
+        verify = input(
+            "Files already in the output are skipped if size and modification time match. "
+            "Also compare their content? (N/partial/full): "
+        ).strip().lower()
+        verify = {"p": VERIFY_PARTIAL, "partial": VERIFY_PARTIAL, "f": VERIFY_FULL, "full": VERIFY_FULL}.get(verify, VERIFY_NONE)
+
+        conflicts = input(
+            "A different file with the same name is already in the output: "
+            "copy under a numbered name or only report it? (R/report): "
+        ).strip().lower()
+        conflicts = CONFLICTS_REPORT if conflicts in ["report", "rep"] else CONFLICTS_RENAME
+        return [layout, verify, conflicts]
+
     @classmethod
     def run(cls) -> int:
         cls.announce()
 
-        work_dir = select_directory_gui("Select folder containing image files")
-        if work_dir is None:
-            print("No directory selected. Abort.")
+        from_archive = input("Sort a folder or the files in a ZIP/TAR archive? (F/a): ").strip().lower() in ["a", "archive"]
+        if from_archive:
+            work_dir = select_file_gui("Select ZIP or TAR archive containing image files", ARCHIVE_FILETYPES)
+            if work_dir is None:
+                print("No archive selected. Abort.")
+                return 1
+        else:
+            work_dir = select_directory_gui(cls.directory_prompt)
+            if work_dir is None:
+                print("No directory selected. Abort.")
+                return 1
+
+        script_args = cls.ask_script_args()
+        if script_args is None:
             return 1
+        layout, verify, conflicts = script_args
+
+        record_checksums = input(
+            "Record checksums of the copies for later verification? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+
+        if from_archive:
+            return cls.sort_archive(work_dir, record_checksums, layout, verify, conflicts)
 
-        image_files = [
-            file for file in work_dir.iterdir()
-            if file.is_file() and file.name.lower().endswith(SUPPORTED_EXTS)
-        ]
+        watch = input(
+            "Keep watching the folder and sort new files as they arrive? (y/N): "
+        ).strip().lower() in ["yes", "y"]
+        if watch:
+            return cls.watch(work_dir, record_checksums, layout, verify, conflicts)
 
+        return cls.sort_directory(work_dir, record_checksums, layout, verify, conflicts)
+
+    @classmethod
+    def supports_batch(cls) -> bool:
+        return True
+
+    @classmethod
+    def batch_job(cls, work_dir: Path, script_args: list[str], image: str | None, manifest_path: Path | None = None) -> BatchJob:
+        # Runs on the host: sort each directory in its own Python process
+        return BatchJob(
+            label=work_dir.name,
+            command=[sys.executable, "-m", "photo_video_tools.tools.sort_images_into_folders", str(work_dir), *script_args],
+            log_path=work_dir / BATCH_LOG_NAME,
+            cwd=REPO_ROOT,
+            env={**os.environ, MANIFEST_ENV: str(manifest_path)} if manifest_path is not None else None,
+        )
+
+    @classmethod
+    def copy_to_folder(
+        cls,
+        img_file: Path,
+        index: DestinationIndex,
+        manifest: ChecksumManifest | None = None,
+        folder_for: Callable[[Path], str | None] | None = None,
+        verify: str = VERIFY_NONE,
+        conflicts: str = CONFLICTS_RENAME,
+    ) -> tuple[str | None, Placement | None, Exception | None]:
+        """
+        Copy one file into its folder, recording its checksum if a manifest is given.
+
+        The folder is named by `folder_for` (the capture date by default). Files already in
+        the folder are not copied again and existing files are never overwritten (see `sync.place`).
+        Returns the folder name (None if it could not be determined), where the file was
+        placed and the copy error, if any.
+        """
+        subdir_name = (folder_for or cls.date_folder)(img_file)
+        if subdir_name is None:
+            return None, None, None
+
+        try:
+            placement = place(img_file, subdir_name, index, verify, conflicts)
+        except Exception as e:
+            return subdir_name, None, e
+        if placement.action != ACTION_COPY:
+            return subdir_name, placement, None
+
+        # The name is reserved until the copy is recorded or has failed
+        try:
+            placement.path.parent.mkdir(parents=True, exist_ok=True)
+            copy = extract_member if isinstance(img_file, ArchiveMember) else copy_file
+            result = copy(img_file, placement.path, manifest.algorithm if manifest is not None else None)
+            if manifest is not None:
+                manifest.record(placement.path, result.digest)
+            index.add(subdir_name, placement.path.name, placement.path.stat())
+        except Exception as e:
+            index.release(subdir_name, placement.path.name)
+            return subdir_name, None, e
+        return subdir_name, placement, None
+
+    @classmethod
+    def sort_files(
+        cls,
+        image_files: list[Path],
+        index: DestinationIndex,
+        manifest: ChecksumManifest | None = None,
+        layout: str = LAYOUT_DATE,
+        verify: str = VERIFY_NONE,
+        conflicts: str = CONFLICTS_RENAME,
+        journal: Journal | None = None,
+    ) -> SortOutcome:
+        """Copy files into date or location folders below the indexed output folder with a progress bar."""
+        outcome = SortOutcome()
+        journal = journal if journal is not None else Journal(None, index.root)
+
+        # Quick check: files whose copy has the same size and mtime need no metadata read at all
+        if verify == VERIFY_NONE:
+            remaining = []
+            for img_file in image_files:
+                try:
+                    unchanged = index.find_unchanged(img_file.name, img_file.stat()) is not None
+                except OSError:
+                    unchanged = False
+                if unchanged:
+                    outcome.unchanged.append(img_file)
+                    journal.record(img_file, STATUS_OK, "unchanged")
+                else:
+                    remaining.append(img_file)
+            image_files = remaining
+            if outcome.unchanged:
+                print(f"{len(outcome.unchanged)} files are already in the output and unchanged")
         if not image_files:
-            print(f"No supported image files found in {work_dir}")
-            return 0
-        
-        # Ensure output directory exists
-        output_dir = work_dir / OUTPUT_SUBDIR
-        output_dir.mkdir(exist_ok=True)
+            return outcome
 
-        # Process each image file
-        processed = 0
-        failed = 0
+        folder_for = None
+        if layout == LAYOUT_LOCATION:
+            print("Looking up places...")
+            folder_for = cls.location_folders(image_files).get
+        controller = AdaptiveConcurrency.from_environment()
 
         with alive_bar(
             len(image_files),
-            title="Organizing images",
+            title="Organizing images and videos",
             bar="smooth",
             spinner="waves",
             dual_line=True,
             enrich_print=True,
         ) as bar:
-            for img_file in image_files:
+            # Copy several files at once; the controller adapts their number to the storage
+            for img_file, result, error in controller.map_unordered(
+                lambda img_file: cls.copy_to_folder(img_file, index, manifest, folder_for, verify, conflicts),
+                image_files,
+            ):
                 bar.text(img_file.name)
-                createdate = cls.extract_createdate(img_file)
-
-                if createdate is None:                   
-                    print(f"✗ Skipped {img_file.name} (could not read create date)")
-                    failed += 1
-                    bar()
-                    continue
-                
-                subdir_name = createdate.strftime("%Y-%m-%d")
-                subdir_path = output_dir / subdir_name
-                subdir_path.mkdir(exist_ok=True)
-
-                output_path = subdir_path / img_file.name
-                try:
-                    shutil.copy2(img_file, output_path)
-                except Exception as e:
-                    print(f"✗ Failed to copy {img_file.name} to folder '{subdir_name}': {e}")
-                    failed += 1
-                    bar()
-                    continue
-
-                print(f"✓ Copied {img_file.name} to folder '{subdir_name}'")
-                processed += 1
+                subdir_name, placement, copy_error = result if error is None else (None, None, error)
+
+                if subdir_name is None and copy_error is None:
+                    print(f"✗ Skipped {img_file.name} ({SKIP_REASONS[layout]})")
+                    journal.record(img_file, STATUS_SKIPPED, SKIP_REASONS[layout])
+                    outcome.skipped.append(img_file)
+                elif copy_error is not None:
+                    print(f"✗ Failed to copy {img_file.name} to folder '{subdir_name}': {copy_error}")
+                    journal.record(img_file, STATUS_FAILED, str(copy_error))
+                    outcome.failed += 1
+                elif placement.action == ACTION_UNCHANGED:
+                    journal.record(img_file, STATUS_OK, "unchanged")
+                    outcome.unchanged.append(img_file)
+                elif placement.action == ACTION_CONFLICT:
+                    print(f"✗ Not copied {img_file.name}: a different file with this name is in folder '{subdir_name}'")
+                    journal.record(img_file, STATUS_FAILED, f"conflict with {placement.path.name} in '{subdir_name}'")
+                    outcome.conflicts.append(img_file)
+                else:
+                    renamed = f" as {placement.path.name}" if placement.path.name != img_file.name else ""
+                    print(f"✓ Copied {img_file.name} to folder '{subdir_name}'{renamed}")
+                    journal.record(img_file, STATUS_OK, f"{subdir_name}/{placement.path.name}")
+                    outcome.copied.append(img_file)
                 bar()
 
-        print(f"Processed: {processed}")
+        print(controller.summary())
+        return outcome
+
+    @classmethod
+    def watch(
+        cls,
+        work_dir: Path,
+        record_checksums: bool = False,
+        layout: str = LAYOUT_DATE,
+        verify: str = VERIFY_NONE,
+        conflicts: str = CONFLICTS_RENAME,
+    ) -> int:
+        """Sort files as they arrive in `work_dir` until interrupted with Ctrl+C."""
+        output_dir = work_dir / OUTPUT_SUBDIR
+        output_dir.mkdir(exist_ok=True)
+        manifest = ChecksumManifest(output_dir, default_hash_algorithm()) if record_checksums else None
+        # Scanned once; copies made while watching are added to it
+        index = DestinationIndex.scan(output_dir, LAYOUT_DEPTHS[layout])
+
+        def sort_batch(batch: list[Path]) -> list[Path]:
+            # Files without a date or position won't get one later, so don't retry them
+            return cls.sort_files(batch, index, manifest, layout, verify, conflicts).handled
+
+        total = 0
+        try:
+            for count in watch_directory(work_dir, output_dir, SUPPORTED_EXTS, sort_batch):
+                total += count
+                print(f"Handled {total} files so far. Press Ctrl+C to stop watching.")
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+
+        print(f"Handled: {total}")
+        print(f"Output written to: {output_dir}")
+        return 0
+
+    @classmethod
+    def sort_directory(
+        cls,
+        work_dir: Path,
+        record_checksums: bool = False,
+        layout: str = LAYOUT_DATE,
+        verify: str = VERIFY_NONE,
+        conflicts: str = CONFLICTS_RENAME,
+    ) -> int:
+        """
+        Copy all supported images of `work_dir` into date or location folders below its output subdirectory.
+
+        If a manifest is passed in the environment, only the files listed in it are sorted.
+        """
+        units = load_units(work_dir)
+        if units is not None:
+            image_files = [unit[0] for unit in units]
+        else:
+            image_files = [
+                file for file in work_dir.iterdir()
+                if file.is_file() and file.name.lower().endswith(SUPPORTED_EXTS)
+            ]
+
+        if not image_files:
+            print(f"No supported image or video files found in {work_dir}")
+            return 0
+
+        journal = Journal.from_environment(work_dir)
+        exit_code = cls.sort_into_output(image_files, work_dir / OUTPUT_SUBDIR, record_checksums, layout, verify, conflicts, journal)
+        journal.close()
+        return exit_code
+
+    @classmethod
+    def sort_archive(
+        cls,
+        archive_path: Path,
+        record_checksums: bool = False,
+        layout: str = LAYOUT_DATE,
+        verify: str = VERIFY_NONE,
+        conflicts: str = CONFLICTS_RENAME,
+    ) -> int:
+        """
+        Copy all supported images in a ZIP or TAR archive into date or location folders next to it.
+
+        Dates and positions are read from the members in place and only the copies are
+        written, so the archive is never extracted as a whole.
+        """
+        try:
+            archive = Archive(archive_path)
+        except (OSError, ValueError) as e:
+            print(f"Could not read {archive_path.name}: {e}")
+            return 1
+
+        with archive:
+            image_files = [member for member in archive.members if member.name.lower().endswith(SUPPORTED_EXTS)]
+            if not image_files:
+                print(f"No supported image or video files found in {archive_path.name}")
+                return 0
+            print(f"Found {len(image_files)} supported files in {archive_path.name}")
+
+            return cls.sort_into_output(
+                image_files, archive_path.parent / OUTPUT_SUBDIR, record_checksums, layout, verify, conflicts
+            )
+
+    @classmethod
+    def sort_into_output(
+        cls,
+        image_files: list[Path],
+        output_dir: Path,
+        record_checksums: bool = False,
+        layout: str = LAYOUT_DATE,
+        verify: str = VERIFY_NONE,
+        conflicts: str = CONFLICTS_RENAME,
+        journal: Journal | None = None,
+    ) -> int:
+        """Copy files (or archive members) into date or location folders below `output_dir` and print a summary."""
+        # Ensure output directory exists
+        output_dir.mkdir(exist_ok=True)
+
+        # Checksums are computed while copying, so verifying later needs no second read of the sources
+        manifest = ChecksumManifest(output_dir, default_hash_algorithm()) if record_checksums else None
+
+        # One pass over the output tree instead of a lookup per file
+        index = DestinationIndex.scan(output_dir, LAYOUT_DEPTHS[layout])
+
+        outcome = cls.sort_files(image_files, index, manifest, layout, verify, conflicts, journal)
+        failed = outcome.failed + len(outcome.skipped) + len(outcome.conflicts)
+
+        print(f"Processed: {len(outcome.copied)}")
+        print(f"Unchanged: {len(outcome.unchanged)}")
+        if outcome.conflicts:
+            print(f"Conflicts: {len(outcome.conflicts)}")
         print(f"Failed: {failed}")
         
         print(f"Output written to: {output_dir}")
+        if manifest is not None:
+            print(f"Checksums written to: {manifest.path}")
 
         if failed != 0:
             print("Completed with failures!")
             return 1
         
-        return 0
\ No newline at end of file
+        return 0
@@ -0,0 +1,203 @@
+"""Watch an inbox folder and sort new images into date folders as they arrive.
+
+New files are detected with inotify on Linux (a file is ready once it was closed after
+writing or moved in) and by polling elsewhere (a file is ready once its size and mtime
+stopped changing). Handled files are remembered in a small SQLite database inside the
+output folder, so memory stays constant and a restart continues where it stopped.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sqlite3
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+STATE_FILE_NAME = ".watch_state.sqlite"
+
+# Files are sorted in batches: as soon as this many are ready or the oldest waited this long
+BATCH_SIZE = 200
+BATCH_DELAY_SECONDS = 2.0
+# Polling: interval between scans and how long size/mtime must stay unchanged
+POLL_INTERVAL_SECONDS = 2.0
+QUIET_SECONDS = 5.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0x00000800
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class HandledFiles:
+    """Persistent set of files (by name, size and mtime) that were already sorted."""
+
+    def __init__(self, path: Path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS handled (name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER)"
+        )
+
+    def contains(self, name: str, stat: os.stat_result) -> bool:
+        row = self.connection.execute("SELECT size, mtime_ns FROM handled WHERE name = ?", (name,)).fetchone()
+        return row is not None and row == (stat.st_size, stat.st_mtime_ns)
+
+    def add_many(self, entries: list[tuple[str, os.stat_result]]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO handled (name, size, mtime_ns) VALUES (?, ?, ?)",
+                [(name, stat.st_size, stat.st_mtime_ns) for name, stat in entries],
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class InotifyWatcher:
+    """Reports files that were closed after writing or moved into a directory (Linux only)."""
+
+    def __init__(self, directory: Path):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def ready_names(self, timeout: float) -> list[str]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].split(b"\0", 1)[0]
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Reports files whose size and mtime stayed unchanged for a quiet period."""
+
+    def __init__(self, directory: Path, is_candidate: Callable[[os.DirEntry], bool]):
+        self.directory = directory
+        self.is_candidate = is_candidate
+        # Only files still being written are tracked here, so this stays small
+        self.changing: dict[str, tuple[int, int, float]] = {}
+
+    def ready_names(self, timeout: float) -> list[str]:
+        time.sleep(timeout)
+        now = time.monotonic()
+        ready = []
+        seen = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not self.is_candidate(entry):
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                seen.add(entry.name)
+                previous = self.changing.get(entry.name)
+                if previous is None or previous[:2] != signature:
+                    self.changing[entry.name] = (*signature, now)
+                elif now - previous[2] >= QUIET_SECONDS:
+                    ready.append(entry.name)
+                    del self.changing[entry.name]
+        for name in list(self.changing):
+            if name not in seen:
+                del self.changing[name]
+        return ready
+
+    def close(self) -> None:
+        pass
+
+
+def watch_directory(
+    work_dir: Path,
+    output_dir: Path,
+    supported_exts: tuple[str, ...],
+    sort_batch: Callable[[list[Path]], list[Path]],
+) -> Iterator[int]:
+    """
+    Sort files arriving in `work_dir` until interrupted.
+
+    `sort_batch` sorts a list of files and returns the ones that were handled successfully.
+    Yields the number of handled files after every batch.
+    """
+    handled = HandledFiles(output_dir / STATE_FILE_NAME)
+
+    def is_candidate(entry: os.DirEntry) -> bool:
+        return (
+            entry.is_file()
+            and not entry.name.startswith(".")
+            and entry.name.lower().endswith(supported_exts)
+            and not handled.contains(entry.name, entry.stat())
+        )
+
+    try:
+        watcher = InotifyWatcher(work_dir)
+        print("Watching for new files (inotify)...")
+    except (OSError, AttributeError):
+        watcher = PollingWatcher(work_dir, is_candidate)
+        print(f"Watching for new files (polling every {POLL_INTERVAL_SECONDS:.0f}s)...")
+
+    # Catch up with files that arrived while not watching
+    with os.scandir(work_dir) as entries:
+        pending = {entry.name: time.monotonic() for entry in entries if is_candidate(entry)}
+    if isinstance(watcher, PollingWatcher):
+        # Let the polling watcher confirm they are complete
+        pending.clear()
+
+    try:
+        while True:
+            timeout = BATCH_DELAY_SECONDS if pending else POLL_INTERVAL_SECONDS
+            for name in watcher.ready_names(timeout):
+                pending.setdefault(name, time.monotonic())
+
+            if not pending:
+                continue
+            oldest = min(pending.values())
+            if len(pending) < BATCH_SIZE and time.monotonic() - oldest < BATCH_DELAY_SECONDS:
+                continue
+
+            batch = []
+            for name in list(pending)[:BATCH_SIZE]:
+                del pending[name]
+                path = work_dir / name
+                try:
+                    if path.is_file() and name.lower().endswith(supported_exts) and not handled.contains(name, path.stat()):
+                        batch.append(path)
+                except OSError:
+                    continue
+            if not batch:
+                continue
+
+            sorted_files = sort_batch(batch)
+            entries = []
+            for path in sorted_files:
+                try:
+                    entries.append((path.name, path.stat()))
+                except OSError:
+                    continue
+            handled.add_many(entries)
+            yield len(entries)
+    finally:
+        watcher.close()
+        handled.close()
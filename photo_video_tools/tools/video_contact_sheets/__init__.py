@@ -0,0 +1 @@
+"""Video contact sheets tool."""
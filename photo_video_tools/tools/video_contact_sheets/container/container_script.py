@@ -0,0 +1,208 @@
+"""Make a contact sheet of keyframe thumbnails for each MP4/MOV video.
+
+Each thumbnail is taken with input seeking (`-ss` before `-i`) and only keyframes are
+decoded, so a thumbnail costs one keyframe decode regardless of the clip's length. Several
+videos are processed at once. Sheets are cached by the video's size and modification time,
+so a rerun only processes new or changed clips.
+"""
+
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from alive_progress import alive_bar
+
+from photo_video_tools.concurrency import AdaptiveConcurrency
+from photo_video_tools.fastcopy import PARTIAL_SUFFIX
+from photo_video_tools.manifest import STATUS_FAILED, STATUS_OK, Journal, load_units
+from photo_video_tools.media import isobmff
+
+
+WORK_DIR = Path("/work")
+TEMP_DIR = Path("/tmp/processing")
+OUTPUT_DIR = WORK_DIR / "contact_sheets"
+# Video name -> size, mtime and thumbnail count of the video its sheet was made from
+CACHE_FILE = OUTPUT_DIR / ".cache.json"
+
+THUMBNAIL_WIDTH = 480
+MAX_COLUMNS = 4
+TILE_SPACING = 4
+
+
+def load_cache() -> dict[str, dict]:
+    try:
+        with open(CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache: dict[str, dict]) -> None:
+    temp = CACHE_FILE.with_name(f"{CACHE_FILE.name}{PARTIAL_SUFFIX}")
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(temp, CACHE_FILE)
+
+
+def cache_key(video: Path, count: int) -> dict:
+    stat = video.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "count": count}
+
+
+def sheet_path(video: Path) -> Path:
+    return OUTPUT_DIR / f"{video.stem}.jpg"
+
+
+def probe_duration(video: Path) -> float | None:
+    """Duration from the `mvhd` box, or from ffprobe for files without one (e.g. fragmented MP4s)."""
+    duration = isobmff.read_duration(video)
+    if duration is not None:
+        return duration
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(video)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    try:
+        return float(probe.stdout.strip())
+    except ValueError:
+        return None
+
+
+def run_ffmpeg(command: list[str]) -> None:
+    # Capture the output so lines of concurrent runs don't interleave
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exit code {process.returncode}: {process.stdout.strip()}")
+
+
+def make_contact_sheet(video: Path, count: int) -> int:
+    """Write the contact sheet of a video; returns the number of thumbnails on it."""
+    duration = probe_duration(video)
+    if duration is None:
+        raise RuntimeError("duration not found")
+
+    thumbnail_dir = TEMP_DIR / f"{video.name}.{threading.get_ident()}"
+    thumbnail_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        # Middle of each of `count` equal segments, so the first and last frames (often black) are avoided
+        for i in range(count):
+            seconds = (i + 0.5) * duration / count
+            run_ffmpeg([
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                # Input options: decode keyframes only, jump to the keyframe before `seconds`
+                # instead of decoding up to it; one thread, the videos run in parallel
+                "-skip_frame", "nokey", "-threads", "1",
+                "-ss", f"{seconds:.3f}", "-noaccurate_seek",
+                "-i", str(video),
+                "-map", "0:v:0", "-frames:v", "1",
+                "-vf", f"scale={THUMBNAIL_WIDTH}:-2",
+                "-q:v", "3",
+                str(thumbnail_dir / f"{i:03d}.jpg"),
+            ])
+
+        columns = min(count, MAX_COLUMNS)
+        rows = math.ceil(count / columns)
+        output = sheet_path(video)
+        temp_output = output.with_name(f".{output.name}{PARTIAL_SUFFIX}.jpg")
+        run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-framerate", "1", "-i", str(thumbnail_dir / "%03d.jpg"),
+            "-vf", f"tile={columns}x{rows}:padding={TILE_SPACING}:margin={TILE_SPACING}",
+            "-frames:v", "1", "-q:v", "3",
+            str(temp_output),
+        ])
+        # Renamed when complete, so the host never sees a partial sheet
+        os.replace(temp_output, output)
+    finally:
+        shutil.rmtree(thumbnail_dir, ignore_errors=True)
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit() or int(sys.argv[1]) < 1:
+        print("Usage: python container_script.py <thumbnails per video>")
+        raise SystemExit(1)
+    count = int(sys.argv[1])
+
+    units = load_units(WORK_DIR)
+    if units is not None:
+        # Videos listed in the manifest passed in
+        videos = [unit[0] for unit in units]
+    else:
+        videos = sorted(
+            file for file in WORK_DIR.iterdir()
+            if file.is_file() and file.suffix.lower() in isobmff.VIDEO_EXTENSIONS
+        )
+
+    if not videos:
+        print("No MP4/MOV videos found. Abort.")
+        raise SystemExit(0)
+
+    print(f"Found {len(videos)} videos to process.")
+
+    TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    OUTPUT_DIR.mkdir(exist_ok=True)
+
+    # Skip videos whose sheet was made from the same file with the same settings
+    cache = load_cache()
+    pending = []
+    unchanged = 0
+    journal = Journal.from_environment(WORK_DIR)
+    for video in videos:
+        if cache.get(video.name) == cache_key(video, count) and sheet_path(video).exists():
+            journal.record(video, STATUS_OK, "unchanged")
+            unchanged += 1
+        else:
+            pending.append(video)
+    if unchanged:
+        print(f"{unchanged} contact sheets are up to date.")
+
+    processed = 0
+    failed = 0
+    controller = AdaptiveConcurrency.from_environment()
+
+    try:
+        with alive_bar(
+            len(pending),
+            title="Making contact sheets",
+            bar="smooth",
+            spinner="waves",
+            dual_line=True,
+            enrich_print=True,
+        ) as bar:
+            for video, thumbnails, error in controller.map_unordered(
+                lambda video: make_contact_sheet(video, count), pending
+            ):
+                bar.text(video.name)
+                if error is not None:
+                    print(f"✗ Failed to process {video.name}: {error}")
+                    journal.record(video, STATUS_FAILED, str(error))
+                    cache.pop(video.name, None)
+                    failed += 1
+                else:
+                    print(f"✓ Processed {video.name} ({thumbnails} thumbnails)")
+                    journal.record(video, STATUS_OK)
+                    cache[video.name] = cache_key(video, count)
+                    processed += 1
+                bar()
+    finally:
+        save_cache(cache)
+        journal.close()
+
+    print(controller.summary())
+    print(f"Processed: {processed}")
+    print(f"Unchanged: {unchanged}")
+    print(f"Failed: {failed}")
+
+    print(f"Output written to: {OUTPUT_DIR}")
+
+    if failed != 0:
+        print("Completed with failures!")
+        raise SystemExit(1)
+
+    raise SystemExit(0)
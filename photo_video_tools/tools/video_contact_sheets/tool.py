@@ -0,0 +1,32 @@
+"""Host launcher for the Docker container executing the script of the video_contact_sheets tool."""
+
+from pathlib import Path
+from photo_video_tools.media import isobmff
+from photo_video_tools.shared import ToolBase
+
+TOOL_PATH = Path(__file__).parent
+CONTAINER_DIR = TOOL_PATH / "container"
+DEFAULT_THUMBNAIL_COUNT = 12
+MAX_THUMBNAIL_COUNT = 64
+
+
+class VideoContactSheetsTool(ToolBase):
+    """Tile keyframe thumbnails of each video into one contact sheet JPEG."""
+
+    name = "Video Contact Sheets"
+    description = "Tile keyframe thumbnails of each MP4/MOV video into one contact sheet JPEG"
+
+    directory_prompt = "Select folder containing MP4/MOV videos"
+    container_name = "ffmpeg"
+    container_dir = CONTAINER_DIR
+    input_extensions = tuple(sorted(isobmff.VIDEO_EXTENSIONS))
+
+    @classmethod
+    def ask_script_args(cls) -> list[str] | None:
+        while True:
+            user_input = input(f"Number of thumbnails per video (Enter for {DEFAULT_THUMBNAIL_COUNT}): ").strip()
+            if not user_input:
+                return [str(DEFAULT_THUMBNAIL_COUNT)]
+            if user_input.isdigit() and 1 <= int(user_input) <= MAX_THUMBNAIL_COUNT:
+                return [user_input]
+            print(f"Invalid number. Please enter a whole number from 1 to {MAX_THUMBNAIL_COUNT}.")
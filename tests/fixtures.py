@@ -0,0 +1,130 @@
+"""Builders for small synthetic media files used by the tests.
+
+The files hold just enough structure for the readers and writers under test: an MP4 has
+`ftyp`, `moov` (with `mvhd`, tracks and optional metadata) and an `mdat` of filler bytes.
+"""
+
+import struct
+from datetime import datetime, timezone
+
+from photo_video_tools.media.isobmff import datetime_to_mac_time
+from photo_video_tools.media.mp4_edit import box, full_box
+
+IDENTITY_MATRIX = struct.pack(">9I", 0x00010000, 0, 0, 0, 0x00010000, 0, 0, 0, 0x40000000)
+
+
+def mac_time(year: int, month: int, day: int, hour: int = 0, minute: int = 0, second: int = 0) -> int:
+    return datetime_to_mac_time(datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc))
+
+
+def mvhd(creation: int, modification: int | None = None, version: int = 0, timescale: int = 1000,
+         duration: int = 10_000, next_track_id: int = 2) -> bytes:
+    modification = creation if modification is None else modification
+    fmt = ">QQIQ" if version == 1 else ">IIII"
+    return full_box(
+        b"mvhd", version, 0,
+        struct.pack(fmt, creation, modification, timescale, duration),
+        struct.pack(">IH10x", 0x00010000, 0x0100), IDENTITY_MATRIX, bytes(24), struct.pack(">I", next_track_id),
+    )
+
+
+def tkhd(creation: int, track_id: int = 1, duration: int = 10_000, width: int = 1920, height: int = 1080) -> bytes:
+    return full_box(
+        b"tkhd", 0, 3,
+        struct.pack(">IIIII", creation, creation, track_id, 0, duration),
+        bytes(8), struct.pack(">hhH2x", 0, 0, 0), IDENTITY_MATRIX, struct.pack(">II", width << 16, height << 16),
+    )
+
+
+def mdhd(creation: int, timescale: int = 1000, duration: int = 10_000) -> bytes:
+    return full_box(b"mdhd", 0, 0, struct.pack(">IIIIHH", creation, creation, timescale, duration, 0x55C4, 0))
+
+
+def video_trak(creation: int, track_id: int = 1) -> bytes:
+    handler = full_box(b"hdlr", 0, 0, bytes(4), b"vide", bytes(12), b"VideoHandler\x00")
+    return box(b"trak", tkhd(creation, track_id), box(b"mdia", mdhd(creation), handler))
+
+
+def keys_meta(items: dict[str, str]) -> bytes:
+    """QuickTime `meta` box with Keys metadata, e.g. {'com.apple.quicktime.creationdate': '...'}."""
+    handler = full_box(b"hdlr", 0, 0, bytes(4), b"mdta", bytes(12), b"\x00")
+    keys = full_box(
+        b"keys", 0, 0, struct.pack(">I", len(items)),
+        *(box(b"mdta", name.encode("utf-8")) for name in items),
+    )
+    entries = [
+        box(struct.pack(">I", index), box(b"data", struct.pack(">II", 1, 0), value.encode("utf-8")))
+        for index, value in enumerate(items.values(), start=1)
+    ]
+    return full_box(b"meta", 0, 0, handler, keys, box(b"ilst", *entries))
+
+
+def udta_text(item_type: bytes, value: str) -> bytes:
+    """QuickTime text user data item such as `©day` or `©xyz`."""
+    text = value.encode("utf-8")
+    return box(item_type, struct.pack(">HH", len(text), 0x55C4), text)
+
+
+def mp4(*moov_children: bytes, mdat_size: int = 4096, moov_first: bool = False, after_moov: bytes = b"") -> bytes:
+    """A complete file: `ftyp`, then `mdat` and `moov` in either order."""
+    ftyp = box(b"ftyp", b"isom", struct.pack(">I", 0x200), b"isomiso2mp41")
+    mdat = box(b"mdat", bytes(range(256)) * (mdat_size // 256))
+    moov = box(b"moov", *moov_children) + after_moov
+    return ftyp + (moov + mdat if moov_first else mdat + moov)
+
+
+def simple_mp4(creation: int | None = None, **kwargs) -> bytes:
+    creation = mac_time(2024, 5, 12, 12, 33, 10) if creation is None else creation
+    return mp4(mvhd(creation), video_trak(creation), **kwargs)
+
+
+def ifd(offset: int, entries: list[tuple[int, int, int, bytes]], next_ifd: int = 0) -> bytes:
+    """A little-endian IFD at `offset` with (tag, type, count, value) entries; long values follow it."""
+    values_offset = offset + 2 + len(entries) * 12 + 4
+    table, values = b"", b""
+    for tag, field_type, count, value in entries:
+        if len(value) <= 4:
+            field = value.ljust(4, b"\0")
+        else:
+            field = struct.pack("<I", values_offset + len(values))
+            values += value + b"\0" * (len(value) % 2)
+        table += struct.pack("<HHI", tag, field_type, count) + field
+    return struct.pack("<H", len(entries)) + table + struct.pack("<I", next_ifd) + values
+
+
+def rationals(*values: tuple[int, int]) -> bytes:
+    return b"".join(struct.pack("<II", numerator, denominator) for numerator, denominator in values)
+
+
+def tiff_stream(date_time_original: str = "2024:05:12 14:33:10", position: tuple[str, str] | None = None) -> bytes:
+    """
+    A TIFF stream with DateTimeOriginal in the EXIF IFD and, optionally, a GPS IFD.
+
+    `position` is ('N' or 'S', 'E' or 'W'); the coordinates are 47° 30' N/S, 8° 15' E/W.
+    """
+    date = date_time_original.encode("ascii") + b"\0"
+
+    def ifd0(exif_offset: int, gps_offset: int) -> bytes:
+        entries = [(0x0132, 2, len(date), date), (0x8769, 4, 1, struct.pack("<I", exif_offset))]
+        if position is not None:
+            entries.append((0x8825, 4, 1, struct.pack("<I", gps_offset)))
+        return ifd(8, entries)
+
+    exif_offset = 8 + len(ifd0(0, 0))
+    exif = ifd(exif_offset, [(0x9003, 2, len(date), date)])
+    gps_offset = exif_offset + len(exif)
+    gps = b""
+    if position is not None:
+        gps = ifd(gps_offset, [
+            (0x0001, 2, 2, position[0].encode() + b"\0"),
+            (0x0002, 5, 3, rationals((47, 1), (30, 1), (0, 1))),
+            (0x0003, 2, 2, position[1].encode() + b"\0"),
+            (0x0004, 5, 3, rationals((8, 1), (15, 1), (0, 1))),
+        ])
+    return b"II*\0" + struct.pack("<I", 8) + ifd0(exif_offset, gps_offset) + exif + gps
+
+
+def jpeg(tiff: bytes) -> bytes:
+    """A JPEG with an APP1 Exif segment holding `tiff` and no image data."""
+    app1 = b"Exif\0\0" + tiff
+    return b"\xff\xd8" + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + b"\xff\xd9"
@@ -0,0 +1,93 @@
+import io
+import struct
+import tarfile
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from photo_video_tools.archives import Archive, extract_member
+from photo_video_tools.media import formats
+
+from .fixtures import jpeg, tiff_stream
+
+PHOTO = jpeg(tiff_stream()) + bytes(range(256)) * 64
+MTIME = 1_700_000_000
+
+
+def make_zip(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        stored = zipfile.ZipInfo("DCIM/100CANON/IMG_0001.JPG", (2023, 11, 14, 22, 13, 20))
+        # Info-ZIP extended timestamp with the exact modification time
+        stored.extra = struct.pack("<HHBI", 0x5455, 5, 1, MTIME)
+        archive.writestr(stored, PHOTO, zipfile.ZIP_STORED)
+        archive.writestr("DCIM/101CANON/IMG_0001.JPG", PHOTO[::-1], zipfile.ZIP_DEFLATED)
+        archive.writestr("__MACOSX/DCIM/._IMG_0001.JPG", b"resource fork")
+        archive.writestr("DCIM/", b"")
+    return path
+
+
+def make_tar(path):
+    with tarfile.open(path, "w") as archive:
+        info = tarfile.TarInfo("DCIM/IMG_0002.JPG")
+        info.size, info.mtime = len(PHOTO), MTIME
+        archive.addfile(info, io.BytesIO(PHOTO))
+        hidden = tarfile.TarInfo("DCIM/.DS_Store")
+        archive.addfile(hidden, io.BytesIO(b""))
+    return path
+
+
+def test_zip_members(tmp_path):
+    with Archive(make_zip(tmp_path / "card.zip")) as archive:
+        stored, deflated = archive.members
+        assert (stored.name, stored.compressed, deflated.compressed) == ("IMG_0001.JPG", False, True)
+        assert stored.stat().st_mtime_ns == MTIME * 1_000_000_000
+        assert archive.data_offset(deflated) is None
+
+        for member, expected in ((stored, PHOTO), (deflated, PHOTO[::-1])):
+            dst = tmp_path / f"{member.path.split('/')[1]}.jpg"
+            extract_member(member, dst)
+            assert dst.read_bytes() == expected
+            assert dst.stat().st_mtime_ns == member.mtime_ns
+        assert extract_member(stored, tmp_path / "hashed.jpg", "blake2b").digest is not None
+
+
+def test_tar_member_reads_like_a_file(tmp_path):
+    with Archive(make_tar(tmp_path / "card.tar")) as archive:
+        (member,) = archive.members
+        assert member.stat() == (len(PHOTO), MTIME * 1_000_000_000)
+        with member.open() as f:
+            f.seek(-256, io.SEEK_END)
+            assert f.read() == bytes(range(256))
+        assert formats.read_capture_time(member) == datetime(2024, 5, 12, 14, 33, 10)
+        with pytest.raises(ValueError):
+            member.open("r+b")
+
+
+def test_capture_time_of_a_compressed_member(tmp_path):
+    path = tmp_path / "card.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("IMG_0003.JPG", PHOTO, zipfile.ZIP_DEFLATED)
+    with Archive(path) as archive:
+        assert formats.read_capture_time(archive.members[0]) == datetime(2024, 5, 12, 14, 33, 10)
+
+
+@pytest.mark.parametrize("name, data", [
+    ("garbage.zip", b"not an archive" * 100),
+    ("empty.tar", b""),
+])
+def test_unreadable_archives_are_refused(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        Archive(path)
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_truncated_archives_are_refused(tmp_path, make):
+    data = make(tmp_path / "card").read_bytes()
+    path = tmp_path / "cut"
+    # Cut inside the data of the first member: the headers before it are complete
+    path.write_bytes(data[:512 + len(PHOTO) // 2])
+    with pytest.raises(ValueError):
+        Archive(path)
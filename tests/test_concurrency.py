@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+from photo_video_tools import concurrency
+from photo_video_tools.concurrency import AdaptiveConcurrency
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(concurrency, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def run_window(clock, controller: AdaptiveConcurrency, tasks: int, nbytes: int, latency: float | None) -> int:
+    """Finish `tasks` tasks in a one-second measurement window and return the limit afterwards."""
+    for _ in range(tasks - 1):
+        controller.task_finished(nbytes, latency)
+    clock[0] += 1.0
+    controller.task_finished(nbytes, latency)
+    return controller.limit
+
+
+def test_grows_while_throughput_keeps_up(clock):
+    controller = AdaptiveConcurrency(1, 8, initial=2)
+    limits = [run_window(clock, controller, 10 * (i + 1), 1000, 0.1) for i in range(4)]
+    assert limits == [3, 4, 5, 6]
+
+
+def test_halves_when_throughput_collapses(clock):
+    controller = AdaptiveConcurrency(1, 8, initial=6)
+    assert run_window(clock, controller, 40, 1000, 0.1) == 7
+    assert run_window(clock, controller, 10, 1000, 0.1) == 3
+
+
+def test_steps_back_when_latency_rises_at_flat_throughput(clock):
+    controller = AdaptiveConcurrency(1, 8, initial=4)
+    assert run_window(clock, controller, 20, 1000, 0.2) == 5
+    # Same throughput, but each operation takes 60% longer
+    assert run_window(clock, controller, 20, 1000, 0.32) == 4
+    # Rising latency that comes with more throughput is fine
+    assert run_window(clock, controller, 30, 1000, 0.5) == 5
+
+
+def test_latency_is_optional(clock):
+    controller = AdaptiveConcurrency(1, 8, initial=4)
+    assert run_window(clock, controller, 20, 1000, None) == 5
+    assert run_window(clock, controller, 20, 1000, None) == 6
+    assert "ms per file" not in controller.summary()
+
+
+def test_stays_within_limits(clock):
+    controller = AdaptiveConcurrency(2, 3, initial=3)
+    assert run_window(clock, controller, 40, 1000, 0.1) == 3
+    assert run_window(clock, controller, 4, 1000, 0.1) == 2
+
+
+def test_map_unordered_yields_every_item():
+    controller = AdaptiveConcurrency(1, 4)
+
+    def work(item: int) -> int:
+        if item == 3:
+            raise ValueError("bad item")
+        return item * 2
+
+    results = {item: (result, error) for item, result, error in controller.map_unordered(work, range(6), size=lambda item: item)}
+    assert {item: result for item, (result, _) in results.items()} == {0: 0, 1: 2, 2: 4, 3: None, 4: 8, 5: 10}
+    assert isinstance(results[3][1], ValueError)
+    assert controller.total_tasks == controller.total_timed_tasks == 6
+    assert "ms per file" in controller.summary()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from photo_video_tools import docker_utils
+from photo_video_tools.docker_utils import BatchJob, run_command_async, run_jobs_concurrently
+
+
+def python_job(label: str, code: str, **kwargs) -> BatchJob:
+    return BatchJob(label, [sys.executable, "-c", code], **kwargs)
+
+
+def test_long_output_lines_are_read(tmp_path):
+    job = python_job("", "print('x' * 200_000); print('done')", log_path=tmp_path / "job.log")
+    assert asyncio.run(run_command_async(job)) == 0
+    assert (tmp_path / "job.log").read_text().splitlines() == ["x" * 200_000, "done"]
+
+
+def test_exit_codes_in_job_order():
+    jobs = [python_job(str(code), f"raise SystemExit({code})") for code in (3, 0, 1)]
+    assert asyncio.run(run_jobs_concurrently(jobs, 2)) == [3, 0, 1]
+
+
+def test_cancelled_job_kills_its_process(tmp_path):
+    pid_file = tmp_path / "pid"
+    job = python_job(
+        "sleeper", f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(60)",
+    )
+
+    async def run_and_cancel():
+        task = asyncio.create_task(run_command_async(job))
+        while not pid_file.exists() or not pid_file.read_text():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(asyncio.wait_for(run_and_cancel(), 30))
+    pid = int(pid_file.read_text())
+    # The process was killed and waited for, so its pid is gone
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+def test_required_images_are_prepared_only_for_a_build(monkeypatch):
+    built = []
+    monkeypatch.setattr(docker_utils, "_image_source_hash", lambda image: "")
+
+    def run(command, **kwargs):
+        built.append(command[command.index("-t") + 1])
+        return SimpleNamespace(returncode=0)
+
+    monkeypatch.setattr(docker_utils.subprocess, "run", run)
+    image, dockerfile_dir, extra_files = docker_utils._container_sources("exiftool-nodejs")
+    assert docker_utils.CONTAINERS_DIR / "exiftool" / "build_timezone_data.py" in extra_files
+    docker_utils.ensure_base_image(
+        image, dockerfile_dir, extra_files, before_build=docker_utils._prepare_required_images("exiftool-nodejs", None),
+    )
+    assert built == ["base-exiftool", "base-exiftool-nodejs"]
+
+    # Up to date: nothing is built, not even the required image
+    built.clear()
+    wanted_hash = docker_utils.source_hash(dockerfile_dir, extra_files)
+    monkeypatch.setattr(docker_utils, "_image_source_hash", lambda image: wanted_hash)
+    docker_utils.ensure_base_image(
+        image, dockerfile_dir, extra_files, before_build=docker_utils._prepare_required_images("exiftool-nodejs", None),
+    )
+    assert built == []
@@ -0,0 +1,14 @@
+from photo_video_tools.exiftool import copy_written, existing_copies
+
+
+def test_copy_of_an_earlier_run_is_not_written(tmp_path):
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    old, new, failed = (tmp_path / name for name in ("old.jpg", "new.jpg", "failed.jpg"))
+    (output_dir / "old.jpg").write_bytes(b"earlier run")
+
+    existed = existing_copies([old, new, failed], output_dir)
+    # What a `-o` write leaves behind: it creates one copy and refuses to overwrite the other
+    (output_dir / "new.jpg").write_bytes(b"this run")
+
+    assert [copy_written(file, output_dir, existed) for file in (old, new, failed)] == [False, True, False]
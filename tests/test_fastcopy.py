@@ -0,0 +1,104 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from photo_video_tools.fastcopy import (
+    PARTIAL_SUFFIX,
+    ChecksumManifest,
+    copy_file,
+    copy_range,
+    copy_stream,
+    hash_file,
+    link_file,
+    sample_hash,
+)
+
+DATA = os.urandom(3 * 1024 * 1024 + 17)
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "src.bin"
+    path.write_bytes(DATA)
+    os.utime(path, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+    return path
+
+
+def no_partials(folder):
+    return not any(path.name.endswith(PARTIAL_SUFFIX) for path in folder.iterdir())
+
+
+@pytest.mark.parametrize("algorithm", [None, "blake2b"])
+def test_copy_file(tmp_path, src, algorithm):
+    dst = tmp_path / "dst.bin"
+    dst.write_bytes(b"replaced")
+    result = copy_file(src, dst, algorithm)
+    assert dst.read_bytes() == DATA
+    assert result.bytes_copied == len(DATA)
+    assert result.digest == (hashlib.blake2b(DATA).hexdigest() if algorithm else None)
+    assert dst.stat().st_mtime_ns == src.stat().st_mtime_ns
+    assert no_partials(tmp_path)
+
+
+@pytest.mark.parametrize("unsupported", [["copy_file_range"], ["copy_file_range", "sendfile"]])
+def test_copy_falls_back_when_kernel_copies_copy_nothing(tmp_path, src, monkeypatch, unsupported):
+    for name in unsupported:
+        if hasattr(os, name):
+            monkeypatch.setattr(os, name, lambda *args: 0)
+    dst = tmp_path / "dst.bin"
+    result = copy_file(src, dst)
+    assert dst.read_bytes() == DATA
+    assert result.method != "copy_file_range"
+    if len(unsupported) == 2:
+        assert result.method == "buffered"
+
+
+def test_copy_range(tmp_path, src):
+    dst = tmp_path / "part.bin"
+    copy_range(src, dst, 1000, 5000, mtime_ns=1_600_000_000_000_000_000)
+    assert dst.read_bytes() == DATA[1000:6000]
+    assert dst.stat().st_mtime_ns == 1_600_000_000_000_000_000
+
+
+def test_copy_range_beyond_the_end_leaves_nothing(tmp_path, src):
+    dst = tmp_path / "part.bin"
+    with pytest.raises(OSError):
+        copy_range(src, dst, len(DATA) - 10, 100)
+    assert not dst.exists()
+    assert no_partials(tmp_path)
+
+
+def test_copy_stream(tmp_path):
+    result = copy_stream(io.BytesIO(DATA), tmp_path / "stream.bin", "blake2b")
+    assert (tmp_path / "stream.bin").read_bytes() == DATA
+    assert result.digest == hash_file(tmp_path / "stream.bin", "blake2b")
+
+
+def test_link_file(tmp_path, src):
+    dst = tmp_path / "link.bin"
+    assert link_file(src, dst).method == "link"
+    assert os.path.samefile(src, dst)
+    # Linking again is a no-op
+    assert link_file(src, dst).bytes_copied == 0
+
+
+def test_sample_hash_sees_head_and_tail_only(tmp_path, src):
+    other = tmp_path / "other.bin"
+    middle = len(DATA) // 2
+    other.write_bytes(DATA[:middle] + bytes([DATA[middle] ^ 1]) + DATA[middle + 1:])
+    assert sample_hash(src, "blake2b") == sample_hash(other, "blake2b")
+    assert hash_file(src, "blake2b") != hash_file(other, "blake2b")
+    other.write_bytes(DATA[:-1] + bytes([DATA[-1] ^ 1]))
+    assert sample_hash(src, "blake2b") != sample_hash(other, "blake2b")
+
+
+def test_manifest_verify(tmp_path, src):
+    manifest = ChecksumManifest(tmp_path, "blake2b")
+    result = copy_file(src, tmp_path / "copy.bin", "blake2b")
+    manifest.record(tmp_path / "copy.bin", result.digest)
+    manifest.record(tmp_path / "missing.bin", result.digest)
+    assert manifest.verify() == ["missing.bin"]
+    (tmp_path / "copy.bin").write_bytes(b"changed")
+    assert manifest.verify() == ["copy.bin", "missing.bin"]
@@ -0,0 +1,53 @@
+import io
+import struct
+from datetime import datetime
+
+import pytest
+
+from photo_video_tools.media import formats, tiff
+
+from .fixtures import ifd, jpeg, tiff_stream
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_jpeg_capture_time_and_position(tmp_path):
+    path = write(tmp_path, "photo.jpg", jpeg(tiff_stream(position=("S", "W"))))
+    assert formats.detect_format(path) is formats.JPEG
+    assert formats.read_capture_time(path) == datetime(2024, 5, 12, 14, 33, 10)
+    assert formats.read_position(path) == (-47.5, -8.25)
+
+
+def test_raw_is_detected_by_header_not_extension(tmp_path):
+    path = write(tmp_path, "photo.jpg", tiff_stream())
+    assert formats.detect_format(path).kind == formats.KIND_RAW
+    assert formats.read_capture_time(path) == datetime(2024, 5, 12, 14, 33, 10)
+    assert formats.read_position(path) is None
+
+
+def test_truncated_jpeg_is_unreadable_not_fatal(tmp_path):
+    data = jpeg(tiff_stream(position=("N", "E")))
+    for length in range(len(data)):
+        path = write(tmp_path, "photo.jpg", data[:length])
+        formats.read_capture_time(path)
+        formats.read_position(path)
+
+
+def test_oversized_value_is_refused():
+    # A DateTime entry claiming 4 GB at an offset past the end of the stream
+    stream = b"II*\0" + struct.pack("<I", 8) + ifd(8, [(0x0132, 2, 0xFFFFFFFF, struct.pack("<I", 1000))])
+    reader = tiff.TiffReader(io.BytesIO(stream))
+    entries, _ = reader.read_ifd(reader.first_ifd)
+    with pytest.raises(ValueError):
+        reader.value_bytes(entries[0x0132])
+    assert tiff.read_datetime_original(io.BytesIO(stream)) is None
+
+
+def test_ifd_loop_ends():
+    # IFD0 pointing to itself as the next IFD
+    stream = b"II*\0" + struct.pack("<I", 8) + ifd(8, [(0x0132, 2, 1, b"\0")], next_ifd=8)
+    assert len(list(tiff.TiffReader(io.BytesIO(stream)).iter_ifds())) == 1
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from photo_video_tools.media import formats, isobmff
+from photo_video_tools.media.mp4_edit import box, full_box
+
+from .fixtures import keys_meta, mac_time, mp4, mvhd, simple_mp4, udta_text, video_trak
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_creation_time_prefers_keys_creationdate(tmp_path):
+    created = mac_time(2024, 5, 12, 12, 33, 10)
+    meta = keys_meta({"com.apple.quicktime.creationdate": "2024-05-12T14:33:10+0200"})
+    path = write(tmp_path, "clip.mov", mp4(mvhd(created), video_trak(created), meta))
+    assert isobmff.read_creation_time(path) == datetime(2024, 5, 12, 14, 33, 10)
+
+
+def test_creation_time_from_user_data_date(tmp_path):
+    created = mac_time(2024, 5, 12, 12, 33, 10)
+    udta = box(b"udta", udta_text(b"\xa9day", "2023-01-02T03:04:05+0100"))
+    path = write(tmp_path, "clip.mp4", mp4(mvhd(created), video_trak(created), udta, moov_first=True))
+    assert isobmff.read_creation_time(path) == datetime(2023, 1, 2, 3, 4, 5)
+
+
+def test_creation_time_falls_back_to_mvhd(tmp_path):
+    path = write(tmp_path, "clip.mp4", simple_mp4())
+    expected = datetime(2024, 5, 12, 12, 33, 10, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert isobmff.read_creation_time(path) == expected
+    assert isobmff.read_duration(path) == 10.0
+
+
+def test_location_from_user_data(tmp_path):
+    created = mac_time(2024, 5, 12)
+    udta = box(b"udta", udta_text(b"\xa9xyz", "+47.1234+008.5678+450.000/"))
+    path = write(tmp_path, "clip.mp4", mp4(mvhd(created), udta))
+    assert isobmff.read_location(path) == (47.1234, 8.5678)
+
+
+def test_truncated_files_are_unreadable_not_fatal(tmp_path):
+    data = simple_mp4(moov_first=True, mdat_size=256)
+    for length in range(len(data)):
+        path = write(tmp_path, "clip.mp4", data[:length])
+        # Any result is fine as long as nothing raises
+        isobmff.read_creation_time(path)
+        isobmff.read_duration(path)
+        isobmff.read_location(path)
+
+
+def test_creation_time_out_of_range_is_ignored(tmp_path):
+    path = write(tmp_path, "clip.mp4", mp4(mvhd(2**63, version=1)))
+    assert isobmff.read_creation_time(path) is None
+
+
+@pytest.mark.parametrize("iinf", [
+    # No version/flags, and nothing after it in the file
+    box(b"iinf"),
+    # `infe` too short for its item type
+    full_box(b"iinf", 0, 0, b"\x00\x01", full_box(b"infe", 2, 0, b"\x00\x01")),
+])
+def test_corrupt_heic_has_no_capture_time(tmp_path, iinf):
+    ftyp = box(b"ftyp", b"heic", bytes(4), b"mif1heic")
+    meta = full_box(b"meta", 0, 0, full_box(b"hdlr", 0, 0, bytes(4), b"pict", bytes(13)), box(b"iloc", b"\x01"), iinf)
+    path = write(tmp_path, "photo.heic", ftyp + meta)
+    assert formats.read_capture_time(path) is None
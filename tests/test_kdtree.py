@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from photo_video_tools.geo.kdtree import KDTree, chord_to_km, to_unit_vectors
+from photo_video_tools.geo.places import PlaceIndex
+
+
+def brute_force(points, queries):
+    distances = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    return distances.min(axis=1)
+
+
+@pytest.mark.parametrize("count", [1, 16, 17, 2000])
+def test_nearest_matches_brute_force(count):
+    rng = np.random.default_rng(count)
+    points = to_unit_vectors(rng.uniform(-90, 90, count), rng.uniform(-180, 180, count))
+    queries = to_unit_vectors(rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500))
+    indices, distances = KDTree(points).query(queries)
+    np.testing.assert_allclose(distances, brute_force(points, queries))
+    np.testing.assert_allclose(np.linalg.norm(points[indices] - queries, axis=1), distances)
+
+
+def test_duplicate_points():
+    points = to_unit_vectors(np.zeros(100), np.zeros(100))
+    indices, distances = KDTree(points).query(points[:3])
+    assert (indices >= 0).all()
+    np.testing.assert_allclose(distances, 0.0, atol=1e-12)
+
+
+def test_chord_to_km():
+    a, b = to_unit_vectors(np.array([0.0, 0.0]), np.array([0.0, 1.0]))
+    assert chord_to_km(np.linalg.norm(a - b)) == pytest.approx(111.195, abs=0.01)
+
+
+def test_place_lookup_across_the_date_line():
+    index = PlaceIndex(
+        ["Suva", "Apia", "Zurich"], ["FJ", "WS", "CH"], {"FJ": "Fiji", "CH": "Switzerland"},
+        np.array([-18.14, -13.83, 47.37]), np.array([178.44, -171.77, 8.54]),
+    )
+    suva, apia, zurich = index.lookup([(-18.0, -179.9), (-13.9, -171.7), (47.4, 8.5)])
+    assert (suva.name, suva.country) == ("Suva", "Fiji")
+    # Countries missing from the table are shown by their code
+    assert (apia.name, apia.country) == ("Apia", "WS")
+    assert zurich.distance_km < 5
+    assert index.lookup([]) == []
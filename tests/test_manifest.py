@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from photo_video_tools import sharding
+from photo_video_tools.manifest import (
+    JOURNAL_ENV,
+    MANIFEST_ENV,
+    STATUS_FAILED,
+    STATUS_OK,
+    STATUS_SKIPPED,
+    Journal,
+    Manifest,
+    load_units,
+    read_journal,
+)
+
+
+def make_plan(tmp_path, sizes):
+    manifest = Manifest("AddTimezoneInfoTool", ["+02:00"], str(tmp_path))
+    for i, size in enumerate(sizes):
+        manifest.add([f"IMG_{i:04d}.JPG"], size)
+    path = tmp_path / "plan.jsonl"
+    manifest.write(path)
+    return path
+
+
+def test_manifest_round_trip(tmp_path, monkeypatch):
+    manifest = Manifest("MergeSrtWithMp4Tool", [], str(tmp_path))
+    manifest.add(["Ünïcode.srt", "Ünïcode.mp4"], 123)
+    path = tmp_path / "plan.jsonl"
+    manifest.write(path)
+    assert Manifest.read(path) == manifest
+
+    assert load_units(tmp_path) is None
+    monkeypatch.setenv(MANIFEST_ENV, str(path))
+    mounted = tmp_path / "mounted"
+    assert load_units(mounted) == [[mounted / "Ünïcode.srt", mounted / "Ünïcode.mp4"]]
+
+
+@pytest.mark.parametrize("content", ["", '{"format": 99}\n', '{"tool": "x"}\n'])
+def test_other_files_are_not_manifests(tmp_path, content):
+    path = tmp_path / "plan.jsonl"
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        Manifest.read(path)
+
+
+def test_journal_cut_off_by_a_crash(tmp_path, monkeypatch):
+    path = tmp_path / "journal.jsonl"
+    monkeypatch.setenv(JOURNAL_ENV, str(path))
+    journal = Journal.from_environment(tmp_path)
+    journal.record(tmp_path / "a.jpg", STATUS_FAILED, "exiftool exit code 1")
+    journal.record(tmp_path / "sub" / "b.jpg", STATUS_OK)
+    journal.record(tmp_path / "a.jpg", STATUS_OK)
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"input": "c.jpg", "sta')
+    assert read_journal(path) == {"a.jpg": (STATUS_OK, ""), "sub/b.jpg": (STATUS_OK, "")}
+
+
+def test_shard_balances_bytes(tmp_path):
+    sizes = [100, 90, 50, 40, 30, 20, 10, 5]
+    paths = sharding.shard(make_plan(tmp_path, sizes), 3)
+    parts = [Manifest.read(path) for path in paths]
+    assert sorted(unit for part in parts for unit in part.units) == [[f"IMG_{i:04d}.JPG"] for i in range(len(sizes))]
+    totals = [sum(part.sizes) for part in parts]
+    assert max(totals) - min(totals) <= max(sizes) // 2
+    # Inputs keep the plan's order within a part
+    assert all(part.units == sorted(part.units) for part in parts)
+
+
+def test_executed_parts_are_not_resharded(tmp_path):
+    plan_path = make_plan(tmp_path, [1, 2, 3])
+    paths = sharding.shard(plan_path, 2)
+    sharding.journal_path(paths[0]).write_text("")
+    with pytest.raises(ValueError):
+        sharding.shard(plan_path, 2)
+
+
+def test_merge_writes_results_and_remaining_inputs(tmp_path):
+    plan_path = make_plan(tmp_path, [1, 2, 3, 4])
+    first, second = sharding.shard(plan_path, 2)
+    journal = Journal(sharding.journal_path(first), tmp_path)
+    outcomes = [STATUS_OK, STATUS_FAILED]
+    for status, unit in zip(outcomes, Manifest.read(first).units):
+        journal.record(tmp_path / unit[0], status)
+    journal.close()
+    journal = Journal(sharding.journal_path(second), tmp_path)
+    journal.record(tmp_path / Manifest.read(second).units[0][0], STATUS_SKIPPED)
+    journal.close()
+
+    assert sharding.merge(plan_path) == 1
+    with open(tmp_path / "plan.results.jsonl", encoding="utf-8") as f:
+        statuses = sorted(json.loads(line)["status"] for line in f)
+    assert statuses == ["failed", "not run", "ok", "skipped"]
+    remaining = Manifest.read(tmp_path / "plan.remaining.jsonl")
+    assert len(remaining.units) == 2
+    assert remaining.params == ["+02:00"]
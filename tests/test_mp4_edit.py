@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+from photo_video_tools.media import mp4_edit
+from photo_video_tools.media.isobmff import iter_boxes, read_payload
+from photo_video_tools.media.mp4_edit import UnsupportedLayout, box, free_box
+
+from .fixtures import mac_time, mp4, mvhd, simple_mp4, video_trak
+
+CREATED = mac_time(2024, 5, 12)
+
+
+@pytest.fixture
+def rewrite(tmp_path):
+    def rewrite(data: bytes, moov_payload: bytes, appended: bytes = b"") -> bytes:
+        path = tmp_path / "clip.mp4"
+        path.write_bytes(data)
+        with open(path, "r+b") as f:
+            mp4_edit.write(f, mp4_edit.read_layout(f), moov_payload, appended)
+        return path.read_bytes()
+    return rewrite
+
+
+def top_level(data: bytes) -> list[tuple[bytes, bytes]]:
+    f = io.BytesIO(data)
+    return [(b.type, read_payload(f, b)) for b in iter_boxes(f, 0, len(data))]
+
+
+def mdat_payload(data: bytes) -> bytes:
+    return next(payload for box_type, payload in top_level(data) if box_type == b"mdat")
+
+
+@pytest.mark.parametrize("moov_first", [False, True])
+def test_round_trip_keeps_media_data(rewrite, moov_first):
+    data = simple_mp4(moov_first=moov_first)
+    grown = mvhd(CREATED) + video_trak(CREATED) + video_trak(CREATED, track_id=2)
+    result = rewrite(data, grown, box(b"mdat", b"new samples"))
+
+    boxes = top_level(result)
+    assert [payload for box_type, payload in boxes if box_type == b"moov"] == [grown]
+    assert mdat_payload(result) == mdat_payload(data)
+    assert boxes[-1][0] in (b"moov", b"mdat")
+    assert (b"mdat", b"new samples") in boxes
+    # The result can be edited again
+    assert mp4_edit.read_layout(io.BytesIO(result)).moov.payload_size == len(grown)
+
+
+def test_moov_at_the_end_is_overwritten(rewrite):
+    data = simple_mp4()
+    result = rewrite(data, mvhd(CREATED))
+    assert [box_type for box_type, _ in top_level(result)] == [b"ftyp", b"mdat", b"moov"]
+    assert len(result) < len(data)
+
+
+def test_fast_start_layout_uses_the_free_space(rewrite):
+    data = simple_mp4(moov_first=True, after_moov=free_box(4096))
+    moov_offset = mp4_edit.read_layout(io.BytesIO(data)).moov.offset
+    result = rewrite(data, mvhd(CREATED) + video_trak(CREATED) + video_trak(CREATED, track_id=2))
+    assert len(result) == len(data)
+    assert [box_type for box_type, _ in top_level(result)] == [b"ftyp", b"moov", b"free", b"mdat"]
+    assert mp4_edit.read_layout(io.BytesIO(result)).moov.offset == moov_offset
+
+
+def test_moov_that_does_not_fit_moves_to_the_end(rewrite):
+    data = simple_mp4(moov_first=True)
+    grown = mvhd(CREATED) + video_trak(CREATED) + video_trak(CREATED, track_id=2)
+    result = rewrite(data, grown)
+    boxes = top_level(result)
+    assert [box_type for box_type, _ in boxes] == [b"ftyp", b"free", b"mdat", b"moov"]
+    # The old moov became free space of the same size, so the media data stays where it was
+    assert result.index(mdat_payload(data)) == data.index(mdat_payload(data))
+
+
+@pytest.mark.parametrize("data", [
+    simple_mp4()[:-3],
+    simple_mp4() + b"junk",
+    mp4(mvhd(CREATED)) + box(b"moov", mvhd(CREATED)),
+    mp4(mvhd(CREATED), box(b"mvex")),
+    mp4(mvhd(CREATED)) + box(b"moof"),
+    b"",
+])
+def test_unsupported_layouts(data):
+    with pytest.raises(UnsupportedLayout):
+        mp4_edit.read_layout(io.BytesIO(data))
@@ -0,0 +1,153 @@
+import importlib.util
+import io
+from pathlib import Path
+
+import pytest
+
+from photo_video_tools.media import isobmff
+from photo_video_tools.media.isobmff import find_box, iter_boxes, read_metadata_items, read_payload
+from photo_video_tools.media.mp4_edit import UnsupportedLayout, box, free_box
+from photo_video_tools.media.mp4_location import LOCATION_KEY, format_iso6709, write_location
+
+from .fixtures import keys_meta, mac_time, mp4, mvhd, udta_text, video_trak
+
+CREATED = mac_time(2024, 5, 12, 12, 33, 10)
+CREATION_DATE = "com.apple.quicktime.creationdate"
+
+
+def write_clip(tmp_path, *moov_children: bytes, **kwargs):
+    path = tmp_path / "clip.mov"
+    path.write_bytes(mp4(mvhd(CREATED), video_trak(CREATED), *moov_children, **kwargs))
+    return path
+
+
+def mdat_payload(data: bytes) -> bytes:
+    f = io.BytesIO(data)
+    return read_payload(f, find_box(f, b"mdat", 0, len(data)))
+
+
+def moov_items(data: bytes) -> tuple[dict[str, bytes], list[bytes]]:
+    """The Keys metadata of `moov/meta` and the item types of `moov/udta`."""
+    f = io.BytesIO(data)
+    moov = find_box(f, b"moov", 0, len(data))
+    meta = find_box(f, b"meta", moov.payload_offset, moov.end)
+    udta = find_box(f, b"udta", moov.payload_offset, moov.end)
+    items = read_metadata_items(f, meta) if meta is not None else {}
+    udta_types = [child.type for child in iter_boxes(f, udta.payload_offset, udta.end)] if udta is not None else []
+    return items, udta_types
+
+
+@pytest.mark.parametrize("position, expected", [
+    ((46.55863, 7.83543, 2971.6), "+46.558630+007.835430+2971.600/"),
+    ((-33.8568, -151.2153, None), "-33.856800-151.215300/"),
+    ((0.0, 0.0, -12.5), "+00.000000+000.000000-12.500/"),
+])
+def test_format_iso6709(position, expected):
+    assert format_iso6709(*position) == expected
+    assert isobmff.parse_iso6709(expected) == pytest.approx(position[:2])
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"moov_first": True},
+    {"moov_first": True, "after_moov": free_box(1024)},
+])
+def test_round_trip(tmp_path, kwargs):
+    path = write_clip(tmp_path, **kwargs)
+    data = path.read_bytes()
+    assert isobmff.read_location(path) is None
+
+    write_location(path, 46.55863, 7.83543, 2971.6)
+    result = path.read_bytes()
+    assert isobmff.read_location(path) == pytest.approx((46.55863, 7.83543))
+    assert mdat_payload(result) == mdat_payload(data)
+    items, udta_types = moov_items(result)
+    assert items[LOCATION_KEY] == b"+46.558630+007.835430+2971.600/"
+    assert udta_types == [b"\xa9xyz"]
+
+    # A second write replaces the position instead of adding another one
+    write_location(path, -33.8568, -151.2153)
+    assert isobmff.read_location(path) == pytest.approx((-33.8568, -151.2153))
+    items, udta_types = moov_items(path.read_bytes())
+    assert list(items) == [LOCATION_KEY]
+    assert udta_types == [b"\xa9xyz"]
+    assert mdat_payload(path.read_bytes()) == mdat_payload(data)
+
+
+def test_fast_start_layout_keeps_the_file_size(tmp_path):
+    path = write_clip(tmp_path, moov_first=True, after_moov=free_box(1024))
+    size = path.stat().st_size
+    write_location(path, 46.55863, 7.83543)
+    assert path.stat().st_size == size
+
+
+def test_free_box_inside_moov_absorbs_the_growth(tmp_path):
+    path = write_clip(tmp_path, free_box(512), moov_first=True)
+    data = path.read_bytes()
+    moov_size = find_box(io.BytesIO(data), b"moov", 0, len(data)).size
+    write_location(path, 46.55863, 7.83543)
+    result = path.read_bytes()
+    assert len(result) == len(data)
+    assert find_box(io.BytesIO(result), b"moov", 0, len(result)).size == moov_size
+    assert isobmff.read_location(path) == pytest.approx((46.55863, 7.83543))
+
+
+def test_existing_metadata_is_kept(tmp_path):
+    meta = keys_meta({CREATION_DATE: "2024-05-12T14:33:10+0200"})
+    udta = box(b"udta", udta_text(b"\xa9day", "2024-05-12T14:33:10+02:00"), udta_text(b"\xa9xyz", "+01.0+002.0/"))
+    path = write_clip(tmp_path, meta, udta)
+
+    write_location(path, 46.55863, 7.83543)
+    items, udta_types = moov_items(path.read_bytes())
+    assert items == {
+        CREATION_DATE: b"2024-05-12T14:33:10+0200",
+        LOCATION_KEY: b"+46.558630+007.835430/",
+    }
+    assert udta_types == [b"\xa9day", b"\xa9xyz"]
+    assert isobmff.read_location(path) == pytest.approx((46.55863, 7.83543))
+
+
+@pytest.mark.parametrize("length", [0, 20, 60, 200])
+def test_truncated_file_writes_nothing(tmp_path, length):
+    path = write_clip(tmp_path, keys_meta({CREATION_DATE: "2024-05-12T14:33:10+0200"}))
+    data = path.read_bytes()
+    moov = data.index(b"moov") - 4
+    path.write_bytes(data[:moov + length])
+    with pytest.raises(UnsupportedLayout):
+        write_location(path, 46.55863, 7.83543)
+    assert path.read_bytes() == data[:moov + length]
+
+
+DJI_SCRIPT = (
+    Path(__file__).parents[1] / "photo_video_tools" / "tools" / "add_geotag_to_dji_drone_video" / "container" / "container_script.py"
+)
+
+
+@pytest.fixture
+def dji_script(monkeypatch):
+    spec = importlib.util.spec_from_file_location("dji_geotag_script", DJI_SCRIPT)
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    # Read back with the reader of this package instead of exiftool
+    monkeypatch.setattr(script, "read_written_position", lambda path: (*isobmff.read_location(path), None))
+    return script
+
+
+def test_dji_geotag_in_place_writes_only_the_original(tmp_path, dji_script):
+    path = write_clip(tmp_path, moov_first=True, after_moov=free_box(1024))
+    size = path.stat().st_size
+    written = dji_script.write_verified_geotag(path, (46.55863, 7.83543, 2971.6))
+    assert written < size
+    assert isobmff.read_location(path) == pytest.approx((46.55863, 7.83543))
+    assert [file.name for file in tmp_path.iterdir()] == ["clip.mov"]
+
+
+def test_dji_geotag_to_copy_leaves_the_original(tmp_path, dji_script):
+    path = write_clip(tmp_path)
+    data = path.read_bytes()
+    output = tmp_path / "out"
+    output.mkdir()
+    dji_script.write_geotag_to_copy(path, (46.55863, 7.83543, 2971.6), output / path.name)
+    assert path.read_bytes() == data
+    assert isobmff.read_location(output / path.name) == pytest.approx((46.55863, 7.83543))
+    assert [file.name for file in output.iterdir()] == ["clip.mov"]
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from photo_video_tools.media import isobmff
+from photo_video_tools.media.mp4_edit import UnsupportedLayout, box
+from photo_video_tools.media.mp4_times import shift_date_string, shift_times
+
+from .fixtures import keys_meta, mac_time, mp4, mvhd, udta_text, video_trak
+
+CREATED = mac_time(2024, 5, 12, 12, 33, 10)
+
+
+def clip(tmp_path, created=CREATED, version=0):
+    meta = keys_meta({"com.apple.quicktime.creationdate": "2024-05-12T14:33:10+0200"})
+    udta = box(b"udta", udta_text(b"\xa9day", "2024-05-12T14:33:10+02:00"))
+    path = tmp_path / "clip.mov"
+    path.write_bytes(mp4(mvhd(created, version=version), video_trak(created), meta, udta))
+    return path
+
+
+@pytest.mark.parametrize("value, shift, shift_offset, expected", [
+    ("2024-05-12T14:33:10+0200", timedelta(hours=-9), False, "2024-05-12T05:33:10+0200"),
+    ("2024-05-12T14:33:10+0200", timedelta(hours=-9), True, "2024-05-12T05:33:10-0700"),
+    ("2024-05-12 23:59:59.5Z", timedelta(seconds=1), True, "2024-05-13 00:00:00.5Z"),
+    # The offset would reach a day
+    ("2024-05-12T14:33:10+02:00", timedelta(hours=-26), True, None),
+    # The year would change the length of the value
+    ("0999-05-12T14:33:10", timedelta(days=-1), False, None),
+    ("9999-12-31T23:33:10", timedelta(hours=1), False, None),
+    ("2024-05-12", timedelta(hours=1), False, None),
+])
+def test_shift_date_string(value, shift, shift_offset, expected):
+    assert shift_date_string(value, shift, shift_offset) == expected
+
+
+def test_round_trip(tmp_path):
+    path = clip(tmp_path)
+    data = path.read_bytes()
+    patches = shift_times(path, timedelta(hours=1), shift_offset=True)
+    assert len(patches) == 2 * 3 + 2
+    assert len(path.read_bytes()) == len(data)
+    assert isobmff.read_creation_time(path) == datetime(2024, 5, 12, 15, 33, 10)
+
+    shift_times(path, timedelta(hours=-1), shift_offset=True)
+    assert path.read_bytes() == data
+
+
+def test_64_bit_times(tmp_path):
+    path = clip(tmp_path, version=1)
+    patches = shift_times(path, timedelta(seconds=30))
+    mvhd_patch = next(patch for patch in patches if patch.label == "mvhd creation time")
+    assert int.from_bytes(mvhd_patch.new, "big") == CREATED + 30
+
+
+def test_out_of_range_shift_writes_nothing(tmp_path):
+    path = clip(tmp_path, created=100)
+    data = path.read_bytes()
+    with pytest.raises(UnsupportedLayout):
+        shift_times(path, timedelta(seconds=-200))
+    assert path.read_bytes() == data
+
+
+@pytest.mark.parametrize("length", [0, 20, 60, 200])
+def test_truncated_file_writes_nothing(tmp_path, length):
+    path = clip(tmp_path)
+    data = path.read_bytes()
+    moov = data.index(b"moov") - 4
+    path.write_bytes(data[:moov + length])
+    with pytest.raises(UnsupportedLayout):
+        shift_times(path, timedelta(hours=1))
+    assert path.read_bytes() == data[:moov + length]
+
+
+def test_fractional_seconds_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        shift_times(clip(tmp_path), timedelta(milliseconds=500))
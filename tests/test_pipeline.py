@@ -0,0 +1,190 @@
+import importlib.util
+import itertools
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from photo_video_tools.pipeline import (
+    DATE_TAGS,
+    GEOTAG,
+    OFFSET_TAGS,
+    SHIFT,
+    TIMEZONE,
+    XMP2EXIF_ARGS_FILE,
+    Step,
+    compile_steps,
+    format_amount,
+    format_shift,
+    geotag_arguments,
+    parse_amount,
+    parse_steps,
+    shift_arguments,
+    timezone_arguments,
+)
+
+_ARGUMENT = re.compile(r"-(\w+)([+-]?)=(.*)")
+SIDECAR = "<name>.xmp"
+CONTAINER_SCRIPT = (
+    Path(__file__).parents[1] / "photo_video_tools" / "tools" / "metadata_pipeline" / "container" / "container_script.py"
+)
+
+
+def parse_duration(value: str) -> timedelta:
+    """'+1:00', '9:30' or '0:03:27' as exiftool reads shifts and offsets."""
+    sign = -1 if value.startswith("-") else 1
+    hours, minutes, *seconds = (int(part) for part in value.lstrip("+-").split(":"))
+    return sign * timedelta(hours=hours, minutes=minutes, seconds=seconds[0] if seconds else 0)
+
+
+def apply_arguments(tags: dict, arguments: list[str], sidecar: dict | None) -> dict:
+    """What exiftool does with the date, offset and sidecar arguments of the tools."""
+    tags = dict(tags)
+    i = 0
+    while i < len(arguments):
+        if arguments[i] == "-tagsfromfile":
+            # The geotag tool's copy: every tag the sidecar has (location, or mapped by xmp2exif.args)
+            assert arguments[i:i + 6] == geotag_arguments(SIDECAR)
+            assert XMP2EXIF_ARGS_FILE in arguments[i:i + 6]
+            tags.update(sidecar)
+            i += 6
+            continue
+        tag, operator, value = _ARGUMENT.fullmatch(arguments[i]).groups()
+        if tag in DATE_TAGS:
+            tags[tag] += parse_duration(value) * (-1 if operator == "-" else 1)
+        elif operator:
+            # Shifting a missing offset leaves it missing
+            if tags.get(tag) is not None:
+                tags[tag] = format_amount(parse_duration(tags[tag]) + parse_duration(value))
+        else:
+            tags[tag] = format_amount(parse_duration(value))
+        i += 1
+    return tags
+
+
+def run_tools(tags: dict, steps: list[Step], sidecar: dict | None) -> dict:
+    """The result of running the standalone tools one after another, with their own arguments."""
+    for step in steps:
+        if step.operation == SHIFT:
+            tags = apply_arguments(tags, shift_arguments(step.amount), sidecar)
+        elif step.operation == TIMEZONE:
+            # The timezone tool gets the offset as entered, e.g. '+2:00'
+            tags = apply_arguments(tags, timezone_arguments(format_shift(step.amount)), sidecar)
+        elif sidecar is not None:
+            tags = apply_arguments(tags, geotag_arguments(SIDECAR), sidecar)
+    return tags
+
+
+def run_pipeline(tags: dict, steps: list[Step], sidecar: dict | None) -> dict:
+    for write in compile_steps(steps).writes:
+        if write.geotag:
+            if sidecar is not None:
+                tags = apply_arguments(tags, geotag_arguments(SIDECAR), sidecar)
+        else:
+            tags = apply_arguments(tags, write.arguments, sidecar)
+    return tags
+
+
+PHOTOS = [
+    {**{tag: datetime(2024, 5, 12, 14, 33, 10) for tag in DATE_TAGS}, **{tag: "+02:00" for tag in OFFSET_TAGS}},
+    {tag: datetime(2024, 5, 12, 14, 33, 10) for tag in DATE_TAGS},
+]
+SIDECARS = [
+    None,
+    {"GPSLatitude": 47.5, "GPSLongitude": 8.25},
+    # A sidecar of a photo manager with corrected capture time and offset
+    {"GPSLatitude": 47.5, "GPSLongitude": 8.25, "DateTimeOriginal": datetime(2024, 5, 12, 5, 0), "OffsetTimeOriginal": "-07:00"},
+]
+STEPS = [
+    Step(SHIFT, timedelta(hours=1)),
+    Step(SHIFT, timedelta(minutes=7)),
+    Step(SHIFT, timedelta(hours=-9, minutes=-30)),
+    Step(TIMEZONE, timedelta(hours=2)),
+    Step(TIMEZONE, timedelta(hours=-5)),
+    Step(GEOTAG),
+]
+
+
+@pytest.mark.parametrize("steps", [
+    list(combination) for length in range(1, 4) for combination in itertools.product(STEPS, repeat=length)
+], ids=lambda steps: " ".join(map(str, steps)))
+def test_compiled_steps_match_running_the_tools_one_by_one(steps):
+    for photo, sidecar in itertools.product(PHOTOS, SIDECARS):
+        assert run_pipeline(photo, steps, sidecar) == run_tools(photo, steps, sidecar)
+    assert compile_steps(steps).geotag == any(step.operation == GEOTAG for step in steps)
+
+
+@pytest.mark.parametrize("args, writes", [
+    (["shift=-9:00", "timezone=+02:00", "shift=+0:07"], 1),
+    (["geotag"], 1),
+    (["geotag", "geotag"], 1),
+    (["shift=-9:00", "timezone=+02:00", "geotag"], 2),
+    (["shift=-9:00", "geotag", "timezone=+02:00", "geotag"], 4),
+])
+def test_steps_between_geotag_steps_are_one_write(args, writes):
+    assert len(compile_steps(parse_steps(args)).writes) == writes
+
+
+def test_clock_drift_does_not_shift_offsets():
+    assert shift_arguments(timedelta(minutes=7)) == [f"-{tag}+=0:07" for tag in DATE_TAGS]
+    [write] = compile_steps(parse_steps(["shift=+0:07"])).writes
+    assert write.arguments == [f"-{tag}+=00:07" for tag in DATE_TAGS]
+
+
+def test_only_time_zone_changes_shift_offsets():
+    [write] = compile_steps(parse_steps(["shift=+1:00", "shift=+0:07"])).writes
+    assert [f"-{tag}+=+01:00" for tag in OFFSET_TAGS] == write.arguments[len(DATE_TAGS):]
+
+
+def test_no_edits_still_copy():
+    [write] = compile_steps(parse_steps(["shift=+0:00"])).writes
+    assert write.arguments == [] and not write.geotag
+
+
+@pytest.mark.parametrize("shift, expected", [
+    (timedelta(hours=-9), "-9:00"),
+    (timedelta(hours=5, minutes=30), "+5:30"),
+    (timedelta(minutes=3, seconds=27), "+0:03:27"),
+])
+def test_format_shift(shift, expected):
+    assert format_shift(shift) == expected
+    assert parse_duration(expected) == shift
+
+
+@pytest.mark.parametrize("args", [[], ["shift"], ["geotag=1"], ["shift=+1"], ["move=+1:00"]])
+def test_invalid_steps(args):
+    with pytest.raises(ValueError):
+        parse_steps(args)
+
+
+def test_parse_amount():
+    assert parse_amount("-9:30") == -timedelta(hours=9, minutes=30)
+    assert format_amount(parse_amount("+2:00")) == "+02:00"
+
+
+def test_geotag_write_uses_the_tool_arguments_per_sidecar(tmp_path):
+    spec = importlib.util.spec_from_file_location("metadata_pipeline_script", CONTAINER_SCRIPT)
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+
+    photos = [tmp_path / name for name in ("a.jpg", "b.JPG", "c.jpg")]
+    for photo in photos:
+        photo.write_bytes(b"")
+    (tmp_path / "a.xmp").write_bytes(b"")
+    (tmp_path / "b.XMP").write_bytes(b"")
+    stage = tmp_path / "stage"
+    sources = {photo: stage / photo.name for photo in photos}
+    target = tmp_path / "out"
+
+    [geotag, shift] = compile_steps(parse_steps(["geotag", "shift=+1:00"])).writes
+    commands, unchanged = script.batch_commands(sources, geotag, target)
+    assert unchanged == [photos[2]]
+    assert sorted(commands) == [
+        ([photos[0]], ["-m", *geotag_arguments(f"{tmp_path}/%f.xmp"), "-o", f"{target}/", str(stage / "a.jpg")]),
+        ([photos[1]], ["-m", *geotag_arguments(f"{tmp_path}/%f.XMP"), "-o", f"{target}/", str(stage / "b.JPG")]),
+    ]
+
+    commands, unchanged = script.batch_commands(sources, shift, target)
+    assert unchanged == []
+    assert commands == [(photos, ["-m", *shift.arguments, "-o", f"{target}/", *(str(sources[photo]) for photo in photos)])]
@@ -0,0 +1,23 @@
+from photo_video_tools.tools.add_geotag_to_dji_drone_video.tool import AddGeotagToDjiDroneVideoTool
+from photo_video_tools.tools.cpy_geotag_from_xmp_to_jpeg_files.tool import CopyGeotagFromXmpToJpegFilesTool
+
+
+def touch(folder, *names):
+    for name in names:
+        (folder / name).write_bytes(b"")
+
+
+def test_partners_match_in_any_case(tmp_path):
+    touch(tmp_path, "IMG_0001.xmp", "IMG_0001.JPG", "img_0002.XMP", "img_0002.jpeg", "IMG_0003.xmp")
+    units = CopyGeotagFromXmpToJpegFilesTool.scan_inputs(tmp_path)
+    assert [[path.name for path in unit] for unit in units] == [
+        ["IMG_0001.xmp", "IMG_0001.JPG"], ["img_0002.XMP", "img_0002.jpeg"],
+    ]
+
+
+def test_video_partner_with_upper_case_extension(tmp_path):
+    touch(tmp_path, "DJI_0001.SRT", "DJI_0001.MP4", "DJI_0002.srt", "DJI_0002.mp4")
+    units = AddGeotagToDjiDroneVideoTool.scan_inputs(tmp_path)
+    assert [[path.name for path in unit] for unit in units] == [
+        ["DJI_0001.SRT", "DJI_0001.MP4"], ["DJI_0002.srt", "DJI_0002.mp4"],
+    ]
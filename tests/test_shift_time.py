@@ -0,0 +1,54 @@
+import importlib.util
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+CONTAINER_SCRIPT = (
+    Path(__file__).parents[1] / "photo_video_tools" / "tools" / "shift_time_and_timezone" / "container" / "container_script.py"
+)
+
+
+@pytest.fixture(scope="module")
+def script():
+    spec = importlib.util.spec_from_file_location("shift_time_script", CONTAINER_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+PHOTO = {"DateTimeOriginal": "2024:05:12 14:33:10", "OffsetTimeOriginal": "+02:00"}
+PHOTO_WITHOUT_OFFSET = {"DateTimeOriginal": "2024:05:12 14:33:10"}
+
+
+@pytest.mark.parametrize("entry, sidecar, shift, expected", [
+    # Offsets of the file move along with a time zone change, like in file mode
+    (PHOTO, {}, timedelta(hours=-9), "-07:00"),
+    # Clock drift keeps them
+    (PHOTO, {}, timedelta(minutes=3, seconds=27), "+02:00"),
+    # An offset written by Add Timezone into the sidecar is kept or moved instead of dropped
+    (PHOTO_WITHOUT_OFFSET, {"DateTimeOriginal": "2024:05:12 14:33:10+05:30"}, timedelta(hours=1), "+06:30"),
+    (PHOTO_WITHOUT_OFFSET, {"DateTimeOriginal": "2024:05:12 14:33:10.25+05:30"}, timedelta(seconds=40), "+05:30"),
+    # A sidecar written by an earlier -9:00 shift: that shift is undone, so a rerun doesn't shift twice
+    (PHOTO, {"DateTimeOriginal": "2024:05:12 05:33:10-07:00"}, timedelta(hours=-9), "-07:00"),
+    (PHOTO, {"DateTimeOriginal": "2024:05:12 05:33:10-07:00"}, timedelta(hours=-8), "-06:00"),
+    # An earlier clock drift shift didn't move the offset
+    (PHOTO, {"DateTimeOriginal": "2024:05:12 14:36:37+02:00"}, timedelta(hours=1), "+03:00"),
+    (PHOTO, {"DateTimeOriginal": "2024:05:12 14:33:10Z"}, timedelta(hours=1), "+01:00"),
+    # Missing offsets stay missing
+    (PHOTO_WITHOUT_OFFSET, {}, timedelta(hours=1), None),
+    (PHOTO_WITHOUT_OFFSET, {"DateTimeOriginal": "2024:05:12 14:33:10"}, timedelta(hours=1), None),
+])
+def test_sidecar_offset(script, entry, sidecar, shift, expected):
+    assert script.sidecar_offset(entry, sidecar, shift) == expected
+
+
+def test_sidecar_arguments_append_the_offset(script):
+    assert script.sidecar_arguments(timedelta(hours=-9), "-07:00") == [
+        "-globalTimeShift", "-9:00",
+        "-XMP-exif:DateTimeOriginal<${DateTimeOriginal}-07:00",
+        "-XMP-photoshop:DateCreated<${DateTimeOriginal}-07:00",
+        "-XMP-xmp:CreateDate<${CreateDate}-07:00",
+        "-XMP-xmp:ModifyDate<${ModifyDate}-07:00",
+    ]
+    assert "-XMP-xmp:CreateDate<${CreateDate}" in script.sidecar_arguments(timedelta(hours=1), None)
@@ -0,0 +1,139 @@
+import importlib.util
+import io
+import struct
+from pathlib import Path
+
+import pytest
+
+from photo_video_tools.media.isobmff import file_size, find_box, find_path, iter_boxes, read_payload
+from photo_video_tools.media.mp4_edit import UnsupportedLayout
+from photo_video_tools.media.subtitles import add_subtitle_track, build_samples, read_srt
+
+from .fixtures import simple_mp4
+
+SRT = """1
+00:00:00,500 --> 00:00:01,500
+<font size="28">First</font>
+
+2
+00:00:01,000 --> 00:00:02,000
+Second line
+and more
+
+3
+00:00:03,000 --> 00:00:04,000
+Third
+"""
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    if isinstance(data, str):
+        path.write_text(data, encoding="utf-8")
+    else:
+        path.write_bytes(data)
+    return path
+
+
+def test_samples_fill_gaps_and_cut_overlaps(tmp_path):
+    cues = read_srt(write(tmp_path, "clip.srt", SRT))
+    assert [text for _, _, text in cues] == ["First", "Second line\nand more", "Third"]
+    assert build_samples(cues) == [
+        (500, b"\x00\x00"),
+        (500, b"\x00\x05First"),
+        (1000, b"\x00\x14Second line\nand more"),
+        (1000, b"\x00\x00"),
+        (1000, b"\x00\x05Third"),
+    ]
+
+
+@pytest.mark.parametrize("moov_first", [False, True])
+def test_track_round_trip(tmp_path, moov_first):
+    original = simple_mp4(moov_first=moov_first)
+    video = write(tmp_path, "clip.mp4", original)
+    add_subtitle_track(video, write(tmp_path, "clip.srt", SRT))
+
+    with open(video, "rb") as f:
+        moov = find_box(f, b"moov", 0, file_size(f))
+        traks = [b for b in iter_boxes(f, moov.payload_offset, moov.end) if b.type == b"trak"]
+        assert len(traks) == 2
+        text = traks[1]
+        tkhd = read_payload(f, find_box(f, b"tkhd", text.payload_offset, text.end))
+        assert struct.unpack(">I", tkhd[12:16])[0] == 2
+        assert tkhd[-8:] == struct.pack(">II", 1920 << 16, 1080 << 16)
+        assert read_payload(f, find_path(f, [b"mdia", b"hdlr"], text.payload_offset, text.end))[8:12] == b"sbtl"
+
+        stbl = find_path(f, [b"mdia", b"minf", b"stbl"], text.payload_offset, text.end)
+        stsz = read_payload(f, find_box(f, b"stsz", stbl.payload_offset, stbl.end))
+        sizes = struct.unpack(">5I", stsz[12:32])
+        stco = read_payload(f, find_box(f, b"stco", stbl.payload_offset, stbl.end))
+        (chunk_offset,) = struct.unpack(">I", stco[8:12])
+        f.seek(chunk_offset)
+        assert f.read(sum(sizes)) == b"".join(sample for _, sample in build_samples(read_srt(tmp_path / "clip.srt")))
+
+        mvhd = read_payload(f, find_box(f, b"mvhd", moov.payload_offset, moov.end))
+        assert struct.unpack(">I", mvhd[-4:])[0] == 3
+
+    # The original media data is untouched
+    mdat = original[original.index(b"mdat") - 4:][:4096 + 8]
+    assert mdat in video.read_bytes()
+
+
+def test_srt_without_cues_leaves_the_video_alone(tmp_path):
+    video = write(tmp_path, "clip.mp4", simple_mp4())
+    with pytest.raises(ValueError):
+        add_subtitle_track(video, write(tmp_path, "clip.srt", "1\nnot a timing\n"))
+    assert video.read_bytes() == simple_mp4()
+
+
+def test_truncated_video_is_not_edited(tmp_path):
+    data = simple_mp4()[:-10]
+    video = write(tmp_path, "clip.mp4", data)
+    with pytest.raises(UnsupportedLayout):
+        add_subtitle_track(video, write(tmp_path, "clip.srt", SRT))
+    assert video.read_bytes() == data
+
+
+MERGE_SCRIPT = Path(__file__).parents[1] / "photo_video_tools" / "tools" / "merge_srt_with_mp4" / "container" / "container_script.py"
+
+
+def text_tracks(path) -> int:
+    data = path.read_bytes()
+    f = io.BytesIO(data)
+    moov = find_box(f, b"moov", 0, len(data))
+    return sum(
+        1 for trak in iter_boxes(f, moov.payload_offset, moov.end)
+        if trak.type == b"trak" and b"sbtl" in read_payload(f, trak)
+    )
+
+
+@pytest.fixture
+def merge_script(monkeypatch):
+    spec = importlib.util.spec_from_file_location("merge_srt_script", MERGE_SCRIPT)
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    # Read back with this package instead of ffprobe
+    monkeypatch.setattr(script, "read_subtitle_codecs", lambda path: ["mov_text"] * text_tracks(path))
+    return script
+
+
+def test_track_in_place_writes_only_the_original(tmp_path, merge_script):
+    video = write(tmp_path, "clip.mp4", simple_mp4())
+    srt = write(tmp_path, "clip.srt", SRT)
+    size = video.stat().st_size
+    written = merge_script.add_verified_track(srt, video)
+    assert text_tracks(video) == 1
+    assert video.stat().st_size <= size + written
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["clip.mp4", "clip.srt"]
+
+
+def test_track_to_copy_leaves_the_original(tmp_path, merge_script):
+    original = simple_mp4()
+    video = write(tmp_path, "clip.mp4", original)
+    srt = write(tmp_path, "clip.srt", SRT)
+    output = tmp_path / "out"
+    output.mkdir()
+    merge_script.add_track_to_copy(srt, video, output / video.name)
+    assert video.read_bytes() == original
+    assert text_tracks(output / video.name) == 1
+    assert [file.name for file in output.iterdir()] == ["clip.mp4"]
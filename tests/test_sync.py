@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from photo_video_tools.fastcopy import copy_file
+from photo_video_tools.tools.sort_images_into_folders.sync import (
+    ACTION_CONFLICT,
+    ACTION_COPY,
+    ACTION_UNCHANGED,
+    CONFLICTS_REPORT,
+    VERIFY_FULL,
+    VERIFY_PARTIAL,
+    DestinationIndex,
+    place,
+)
+from photo_video_tools.tools.sort_images_into_folders.tool import SortImagesIntoFoldersTool
+
+FOLDER = "2024-05-12"
+
+
+def same_name_sources(tmp_path, count):
+    """Files named IMG_0001.JPG with different content, as in folders of several cameras."""
+    sources = []
+    for number in range(count):
+        path = tmp_path / "in" / f"camera{number}" / "IMG_0001.JPG"
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"photo %d" % number)
+        # Far enough apart that the quick check doesn't take them for copies of each other
+        os.utime(path, ns=(0, 1_700_000_000_000_000_000 + number * 60_000_000_000))
+        sources.append(path)
+    return sources
+
+
+def test_place_reserves_the_chosen_name(tmp_path):
+    index = DestinationIndex(tmp_path / "out")
+    placements = [place(src, FOLDER, index) for src in same_name_sources(tmp_path, 4)]
+    assert [p.action for p in placements] == [ACTION_COPY] * 4
+    assert [p.path.name for p in placements] == [
+        "IMG_0001.JPG", "IMG_0001 (1).JPG", "IMG_0001 (2).JPG", "IMG_0001 (3).JPG",
+    ]
+
+
+def test_released_name_is_chosen_again(tmp_path):
+    index = DestinationIndex(tmp_path / "out")
+    first, second = same_name_sources(tmp_path, 2)
+    placement = place(first, FOLDER, index)
+    index.release(FOLDER, placement.path.name)
+    assert place(second, FOLDER, index).path == placement.path
+
+
+def test_parallel_copies_of_same_name_keep_every_file(tmp_path):
+    index = DestinationIndex(tmp_path / "out")
+    sources = same_name_sources(tmp_path, 8)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda src: SortImagesIntoFoldersTool.copy_to_folder(src, index, folder_for=lambda _: FOLDER), sources,
+        ))
+    assert all(error is None for _, _, error in results)
+    copied = sorted(p.read_bytes() for p in (tmp_path / "out" / FOLDER).iterdir())
+    assert copied == sorted(src.read_bytes() for src in sources)
+    assert not index.reserved
+
+
+def sorted_copy(tmp_path, src, name=None):
+    """A copy in the output as an earlier run left it: same size and mtime."""
+    dst = tmp_path / "out" / FOLDER / (name or src.name)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    copy_file(src, dst)
+    return dst
+
+
+def test_scan_indexes_files_at_the_folder_depth(tmp_path):
+    (src,) = same_name_sources(tmp_path, 1)
+    sorted_copy(tmp_path, src)
+    (tmp_path / "out" / "stray.jpg").write_bytes(b"")
+    (tmp_path / "out" / FOLDER / ".hidden").write_bytes(b"")
+    index = DestinationIndex.scan(tmp_path / "out", 1)
+    assert list(index.entries) == ["IMG_0001.JPG"]
+    assert index.find_unchanged("IMG_0001.JPG", src.stat()) == FOLDER
+
+
+def test_copy_of_an_earlier_run_is_unchanged(tmp_path):
+    (src,) = same_name_sources(tmp_path, 1)
+    dst = sorted_copy(tmp_path, src)
+    placement = place(src, FOLDER, DestinationIndex.scan(tmp_path / "out", 1))
+    assert (placement.action, placement.path) == (ACTION_UNCHANGED, dst)
+
+
+def test_different_file_with_the_same_name(tmp_path):
+    first, second = same_name_sources(tmp_path, 2)
+    sorted_copy(tmp_path, first)
+    index = DestinationIndex.scan(tmp_path / "out", 1)
+    assert place(second, FOLDER, index).path.name == "IMG_0001 (1).JPG"
+    placement = place(second, FOLDER, DestinationIndex.scan(tmp_path / "out", 1), conflicts=CONFLICTS_REPORT)
+    assert (placement.action, placement.path.name) == (ACTION_CONFLICT, "IMG_0001.JPG")
+
+
+def test_renamed_copy_of_an_earlier_run_is_found(tmp_path):
+    first, second = same_name_sources(tmp_path, 2)
+    sorted_copy(tmp_path, first)
+    sorted_copy(tmp_path, second, "IMG_0001 (1).JPG")
+    placement = place(second, FOLDER, DestinationIndex.scan(tmp_path / "out", 1))
+    assert (placement.action, placement.path.name) == (ACTION_UNCHANGED, "IMG_0001 (1).JPG")
+
+
+@pytest.mark.parametrize("verify", [VERIFY_PARTIAL, VERIFY_FULL])
+def test_verify_compares_contents(tmp_path, verify):
+    (src,) = same_name_sources(tmp_path, 1)
+    dst = sorted_copy(tmp_path, src)
+    assert place(src, FOLDER, DestinationIndex.scan(tmp_path / "out", 1), verify).action == ACTION_UNCHANGED
+    # Same size and mtime, different content: only a hash tells them apart
+    dst.write_bytes(src.read_bytes().upper())
+    os.utime(dst, ns=(src.stat().st_atime_ns, src.stat().st_mtime_ns))
+    index = DestinationIndex.scan(tmp_path / "out", 1)
+    assert place(src, FOLDER, index).action == ACTION_UNCHANGED
+    assert place(src, FOLDER, index, verify).path.name == "IMG_0001 (1).JPG"
@@ -0,0 +1,65 @@
+import importlib.util
+import json
+import struct
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from photo_video_tools.geo.timezones import TimezoneIndex, nautical_zone, utc_offset
+
+BUILD_SCRIPT = Path(__file__).parents[1] / "photo_video_tools" / "containers" / "exiftool" / "build_timezone_data.py"
+
+
+def square(west, south, east, north):
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
+
+
+@pytest.fixture(scope="module")
+def data_file(tmp_path_factory):
+    """Berlin as a square with a hole (given to no zone), and Kolkata as a second polygon."""
+    folder = tmp_path_factory.mktemp("timezones")
+    features = [
+        {"properties": {"tzid": "Europe/Berlin"},
+         "geometry": {"type": "Polygon", "coordinates": [square(6, 47, 15, 55), square(10, 50, 11, 51)]}},
+        {"properties": {"tzid": "Asia/Kolkata"},
+         "geometry": {"type": "MultiPolygon", "coordinates": [[square(70, 10, 90, 30)]]}},
+    ]
+    source = folder / "timezones.geojson.zip"
+    with zipfile.ZipFile(source, "w") as archive:
+        archive.writestr("combined.json", json.dumps({"features": features}))
+
+    spec = importlib.util.spec_from_file_location("build_timezone_data", BUILD_SCRIPT)
+    build = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(build)
+    destination = folder / "timezones.bin"
+    build.main(str(source), str(destination))
+    return destination
+
+
+def test_zone_at(data_file):
+    index = TimezoneIndex.load(data_file)
+    assert index.zone_at(52.52, 13.40) == "Europe/Berlin"
+    assert index.zone_at(22.57, 88.36) == "Asia/Kolkata"
+    # In the hole and at sea: the nautical zone
+    assert index.zone_at(50.5, 10.5) == "Etc/GMT-1"
+    assert index.zone_at(0.0, -30.0) == "Etc/GMT+2"
+
+
+def test_utc_offset_follows_daylight_saving_time():
+    assert utc_offset("Europe/Berlin", datetime(2024, 7, 1, 12)) == "+02:00"
+    assert utc_offset("Europe/Berlin", datetime(2024, 1, 1, 12)) == "+01:00"
+    assert utc_offset("Asia/Kolkata", datetime(2024, 1, 1, 12)) == "+05:30"
+    assert utc_offset(nautical_zone(-150.0), datetime(2024, 1, 1, 12)) == "-10:00"
+
+
+def test_truncated_or_foreign_data_file_is_refused(data_file, tmp_path):
+    truncated = tmp_path / "truncated.bin"
+    truncated.write_bytes(data_file.read_bytes()[:20])
+    with pytest.raises(struct.error):
+        TimezoneIndex.load(truncated)
+    foreign = tmp_path / "foreign.bin"
+    foreign.write_bytes(b"PK\x03\x04" + bytes(16))
+    with pytest.raises(ValueError):
+        TimezoneIndex.load(foreign)
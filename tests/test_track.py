@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from photo_video_tools.media.track import simplify, start_utc_offset, write_gpx
+
+
+class Berlin:
+    """Time zone data that puts every position into Berlin."""
+
+    def zone_at(self, latitude: float, longitude: float) -> str:
+        return "Europe/Berlin"
+
+
+def test_straight_line_keeps_only_the_ends():
+    x = np.linspace(0, 1000, 101)
+    assert simplify(x, np.zeros_like(x), 1.0).tolist() == [0, 100]
+
+
+def test_corner_is_kept():
+    x = np.concatenate([np.linspace(0, 100, 11), np.full(10, 100.0)])
+    y = np.concatenate([np.zeros(11), np.linspace(10, 100, 10)])
+    assert simplify(x, y, 1.0).tolist() == [0, 10, 20]
+
+
+def test_turnaround_beyond_the_end_is_kept():
+    # Out 200 m and back 100 m: the far point lies on the line through the ends, not on the segment
+    x = np.array([0.0, 100.0, 200.0, 150.0, 100.0])
+    assert 2 in simplify(x, np.zeros_like(x), 1.0).tolist()
+
+
+def test_truncated_track_returns_all_points():
+    assert simplify(np.array([1.0]), np.array([2.0]), 1.0).tolist() == [0]
+    assert simplify(np.array([]), np.array([]), 1.0).tolist() == []
+
+
+def test_gpx_times_are_utc(tmp_path):
+    local = datetime(2024, 7, 1, 14, 0, 0)
+    track = {
+        "latitude": np.array([52.52, 52.53]),
+        "longitude": np.array([13.40, 13.41]),
+        "abs_alt": np.array([40.0, np.nan]),
+        "timestamp_us": np.array([int((local - datetime(1970, 1, 1)) / timedelta(microseconds=1))] * 2),
+    }
+    # Summer time in Berlin, an hour more than the nautical zone of its longitude
+    offset = start_utc_offset(track, Berlin())
+    assert offset == timedelta(hours=2)
+    path = tmp_path / "flight.gpx"
+    write_gpx(path, track, np.arange(2), "flight", offset)
+    text = path.read_text()
+    assert "<time>2024-07-01T12:00:00.000Z</time>" in text
+    assert text.count("<ele>") == 1
+
+    # Without time zone data the times stay local and aren't marked as UTC
+    write_gpx(path, track, np.arange(2), "flight")
+    assert "<time>2024-07-01T14:00:00.000</time>" in path.read_text()